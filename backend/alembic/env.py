@@ -80,7 +80,17 @@ aichunk = Table(
     Column('document_id', String, ForeignKey('ai_documents.id', ondelete='CASCADE'), nullable=False, index=True),
     Column('chunk_index', Integer, nullable=False),
     Column('content', Text, nullable=False),
-    Column('embedding', Vector(3072))
+    Column('embedding', Vector(3072)),
+    Column('content_hash', String(64), index=True)
+)
+
+aiembcache = Table(
+    'ai_embedding_cache', metadata,
+    Column('model', String, primary_key=True),
+    Column('dims', Integer, primary_key=True),
+    Column('content_hash', String(64), primary_key=True),
+    Column('embedding', Vector()),
+    Column('created_at', DateTime(timezone=True))
 )
 
 aiupload = Table(
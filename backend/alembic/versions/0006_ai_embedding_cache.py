@@ -0,0 +1,41 @@
+"""embedding cache and chunk content hash for ai knowledge
+
+Revision ID: 0006_ai_embedding_cache
+Revises: 0005
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_ai_embedding_cache'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Кэш эмбеддингов по (model, dims, sha256 нормализованного текста); vector без фиксированной размерности
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ai_embedding_cache (
+            model VARCHAR NOT NULL,
+            dims INTEGER NOT NULL,
+            content_hash VARCHAR(64) NOT NULL,
+            embedding vector NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (model, dims, content_hash)
+        )
+        """
+    )
+    # Хэш текста чанка для дедупликации при повторной загрузке
+    op.add_column('ai_chunks', sa.Column('content_hash', sa.String(64), nullable=True))
+    op.create_index('ix_ai_chunks_content_hash', 'ai_chunks', ['content_hash'])
+
+
+def downgrade():
+    op.drop_index('ix_ai_chunks_content_hash', table_name='ai_chunks')
+    op.drop_column('ai_chunks', 'content_hash')
+    op.execute("DROP TABLE IF EXISTS ai_embedding_cache")
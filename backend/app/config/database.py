@@ -1,6 +1,7 @@
 """
 Конфигурация базы данных - подключение к Yandex PostgreSQL с SSL
 """
+import asyncio
 import logging
 import ssl
 from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
@@ -114,20 +115,29 @@ async def init_db():
         await conn.run_sync(Base.metadata.create_all)
     logger.info("✅ Database tables created successfully")
 
-# Для работы с asyncpg напрямую (используется в миграциях и Telegram боте)
+# Для работы с asyncpg напрямую (миграции, Telegram бот, raw-SQL роутеры финансов)
 _db_pool = None
+_db_pool_lock = asyncio.Lock()
+_db_pool_acquire_total = 0
+_db_pool_acquire_errors = 0
 
 async def get_db_pool():
     """
     Получить asyncpg connection pool
-    Используется для прямых SQL запросов в миграциях и Telegram боте
+    Общий пул приложения: создаётся при старте (server.py startup), все raw-SQL
+    запросы берут соединения из него вместо asyncpg.connect на каждый запрос
     """
     global _db_pool
     
-    if _db_pool is None:
+    if _db_pool is not None:
+        return _db_pool
+    
+    async with _db_pool_lock:
+        # Повторная проверка: пул мог создать конкурентный запрос
+        if _db_pool is not None:
+            return _db_pool
         try:
             import asyncpg
-            from .settings import settings
             
             # Парсим DATABASE_URL
             parsed = urlparse(settings.DATABASE_URL)
@@ -140,22 +150,89 @@ async def get_db_pool():
                 password=parsed.password,
                 database=parsed.path.lstrip('/'),
                 ssl=ssl_context,
-                min_size=2,
-                max_size=10,
-                command_timeout=60
+                min_size=settings.DB_POOL_MIN_SIZE,
+                max_size=settings.DB_POOL_MAX_SIZE,
+                command_timeout=60,
+                server_settings={"application_name": "vasdom_audiobot"}
             )
             
-            logger.info("✅ AsyncPG pool created successfully")
+            logger.info(
+                f"✅ AsyncPG pool created successfully "
+                f"(min={settings.DB_POOL_MIN_SIZE}, max={settings.DB_POOL_MAX_SIZE})"
+            )
         except Exception as e:
             logger.error(f"❌ Failed to create asyncpg pool: {e}")
             return None
     
     return _db_pool
 
+async def acquire_db_connection():
+    """
+    Взять соединение из общего пула.
+    Возвращённое соединение обязательно вернуть через release_db_connection()
+    """
+    global _db_pool_acquire_total, _db_pool_acquire_errors
+    
+    pool = await get_db_pool()
+    if pool is None:
+        _db_pool_acquire_errors += 1
+        raise RuntimeError("Database pool is not available")
+    
+    try:
+        conn = await pool.acquire()
+    except Exception:
+        _db_pool_acquire_errors += 1
+        raise
+    _db_pool_acquire_total += 1
+    return conn
+
+async def release_db_connection(conn):
+    """Вернуть соединение в общий пул"""
+    if conn is None or _db_pool is None:
+        return
+    try:
+        await _db_pool.release(conn)
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to release connection to pool: {e}")
+
+def get_db_pool_stats() -> dict:
+    """Метрики пула для /health"""
+    if _db_pool is None:
+        return {
+            "initialized": False,
+            "acquired_total": _db_pool_acquire_total,
+            "acquire_errors": _db_pool_acquire_errors,
+        }
+    size = _db_pool.get_size()
+    idle = _db_pool.get_idle_size()
+    return {
+        "initialized": True,
+        "size": size,
+        "idle": idle,
+        "in_use": size - idle,
+        "min_size": _db_pool.get_min_size(),
+        "max_size": _db_pool.get_max_size(),
+        "acquired_total": _db_pool_acquire_total,
+        "acquire_errors": _db_pool_acquire_errors,
+    }
+
+async def check_db_pool() -> bool:
+    """Быстрая проверка живости БД через пул (SELECT 1)"""
+    pool = await get_db_pool()
+    if pool is None:
+        return False
+    try:
+        async with pool.acquire() as conn:
+            await conn.fetchval("SELECT 1")
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ DB pool health check failed: {e}")
+        return False
+
 async def close_db_pool():
     """Закрыть asyncpg connection pool"""
     global _db_pool
     if _db_pool:
         await _db_pool.close()
         _db_pool = None
-        logger.info("✅ AsyncPG pool closed")
\ No newline at end of file
+        logger.info("✅ AsyncPG pool closed")
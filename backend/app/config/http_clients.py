@@ -0,0 +1,110 @@
+"""
+Общие HTTP-клиенты приложения для внешних интеграций (Bitrix24, Telegram, Novofon, OpenAI)
+Один долгоживущий httpx.AsyncClient на интеграцию: keep-alive пул соединений, HTTP/2 (если
+установлен h2), свои таймауты. Клиенты создаются лениво при первом обращении и закрываются
+в shutdown (server.py) - запросы больше не платят DNS + TLS handshake на каждый вызов
+"""
+import importlib.util
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Таймауты и пулы по интеграциям: (общий таймаут, connect, соединений всего, keep-alive)
+INTEGRATIONS: Dict[str, Dict[str, Any]] = {
+    'bitrix': {'timeout': 40.0, 'connect': 10.0, 'max_connections': 20, 'keepalive': 10},
+    'telegram': {'timeout': 30.0, 'connect': 10.0, 'max_connections': 20, 'keepalive': 10},
+    'novofon': {'timeout': 60.0, 'connect': 10.0, 'max_connections': 10, 'keepalive': 5},
+    'openai': {'timeout': 120.0, 'connect': 10.0, 'max_connections': 20, 'keepalive': 10},
+    'default': {'timeout': 30.0, 'connect': 10.0, 'max_connections': 20, 'keepalive': 10},
+}
+KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '30'))
+
+
+class HTTPClientRegistry:
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._openai = None
+        self._requests: Dict[str, int] = {}
+
+    def get(self, name: str = 'default') -> httpx.AsyncClient:
+        """Общий клиент интеграции (создаётся при первом обращении)"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            cfg = INTEGRATIONS.get(name) or INTEGRATIONS['default']
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(cfg['timeout'], connect=cfg['connect']),
+                limits=httpx.Limits(
+                    max_connections=cfg['max_connections'],
+                    max_keepalive_connections=cfg['keepalive'],
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+                http2=HTTP2_AVAILABLE,
+                follow_redirects=True,
+                event_hooks={'request': [self._count(name)]},
+            )
+            self._clients[name] = client
+            logger.info(f"🌐 HTTP client '{name}' opened (http2={HTTP2_AVAILABLE})")
+        return client
+
+    def _count(self, name: str):
+        async def hook(request: httpx.Request) -> None:
+            self._requests[name] = self._requests.get(name, 0) + 1
+        return hook
+
+    @asynccontextmanager
+    async def client(self, name: str = 'default'):
+        """`async with http_clients.client('telegram') as client:` - как httpx.AsyncClient(), но без закрытия"""
+        yield self.get(name)
+
+    def openai(self):
+        """AsyncOpenAI поверх общего пула 'openai'"""
+        if self._openai is None or self._clients.get('openai') is None or self._clients['openai'].is_closed:
+            from openai import AsyncOpenAI
+            self._openai = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'), http_client=self.get('openai'))
+        return self._openai
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        self._openai = None
+        for name, client in clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"HTTP client '{name}' close failed: {e}")
+        if clients:
+            logger.info(f"✅ HTTP clients closed: {', '.join(clients)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'http2': HTTP2_AVAILABLE,
+            'clients': {
+                name: {'open': not client.is_closed, 'requests': self._requests.get(name, 0)}
+                for name, client in self._clients.items()
+            },
+        }
+
+
+http_clients = HTTPClientRegistry()
+
+
+def get_http_client(name: str = 'default') -> httpx.AsyncClient:
+    return http_clients.get(name)
+
+
+def get_openai_client(api_key: Optional[str] = None):
+    """Общий AsyncOpenAI; с явным ключом - отдельный экземпляр на том же пуле соединений"""
+    if api_key and api_key != os.getenv('OPENAI_API_KEY'):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=api_key, http_client=http_clients.get('openai'))
+    return http_clients.openai()
+
+
+async def close_http_clients() -> None:
+    await http_clients.aclose()
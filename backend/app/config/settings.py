@@ -13,9 +13,19 @@ class Settings:
     
     # Database
     DATABASE_URL: str = os.getenv('DATABASE_URL', '')
+    DB_POOL_MIN_SIZE: int = int(os.getenv('DB_POOL_MIN_SIZE', '2'))
+    DB_POOL_MAX_SIZE: int = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
     
     # Integrations
     BITRIX24_WEBHOOK_URL: str = os.getenv('BITRIX24_WEBHOOK_URL', '')
+    # Лимиты REST API Bitrix24 (leaky bucket портала): запросов в секунду, запас, одновременных запросов
+    BITRIX_RATE_LIMIT: float = float(os.getenv('BITRIX_RATE_LIMIT', '2'))
+    BITRIX_RATE_BURST: int = int(os.getenv('BITRIX_RATE_BURST', '50'))
+    BITRIX_MAX_CONCURRENCY: int = int(os.getenv('BITRIX_MAX_CONCURRENCY', '4'))
+    # Фильтры list_houses (бригада, даты уборок) - в filter[...] crm.deal.list, а не перебором всех сделок
+    BITRIX_FILTER_PUSHDOWN: bool = os.getenv('BITRIX_FILTER_PUSHDOWN', 'true').lower() in ('1', 'true', 'yes')
+    # application_token исходящего вебхука Bitrix24 (auth[application_token]) для /bitrix-webhook/deal-event
+    BITRIX_APP_TOKEN: str = os.getenv('BITRIX_APP_TOKEN', '')
     TELEGRAM_BOT_TOKEN: str = os.getenv('TELEGRAM_BOT_TOKEN', '')
     EMERGENT_LLM_KEY: str = os.getenv('EMERGENT_LLM_KEY', '')
     
@@ -0,0 +1,4 @@
+-- Keyset-пагинация /houses: выражения совпадают с _SORT_KEYS в routers/houses.py (NULL -> '' / epoch)
+CREATE INDEX IF NOT EXISTS ix_houses_brigade_keyset ON houses ((COALESCE(brigade_number, '')), id) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS ix_houses_company_keyset ON houses ((COALESCE(company_title, '')), id) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS ix_houses_synced_keyset ON houses ((COALESCE(synced_at, 'epoch'::timestamp)), id) WHERE deleted_at IS NULL;
@@ -0,0 +1,8 @@
+-- Синхронизация домов из Bitrix24: хэш содержимого (пишутся только изменившиеся дома) и мягкое удаление
+ALTER TABLE houses ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+ALTER TABLE houses ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS ix_houses_deleted_at ON houses(deleted_at);
+
+COMMENT ON COLUMN houses.content_hash IS 'sha256 полей из Bitrix24 на момент последней записи';
+COMMENT ON COLUMN houses.deleted_at IS 'Сделка пропала из Bitrix24';
@@ -0,0 +1,32 @@
+-- Локальное зеркало сделок Bitrix24 (воронка домов CATEGORY_ID=34)
+CREATE TABLE IF NOT EXISTS bitrix_deals_mirror (
+    deal_id BIGINT PRIMARY KEY,
+    category_id VARCHAR,
+    deal JSONB NOT NULL,  -- Сырые поля сделки из crm.deal.list / crm.deal.get
+    company_title VARCHAR,  -- Название УК, уже разрешённое через crm.company.get
+    address VARCHAR,  -- UF_CRM_1669561599956 или TITLE
+    date_modify TIMESTAMP WITH TIME ZONE,
+    deleted BOOLEAN DEFAULT FALSE,
+    synced_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_bitrix_deals_mirror_active ON bitrix_deals_mirror(deleted, category_id);
+CREATE INDEX IF NOT EXISTS idx_bitrix_deals_mirror_date_modify ON bitrix_deals_mirror(date_modify DESC);
+
+-- Карты значений enum-полей сделок (типы уборок)
+CREATE TABLE IF NOT EXISTS bitrix_enum_mirror (
+    field_code VARCHAR PRIMARY KEY,
+    enum_values JSONB NOT NULL,
+    synced_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Состояние синхронизации (last_sync по DATE_MODIFY)
+CREATE TABLE IF NOT EXISTS bitrix_sync_state (
+    key VARCHAR PRIMARY KEY,
+    last_sync TIMESTAMP WITH TIME ZONE,
+    full_sync_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE bitrix_deals_mirror IS 'Зеркало сделок Bitrix24 для list_houses без обхода портала';
+COMMENT ON COLUMN bitrix_deals_mirror.date_modify IS 'DATE_MODIFY сделки, по нему работает дельта-синхронизация';
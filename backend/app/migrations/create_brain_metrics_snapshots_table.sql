@@ -0,0 +1,12 @@
+-- Снимки BrainMetrics: одна строка - интервал между сбросами одного процесса (flush_brain_metrics)
+CREATE TABLE IF NOT EXISTS brain_metrics_snapshots (
+    id BIGSERIAL PRIMARY KEY,
+    taken_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    instance VARCHAR NOT NULL,  -- '<host>:<pid>': метрики в памяти процесса, у каждого воркера свои
+    started_at TIMESTAMP WITH TIME ZONE,  -- старт процесса
+    data JSONB NOT NULL  -- счётчики и гистограммы за интервал (приросты, не накопленные значения)
+);
+
+CREATE INDEX IF NOT EXISTS idx_brain_metrics_snapshots_taken_at ON brain_metrics_snapshots(taken_at);
+
+COMMENT ON TABLE brain_metrics_snapshots IS 'Тренды Single Brain для дашборда агентов: задержки резолверов и BrainStore, кеши, circuit breaker';
@@ -0,0 +1,21 @@
+-- Очередь событий звонков: одна строка на звонок (webhook Novofon, агент опроса, автопроцессор)
+CREATE TABLE IF NOT EXISTS call_events (
+    call_key VARCHAR PRIMARY KEY,  -- 'novofon:<pbx_call_id>', 'bitrix:<CALL_ID>'
+    source VARCHAR,
+    kind VARCHAR,  -- обработчик: transcription / novofon_api / bitrix_api / external
+    metadata JSONB NOT NULL DEFAULT '{}'::jsonb,  -- метаданные NOTIFY_END, дополняются последующими событиями
+    payload JSONB,
+    status VARCHAR NOT NULL DEFAULT 'waiting',  -- waiting / pending / processing / done / failed / skipped
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    available_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP WITH TIME ZONE,
+    locked_by VARCHAR,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_call_events_ready ON call_events(available_at) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_call_events_processing ON call_events(locked_at) WHERE status = 'processing';
+
+COMMENT ON TABLE call_events IS 'Очередь звонков на саммари: обработка ровно один раз между процессами и рестартами';
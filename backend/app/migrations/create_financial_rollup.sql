@@ -0,0 +1,130 @@
+-- Помесячные свёртки financial_transactions для отчётов /finances (profit-loss, expense/revenue-analysis,
+-- export-expenses, консолидация) и подневная - для cash-flow.
+-- Поддерживаются триггерами уровня оператора (transition tables): любой INSERT/UPDATE/DELETE, включая
+-- импорты и скрипты, применяет к свёрткам дельту одним INSERT ... ON CONFLICT на оператор.
+-- Месяц и день - по UTC. Файл выполняется целиком в одной транзакции (run_migrations.WHOLE_FILE_MIGRATIONS).
+
+-- Колонка company добавлялась скриптом add_company_field.py; триггеру она нужна всегда
+ALTER TABLE financial_transactions ADD COLUMN IF NOT EXISTS company VARCHAR(100) DEFAULT 'ООО ВАШ ДОМ';
+
+-- Записи во время создания триггеров и первичного заполнения ждут, чтобы не потерять дельты
+LOCK TABLE financial_transactions IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE TABLE IF NOT EXISTS financial_monthly_rollup (
+    company VARCHAR(100) NOT NULL,  -- '' для NULL
+    month DATE NOT NULL,  -- первое число месяца (UTC)
+    project VARCHAR(100) NOT NULL,  -- '' для NULL; в данных это подпись месяца ("Январь 2025")
+    category VARCHAR(100) NOT NULL,
+    type VARCHAR(10) NOT NULL,
+    amount DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    tx_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (company, type, month, project, category)
+);
+
+CREATE INDEX IF NOT EXISTS idx_financial_monthly_rollup_project ON financial_monthly_rollup(company, type, project);
+
+CREATE TABLE IF NOT EXISTS financial_daily_rollup (
+    day DATE NOT NULL,  -- UTC
+    type VARCHAR(10) NOT NULL,
+    amount DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    tx_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, type)
+);
+
+CREATE OR REPLACE FUNCTION financial_rollup_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        TRUNCATE financial_monthly_rollup, financial_daily_rollup;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO financial_monthly_rollup AS r (company, type, month, project, category, amount, tx_count)
+        SELECT COALESCE(company, ''), type, date_trunc('month', date AT TIME ZONE 'UTC')::date,
+               COALESCE(project, ''), category, -SUM(amount), -COUNT(*)
+        FROM old_rows
+        GROUP BY 1, 2, 3, 4, 5
+        ORDER BY 1, 2, 3, 4, 5
+        ON CONFLICT (company, type, month, project, category)
+        DO UPDATE SET amount = r.amount + EXCLUDED.amount, tx_count = r.tx_count + EXCLUDED.tx_count;
+
+        INSERT INTO financial_daily_rollup AS r (day, type, amount, tx_count)
+        SELECT (date AT TIME ZONE 'UTC')::date, type, -SUM(amount), -COUNT(*)
+        FROM old_rows
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        ON CONFLICT (day, type)
+        DO UPDATE SET amount = r.amount + EXCLUDED.amount, tx_count = r.tx_count + EXCLUDED.tx_count;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO financial_monthly_rollup AS r (company, type, month, project, category, amount, tx_count)
+        SELECT COALESCE(company, ''), type, date_trunc('month', date AT TIME ZONE 'UTC')::date,
+               COALESCE(project, ''), category, SUM(amount), COUNT(*)
+        FROM new_rows
+        GROUP BY 1, 2, 3, 4, 5
+        ORDER BY 1, 2, 3, 4, 5
+        ON CONFLICT (company, type, month, project, category)
+        DO UPDATE SET amount = r.amount + EXCLUDED.amount, tx_count = r.tx_count + EXCLUDED.tx_count;
+
+        INSERT INTO financial_daily_rollup AS r (day, type, amount, tx_count)
+        SELECT (date AT TIME ZONE 'UTC')::date, type, SUM(amount), COUNT(*)
+        FROM new_rows
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        ON CONFLICT (day, type)
+        DO UPDATE SET amount = r.amount + EXCLUDED.amount, tx_count = r.tx_count + EXCLUDED.tx_count;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        -- Группы, в которых не осталось транзакций
+        DELETE FROM financial_monthly_rollup r
+        USING (SELECT DISTINCT COALESCE(company, '') AS company, type,
+                      date_trunc('month', date AT TIME ZONE 'UTC')::date AS month,
+                      COALESCE(project, '') AS project, category
+               FROM old_rows) o
+        WHERE r.company = o.company AND r.type = o.type AND r.month = o.month
+          AND r.project = o.project AND r.category = o.category AND r.tx_count = 0;
+
+        DELETE FROM financial_daily_rollup r
+        USING (SELECT DISTINCT (date AT TIME ZONE 'UTC')::date AS day, type FROM old_rows) o
+        WHERE r.day = o.day AND r.type = o.type AND r.tx_count = 0;
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS financial_rollup_insert ON financial_transactions;
+CREATE TRIGGER financial_rollup_insert AFTER INSERT ON financial_transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE financial_rollup_apply();
+
+DROP TRIGGER IF EXISTS financial_rollup_update ON financial_transactions;
+CREATE TRIGGER financial_rollup_update AFTER UPDATE ON financial_transactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE financial_rollup_apply();
+
+DROP TRIGGER IF EXISTS financial_rollup_delete ON financial_transactions;
+CREATE TRIGGER financial_rollup_delete AFTER DELETE ON financial_transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE financial_rollup_apply();
+
+DROP TRIGGER IF EXISTS financial_rollup_truncate ON financial_transactions;
+CREATE TRIGGER financial_rollup_truncate AFTER TRUNCATE ON financial_transactions
+    FOR EACH STATEMENT EXECUTE PROCEDURE financial_rollup_apply();
+
+-- Первичное заполнение (свёртки пустые - таблица только что создана)
+INSERT INTO financial_monthly_rollup (company, type, month, project, category, amount, tx_count)
+SELECT COALESCE(company, ''), type, date_trunc('month', date AT TIME ZONE 'UTC')::date,
+       COALESCE(project, ''), category, SUM(amount), COUNT(*)
+FROM financial_transactions
+WHERE NOT EXISTS (SELECT 1 FROM financial_monthly_rollup)
+GROUP BY 1, 2, 3, 4, 5;
+
+INSERT INTO financial_daily_rollup (day, type, amount, tx_count)
+SELECT (date AT TIME ZONE 'UTC')::date, type, SUM(amount), COUNT(*)
+FROM financial_transactions
+WHERE NOT EXISTS (SELECT 1 FROM financial_daily_rollup)
+GROUP BY 1, 2;
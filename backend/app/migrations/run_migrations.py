@@ -7,6 +7,9 @@ from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Файлы с функциями plpgsql ($$ ... ; ... $$) нельзя резать по ';' - выполняются целиком в одной транзакции
+WHOLE_FILE_MIGRATIONS = {"create_financial_rollup.sql"}
+
 async def run_migrations(db_pool):
     """
     Выполняет SQL миграции из папки migrations
@@ -29,7 +32,13 @@ async def run_migrations(db_pool):
         "add_brigade_test_users.sql",
         "update_test_passwords.sql",
         "create_financial_transactions_table.sql",
-        "create_debts_inventory_tables.sql"
+        "create_debts_inventory_tables.sql",
+        "create_bitrix_deals_mirror_table.sql",
+        "create_call_events_table.sql",
+        "add_houses_sync_columns.sql",
+        "add_houses_listing_indexes.sql",
+        "create_financial_rollup.sql",
+        "create_brain_metrics_snapshots_table.sql"
     ]
     
     for migration_file in migrations:
@@ -46,6 +55,12 @@ async def run_migrations(db_pool):
             
             # Выполняем каждую команду отдельно вне транзакции
             async with db_pool.acquire() as conn:
+                if migration_file in WHOLE_FILE_MIGRATIONS:
+                    async with conn.transaction():
+                        await conn.execute(sql)
+                    logger.info(f"[migrations] ✅ Migration executed: {migration_file}")
+                    continue
+                
                 # Разбиваем SQL на отдельные команды
                 commands = [cmd.strip() for cmd in sql.split(';') if cmd.strip()]
                 for command in commands:
@@ -52,6 +52,8 @@ class House(Base):
     created_at = Column(DateTime, default=lambda: datetime.utcnow())
     updated_at = Column(DateTime, default=lambda: datetime.utcnow(), onupdate=lambda: datetime.utcnow())
     synced_at = Column(DateTime, nullable=True)  # Дата последней синхронизации с Bitrix24
+    content_hash = Column(String(64), nullable=True)  # sha256 полей из Bitrix24 (services/house_sync.py)
+    deleted_at = Column(DateTime, nullable=True, index=True)  # Сделка пропала из Bitrix24 (мягкое удаление)
     
     def __repr__(self):
         return f"<House(id={self.id}, address={self.address}, brigade={self.brigade_number})>"
\ No newline at end of file
@@ -180,3 +180,43 @@ async def initialize_logs_table():
     except Exception as e:
         logger.error(f"❌ Error creating logs table: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/brain-metrics")
+async def get_brain_metrics_trends(hours: int = 24, instance: str = None):
+    """
+    Тренды Single Brain: снимки BrainMetrics за интервалы (brain_metrics_snapshots),
+    в каждом - приросты счётчиков и гистограммы задержек с p50/p95/p99
+    """
+    from backend.app.config.database import acquire_db_connection, release_db_connection
+
+    try:
+        conn = await acquire_db_connection()
+        try:
+            rows = await conn.fetch(
+                """
+                SELECT taken_at, instance, started_at, data
+                FROM brain_metrics_snapshots
+                WHERE taken_at >= $1 AND ($2::varchar IS NULL OR instance = $2)
+                ORDER BY taken_at
+                """,
+                datetime.now(timezone.utc) - timedelta(hours=hours), instance,
+            )
+            return {
+                "hours": hours,
+                "snapshots": [
+                    {
+                        "taken_at": row['taken_at'].isoformat(),
+                        "instance": row['instance'],
+                        "started_at": row['started_at'].isoformat() if row['started_at'] else None,
+                        "data": json.loads(row['data']) if isinstance(row['data'], str) else row['data'],
+                    }
+                    for row in rows
+                ],
+            }
+        finally:
+            await release_db_connection(conn)
+
+    except Exception as e:
+        logger.error(f"❌ Error fetching brain metrics trends: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -17,14 +17,14 @@ from backend.app.models.chat_history import ChatHistory
 from backend.app.models.ai_task import AITask, AITaskStatus, AITaskType
 from backend.app.models.house import House
 from backend.app.services.openai_service import VasDomAIAgent
-from backend.app.services.bitrix24_service import Bitrix24Service
+from backend.app.services.bitrix24_service import bitrix24_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/ai", tags=["AI Chat"])
 
 # Инициализация сервисов
 ai_agent = VasDomAIAgent()
-bitrix_service = Bitrix24Service()
+bitrix_service = bitrix24_service
 
 # Pydantic модели
 
@@ -124,8 +124,8 @@ async def handle_get_houses_for_date(date: str, brigade_number: Optional[str] =
         target_date = datetime.strptime(date, "%Y-%m-%d").date()
         date_str = target_date.strftime("%Y-%m-%d")
         
-        # Базовый запрос (все дома)
-        query = select(House)
+        # Базовый запрос (все дома, кроме пропавших из Bitrix24)
+        query = select(House).where(House.deleted_at.is_(None))
         
         if brigade_number:
             query = query.where(House.brigade_number == brigade_number)
@@ -178,7 +178,7 @@ async def handle_get_brigade_workload(brigade_number: str, date: Optional[str] =
         
         # Получаем все дома бригады
         result = await db.execute(
-            select(House).where(House.brigade_number == brigade_number)
+            select(House).where(House.brigade_number == brigade_number, House.deleted_at.is_(None))
         )
         houses = result.scalars().all()
         
@@ -1,14 +1,19 @@
 import os
 import io
 import json
+import asyncio
+import hashlib
+import re
+from array import array
+from collections import OrderedDict
 import zipfile
 import logging
 from datetime import datetime, timezone, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set
 from uuid import uuid4
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Body
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 # Psycopg3 async
 try:
@@ -25,6 +30,14 @@ except Exception:  # pragma: no cover
     PgJson = None
     PSYCOPG_AVAILABLE = False
 
+# pgvector: бинарный формат vector для COPY (без него - текстовый COPY)
+try:
+    from pgvector.psycopg import register_vector_async
+    PGVECTOR_AVAILABLE = True
+except Exception:  # pragma: no cover
+    register_vector_async = None
+    PGVECTOR_AVAILABLE = False
+
 from openai import AsyncOpenAI
 import tiktoken
 from PyPDF2 import PdfReader
@@ -42,6 +55,16 @@ OPENAI_API_KEY = (os.environ.get("OPENAI_API_KEY") or "").strip()
 
 ALLOWED_EXT = {".pdf", ".docx", ".txt", ".xlsx", ".zip"}
 
+# Эмбеддинги: размер батча (input-массив одного запроса) и число параллельных запросов
+EMBED_BATCH_SIZE = max(1, int(os.environ.get("AI_EMBED_BATCH_SIZE", "64")))
+EMBED_CONCURRENCY = max(1, int(os.environ.get("AI_EMBED_CONCURRENCY", "4")))
+# In-process LRU перед таблицей ai_embedding_cache (векторы хранятся как float32)
+EMBED_CACHE_SIZE = max(0, int(os.environ.get("AI_EMBED_CACHE_SIZE", "1024")))
+# ANN-поиск по ai_chunks: значения по умолчанию для ivfflat.probes / hnsw.ef_search (0 - настройка сервера)
+VECTOR_INDEX_NAME = "ix_ai_chunks_embedding"
+VECTOR_PROBES = max(0, int(os.environ.get("AI_VECTOR_PROBES", "0")))
+VECTOR_EF_SEARCH = max(0, int(os.environ.get("AI_VECTOR_EF_SEARCH", "0")))
+
 # ========= DSN helpers =========
 from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
 
@@ -139,7 +162,17 @@ async def _summarize(text: str, max_chars: int = 2000) -> str:
     return (text or "")[:max_chars]
 
 
+# Размерность ai_chunks.embedding - читается из каталога один раз на процесс
+_vector_dims: Optional[int] = None
+_openai_client: Optional[AsyncOpenAI] = None
+# Наличие ai_embedding_cache / ai_chunks.content_hash (миграция 0006) - проверяется один раз
+_cache_schema: Optional[Dict[str, bool]] = None
+
+
 async def _detect_vector_dims() -> int:
+    global _vector_dims
+    if _vector_dims is not None:
+        return _vector_dims
     if not await _ensure_pool():
         return 1536
     try:
@@ -159,36 +192,464 @@ async def _detect_vector_dims() -> int:
                 if row and isinstance(row.get("atttypmod"), int) and row["atttypmod"] > 4:
                     dims = int(row["atttypmod"]) - 4
                     if 1528 <= dims <= 1536:
-                        return 1536
+                        dims = 1536
+                    _vector_dims = dims
                     return dims
     except Exception as e:
         logger.warning(f"Vector dims detection failed: {e}")
     return 1536
 
 
+def _get_openai_client() -> AsyncOpenAI:
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+    return _openai_client
+
+
+def _embedding_model(dims: int) -> str:
+    return "text-embedding-3-small" if dims <= 1536 else "text-embedding-3-large"
+
+
+def _fit_dims(vec: List[float], dims: int) -> List[float]:
+    if len(vec) > dims:
+        return vec[:dims]
+    if len(vec) < dims:
+        return vec + [0.0] * (dims - len(vec))
+    return vec
+
+
 async def _embed_texts_dynamic(texts: List[str]) -> List[List[float]]:
+    """Эмбеддинги батчами по EMBED_BATCH_SIZE, до EMBED_CONCURRENCY запросов одновременно.
+    Порядок результата совпадает с texts; при ошибке батча - нулевые векторы для его текстов"""
     dims = await _detect_vector_dims()
-    model = "text-embedding-3-small" if dims <= 1536 else "text-embedding-3-large"
+    model = _embedding_model(dims)
+    if not texts:
+        return []
     if not OPENAI_API_KEY:
         return [[0.0] * dims for _ in texts]
-    client = AsyncOpenAI(api_key=OPENAI_API_KEY)
-    out: List[List[float]] = []
-    for t in texts:
-        try:
-            r = await client.embeddings.create(model=model, input=t)
-            vec = r.data[0].embedding
-            if len(vec) != dims:
-                if len(vec) > dims:
-                    vec = vec[:dims]
-                else:
-                    vec = vec + [0.0] * (dims - len(vec))
-            out.append(vec)
-        except Exception as e:
-            logger.error(f"Embedding error: {e}")
-            out.append([0.0] * dims)
+    client = _get_openai_client()
+    sem = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+    async def _batch(batch: List[str]) -> List[List[float]]:
+        async with sem:
+            try:
+                r = await client.embeddings.create(model=model, input=batch)
+                data = sorted(r.data, key=lambda d: d.index)
+                if len(data) != len(batch):
+                    raise ValueError(f"expected {len(batch)} embeddings, got {len(data)}")
+                return [_fit_dims(list(d.embedding), dims) for d in data]
+            except Exception as e:
+                logger.error(f"Embedding error: {e}")
+                return [[0.0] * dims for _ in batch]
+
+    # Пустые строки API отклоняет (и валит весь батч) - для них сразу нулевой вектор
+    out: List[List[float]] = [[0.0] * dims for _ in texts]
+    pending = [i for i, t in enumerate(texts) if t and t.strip()]
+    groups = [pending[i : i + EMBED_BATCH_SIZE] for i in range(0, len(pending), EMBED_BATCH_SIZE)]
+    results = await asyncio.gather(*(_batch([texts[i] for i in g]) for g in groups))
+    for g, vecs in zip(groups, results):
+        for i, vec in zip(g, vecs):
+            out[i] = vec
     return out
 
 
+def _normalize_vectors(vectors: List[Any]) -> List[List[float]]:
+    """Normalize vector length to 1536 to avoid rare atttypmod anomalies"""
+    norm = []
+    for v in vectors:
+        if not isinstance(v, list):
+            v = []
+        if 1528 <= len(v) <= 1536:
+            v = _fit_dims(v, 1536)
+        norm.append(v)
+    return norm
+
+
+def _vector_literal(v: List[float]) -> str:
+    return "[" + ",".join(map(repr, map(float, v or []))) + "]"
+
+
+async def _copy_chunks(
+    conn,
+    cur,
+    doc_id: str,
+    chunks: List[str],
+    vectors: List[List[float]],
+    indexes: Optional[List[int]] = None,
+    hashes: Optional[List[str]] = None,
+) -> None:
+    """Bulk-запись чанков документа одним COPY (бинарный vector при наличии pgvector).
+    indexes - исходные chunk_index (после дедупликации), hashes - content_hash, если колонка есть"""
+    if indexes is None:
+        indexes = list(range(len(chunks)))
+    rows = [(str(uuid4()), doc_id, idx, text, v) for idx, text, v in zip(indexes, chunks, vectors)]
+    if not rows:
+        return
+    names = ["id", "document_id", "chunk_index", "content", "embedding"]
+    types = ["varchar", "varchar", "int4", "text", "vector"]
+    if hashes is not None:
+        rows = [row + (h,) for row, h in zip(rows, hashes)]
+        names.append("content_hash")
+        types.append("varchar")
+    columns = f"ai_chunks ({', '.join(names)})"
+    if PGVECTOR_AVAILABLE:
+        await register_vector_async(conn)
+        async with cur.copy(f"COPY {columns} FROM STDIN WITH (FORMAT BINARY)") as copy:
+            copy.set_types(types)
+            for row in rows:
+                await copy.write_row(row)
+    else:
+        async with cur.copy(f"COPY {columns} FROM STDIN") as copy:
+            for row in rows:
+                await copy.write_row(row[:4] + (_vector_literal(row[4]),) + row[5:])
+
+
+# ========= Embedding cache =========
+_WS_RE = re.compile(r"\s+")
+
+
+def _content_hash(text: str) -> str:
+    """sha256 нормализованного текста чанка (пробелы схлопнуты, края обрезаны)"""
+    return hashlib.sha256(_WS_RE.sub(" ", text or "").strip().encode("utf-8")).hexdigest()
+
+
+class _EmbeddingLRU:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[tuple, array]" = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[List[float]]:
+        vec = self._data.get(key)
+        if vec is None:
+            return None
+        self._data.move_to_end(key)
+        return vec.tolist()
+
+    def set(self, key: tuple, vec: List[float]) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = array("f", vec)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_embed_lru = _EmbeddingLRU(EMBED_CACHE_SIZE)
+_embed_cache_stats: Dict[str, int] = {"lru_hits": 0, "db_hits": 0, "misses": 0, "duplicate_chunks": 0}
+
+
+def _embed_cache_info() -> Dict[str, Any]:
+    lookups = _embed_cache_stats["lru_hits"] + _embed_cache_stats["db_hits"] + _embed_cache_stats["misses"]
+    hits = lookups - _embed_cache_stats["misses"]
+    return {
+        **_embed_cache_stats,
+        "lookups": lookups,
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "lru_size": len(_embed_lru),
+        "lru_maxsize": _embed_lru.maxsize,
+        "schema": dict(_cache_schema or {}),
+    }
+
+
+async def _detect_cache_schema(conn) -> Dict[str, bool]:
+    global _cache_schema
+    if _cache_schema is not None:
+        return _cache_schema
+    try:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(
+                """
+                SELECT to_regclass('ai_embedding_cache') IS NOT NULL AS cache_table,
+                       EXISTS (
+                           SELECT 1 FROM information_schema.columns
+                           WHERE table_name = 'ai_chunks' AND column_name = 'content_hash'
+                       ) AS chunk_hash
+                """
+            )
+            row = await cur.fetchone() or {}
+        _cache_schema = {"cache_table": bool(row.get("cache_table")), "chunk_hash": bool(row.get("chunk_hash"))}
+    except Exception as e:
+        logger.warning(f"Embedding cache schema detection failed: {e}")
+        return {"cache_table": False, "chunk_hash": False}
+    return _cache_schema
+
+
+async def _embed_texts_cached(texts: List[str], conn=None) -> List[List[float]]:
+    """_embed_texts_dynamic с кэшем по (model, dims, sha256 текста): LRU -> ai_embedding_cache -> API.
+    Нулевые векторы (ошибка эмбеддинга) не кэшируются"""
+    if not texts:
+        return []
+    dims = await _detect_vector_dims()
+    model = _embedding_model(dims)
+    hashes = [_content_hash(t) for t in texts]
+    found: Dict[str, List[float]] = {}
+    for h in dict.fromkeys(hashes):
+        vec = _embed_lru.get((model, dims, h))
+        if vec is not None:
+            found[h] = vec
+            _embed_cache_stats["lru_hits"] += 1
+
+    async def _with_db(fn):
+        if conn is not None:
+            return await fn(conn)
+        if not await _ensure_pool():
+            return None
+        async with pg_pool.connection() as c:  # type: ignore
+            return await fn(c)
+
+    async def _db_lookup(c) -> None:
+        if not (await _detect_cache_schema(c)).get("cache_table"):
+            return
+        wanted = [h for h in dict.fromkeys(hashes) if h not in found]
+        if not wanted:
+            return
+        # Savepoint: ошибка кэша не должна ломать транзакцию загрузки
+        async with c.transaction():
+            async with c.cursor(row_factory=dict_row) as cur:
+                await cur.execute(
+                    "SELECT content_hash, embedding::text AS embedding FROM ai_embedding_cache "
+                    "WHERE model = %(m)s AND dims = %(d)s AND content_hash = ANY(%(h)s)",
+                    {"m": model, "d": dims, "h": wanted},
+                )
+                for r in await cur.fetchall():
+                    vec = json.loads(r["embedding"])
+                    found[r["content_hash"]] = vec
+                    _embed_lru.set((model, dims, r["content_hash"]), vec)
+                    _embed_cache_stats["db_hits"] += 1
+
+    try:
+        await _with_db(_db_lookup)
+    except Exception as e:
+        logger.warning(f"Embedding cache lookup failed: {e}")
+
+    # Одинаковые тексты в запросе эмбеддим один раз
+    missing: Dict[str, str] = {}
+    for h, t in zip(hashes, texts):
+        if h not in found and h not in missing:
+            missing[h] = t
+    _embed_cache_stats["misses"] += len(missing)
+    fresh: Dict[str, List[float]] = {}
+    if missing:
+        vectors = await _embed_texts_dynamic(list(missing.values()))
+        for h, vec in zip(missing.keys(), vectors):
+            found[h] = vec
+            if any(vec):
+                fresh[h] = vec
+                _embed_lru.set((model, dims, h), vec)
+
+    async def _db_store(c) -> None:
+        if not fresh or not (await _detect_cache_schema(c)).get("cache_table"):
+            return
+        async with c.transaction():
+            async with c.cursor() as cur:
+                await cur.executemany(
+                    "INSERT INTO ai_embedding_cache (model, dims, content_hash, embedding) "
+                    "VALUES (%s, %s, %s, (%s)::vector) ON CONFLICT DO NOTHING",
+                    [(model, dims, h, _vector_literal(v)) for h, v in fresh.items()],
+                )
+
+    try:
+        await _with_db(_db_store)
+    except Exception as e:
+        logger.warning(f"Embedding cache store failed: {e}")
+    return [found[h] for h in hashes]
+
+
+async def _ingest_chunks(conn, cur, doc_id: str, chunks: List[str]) -> Dict[str, int]:
+    """Эмбеддинг + COPY чанков документа; чанки, уже лежащие в ai_chunks (по content_hash), пропускаются"""
+    hashes = [_content_hash(c) for c in chunks]
+    keep = list(range(len(chunks)))
+    if chunks and (await _detect_cache_schema(conn)).get("chunk_hash"):
+        async with conn.cursor(row_factory=dict_row) as hcur:
+            await hcur.execute(
+                "SELECT DISTINCT content_hash FROM ai_chunks WHERE content_hash = ANY(%(h)s)",
+                {"h": list(set(hashes))},
+            )
+            seen = {r["content_hash"] for r in await hcur.fetchall()}
+        keep = []
+        for i, h in enumerate(hashes):
+            if h not in seen:
+                seen.add(h)
+                keep.append(i)
+        _embed_cache_stats["duplicate_chunks"] += len(chunks) - len(keep)
+        kept_hashes: Optional[List[str]] = [hashes[i] for i in keep]
+    else:
+        kept_hashes = None
+    texts = [chunks[i] for i in keep]
+    vectors = _normalize_vectors(await _embed_texts_cached(texts, conn=conn))
+    await _copy_chunks(conn, cur, doc_id, texts, vectors, indexes=keep, hashes=kept_hashes)
+    return {"stored": len(keep), "duplicates": len(chunks) - len(keep)}
+
+
+# ========= Vector index =========
+_vector_index_job: Dict[str, Any] = {"state": "idle"}
+# Ссылки на фоновые сборки: без них задачу может собрать GC до завершения
+_vector_index_tasks: Set[asyncio.Task] = set()
+
+
+async def _apply_vector_search_settings(
+    cur,
+    top_k: int,
+    probes: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    exact: bool = False,
+) -> None:
+    """Параметры ANN на текущую транзакцию (set_config(..., true) == SET LOCAL)"""
+    probes = probes or VECTOR_PROBES
+    ef_search = ef_search or VECTOR_EF_SEARCH
+    # hnsw не вернёт больше ef_search строк (по умолчанию 40)
+    if top_k > (ef_search or 40):
+        ef_search = top_k
+    if probes:
+        await cur.execute("SELECT set_config('ivfflat.probes', %(v)s, true)", {"v": str(int(probes))})
+    if ef_search:
+        await cur.execute("SELECT set_config('hnsw.ef_search', %(v)s, true)", {"v": str(int(ef_search))})
+    if exact:
+        await cur.execute("SELECT set_config('enable_indexscan', 'off', true)")
+
+
+async def _vector_indexes(cur) -> List[Dict[str, Any]]:
+    await cur.execute(
+        """
+        SELECT i.relname AS name, am.amname AS method, ix.indisvalid AS valid,
+               pg_get_indexdef(ix.indexrelid) AS definition,
+               pg_relation_size(ix.indexrelid) AS size_bytes
+        FROM pg_index ix
+        JOIN pg_class i ON i.oid = ix.indexrelid
+        JOIN pg_am am ON am.oid = i.relam
+        WHERE ix.indrelid = 'ai_chunks'::regclass AND am.amname IN ('hnsw', 'ivfflat')
+        ORDER BY i.relname
+        """
+    )
+    rows = await cur.fetchall()
+    return [dict(r) for r in rows or []]
+
+
+def _plan_index_nodes(plan: Any) -> List[str]:
+    """Имена индексов из узлов Index Scan плана EXPLAIN (FORMAT JSON)"""
+    found: List[str] = []
+    if isinstance(plan, dict):
+        if plan.get("Index Name") and "Index" in str(plan.get("Node Type")):
+            found.append(plan["Index Name"])
+        for child in plan.get("Plans") or []:
+            found.extend(_plan_index_nodes(child))
+    elif isinstance(plan, list):
+        for p in plan:
+            found.extend(_plan_index_nodes(p.get("Plan") if isinstance(p, dict) and "Plan" in p else p))
+    return found
+
+
+async def _explain_vector_search(cur, dims: int) -> Dict[str, Any]:
+    """Проверка, что планировщик берёт ANN-индекс для ORDER BY embedding <=> q LIMIT k"""
+    probe = _vector_literal([1.0] + [0.0] * (max(1, dims) - 1))
+    await cur.execute(
+        "EXPLAIN (FORMAT JSON) SELECT id FROM ai_chunks ORDER BY embedding <=> (%(qv)s)::vector LIMIT 10",
+        {"qv": probe},
+    )
+    row = await cur.fetchone()
+    plan = (row.get("QUERY PLAN") if isinstance(row, dict) else row[0]) if row else None
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    used = _plan_index_nodes(plan)
+    top = plan[0]["Plan"] if isinstance(plan, list) and plan else {}
+    return {
+        "uses_index": bool(used),
+        "indexes": used,
+        "top_node": top.get("Node Type"),
+        "total_cost": top.get("Total Cost"),
+    }
+
+
+class VectorIndexRequest(BaseModel):
+    method: str = Field("hnsw", pattern="^(hnsw|ivfflat)$")
+    # ivfflat: число списков (по умолчанию rows/1000, для >1M строк - sqrt(rows))
+    lists: Optional[int] = Field(None, ge=1, le=32768)
+    # hnsw: параметры построения графа
+    m: int = Field(16, ge=2, le=100)
+    ef_construction: int = Field(64, ge=4, le=1000)
+    concurrently: bool = True
+
+
+async def _build_vector_index(req: VectorIndexRequest) -> None:
+    job = _vector_index_job
+    tmp_name = f"{VECTOR_INDEX_NAME}_new"
+    cc = "CONCURRENTLY " if req.concurrently else ""
+    started = datetime.now(timezone.utc)
+    try:
+        async with pg_pool.connection() as conn:  # type: ignore
+            # CREATE/DROP INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+            await conn.set_autocommit(True)
+            try:
+                async with conn.cursor(row_factory=dict_row) as cur:
+                    if req.method == "ivfflat":
+                        lists = req.lists
+                        if not lists:
+                            await cur.execute("SELECT count(*) AS n FROM ai_chunks")
+                            rows = (await cur.fetchone())["n"] or 0
+                            lists = max(10, rows // 1000) if rows <= 1_000_000 else int(rows ** 0.5)
+                        with_clause = f"lists = {int(lists)}"
+                    else:
+                        with_clause = f"m = {int(req.m)}, ef_construction = {int(req.ef_construction)}"
+                    job["with"] = with_clause
+                    await cur.execute(f"DROP INDEX {cc}IF EXISTS {tmp_name}")
+                    await cur.execute(
+                        f"CREATE INDEX {cc}{tmp_name} ON ai_chunks USING {req.method} "
+                        f"(embedding vector_cosine_ops) WITH ({with_clause})"
+                    )
+                    await cur.execute(f"DROP INDEX {cc}IF EXISTS {VECTOR_INDEX_NAME}")
+                    await cur.execute(f"ALTER INDEX {tmp_name} RENAME TO {VECTOR_INDEX_NAME}")
+                    await cur.execute("ANALYZE ai_chunks")
+            finally:
+                await conn.set_autocommit(False)
+        job.update(state="done", error=None)
+    except Exception as e:
+        logger.error(f"vector index build failed: {e}")
+        job.update(state="failed", error=str(e))
+    finally:
+        job["finished_at"] = datetime.now(timezone.utc).isoformat()
+        job["seconds"] = round((datetime.now(timezone.utc) - started).total_seconds(), 1)
+
+
+@router.get("/vector-index")
+async def vector_index_status():
+    """ANN-индексы ai_chunks, план поиска и состояние последней перестройки"""
+    if not await _ensure_pool():
+        raise HTTPException(status_code=500, detail="Database is not initialized")
+    try:
+        async with pg_pool.connection() as conn:  # type: ignore
+            async with conn.cursor(row_factory=dict_row) as cur:
+                indexes = await _vector_indexes(cur)
+                plan = await _explain_vector_search(cur, await _detect_vector_dims())
+        return {"indexes": indexes, "plan": plan, "job": dict(_vector_index_job)}
+    except Exception as e:
+        logger.error(f"vector index status error: {e}")
+        return {"indexes": [], "plan": None, "job": dict(_vector_index_job), "error": str(e)}
+
+
+@router.post("/vector-index")
+async def vector_index_rebuild(req: VectorIndexRequest):
+    """Построить/перестроить ANN-индекс (hnsw или ivfflat) в фоне; старый индекс заменяется по готовности"""
+    if not await _ensure_pool():
+        raise HTTPException(status_code=500, detail="Database is not initialized")
+    if _vector_index_job.get("state") == "running":
+        raise HTTPException(status_code=409, detail="Index build already running")
+    _vector_index_job.clear()
+    _vector_index_job.update(
+        state="running",
+        method=req.method,
+        concurrently=req.concurrently,
+        started_at=datetime.now(timezone.utc).isoformat(),
+    )
+    task = asyncio.create_task(_build_vector_index(req))
+    _vector_index_tasks.add(task)
+    task.add_done_callback(_vector_index_tasks.discard)
+    return {"started": True, "job": dict(_vector_index_job)}
+
+
 # ========= Diagnostics =========
 class DbCheckResponse(BaseModel):
     connected: bool
@@ -196,17 +657,23 @@ class DbCheckResponse(BaseModel):
     pgvector_installed: bool
     ai_tables: List[str]
     embedding_dims: Optional[int] = None
+    embedding_cache: Optional[Dict[str, Any]] = None
+    vector_indexes: List[Dict[str, Any]] = []
+    vector_search_plan: Optional[Dict[str, Any]] = None
     errors: List[str] = []
 
 
 @router.get("/db-check", response_model=DbCheckResponse)
 async def db_check():
+    global _vector_dims, _cache_schema
     errors: List[str] = []
     ai_tables: List[str] = []
     connected = False
     pgvector_available = False
     pgvector_installed = False
     dims: Optional[int] = None
+    vector_indexes: List[Dict[str, Any]] = []
+    vector_search_plan: Optional[Dict[str, Any]] = None
     ok = await _ensure_pool()
     if not ok:
         return DbCheckResponse(
@@ -215,6 +682,7 @@ async def db_check():
             pgvector_installed=False,
             ai_tables=[],
             embedding_dims=None,
+            embedding_cache=_embed_cache_info(),
             errors=["pool_not_initialized"],
         )
     try:
@@ -260,8 +728,19 @@ async def db_check():
                         if rowd and rowd.get("atttypmod") and rowd["atttypmod"] > 4:
                             _d = int(rowd["atttypmod"]) - 4
                             dims = 1536 if 1528 <= _d <= 1536 else _d
+                            # Обновляем кэш размерности (например, после миграции колонки)
+                            _vector_dims = dims
                 except Exception as e:
                     errors.append(f"dims: {e}")
+                if "ai_chunks" in ai_tables and pgvector_installed:
+                    try:
+                        vector_indexes = await _vector_indexes(cur)
+                        vector_search_plan = await _explain_vector_search(cur, dims or 1536)
+                    except Exception as e:
+                        errors.append(f"vector_index: {e}")
+            # Перечитываем наличие таблицы кэша / content_hash
+            _cache_schema = None
+            await _detect_cache_schema(conn)
     except Exception as e:
         errors.append(f"session: {e}")
     return DbCheckResponse(
@@ -270,6 +749,9 @@ async def db_check():
         pgvector_installed=pgvector_installed,
         ai_tables=ai_tables,
         embedding_dims=dims,
+        embedding_cache=_embed_cache_info(),
+        vector_indexes=vector_indexes,
+        vector_search_plan=vector_search_plan,
         errors=errors,
     )
 
@@ -512,18 +994,6 @@ async def study(
                 raw_meta = row.get("meta")
                 meta = raw_meta if isinstance(raw_meta, dict) else (json.loads(raw_meta) if isinstance(raw_meta, str) else {})
                 chunks: List[str] = meta.get("chunks") or []
-                vectors = await _embed_texts_dynamic(chunks)
-                # Normalize vector length to 1536 to avoid rare atttypmod anomalies
-                norm = []
-                for v in vectors:
-                    if not isinstance(v, list):
-                        v = []
-                    if 1528 <= len(v) <= 1536:
-                        if len(v) < 1536:
-                            v = v + [0.0] * (1536 - len(v))
-                        elif len(v) > 1536:
-                            v = v[:1536]
-                    norm.append(v)
                 doc_id = str(uuid4())
                 summary = meta.get("summary") or ""
                 size_bytes = int(meta.get("size_bytes") or meta.get("total_size_bytes") or 0)
@@ -541,15 +1011,10 @@ async def study(
                         "ca": datetime.now(timezone.utc),
                     },
                 )
-                for idx, (text, v) in enumerate(zip(chunks, norm)):
-                    v_str = "[" + ",".join(str(float(x)) for x in (v or [])) + "]"
-                    await cur.execute(
-                        "INSERT INTO ai_chunks (id, document_id, chunk_index, content, embedding) VALUES (%(i)s,%(d)s,%(x)s,%(c)s,(%(e)s)::vector)",
-                        {"i": str(uuid4()), "d": doc_id, "x": idx, "c": text, "e": v_str},
-                    )
+                ingested = await _ingest_chunks(conn, cur, doc_id, chunks)
                 await cur.execute("DELETE FROM ai_uploads_temp WHERE upload_id=%(id)s", {"id": upload_id})
                 await conn.commit()
-        return {"document_id": doc_id, "chunks": len(chunks), "category": category}
+        return {"document_id": doc_id, "chunks": len(chunks), "stored_chunks": ingested["stored"], "duplicate_chunks": ingested["duplicates"], "category": category}
     except HTTPException:
         raise
     except Exception as e:
@@ -573,18 +1038,6 @@ async def remember(req: RememberRequest):
     text = (req.text or '').strip()
     try:
         chunks = await _split_into_chunks(text, target_tokens=900, overlap=200)
-        vectors = await _embed_texts_dynamic(chunks)
-        # Normalize to 1536 if needed
-        norm = []
-        for v in vectors:
-            if not isinstance(v, list):
-                v = []
-            if 1528 <= len(v) <= 1536:
-                if len(v) < 1536:
-                    v = v + [0.0] * (1536 - len(v))
-                elif len(v) > 1536:
-                    v = v[:1536]
-            norm.append(v)
         doc_id = str(uuid4())
         filename = req.filename or f'note_{datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")}.txt'
         mime = f'text/plain; category={req.category or "Notes"}'
@@ -594,14 +1047,9 @@ async def remember(req: RememberRequest):
                     'INSERT INTO ai_documents (id, filename, mime, size_bytes, summary, pages, created_at) VALUES (%(i)s,%(fn)s,%(mime)s,%(sz)s,%(sm)s,%(pg)s,%(ca)s)',
                     { 'i': doc_id, 'fn': filename, 'mime': mime, 'sz': len(text.encode("utf-8")), 'sm': (text[:500] if isinstance(text,str) else None), 'pg': None, 'ca': datetime.now(timezone.utc) }
                 )
-                for idx, (c, v) in enumerate(zip(chunks, norm)):
-                    v_str = '[' + ','.join(str(float(x)) for x in (v or [])) + ']'
-                    await cur.execute(
-                        'INSERT INTO ai_chunks (id, document_id, chunk_index, content, embedding) VALUES (%(i)s,%(d)s,%(x)s,%(c)s,(%(e)s)::vector)',
-                        { 'i': str(uuid4()), 'd': doc_id, 'x': idx, 'c': c, 'e': v_str }
-                    )
+                ingested = await _ingest_chunks(conn, cur, doc_id, chunks)
                 await conn.commit()
-        return { 'ok': True, 'document_id': doc_id, 'chunks': len(chunks) }
+        return { 'ok': True, 'document_id': doc_id, 'chunks': len(chunks), 'stored_chunks': ingested['stored'], 'duplicate_chunks': ingested['duplicates'] }
     except Exception as e:
         logger.error(f'remember error: {e}')
         raise HTTPException(status_code=500, detail='Database write error')
@@ -610,6 +1058,10 @@ async def remember(req: RememberRequest):
 class SearchRequest(BaseModel):
     query: str
     top_k: int = 10
+    # Точность/скорость ANN на запрос: ivfflat.probes, hnsw.ef_search, exact - без индекса
+    probes: Optional[int] = Field(None, ge=1, le=1000)
+    ef_search: Optional[int] = Field(None, ge=1, le=1000)
+    exact: bool = False
 
 
 @router.post("/search")
@@ -620,18 +1072,19 @@ async def search(req: SearchRequest):
     if not q:
         return {"results": []}
     try:
-        qvec = (await _embed_texts_dynamic([q]))[0]
-        qvec_str = "[" + ",".join(str(float(x)) for x in qvec) + "]"
+        qvec = (await _embed_texts_cached([q]))[0]
+        qvec_str = _vector_literal(qvec)
         async with pg_pool.connection() as conn:  # type: ignore
             conn.row_factory = dict_row
             async with conn.cursor() as cur:
+                await _apply_vector_search_settings(cur, int(req.top_k), req.probes, req.ef_search, req.exact)
                 await cur.execute(
                     """
                     SELECT d.id as document_id, d.filename, c.chunk_index, c.content,
-                           1 - (c.embedding &lt;=&gt; (%(qv)s)::vector) as score
+                           1 - (c.embedding <=> (%(qv)s)::vector) as score
                     FROM ai_chunks c
                     JOIN ai_documents d ON d.id = c.document_id
-                    ORDER BY c.embedding &lt;=&gt; (%(qv)s)::vector
+                    ORDER BY c.embedding <=> (%(qv)s)::vector
                     LIMIT %(k)s
                     """,
                     {"qv": qvec_str, "k": int(req.top_k)},
@@ -672,8 +1125,8 @@ async def answer(req: AnswerRequest):
     try:
         # 1) Пытаемся найти контекст в БЗ
         if await _ensure_pool():
-            qvec = (await _embed_texts_dynamic([q]))[0]
-            qvec_str = "[" + ",".join(str(float(x)) for x in qvec) + "]"
+            qvec = (await _embed_texts_cached([q]))[0]
+            qvec_str = _vector_literal(qvec)
             async with pg_pool.connection() as conn:  # type: ignore
                 conn.row_factory = dict_row
                 async with conn.cursor() as cur:
@@ -682,14 +1135,15 @@ async def answer(req: AnswerRequest):
                     if req.category:
                         cat_clause = "WHERE d.mime ILIKE %(cat)s"
                         params["cat"] = f"%category={req.category}%"
+                    await _apply_vector_search_settings(cur, int(req.top_k))
                     await cur.execute(
                         f"""
                         SELECT d.id as document_id, d.filename, c.chunk_index, c.content,
-                               1 - (c.embedding &lt;=&gt; (%(qv)s)::vector) as score
+                               1 - (c.embedding <=> (%(qv)s)::vector) as score
                         FROM ai_chunks c
                         JOIN ai_documents d ON d.id = c.document_id
                         {cat_clause}
-                        ORDER BY c.embedding &lt;=&gt; (%(qv)s)::vector
+                        ORDER BY c.embedding <=> (%(qv)s)::vector
                         LIMIT %(k)s
                         """,
                         params,
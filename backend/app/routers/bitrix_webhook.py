@@ -1,11 +1,15 @@
 """
 Webhook от Bitrix24 для автоматической обработки звонков
 """
-from fastapi import APIRouter, BackgroundTasks, Request
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
 from typing import Dict, Any
+import hmac
 import logging
 
+from backend.app.config.settings import settings
 from backend.app.services.bitrix_calls_service import BitrixCallsService
+from backend.app.services.bitrix24_service import bitrix24_service
+from backend.app.services.brain_answer_cache import brain_answer_cache
 
 router = APIRouter(prefix="/bitrix-webhook", tags=["Bitrix24 Webhook"])
 logger = logging.getLogger(__name__)
@@ -129,6 +133,57 @@ async def process_bitrix_call(call_id: str, call_data: Dict[str, Any]):
         import traceback
         logger.error(traceback.format_exc())
 
+@router.post("/deal-event")
+async def bitrix_deal_event_webhook(
+    request: Request,
+    background_tasks: BackgroundTasks
+):
+    """
+    Webhook от Bitrix24 на изменение сделок (ONCRMDEALADD / ONCRMDEALUPDATE / ONCRMDEALDELETE)
+    Сразу применяет изменение к локальному зеркалу сделок.
+    Принимаются только запросы с auth[application_token], равным BITRIX_APP_TOKEN
+    """
+    try:
+        # Исходящие вебхуки Bitrix24 присылают form-data: event=...&data[FIELDS][ID]=...
+        content_type = request.headers.get("content-type", "")
+        if "application/json" in content_type:
+            data = await request.json()
+            event = data.get("event")
+            deal_id = ((data.get("data") or {}).get("FIELDS") or {}).get("ID")
+            token = (data.get("auth") or {}).get("application_token")
+        else:
+            form = await request.form()
+            event = form.get("event")
+            deal_id = form.get("data[FIELDS][ID]")
+            token = form.get("auth[application_token]")
+        
+        if not settings.BITRIX_APP_TOKEN or not hmac.compare_digest(str(token or ""), settings.BITRIX_APP_TOKEN):
+            logger.warning("⚠️ Rejected deal event: invalid or unconfigured application_token")
+            raise HTTPException(status_code=403, detail="Invalid application token")
+        
+        event = str(event or "").upper()
+        if not deal_id:
+            return {"status": "ignored", "reason": "no_deal_id"}
+        
+        if event == "ONCRMDEALDELETE":
+            background_tasks.add_task(bitrix24_service.mirror.remove_deal, deal_id)
+        elif event in ("ONCRMDEALADD", "ONCRMDEALUPDATE"):
+            background_tasks.add_task(bitrix24_service.mirror.apply_deal, deal_id)
+        else:
+            logger.info(f"⏭️ Ignoring deal event: {event}")
+            return {"status": "ignored", "reason": "unsupported_event"}
+        
+        # Зеркало может быть ещё не готово (тогда apply_deal ничего не сбросит) - ответы Brain сбрасываем сразу
+        brain_answer_cache.invalidate("bitrix")
+        logger.info(f"✅ Deal event {event} for {deal_id} queued for mirror")
+        return {"status": "accepted", "deal_id": str(deal_id), "event": event}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error processing Bitrix deal event: {e}")
+        return {"status": "error", "message": str(e)}
+
 @router.get("/test")
 async def test_webhook():
     """
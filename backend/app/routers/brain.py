@@ -40,11 +40,6 @@ async def brain_ask(req: BrainAskRequest, db: AsyncSession = Depends(get_db)) ->
         if req.debug:
             out["debug"] = {"matched_rule": None, "matched_rules": []}
         return out
-    # record metrics if debug present
-    if req.debug and isinstance(ans, dict) and ans.get("debug"):
-        dbg = ans["debug"]
-        rule = dbg.get("matched_rule") or ans.get("rule") or "unknown"
-        brain_metrics.record_resolver(rule, dbg.get("elapsed_ms", 0))
     return ans
 
 
@@ -9,10 +9,12 @@ from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
 import logging
-import httpx
 import os
 
 from backend.app.config.database import get_db
+from backend.app.services.call_event_queue import call_event_queue, call_key
+from backend.app.services import chunked_transcriber
+from backend.app.config.http_clients import get_openai_client, http_clients
 
 router = APIRouter(prefix="/call-summary", tags=["Call Summary"])
 logger = logging.getLogger(__name__)
@@ -110,7 +112,7 @@ async def novofon_webhook(
             logger.info(f"🎤 Received SPEECH_RECOGNITION for call {pbx_call_id}")
             
             # ФИЛЬТР: Проверяем что это звонок с нужного номера
-            call_metadata = getattr(novofon_webhook, '_call_cache', {}).get(pbx_call_id, {})
+            call_metadata = await call_event_queue.get_metadata(call_key("novofon", pbx_call_id))
             target_caller = os.getenv("NOVOFON_CALLER_ID", "+79843330712").replace("+", "")
             current_caller = call_metadata.get("caller", "").replace("+", "")
             
@@ -141,9 +143,6 @@ async def novofon_webhook(
                 
                 logger.info(f"✅ Got transcription for call {pbx_call_id}: {len(transcription)} chars")
                 
-                # Получаем метаданные из кэша (если есть)
-                call_metadata = getattr(novofon_webhook, '_call_cache', {}).get(pbx_call_id, {})
-                
                 # Формируем данные для обработки
                 normalized_data = {
                     "call_id": pbx_call_id,
@@ -157,19 +156,25 @@ async def novofon_webhook(
                     "transcription": transcription  # ВАЖНО: передаём готовую транскрипцию
                 }
                 
-                # Помечаем звонок как обрабатываемый через SPEECH_RECOGNITION
-                if not hasattr(novofon_webhook, '_processed_calls'):
-                    novofon_webhook._processed_calls = set()
-                novofon_webhook._processed_calls.add(pbx_call_id)
-                
-                # ВАЖНО: Добавляем задачу для создания саммари В ФОНЕ
-                background_tasks.add_task(
-                    process_transcription,
+                # Ставим звонок в очередь call_events: повторный webhook / другой процесс его не возьмёт
+                queued = await call_event_queue.enqueue(
+                    call_key("novofon", pbx_call_id),
+                    "transcription",
                     normalized_data,
-                    db
+                    source="novofon",
                 )
+                if queued is False:
+                    logger.info(f"⏭️ Call {pbx_call_id} already queued or processed")
+                    return {"status": "duplicate", "call_id": pbx_call_id, "type": "speech_recognition"}
+                if queued is None:
+                    # Очередь недоступна (нет БД) - обрабатываем в фоне этого процесса, как раньше
+                    background_tasks.add_task(
+                        process_transcription,
+                        normalized_data,
+                        db
+                    )
                 
-                logger.info(f"🚀 Started background processing transcription for call {pbx_call_id}")
+                logger.info(f"🚀 Queued transcription processing for call {pbx_call_id}")
                 return {"status": "accepted", "call_id": pbx_call_id, "type": "speech_recognition"}
                 
             except json.JSONDecodeError as e:
@@ -202,10 +207,8 @@ async def novofon_webhook(
             "timestamp": webhook_data.get("call_start", "")
         }
         
-        # Сохраняем метаданные в глобальный кэш (для SPEECH_RECOGNITION если придёт)
-        if not hasattr(novofon_webhook, '_call_cache'):
-            novofon_webhook._call_cache = {}
-        novofon_webhook._call_cache[pbx_call_id] = call_metadata
+        # Сохраняем метаданные в call_events (для SPEECH_RECOGNITION, даже если он придёт в другой процесс)
+        await call_event_queue.remember_metadata(call_key("novofon", pbx_call_id), call_metadata)
         
         logger.info(f"📋 Cached metadata for call {pbx_call_id}: caller={call_metadata['caller']}, called={call_metadata['called']}, duration={call_metadata['duration']}s")
         
@@ -260,7 +263,7 @@ async def send_error_notification(call_metadata: dict, error_message: str):
 
 <i>Запись звонка будет доступна в личном кабинете Novofon</i>
 """
-        async with httpx.AsyncClient() as client:
+        async with http_clients.client('telegram') as client:
             await client.post(
                 f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
                 json={
@@ -327,7 +330,7 @@ async def download_recording_with_auth(call_id_with_rec: str) -> Optional[bytes]
     # URL для запроса ссылки на запись
     url = f"https://api.novofon.com{method}"
     
-    async with httpx.AsyncClient(timeout=60.0) as client:
+    async with http_clients.client('novofon') as client:
         try:
             # Запрашиваем ссылку на запись
             logger.info(f"🔄 Requesting recording link with HMAC auth for {call_id_with_rec[:30]}...")
@@ -375,7 +378,7 @@ async def download_recording_with_auth(call_id_with_rec: str) -> Optional[bytes]
         f"https://api.novofon.com/v1/call/recording/?id={call_id_with_rec}",
     ]
     
-    async with httpx.AsyncClient(timeout=60.0) as client2:
+    async with http_clients.client('novofon') as client2:
         for alt_url in alt_urls:
             try:
                 logger.info(f"🔄 Trying alternate URL: {alt_url[:60]}...")
@@ -392,13 +395,14 @@ async def download_recording_with_auth(call_id_with_rec: str) -> Optional[bytes]
     logger.error(f"❌ All download attempts failed for {call_id_with_rec}")
     return None
 
-async def process_transcription(webhook_data: dict, db: AsyncSession):
+async def process_transcription(webhook_data: dict, db: AsyncSession, raise_errors: bool = False):
     """
     Фоновая задача: обработка готовой транскрипции от Novofon
     1. Получить метаданные из кэша (если есть)
     2. Создать саммари через GPT-4o
     3. Сохранить в БД
     4. Отправить в Telegram
+    raise_errors=True - ошибка пробрасывается (очередь call_events повторит задачу)
     """
     call_id = webhook_data["call_id"]
     transcription = webhook_data.get("transcription", "")
@@ -406,8 +410,8 @@ async def process_transcription(webhook_data: dict, db: AsyncSession):
     try:
         logger.info(f"🎤 Processing transcription for call: {call_id}")
         
-        # Получаем метаданные из кэша
-        cached_metadata = getattr(novofon_webhook, '_call_cache', {}).get(call_id, {})
+        # Получаем метаданные из call_events (NOTIFY_END)
+        cached_metadata = await call_event_queue.get_metadata(call_key("novofon", call_id))
         if cached_metadata:
             webhook_data.update({
                 "caller": cached_metadata.get("caller", webhook_data.get("caller", "")),
@@ -451,8 +455,10 @@ async def process_transcription(webhook_data: dict, db: AsyncSession):
         logger.error(f"❌ Error processing transcription for call {call_id}: {e}")
         import traceback
         logger.error(traceback.format_exc())
+        if raise_errors:
+            raise
 
-async def process_call_recording(webhook_data: dict, db: AsyncSession):
+async def process_call_recording(webhook_data: dict, db: AsyncSession, raise_errors: bool = False):
     """
     Фоновая задача: обработка записи звонка (УСТАРЕВШАЯ - используем SPEECH_RECOGNITION)
     1. Скачать аудио
@@ -460,22 +466,29 @@ async def process_call_recording(webhook_data: dict, db: AsyncSession):
     3. Создать саммари через GPT
     4. Сохранить в БД
     5. Отправить в Telegram
+    raise_errors=True - ошибка (в том числе несостоявшиеся скачивание и транскрибация)
+    пробрасывается, очередь call_events повторит задачу
     """
     call_id = webhook_data["call_id"]
+    audio_path = None
     
     try:
         logger.info(f"🎙️ Processing call recording: {call_id}")
         
-        # 1. Скачать аудио запись
-        audio_data = await download_call_recording(webhook_data["record_url"])
-        if not audio_data:
+        # 1. Скачать аудио запись (потоком во временный файл)
+        audio_path = await chunked_transcriber.download_to_tempfile(webhook_data["record_url"])
+        if not audio_path:
             logger.error(f"❌ Failed to download recording for {call_id}")
+            if raise_errors:
+                raise RuntimeError(f"failed to download recording for {call_id}")
             return
         
-        # 2. Транскрибировать через OpenAI Whisper
-        transcription = await transcribe_audio(audio_data)
+        # 2. Транскрибировать через OpenAI Whisper (сегментами по паузам)
+        transcription = await chunked_transcriber.transcribe_file(audio_path)
         if not transcription:
             logger.error(f"❌ Failed to transcribe call {call_id}")
+            if raise_errors:
+                raise RuntimeError(f"failed to transcribe call {call_id}")
             return
         
         logger.info(f"✅ Transcription completed for {call_id}: {len(transcription)} chars")
@@ -501,55 +514,30 @@ async def process_call_recording(webhook_data: dict, db: AsyncSession):
         logger.error(f"❌ Error processing call {call_id}: {e}")
         import traceback
         logger.error(traceback.format_exc())
-
-async def download_call_recording(record_url: str) -> Optional[bytes]:
-    """Скачать аудиозапись звонка"""
-    try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.get(record_url)
-            
-            if response.status_code == 200:
-                return response.content
-            else:
-                logger.error(f"Failed to download recording: {response.status_code}")
-                return None
-                
-    except Exception as e:
-        logger.error(f"Error downloading recording: {e}")
-        return None
+        if raise_errors:
+            raise
+    finally:
+        if audio_path:
+            chunked_transcriber.remove_tempfile(audio_path)
 
 async def transcribe_audio(audio_data: bytes) -> Optional[str]:
-    """Транскрибировать аудио через OpenAI Whisper"""
+    """Транскрибировать аудио через OpenAI Whisper (уникальный временный файл, длинные записи - сегментами)"""
+    temp_file = None
     try:
-        from openai import AsyncOpenAI
-        
-        client = AsyncOpenAI(api_key=OPENAI_API_KEY)
-        
-        # Сохраняем временно
-        temp_file = "/tmp/call_recording.mp3"
-        with open(temp_file, "wb") as f:
-            f.write(audio_data)
-        
-        # Транскрибируем
-        with open(temp_file, "rb") as audio_file:
-            transcription = await client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                language="ru"
-            )
-        
-        return transcription.text
+        temp_file = chunked_transcriber.bytes_to_tempfile(audio_data)
+        return await chunked_transcriber.transcribe_file(temp_file)
         
     except Exception as e:
         logger.error(f"Error transcribing audio: {e}")
         return None
+    finally:
+        if temp_file:
+            chunked_transcriber.remove_tempfile(temp_file)
 
 async def create_call_summary(transcription: str, webhook_data: dict) -> dict:
     """Создать саммари разговора через GPT-5"""
     try:
-        from openai import AsyncOpenAI
-        
-        client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+        client = get_openai_client(OPENAI_API_KEY)
         
         direction = "входящий" if webhook_data["direction"] == "in" else "исходящий"
         
@@ -834,7 +822,7 @@ async def send_to_telegram(webhook_data: dict, summary_data: dict):
             first_part = message[:4000] + "\n\n... [продолжение в следующем сообщении]"
             second_part = message[4000:]
             
-            async with httpx.AsyncClient() as client:
+            async with http_clients.client('telegram') as client:
                 # Первая часть
                 response1 = await client.post(
                     f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
@@ -862,7 +850,7 @@ async def send_to_telegram(webhook_data: dict, summary_data: dict):
                     logger.error(f"Failed to send to Telegram: {response1.text}")
         else:
             # Отправляем одним сообщением
-            async with httpx.AsyncClient() as client:
+            async with http_clients.client('telegram') as client:
                 response = await client.post(
                     f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
                     json={
@@ -959,7 +947,7 @@ async def create_manual_summary(
         }
         
         # Попытка скачать и обработать
-        audio_data = await download_recording_simple(call_id_with_rec or call_id)
+        audio_data = await download_recording_with_auth(call_id_with_rec or call_id)
         
         if not audio_data:
             return {
@@ -1004,3 +992,11 @@ async def create_manual_summary(
         import traceback
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _handle_queued_transcription(payload: dict, metadata: dict):
+    """Обработчик задач call_events kind=transcription: ошибка уходит в очередь на повтор"""
+    await process_transcription({**metadata, **payload}, None, raise_errors=True)
+
+
+call_event_queue.register("transcription", _handle_queued_transcription)
@@ -8,6 +8,7 @@ import logging
 
 from backend.app.config.database import get_db
 from backend.app.services.bitrix24_service import bitrix24_service
+from backend.app.services.brain_answer_cache import brain_answer_cache
 from backend.app.utils.auth_deps import get_current_user_optional, CurrentUser
 
 logger = logging.getLogger(__name__)
@@ -25,6 +26,7 @@ async def get_cleaning_houses(
     cleaning_date: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
+    with_total: bool = Query(False, description="Точный total (полный обход); без него total - нижняя граница"),
     db: AsyncSession = Depends(get_db),
     current: Optional[CurrentUser] = Depends(get_current_user_optional)
 ):
@@ -48,6 +50,7 @@ async def get_cleaning_houses(
                 date_to=date_to,
                 page=1,
                 limit=1000,  # Загружаем много домов для поиска
+                with_total=True,
             )
             # Фильтрация по адресу
             all_houses = data.get('houses', [])
@@ -82,6 +85,7 @@ async def get_cleaning_houses(
                 date_to=date_to,
                 page=page,
                 limit=limit,
+                with_total=with_total,
             )
             return data
     except Exception as e:
@@ -122,6 +126,33 @@ async def sync_houses_from_bitrix24(db: AsyncSession = Depends(get_db)):
         logger.error(f"Error syncing from Bitrix24: {e}")
         return {"success": False, "error": str(e)}
 
+@router.post("/mirror/sync")
+async def sync_deals_mirror(full: bool = False):
+    """Синхронизировать зеркало сделок Bitrix24 (дельта по DATE_MODIFY или полная)"""
+    try:
+        if full:
+            return await bitrix24_service.mirror.full_sync()
+        return await bitrix24_service.mirror.delta_sync()
+    except Exception as e:
+        logger.error(f"Error syncing deals mirror: {e}")
+        return {"success": False, "error": str(e)}
+
+@router.get("/mirror/status")
+async def get_deals_mirror_status():
+    """Состояние зеркала сделок Bitrix24"""
+    try:
+        return await bitrix24_service.mirror.status()
+    except Exception as e:
+        return {"ready": False, "error": str(e)}
+
+@router.get("/bitrix/rate-limit")
+async def get_bitrix_rate_limit():
+    """Состояние rate limiter'а Bitrix24: текущая скорость, очередь, события троттлинга"""
+    return {
+        "limiter": bitrix24_service.rate_limiter.status(),
+        "batcher": bitrix24_service._batcher.stats,
+    }
+
 @router.get("/brigades")
 async def get_brigades_list():
     """Получить список всех бригад для выбора"""
@@ -160,7 +191,7 @@ async def debug_enum_field(field_code: str):
         async with httpx.AsyncClient(timeout=httpx.Timeout(40.0)) as client:
             # Очищаем кеш для этого поля
             cache_key = f"enum:{field_code}"
-            bitrix24_service.enum_cache.store.pop(cache_key, None)
+            bitrix24_service.enum_cache.pop(cache_key)
             
             # Получаем заново
             enum_map = await bitrix24_service._get_enum_map(client, field_code)
@@ -178,10 +209,11 @@ async def debug_enum_field(field_code: str):
 async def clear_bitrix_cache():
     """Очистить весь кеш Bitrix24"""
     try:
-        bitrix24_service.enum_cache.store.clear()
-        bitrix24_service.company_cache.store.clear()
-        bitrix24_service.user_cache.store.clear()
-        bitrix24_service.deals_cache.store.clear()
+        bitrix24_service.enum_cache.clear()
+        bitrix24_service.company_cache.clear()
+        bitrix24_service.user_cache.clear()
+        bitrix24_service.deals_cache.clear()
+        brain_answer_cache.invalidate("bitrix")
         return {"success": True, "message": "Кеш очищен"}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -208,7 +240,7 @@ async def get_house_photo_history(
     Возвращает список всех уборок с фото, датами и ссылками на посты в TG
     """
     try:
-        from app.config.database import get_db_pool
+        from backend.app.config.database import get_db_pool
         
         db_pool = await get_db_pool()
         if not db_pool:
@@ -277,7 +309,7 @@ async def resend_photos_to_telegram(data: dict):
         if not cleaning_id:
             return {"success": False, "error": "cleaning_id is required"}
         
-        from app.config.database import get_db_pool
+        from backend.app.config.database import get_db_pool
         import os
         
         db_pool = await get_db_pool()
@@ -345,201 +377,191 @@ async def resend_photos_to_telegram(data: dict):
         logger.error(f"[cleaning] Error resending photos: {e}")
         return {"success": False, "error": str(e)}
 
+MISSING_DATA_CSV_FIELDS = [
+    'ID', 'Адрес', 'УК', 'Бригада', 'Подъезды', 'Этажи',
+    'Квартиры', 'Периодичность', 'Старший (ФИО)', 'Старший (телефон)',
+    'Старший (email)', 'Недостающие поля'
+]
+
+
+def _missing_data_row(house: dict, details: Optional[dict], with_contacts: bool) -> dict:
+    """Строка отчёта по недостающим данным дома (details - из iter_deal_details, если with_contacts)"""
+    missing_fields = []
+
+    # Проверка адреса
+    if not house.get('address') or len(house.get('address', '')) < 10:
+        missing_fields.append('Адрес')
+
+    # Проверка УК
+    if not house.get('management_company') or house.get('management_company') == '':
+        missing_fields.append('УК')
+
+    # Проверка старшего/ответственного
+    if not house.get('brigade_name') or house.get('brigade_name') in ['Бригада не назначена', '']:
+        missing_fields.append('Бригада')
+
+    # Проверка подъездов
+    if not house.get('entrances') or house.get('entrances') == 0:
+        missing_fields.append('Подъезды')
+
+    # Проверка этажей
+    if not house.get('floors') or house.get('floors') == 0:
+        missing_fields.append('Этажи')
+
+    # Проверка квартир
+    if not house.get('apartments') or house.get('apartments') == 0:
+        missing_fields.append('Квартиры')
+
+    # Проверка графика уборки (октябрь и ноябрь)
+    cleaning_dates = house.get('cleaning_dates', {})
+    has_october = (cleaning_dates.get('october_1', {}).get('dates') or
+                  cleaning_dates.get('october_2', {}).get('dates'))
+    has_november = (cleaning_dates.get('november_1', {}).get('dates') or
+                   cleaning_dates.get('november_2', {}).get('dates'))
+
+    if not has_october and not has_november:
+        missing_fields.append('График уборки')
+
+    # Контакты старшего (ТОЛЬКО если with_contacts=True)
+    elder_name = 'Не указан'
+    elder_phone = 'Не указан'
+    elder_email = 'Не указан'
+
+    elder_contact = (details or {}).get('elder_contact') if with_contacts else None
+    if elder_contact and isinstance(elder_contact, dict):
+        elder_name = elder_contact.get('name') or 'Не указан'
+        phones = elder_contact.get('phones', [])
+        emails = elder_contact.get('emails', [])
+        elder_phone = phones[0] if phones else 'Не указан'
+        elder_email = emails[0] if emails else 'Не указан'
+
+    if elder_name == 'Не указан':
+        missing_fields.append('Старший (ФИО)')
+    if elder_phone == 'Не указан':
+        missing_fields.append('Старший (телефон)')
+
+    # В отчёт попадают все дома, не только с недостающими полями
+    return {
+        'ID': house.get('id', ''),
+        'Адрес': house.get('address') or house.get('title', 'Не указан'),
+        'УК': house.get('management_company', 'Не указана'),
+        'Бригада': house.get('brigade_name', 'Не назначена'),
+        'Подъезды': house.get('entrances', 0),
+        'Этажи': house.get('floors', 0),
+        'Квартиры': house.get('apartments', 0),
+        'Периодичность': house.get('periodicity', 'Не указана'),
+        'Старший (ФИО)': elder_name,
+        'Старший (телефон)': elder_phone,
+        'Старший (email)': elder_email,
+        'Недостающие поля': ', '.join(missing_fields) if missing_fields else 'Нет'
+    }
+
+
 @router.get("/missing-data-report")
 async def get_missing_data_report(with_contacts: bool = False):
     """
     Генерирует CSV отчет по домам с недостающими данными
     Проверяет: address, management_company, entrances, floors, apartments, cleaning_schedule, elder_contact
-    
+
     Параметры:
-    - with_contacts: bool = False - загружать контакты старшего (медленно, ~10 минут)
-    
+    - with_contacts: bool = False - загружать контакты старшего (пачками через batch, десятки секунд)
+
     По умолчанию генерирует быстрый отчет без контактов (1-2 секунды)
     Для полного отчета: ?with_contacts=true
+    CSV отдаётся потоком: строки пишутся по мере готовности пачек контактов
     """
     try:
         from fastapi.responses import StreamingResponse
         import io
         import csv
-        import asyncio
-        
+
         logger.info(f"[cleaning] Generating missing data report (with_contacts={with_contacts})...")
-        
+
         # Загружаем ВСЕ дома из Bitrix24 (с учетом пагинации)
         all_houses = []
         page = 1
         page_limit = 50  # Bitrix24 лимит на страницу
-        
+
         while True:
             logger.info(f"[cleaning] Loading page {page}...")
-            data = await bitrix24_service.list_houses(page=page, limit=page_limit)
+            data = await bitrix24_service.list_houses(page=page, limit=page_limit, with_total=True)
             houses = data.get('houses', [])
-            
+
             if not houses:
                 break
-            
+
             all_houses.extend(houses)
-            
+
             # Проверяем, есть ли еще страницы
             total_pages = data.get('pages', 1)
             if page >= total_pages:
                 break
-            
+
             page += 1
-        
+
         logger.info(f"[cleaning] Loaded {len(all_houses)} houses for report")
-        
-        if with_contacts:
-            logger.info("[cleaning] Loading elder contacts for each house (this may take 10+ minutes)...")
-        
-        # Проверяем каждый дом на недостающие данные
-        missing_data_houses = []
-        
-        # Счетчик для логирования прогресса
-        processed_count = 0
-        
-        for house in all_houses:
-            processed_count += 1
-            
-            # Логируем прогресс каждые 50 домов (только если загружаем контакты)
-            if with_contacts and processed_count % 50 == 0:
-                logger.info(f"[cleaning] Progress: {processed_count}/{len(all_houses)} houses processed")
-            
-            missing_fields = []
-            
-            # Проверка адреса
-            if not house.get('address') or len(house.get('address', '')) < 10:
-                missing_fields.append('Адрес')
-            
-            # Проверка УК
-            if not house.get('management_company') or house.get('management_company') == '':
-                missing_fields.append('УК')
-            
-            # Проверка старшего/ответственного
-            if not house.get('brigade_name') or house.get('brigade_name') in ['Бригада не назначена', '']:
-                missing_fields.append('Бригада')
-            
-            # Проверка подъездов
-            if not house.get('entrances') or house.get('entrances') == 0:
-                missing_fields.append('Подъезды')
-            
-            # Проверка этажей
-            if not house.get('floors') or house.get('floors') == 0:
-                missing_fields.append('Этажи')
-            
-            # Проверка квартир
-            if not house.get('apartments') or house.get('apartments') == 0:
-                missing_fields.append('Квартиры')
-            
-            # Проверка графика уборки (октябрь и ноябрь)
-            cleaning_dates = house.get('cleaning_dates', {})
-            has_october = (cleaning_dates.get('october_1', {}).get('dates') or 
-                          cleaning_dates.get('october_2', {}).get('dates'))
-            has_november = (cleaning_dates.get('november_1', {}).get('dates') or 
-                           cleaning_dates.get('november_2', {}).get('dates'))
-            
-            if not has_october and not has_november:
-                missing_fields.append('График уборки')
-            
-            # ЗАГРУЖАЕМ ДЕТАЛИ ДОМА для получения контактов старшего (ТОЛЬКО если with_contacts=True)
-            elder_name = 'Не указан'
-            elder_phone = 'Не указан'
-            elder_email = 'Не указан'
-            
-            if with_contacts:
-                try:
-                    house_details = await bitrix24_service.get_deal_details(house.get('id'))
-                    if house_details:
-                        elder_contact = house_details.get('elder_contact', {})
-                        if elder_contact and isinstance(elder_contact, dict):
-                            elder_name = elder_contact.get('name', 'Не указан')
-                            phones = elder_contact.get('phones', [])
-                            emails = elder_contact.get('emails', [])
-                            elder_phone = phones[0] if phones else 'Не указан'
-                            elder_email = emails[0] if emails else 'Не указан'
-                        
-                        # Проверка наличия контактов
-                        if elder_name == 'Не указан' or not elder_name:
-                            missing_fields.append('Старший (ФИО)')
-                        if elder_phone == 'Не указан' or not elder_phone:
-                            missing_fields.append('Старший (телефон)')
-                except Exception as e:
-                    logger.warning(f"[cleaning] Failed to load details for house {house.get('id')}: {e}")
-                    missing_fields.append('Старший (ФИО)')
-                    missing_fields.append('Старший (телефон)')
-            else:
-                # Без контактов просто отмечаем как недостающие
-                missing_fields.append('Старший (ФИО)')
-                missing_fields.append('Старший (телефон)')
-            
-            # Добавляем в отчет (всегда, не только если есть недостающие поля)
-            # Это позволит видеть полную информацию по всем домам
-            missing_data_houses.append({
-                'id': house.get('id', ''),
-                'address': house.get('address') or house.get('title', 'Не указан'),
-                'management_company': house.get('management_company', 'Не указана'),
-                'brigade_name': house.get('brigade_name', 'Не назначена'),
-                'entrances': house.get('entrances', 0),
-                'floors': house.get('floors', 0),
-                'apartments': house.get('apartments', 0),
-                'periodicity': house.get('periodicity', 'Не указана'),
-                'elder_name': elder_name,
-                'elder_phone': elder_phone,
-                'elder_email': elder_email,
-                'missing_fields': ', '.join(missing_fields) if missing_fields else 'Нет'
-            })
-        
-        logger.info(f"[cleaning] Finished processing all {len(all_houses)} houses")
-        
-        logger.info(f"[cleaning] Found {len(missing_data_houses)} houses with missing data")
-        
-        # Создаем CSV с правильным разделителем для Excel
-        output = io.StringIO()
-        
-        # Используем точку с запятой как разделитель для совместимости с Excel
-        writer = csv.DictWriter(
-            output, 
-            fieldnames=[
-                'ID', 'Адрес', 'УК', 'Бригада', 'Подъезды', 'Этажи', 
-                'Квартиры', 'Периодичность', 'Старший (ФИО)', 'Старший (телефон)', 
-                'Старший (email)', 'Недостающие поля'
-            ],
-            delimiter=';',  # Точка с запятой для Excel
-            quoting=csv.QUOTE_MINIMAL
-        )
-        
-        writer.writeheader()
-        
-        for house in missing_data_houses:
-            writer.writerow({
-                'ID': house['id'],
-                'Адрес': house['address'],
-                'УК': house['management_company'],
-                'Бригада': house['brigade_name'],
-                'Подъезды': house['entrances'],
-                'Этажи': house['floors'],
-                'Квартиры': house['apartments'],
-                'Периодичность': house['periodicity'],
-                'Старший (ФИО)': house['elder_name'],
-                'Старший (телефон)': house['elder_phone'],
-                'Старший (email)': house['elder_email'],
-                'Недостающие поля': house['missing_fields']
-            })
-        
-        # Возвращаем CSV как downloadable file
-        output.seek(0)
-        
+
+        def _csv_chunk(rows, header: bool = False) -> bytes:
+            # Точка с запятой как разделитель для совместимости с Excel
+            buf = io.StringIO()
+            writer = csv.DictWriter(buf, fieldnames=MISSING_DATA_CSV_FIELDS, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+            if header:
+                writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+            return buf.getvalue().encode('utf-8')
+
+        async def _rows():
+            # BOM для корректного отображения в Excel + заголовок
+            yield '\ufeff'.encode('utf-8') + _csv_chunk([], header=True)
+            if not with_contacts:
+                yield _csv_chunk(_missing_data_row(h, None, False) for h in all_houses)
+                return
+
+            by_id = {str(h.get('id')): h for h in all_houses if h.get('id')}
+            pending = []
+            processed = 0
+            done_ids = set()
+            error_row = None
+            try:
+                async for deal_id, details in bitrix24_service.iter_deal_details(list(by_id)):
+                    pending.append(_missing_data_row(by_id[deal_id], details, True))
+                    done_ids.add(deal_id)
+                    processed += 1
+                    if len(pending) >= 50:
+                        logger.info(f"[cleaning] Progress: {processed}/{len(by_id)} houses processed")
+                        yield _csv_chunk(pending)
+                        pending = []
+            except Exception as e:
+                # Заголовки уже отправлены - дописываем то, что успели, и явную строку об ошибке в конце
+                logger.error(f"[cleaning] Error while streaming report: {e}")
+                unprocessed = [i for i in by_id if i not in done_ids]
+                error_row = {
+                    'ID': 'ОШИБКА',
+                    'Адрес': f'Отчёт неполный: {e}',
+                    'Недостающие поля': f'Не обработаны сделки ({len(unprocessed)}): {", ".join(unprocessed)}',
+                }
+            if pending:
+                yield _csv_chunk(pending)
+            # Дома без ID сделки - без контактов
+            yield _csv_chunk(_missing_data_row(h, None, True) for h in all_houses if not h.get('id'))
+            if error_row:
+                yield _csv_chunk([error_row])
+                logger.warning(f"[cleaning] Report incomplete: {processed}/{len(by_id)} houses processed")
+                return
+            logger.info(f"[cleaning] Finished processing all {processed} houses")
+
         from datetime import datetime
         filename = f"missing_data_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        
+
         return StreamingResponse(
-            io.BytesIO(output.getvalue().encode('utf-8-sig')),  # BOM для корректного отображения в Excel
+            _rows(),
             media_type="text/csv",
             headers={
                 "Content-Disposition": f"attachment; filename={filename}"
             }
         )
-        
+
     except Exception as e:
         logger.error(f"[cleaning] Error generating report: {e}")
-        return {"error": str(e), "houses_with_issues": []}
\ No newline at end of file
+        return {"error": str(e), "houses_with_issues": []}
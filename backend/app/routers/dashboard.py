@@ -5,96 +5,28 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from typing import Dict, Any
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
+import logging
 
 from backend.app.config.database import get_db
 from backend.app.models.house import House
-from backend.app.models.task import Task, TaskStatus
-from backend.app.models.user import User
+from backend.app.models.task import Task
 from backend.app.models.log import Log
+from backend.app.services import dashboard_stats
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
 @router.get("/stats")
-async def get_dashboard_stats(db: AsyncSession = Depends(get_db)):
+async def get_dashboard_stats():
     """
     Получение основной статистики для дашборда
-    Real-time данные из БД
+    Снимок из dashboard_stats: один запрос на все счётчики, кеш на DASHBOARD_STATS_TTL секунд
     """
     
     try:
-        # Статистика по домам
-        houses_result = await db.execute(select(func.count(House.id)))
-        total_houses = houses_result.scalar() or 0
-        
-        # Сумма квартир
-        apts_result = await db.execute(select(func.sum(House.apartments_count)))
-        total_apartments = apts_result.scalar() or 0
-        
-        # Сумма подъездов
-        entr_result = await db.execute(select(func.sum(House.entrances_count)))
-        total_entrances = entr_result.scalar() or 0
-        
-        # Сумма этажей
-        floors_result = await db.execute(select(func.sum(House.floors_count)))
-        total_floors = floors_result.scalar() or 0
-        
-        # Активные бригады (уникальные brigade_number)
-        brigades_result = await db.execute(
-            select(func.count(func.distinct(House.brigade_number)))
-            .where(House.brigade_number.isnot(None))
-        )
-        active_brigades = brigades_result.scalar() or 0
-        
-        # Статистика по задачам
-        tasks_result = await db.execute(select(func.count(Task.id)))
-        total_tasks = tasks_result.scalar() or 0
-        
-        # Активные задачи (не завершенные)
-        active_tasks_result = await db.execute(
-            select(func.count(Task.id))
-            .where(Task.status.in_([TaskStatus.TODO, TaskStatus.IN_PROGRESS]))
-        )
-        active_tasks = active_tasks_result.scalar() or 0
-        
-        # Завершенные задачи
-        completed_tasks = total_tasks - active_tasks
-        
-        # Статистика по сотрудникам
-        employees_result = await db.execute(select(func.count(User.id)))
-        total_employees = employees_result.scalar() or 0
-        
-        # Логи за последние 24 часа
-        yesterday = datetime.now(timezone.utc) - timedelta(days=1)
-        # Убираем timezone для PostgreSQL без timezone
-        yesterday_naive = yesterday.replace(tzinfo=None)
-        logs_result = await db.execute(
-            select(func.count(Log.id))
-            .where(Log.created_at >= yesterday_naive)
-        )
-        recent_logs = logs_result.scalar() or 0
-        
-        # УК (уникальные)
-        companies_result = await db.execute(
-            select(func.count(func.distinct(House.company_title)))
-            .where(House.company_title.isnot(None))
-        )
-        total_companies = companies_result.scalar() or 0
-        
-        return {
-            "total_houses": total_houses,
-            "total_apartments": total_apartments or 0,
-            "total_entrances": total_entrances or 0,
-            "total_floors": total_floors or 0,
-            "active_brigades": active_brigades,
-            "total_tasks": total_tasks,
-            "active_tasks": active_tasks,
-            "completed_tasks": completed_tasks,
-            "employees": total_employees,
-            "recent_logs": recent_logs,
-            "total_companies": total_companies,
-            "last_sync": datetime.now(timezone.utc).isoformat()
-        }
+        return await dashboard_stats.get_stats()
         
     except Exception as e:
         # Fallback если БД не готова
@@ -193,54 +125,11 @@ async def get_tasks_by_status(db: AsyncSession = Depends(get_db)):
         }
 
 @router.get("/houses-by-brigade")
-async def get_houses_by_brigade(db: AsyncSession = Depends(get_db)):
-    """Распределение домов по бригадам для круговой диаграммы"""
+async def get_houses_by_brigade():
+    """Распределение домов по бригадам для круговой диаграммы (снимок из dashboard_stats)"""
     
     try:
-        # Сначала пробуем по brigade_number
-        result = await db.execute(
-            select(
-                House.brigade_number,
-                func.count(House.id).label('count')
-            )
-            .where(House.brigade_number.isnot(None))
-            .group_by(House.brigade_number)
-            .order_by(House.brigade_number)
-        )
-        
-        data = []
-        colors = ['#3B82F6', '#10B981', '#F59E0B', '#EF4444', '#8B5CF6', '#EC4899', '#14B8A6']
-        
-        rows = result.all()
-        
-        if rows and len(rows) > 0:
-            for idx, row in enumerate(rows):
-                data.append({
-                    "label": f"Бригада {row.brigade_number}",
-                    "value": row.count,
-                    "color": colors[idx % len(colors)]
-                })
-        else:
-            # Fallback: группируем по assigned_by_id
-            result2 = await db.execute(
-                select(
-                    House.assigned_by_id,
-                    func.count(House.id).label('count')
-                )
-                .where(House.assigned_by_id.isnot(None))
-                .group_by(House.assigned_by_id)
-                .order_by(func.count(House.id).desc())
-                .limit(7)
-            )
-            
-            for idx, row in enumerate(result2):
-                data.append({
-                    "label": f"Бригада {idx + 1}",
-                    "value": row.count,
-                    "color": colors[idx % len(colors)]
-                })
-        
-        return {"data": data}
+        return {"data": await dashboard_stats.get_houses_by_brigade()}
         
     except Exception as e:
         logger.error(f"Error in houses-by-brigade: {e}")
@@ -5,10 +5,10 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional, Literal
 from datetime import datetime
-import asyncpg
 import os
 import logging
 from uuid import uuid4
+from backend.app.config.database import acquire_db_connection, release_db_connection
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["debts"])
@@ -43,14 +43,12 @@ class DebtResponse(DebtBase):
 
 
 async def get_db_connection():
-    """Получить прямое соединение с БД"""
-    db_url = os.environ.get('DATABASE_URL', '')
-    
-    if not db_url:
+    """Взять соединение из общего asyncpg пула (вернуть через release_db_connection)"""
+    if not os.environ.get('DATABASE_URL', ''):
         raise HTTPException(status_code=500, detail="Database not configured")
     
     try:
-        return await asyncpg.connect(db_url)
+        return await acquire_db_connection()
     except Exception as e:
         logger.error(f"Failed to connect to database: {e}")
         raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
@@ -158,7 +156,7 @@ async def get_all_debts():
                 }
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error fetching debts: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -203,7 +201,7 @@ async def create_debt(debt: DebtCreate):
                 "updated_at": row['updated_at']
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error creating debt: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -282,7 +280,7 @@ async def update_debt(debt_id: str, debt: DebtUpdate):
                 "updated_at": row['updated_at']
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except HTTPException:
         raise
     except Exception as e:
@@ -306,7 +304,7 @@ async def delete_debt(debt_id: str):
             
             return {"success": True, "message": "Debt deleted successfully"}
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except HTTPException:
         raise
     except Exception as e:
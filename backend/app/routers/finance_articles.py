@@ -4,9 +4,10 @@ API для управления статьями расходов и их мап
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Optional
-import asyncpg
 import os
 import logging
+from backend.app.config.database import acquire_db_connection, release_db_connection
+from backend.app.services.brain_answer_cache import brain_answer_cache
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["finance_articles"])
@@ -60,14 +61,12 @@ ARTICLE_MAPPING = {
 
 
 async def get_db_connection():
-    """Получить прямое соединение с БД"""
-    db_url = os.environ.get('DATABASE_URL', '')
-    
-    if not db_url:
+    """Взять соединение из общего asyncpg пула (вернуть через release_db_connection)"""
+    if not os.environ.get('DATABASE_URL', ''):
         raise HTTPException(status_code=500, detail="Database not configured")
     
     try:
-        return await asyncpg.connect(db_url)
+        return await acquire_db_connection()
     except Exception as e:
         logger.error(f"Failed to connect to database: {e}")
         raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
@@ -116,7 +115,7 @@ async def get_articles():
                 "unmapped_count": len([a for a in articles if not a['is_mapped']])
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error fetching articles: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -164,7 +163,7 @@ async def get_unmapped_articles():
                 "total_unmapped": len(unmapped)
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error fetching unmapped articles: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -198,13 +197,15 @@ async def update_article_mapping(request: UpdateArticlesRequest):
                 
                 logger.info(f"Обновлено {count} транзакций для статьи {article} -> {category}")
             
+            if updated_count:
+                brain_answer_cache.invalidate("finance")
             return {
                 "success": True,
                 "updated_transactions": updated_count,
                 "updated_articles": len(new_mapping)
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error updating article mapping: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -231,13 +232,15 @@ async def recategorize_all():
                 count = int(result.split()[-1])
                 updated_count += count
             
+            if updated_count:
+                brain_answer_cache.invalidate("finance")
             return {
                 "success": True,
                 "updated_transactions": updated_count,
                 "message": "Категории успешно пересчитаны"
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error recategorizing: {e}")
         raise HTTPException(status_code=500, detail=str(e))
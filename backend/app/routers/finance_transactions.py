@@ -3,11 +3,12 @@ from typing import List, Optional, Literal
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 import logging
-import asyncpg
 import csv
 import io
 from uuid import uuid4
 import os
+from backend.app.config.database import acquire_db_connection, release_db_connection
+from backend.app.services.brain_answer_cache import brain_answer_cache
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["finance-transactions"])
@@ -72,17 +73,12 @@ DEFAULT_EXPENSE_CATEGORIES = [
 
 # Helper function для получения DB connection
 async def get_db_connection():
-    """Получить прямое соединение с БД для raw SQL"""
-    db_url = os.environ.get('DATABASE_URL', '')
-    
-    if not db_url:
+    """Взять соединение из общего asyncpg пула (вернуть через release_db_connection)"""
+    if not os.environ.get('DATABASE_URL', ''):
         raise HTTPException(status_code=500, detail="Database not configured")
     
-    # Преобразуем asyncpg URL
-    db_url = db_url.replace('postgresql+asyncpg://', 'postgresql://')
-    
     try:
-        return await asyncpg.connect(db_url)
+        return await acquire_db_connection()
     except Exception as e:
         logger.error(f"Failed to connect to database: {e}")
         raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
@@ -109,6 +105,7 @@ async def create_transaction(transaction: TransactionCreate):
                 transaction.category, transaction.type, transaction.description,
                 transaction.payment_method, transaction.counterparty, 
                 transaction.project, transaction.tags or [], now)
+            brain_answer_cache.invalidate("finance")
             
             # Получить созданную транзакцию
             row = await conn.fetchrow(
@@ -131,7 +128,7 @@ async def create_transaction(transaction: TransactionCreate):
                 updated_at=row['updated_at']
             )
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error creating transaction: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -205,7 +202,7 @@ async def get_transactions(
                 for row in rows
             ]
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error fetching transactions: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -241,7 +238,7 @@ async def get_transaction(transaction_id: str):
                 updated_at=row['updated_at']
             )
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except HTTPException:
         raise
     except Exception as e:
@@ -332,11 +329,30 @@ async def update_transaction(transaction_id: str, transaction: TransactionUpdate
             """
             
             await conn.execute(query, *params)
+            brain_answer_cache.invalidate("finance")
             
-            # Вернуть обновлённую транзакцию
-            return await get_transaction(transaction_id)
+            # Вернуть обновлённую транзакцию (на том же соединении - без второго захвата из пула)
+            row = await conn.fetchrow(
+                "SELECT * FROM financial_transactions WHERE id = $1",
+                transaction_id
+            )
+
+            return TransactionResponse(
+                id=row['id'],
+                date=row['date'],
+                amount=float(row['amount']),
+                category=row['category'],
+                type=row['type'],
+                description=row['description'],
+                payment_method=row['payment_method'],
+                counterparty=row['counterparty'],
+                project=row['project'],
+                tags=row['tags'] or [],
+                created_at=row['created_at'],
+                updated_at=row['updated_at']
+            )
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except HTTPException:
         raise
     except Exception as e:
@@ -358,10 +374,11 @@ async def delete_transaction(transaction_id: str):
             
             if result == "DELETE 0":
                 raise HTTPException(status_code=404, detail="Transaction not found")
+            brain_answer_cache.invalidate("finance")
             
             return {"success": True, "message": "Transaction deleted"}
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except HTTPException:
         raise
     except Exception as e:
@@ -427,13 +444,15 @@ async def import_csv(file: UploadFile = File(...)):
                 except Exception as e:
                     errors.append(f"Строка {row_num}: {str(e)}")
             
+            if imported_count:
+                brain_answer_cache.invalidate("finance")
             return {
                 "success": True,
                 "imported": imported_count,
                 "errors": errors if errors else None
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error importing CSV: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -470,7 +489,7 @@ async def init_database():
             await conn.execute(CREATE_TABLE_SQL)
             return {"success": True, "message": "Database table created successfully"}
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error initializing database: {e}")
         raise HTTPException(status_code=500, detail=str(e))
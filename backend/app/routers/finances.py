@@ -5,25 +5,25 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel
 import logging
-import asyncpg
 import os
 import io
 import csv
+from backend.app.config.database import acquire_db_connection, release_db_connection
+from backend.app.models.user import RoleEnum, User
+from backend.app.services import finance_rollup
+from backend.app.utils.auth_deps import get_current_user
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["finances"])
 
 # Helper function для получения DB connection
 async def get_db_connection():
-    """Получить прямое соединение с БД для raw SQL"""
-    db_url = os.environ.get('DATABASE_URL', '')
-    
-    if not db_url:
+    """Взять соединение из общего asyncpg пула (вернуть через release_db_connection)"""
+    if not os.environ.get('DATABASE_URL', ''):
         raise HTTPException(status_code=500, detail="Database not configured")
     
-    # Для asyncpg не нужно преобразовывать URL
     try:
-        return await asyncpg.connect(db_url)
+        return await acquire_db_connection()
     except Exception as e:
         logger.error(f"Failed to connect to database: {e}")
         raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
@@ -79,15 +79,15 @@ async def get_cash_flow(
     try:
         conn = await get_db_connection()
         try:
-            # Получаем данные по дням
+            # Получаем данные по дням (подневная свёртка, migrations/create_financial_rollup.sql)
             query = """
                 SELECT 
-                    DATE(date) as transaction_date,
+                    day as transaction_date,
                     SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END) as income,
                     SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END) as expense
-                FROM financial_transactions
-                GROUP BY DATE(date)
-                ORDER BY DATE(date) DESC
+                FROM financial_daily_rollup
+                GROUP BY day
+                ORDER BY day DESC
                 LIMIT 30
             """
             rows = await conn.fetch(query)
@@ -132,7 +132,7 @@ async def get_cash_flow(
                 }
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error fetching cash flow: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -173,17 +173,17 @@ async def get_profit_loss(
                 """, company)
                 manual_revenue = {row['month']: float(row['revenue']) for row in manual_rows}
             
-            # Группируем данные по месяцам из даты
+            # Группируем данные по месяцам (помесячная свёртка, migrations/create_financial_rollup.sql)
             query = """
                 SELECT 
-                    TO_CHAR(date, 'Month YYYY') as period,
-                    TO_CHAR(date, 'YYYY-MM') as sort_key,
+                    TO_CHAR(month, 'Month YYYY') as period,
+                    TO_CHAR(month, 'YYYY-MM') as sort_key,
                     SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END) as revenue,
                     SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END) as expenses
-                FROM financial_transactions
-                WHERE date IS NOT NULL AND EXTRACT(YEAR FROM date) = 2025 AND company = $1
-                GROUP BY TO_CHAR(date, 'Month YYYY'), TO_CHAR(date, 'YYYY-MM')
-                ORDER BY TO_CHAR(date, 'YYYY-MM')
+                FROM financial_monthly_rollup
+                WHERE month >= DATE '2025-01-01' AND month < DATE '2026-01-01' AND company = $1
+                GROUP BY month
+                ORDER BY month
             """
             rows = await conn.fetch(query, company)
             
@@ -244,7 +244,7 @@ async def get_profit_loss(
                 }
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error fetching profit/loss: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -315,7 +315,7 @@ async def get_expense_analysis(month: Optional[str] = None, company: Optional[st
             if month:
                 query = """
                     SELECT category, SUM(amount) as total_amount
-                    FROM financial_transactions
+                    FROM financial_monthly_rollup
                     WHERE type = 'expense' AND project = $1 AND company = $2
                     GROUP BY category
                     ORDER BY total_amount DESC
@@ -324,7 +324,7 @@ async def get_expense_analysis(month: Optional[str] = None, company: Optional[st
             else:
                 query = """
                     SELECT category, SUM(amount) as total_amount
-                    FROM financial_transactions
+                    FROM financial_monthly_rollup
                     WHERE type = 'expense' AND company = $1
                     GROUP BY category
                     ORDER BY total_amount DESC
@@ -359,7 +359,7 @@ async def get_expense_analysis(month: Optional[str] = None, company: Optional[st
                 "month": month
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error fetching expense analysis: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -374,10 +374,10 @@ async def get_available_months():
         conn = await get_db_connection()
         try:
             query = """
-                SELECT DISTINCT project as month,
-                       MIN(date) as start_date
-                FROM financial_transactions
-                WHERE project IS NOT NULL
+                SELECT project as month,
+                       MIN(month) as start_date
+                FROM financial_monthly_rollup
+                WHERE project <> ''
                 GROUP BY project
                 ORDER BY start_date DESC
             """
@@ -390,12 +390,56 @@ async def get_available_months():
                 "total": len(months)
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error fetching available months: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/finances/rollup/check")
+async def check_financial_rollup():
+    """
+    Сверить помесячную и подневную свёртки с financial_transactions (только чтение;
+    пересборка - POST /finances/rollup/repair)
+    """
+    try:
+        conn = await get_db_connection()
+        try:
+            return await finance_rollup.check(conn)
+        finally:
+            await release_db_connection(conn)
+    except Exception as e:
+        logger.error(f"Error checking financial rollup: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Пересборка свёрток блокирует обе таблицы - только для ролей с доступом к бухгалтерии
+ROLLUP_REPAIR_ROLES = (RoleEnum.DIRECTOR, RoleEnum.GENERAL_DIRECTOR, RoleEnum.ACCOUNTANT)
+
+
+@router.post("/finances/rollup/repair")
+async def repair_financial_rollup(current_user: User = Depends(get_current_user)):
+    """
+    Сверить свёртки и пересобрать их, если они расходятся
+    (LOCK + TRUNCATE + пересчёт из financial_transactions)
+    """
+    if not any(current_user.has_role(role) for role in ROLLUP_REPAIR_ROLES):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    try:
+        conn = await get_db_connection()
+        try:
+            result = await finance_rollup.check(conn)
+            if not result["consistent"]:
+                logger.warning(f"Rebuilding financial rollup by user {current_user.id}")
+                result["repair"] = await finance_rollup.rebuild(conn)
+            return result
+        finally:
+            await release_db_connection(conn)
+    except Exception as e:
+        logger.error(f"Error repairing financial rollup: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/finances/debts")
 async def get_debts():
     """
@@ -463,7 +507,7 @@ async def get_debts():
                 }
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error fetching debts: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -574,14 +618,14 @@ async def export_expenses(year: int = 2025):
             # Получаем расходы по месяцам с детализацией по категориям
             query = """
                 SELECT 
-                    TO_CHAR(date, 'YYYY-MM') as month,
-                    TO_CHAR(date, 'Month YYYY') as month_name,
+                    TO_CHAR(month, 'YYYY-MM') as month_key,
+                    TO_CHAR(month, 'Month YYYY') as month_name,
                     category,
                     SUM(amount) as total_amount,
-                    COUNT(*) as transactions_count
-                FROM financial_transactions
-                WHERE type = 'expense' AND EXTRACT(YEAR FROM date) = $1
-                GROUP BY TO_CHAR(date, 'YYYY-MM'), TO_CHAR(date, 'Month YYYY'), category
+                    SUM(tx_count) as transactions_count
+                FROM financial_monthly_rollup
+                WHERE type = 'expense' AND month >= make_date($1, 1, 1) AND month < make_date($1 + 1, 1, 1)
+                GROUP BY month, category
                 ORDER BY month, category
             """
             rows = await conn.fetch(query, year)
@@ -609,12 +653,12 @@ async def export_expenses(year: int = 2025):
             
             monthly_query = """
                 SELECT 
-                    TO_CHAR(date, 'Month YYYY') as month_name,
+                    TO_CHAR(month, 'Month YYYY') as month_name,
                     SUM(amount) as total_amount
-                FROM financial_transactions
-                WHERE type = 'expense' AND EXTRACT(YEAR FROM date) = $1
-                GROUP BY TO_CHAR(date, 'YYYY-MM'), TO_CHAR(date, 'Month YYYY')
-                ORDER BY TO_CHAR(date, 'YYYY-MM')
+                FROM financial_monthly_rollup
+                WHERE type = 'expense' AND month >= make_date($1, 1, 1) AND month < make_date($1 + 1, 1, 1)
+                GROUP BY month
+                ORDER BY month
             """
             monthly_rows = await conn.fetch(monthly_query, year)
             
@@ -636,7 +680,7 @@ async def export_expenses(year: int = 2025):
             )
             
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error exporting expenses: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -703,7 +747,7 @@ async def get_expense_details(month: str, company: Optional[str] = "ООО ВА
             }
             
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error fetching expense details: {e}")
 
@@ -727,7 +771,7 @@ async def get_revenue_analysis(month: Optional[str] = None, company: Optional[st
             if month:
                 query = """
                     SELECT category, SUM(amount) as total_amount
-                    FROM financial_transactions
+                    FROM financial_monthly_rollup
                     WHERE type = 'income' AND project = $1 AND company = $2
                     GROUP BY category
                     ORDER BY total_amount DESC
@@ -736,7 +780,7 @@ async def get_revenue_analysis(month: Optional[str] = None, company: Optional[st
             else:
                 query = """
                     SELECT category, SUM(amount) as total_amount
-                    FROM financial_transactions
+                    FROM financial_monthly_rollup
                     WHERE type = 'income' AND company = $1
                     GROUP BY category
                     ORDER BY total_amount DESC
@@ -771,7 +815,7 @@ async def get_revenue_analysis(month: Optional[str] = None, company: Optional[st
                 "month": month
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error fetching revenue analysis: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -842,7 +886,7 @@ async def get_revenue_details(month: Optional[str] = None, company: Optional[str
             }
             
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error fetching revenue details: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -896,7 +940,7 @@ async def get_consolidated_revenue(conn, month: Optional[str] = None):
 
 async def get_consolidated_profit_loss(conn):
     """
-    Консолидированный расчет для "ВАШ ДОМ модель"
+    Консолидированный расчет для "ВАШ ДОМ модель" (расходы - из financial_monthly_rollup)
     
     Логика:
     - Выручка: из monthly_revenue для "ВАШ ДОМ модель" (ручная)
@@ -920,10 +964,10 @@ async def get_consolidated_profit_loss(conn):
     # Получаем расходы ВАШ ДОМ ФАКТ по месяцам и категориям
     vasdom_expenses = await conn.fetch("""
         SELECT 
-            project as month,
+            NULLIF(project, '') as month,
             category,
             SUM(amount) as amount
-        FROM financial_transactions
+        FROM financial_monthly_rollup
         WHERE type = 'expense' AND company = 'ВАШ ДОМ ФАКТ'
         GROUP BY project, category
     """)
@@ -931,10 +975,10 @@ async def get_consolidated_profit_loss(conn):
     # Получаем расходы УФИЦ модель по месяцам - ТОЛЬКО Зарплата (без ФОТ)
     ufic_expenses = await conn.fetch("""
         SELECT 
-            project as month,
+            NULLIF(project, '') as month,
             category,
             SUM(amount) as amount
-        FROM financial_transactions
+        FROM financial_monthly_rollup
         WHERE type = 'expense' AND company = 'УФИЦ модель'
           AND category = 'Зарплата'
         GROUP BY project, category
@@ -943,9 +987,9 @@ async def get_consolidated_profit_loss(conn):
     # Получаем Аутсорсинг персонала из транзакций ВАШ ДОМ модель
     outsourcing_expenses = await conn.fetch("""
         SELECT 
-            project as month,
+            NULLIF(project, '') as month,
             SUM(amount) as amount
-        FROM financial_transactions
+        FROM financial_monthly_rollup
         WHERE type = 'expense' AND company = 'ВАШ ДОМ модель'
           AND category = 'Аутсорсинг персонала'
         GROUP BY project
@@ -1084,7 +1128,7 @@ async def get_consolidated_expenses(conn, month: Optional[str] = None):
     if month:
         outsourcing_query = """
             SELECT SUM(amount) as total_amount
-            FROM financial_transactions
+            FROM financial_monthly_rollup
             WHERE type = 'expense' AND company = 'ВАШ ДОМ модель' 
               AND category = 'Аутсорсинг персонала' AND project = $1
         """
@@ -1092,7 +1136,7 @@ async def get_consolidated_expenses(conn, month: Optional[str] = None):
     else:
         outsourcing_query = """
             SELECT SUM(amount) as total_amount
-            FROM financial_transactions
+            FROM financial_monthly_rollup
             WHERE type = 'expense' AND company = 'ВАШ ДОМ модель'
               AND category = 'Аутсорсинг персонала'
         """
@@ -1106,7 +1150,7 @@ async def get_consolidated_expenses(conn, month: Optional[str] = None):
     if month:
         vasdom_query = """
             SELECT category, SUM(amount) as total_amount
-            FROM financial_transactions
+            FROM financial_monthly_rollup
             WHERE type = 'expense' AND company = 'ВАШ ДОМ ФАКТ' 
               AND project = $1
               AND category NOT IN ('Кредиты', 'Швеи', 'Юридические услуги', 'Продукты питания')
@@ -1116,7 +1160,7 @@ async def get_consolidated_expenses(conn, month: Optional[str] = None):
     else:
         vasdom_query = """
             SELECT category, SUM(amount) as total_amount
-            FROM financial_transactions
+            FROM financial_monthly_rollup
             WHERE type = 'expense' AND company = 'ВАШ ДОМ ФАКТ'
               AND category NOT IN ('Кредиты', 'Швеи', 'Юридические услуги', 'Продукты питания')
             GROUP BY category
@@ -1127,7 +1171,7 @@ async def get_consolidated_expenses(conn, month: Optional[str] = None):
     if month:
         ufic_salary_query = """
             SELECT SUM(amount) as total_amount
-            FROM financial_transactions
+            FROM financial_monthly_rollup
             WHERE type = 'expense' AND company = 'УФИЦ модель' 
               AND category = 'Зарплата' AND project = $1
         """
@@ -1135,7 +1179,7 @@ async def get_consolidated_expenses(conn, month: Optional[str] = None):
     else:
         ufic_salary_query = """
             SELECT SUM(amount) as total_amount
-            FROM financial_transactions
+            FROM financial_monthly_rollup
             WHERE type = 'expense' AND company = 'УФИЦ модель'
               AND category = 'Зарплата'
         """
@@ -1992,7 +2036,7 @@ async def get_forecast(
             }
             
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error calculating forecast: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -2128,7 +2172,7 @@ async def export_all_financial_data():
             
         finally:
             if conn:
-                await conn.close()
+                await release_db_connection(conn)
         
     except Exception as e:
         logger.error(f"Error exporting all financial data: {e}")
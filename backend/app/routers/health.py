@@ -2,9 +2,15 @@
 Health check endpoint для мониторинга
 """
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
 import os
 from datetime import datetime
 
+from backend.app.config.database import get_db_pool_stats, check_db_pool
+from backend.app.config.http_clients import http_clients
+from backend.app.services.brain_metrics import brain_metrics
+from backend.app.services.swr_cache import cache_stats
+
 router = APIRouter(tags=["Health"])
 
 @router.get("/health")
@@ -13,6 +19,7 @@ async def health_check():
     Health check endpoint
     Проверяет что сервис запущен и работает
     """
+    db_ok = await check_db_pool() if os.getenv("DATABASE_URL") else False
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
@@ -25,6 +32,12 @@ async def health_check():
             "livekit": "Connected" if os.getenv("LIVEKIT_WS_URL") else "Not configured",
             "openai": "Connected" if os.getenv("OPENAI_API_KEY") else "Not configured",
         },
+        "database_pool": {
+            "healthy": db_ok,
+            **get_db_pool_stats()
+        },
+        "http_clients": http_clients.stats(),
+        "caches": cache_stats(),
         "features": [
             "Authentication (JWT)",
             "RBAC (10 roles)",
@@ -40,6 +53,11 @@ async def health_check():
         ]
     }
 
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Метрики Single Brain в текстовом формате Prometheus"""
+    return PlainTextResponse(brain_metrics.render_text(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @router.get("/")
 async def root():
     """Root endpoint - redirect to health"""
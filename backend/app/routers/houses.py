@@ -1,78 +1,120 @@
 """
 API роутер для домов - интеграция с Bitrix24
 """
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
-from typing import List, Optional
+from sqlalchemy import func, literal, literal_column, select, text, tuple_, update
+from typing import List, Literal, Optional
 from datetime import datetime, timezone
+import base64
+import json
 
-from backend.app.config.database import get_db
+from backend.app.config.database import AsyncSessionLocal, get_db
 from backend.app.models.house import House
 from backend.app.schemas.house import HouseResponse, HouseCreate, HouseUpdate
 from backend.app.services.bitrix24_service import bitrix24_service
+from backend.app.services import dashboard_stats
+from backend.app.services.brain_answer_cache import brain_answer_cache
+from backend.app.services.house_sync import houses_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/houses", tags=["Houses"])
 
+# Колонки ответа /houses: без content_hash/deleted_at и без ORM-объектов
+_LIST_COLUMNS = [c for c in House.__table__.c if c.name not in ("content_hash", "deleted_at")]
+
+# Ключи keyset-пагинации: выражения совпадают с индексами из add_houses_listing_indexes.sql
+_SORT_KEYS = {
+    "id": House.id,
+    "brigade_number": func.coalesce(House.brigade_number, literal_column("''")),
+    "company_title": func.coalesce(House.company_title, literal_column("''")),
+    "synced_at": func.coalesce(House.synced_at, literal_column("'epoch'::timestamp")),
+}
+
+
+def _encode_cursor(sort_value, house_id: str) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, house_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str, order_by: str):
+    try:
+        sort_value, house_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if order_by == "synced_at":
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, str(house_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+
+def _house_row_to_dict(row) -> dict:
+    house_dict = dict(row)
+    # Вычисляем periodicity
+    house_dict["periodicity"] = bitrix24_service._compute_periodicity(house_dict.get("cleaning_schedule") or {})
+    return house_dict
+
+
 @router.get("/", response_model=List[HouseResponse])
 async def get_houses(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
     brigade_number: Optional[str] = None,
     company_id: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
+    order_by: Literal["id", "brigade_number", "company_title", "synced_at"] = "id",
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor (вместо skip)"),
 ):
-    """Получение списка домов с фильтрацией"""
-    
-    query = select(House)
-    
-    # Фильтр по бригаде (для RBAC)
-    if brigade_number:
-        query = query.where(House.brigade_number == brigade_number)
-    
-    # Фильтр по УК
-    if company_id:
-        query = query.where(House.company_id == company_id)
-    
-    query = query.offset(skip).limit(limit)
+    """
+    Получение списка домов с фильтрацией.
+    Keyset-пагинация: следующую страницу запрашивать с cursor из заголовка X-Next-Cursor
+    (skip оставлен для совместимости, на дальних страницах он медленный).
+    Загрузка в houses_cache общая для конкурентных запросов - идёт на своей сессии, не на сессии запроса
+    """
     
-    result = await db.execute(query)
-    houses = result.scalars().all()
+    cache_key = f"list:{order_by}:{brigade_number}:{company_id}:{cursor}:{skip}:{limit}"
+    sort_key = _SORT_KEYS[order_by]
+    after = _decode_cursor(cursor, order_by) if cursor else None
     
-    # Вычисляем periodicity для каждого дома
-    houses_with_periodicity = []
-    for house in houses:
-        house_dict = {
-            "id": house.id,
-            "bitrix_id": house.bitrix_id,
-            "address": house.address,
-            "apartments_count": house.apartments_count,
-            "entrances_count": house.entrances_count,
-            "floors_count": house.floors_count,
-            "company_id": house.company_id,
-            "company_title": house.company_title,
-            "assigned_by_id": house.assigned_by_id,
-            "assigned_by_name": house.assigned_by_name,
-            "brigade_number": house.brigade_number,
-            "tariff": house.tariff,
-            "elder_contact": house.elder_contact,
-            "notes": house.notes,
-            "cleaning_schedule": house.cleaning_schedule,
-            "complaints": house.complaints,
-            "act_signed": house.act_signed,
-            "last_cleaning": house.last_cleaning,
-            "created_at": house.created_at,
-            "updated_at": house.updated_at,
-            "synced_at": house.synced_at,
-            # Вычисляем periodicity
-            "periodicity": bitrix24_service._compute_periodicity(house.cleaning_schedule or {})
+    async def _load():
+        # Дома, пропавшие из Bitrix24 (deleted_at), не показываем
+        query = select(*_LIST_COLUMNS, sort_key.label("_sort")).where(House.deleted_at.is_(None))
+        
+        # Фильтр по бригаде (для RBAC)
+        if brigade_number:
+            query = query.where(_SORT_KEYS["brigade_number"] == brigade_number)
+        
+        # Фильтр по УК
+        if company_id:
+            query = query.where(House.company_id == company_id)
+        
+        if after:
+            sort_value, house_id = after
+            if order_by == "id":
+                query = query.where(House.id > house_id)
+            else:
+                query = query.where(tuple_(sort_key, House.id) > tuple_(literal(sort_value), literal(house_id)))
+        elif skip:
+            query = query.offset(skip)
+        
+        order = [House.id] if order_by == "id" else [sort_key, House.id]
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(query.order_by(*order).limit(limit))
+            rows = result.mappings().all()
+        
+        next_cursor = _encode_cursor(rows[-1]["_sort"], rows[-1]["id"]) if len(rows) == limit else None
+        return {
+            "houses": [_house_row_to_dict({k: v for k, v in row.items() if k != "_sort"}) for row in rows],
+            "next_cursor": next_cursor,
         }
-        houses_with_periodicity.append(house_dict)
     
-    return houses_with_periodicity
+    page = await houses_cache.get_or_load(cache_key, _load)
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return page["houses"]
 
 @router.get("/{house_id}", response_model=HouseResponse)
 async def get_house(house_id: str, db: AsyncSession = Depends(get_db)):
@@ -126,6 +168,9 @@ async def create_house(house_data: HouseCreate, db: AsyncSession = Depends(get_d
     db.add(new_house)
     await db.commit()
     await db.refresh(new_house)
+    houses_cache.clear()
+    brain_answer_cache.invalidate("houses")
+    dashboard_stats.schedule_refresh()
     
     return new_house
 
@@ -152,6 +197,9 @@ async def update_house(
     
     await db.commit()
     await db.refresh(house)
+    houses_cache.clear()
+    brain_answer_cache.invalidate("houses")
+    dashboard_stats.schedule_refresh()
     
     return house
 
@@ -167,6 +215,9 @@ async def delete_house(house_id: str, db: AsyncSession = Depends(get_db)):
     
     await db.delete(house)
     await db.commit()
+    houses_cache.clear()
+    brain_answer_cache.invalidate("houses")
+    dashboard_stats.schedule_refresh()
     
     return {"message": "Дом удален"}
 
@@ -194,80 +245,65 @@ async def sync_houses_from_bitrix24(db: AsyncSession):
     """Фоновая задача синхронизации"""
     
     try:
-        # Загрузка всех сделок из Bitrix24
-        deals = await bitrix24_service.get_all_deals()
+        result = await bitrix24_service.sync_houses(db)
         
-        logger.info(f"Загружено {len(deals)} сделок из Bitrix24")
-        
-        synced_count = 0
-        created_count = 0
-        updated_count = 0
-        
-        for deal in deals:
-            # Парсинг сделки в формат дома
-            house_data = bitrix24_service.parse_deal_to_house(deal)
-            
-            if not house_data.get("address"):
-                continue
-            
-            # Проверка существования дома по bitrix_id
-            result = await db.execute(
-                select(House).where(House.bitrix_id == house_data["bitrix_id"])
-            )
-            existing_house = result.scalar_one_or_none()
-            
-            if existing_house:
-                # Обновление существующего дома
-                for key, value in house_data.items():
-                    if key != "id":  # Не обновляем ID
-                        setattr(existing_house, key, value)
-                
-                updated_count += 1
-            else:
-                # Создание нового дома
-                new_house = House(**house_data)
-                db.add(new_house)
-                created_count += 1
-            
-            synced_count += 1
-        
-        await db.commit()
-        
-        logger.info(f"✅ Синхронизация завершена: {synced_count} домов, создано: {created_count}, обновлено: {updated_count}")
+        logger.info(
+            f"✅ Синхронизация завершена: {result['total']} домов, создано: {result['created']}, "
+            f"обновлено: {result['updated']}, без изменений: {result['unchanged']}, удалено: {result['deleted']}"
+        )
         
     except Exception as e:
         logger.error(f"❌ Ошибка синхронизации: {e}")
         await db.rollback()
 
 @router.get("/stats/summary")
-async def get_houses_stats(db: AsyncSession = Depends(get_db)):
-    """Статистика по домам"""
-    
-    result = await db.execute(select(House))
-    houses = result.scalars().all()
-    
-    stats = {
-        "total": len(houses),
-        "by_brigade": {},
-        "by_company": {},
-        "last_sync": None
-    }
+async def get_houses_stats():
+    """Статистика по домам: один GROUP BY GROUPING SETS вместо загрузки всех домов (своя сессия, как в get_houses)"""
     
-    for house in houses:
-        # Статистика по бригадам
-        brigade = house.brigade_number or "Не назначено"
-        stats["by_brigade"][brigade] = stats["by_brigade"].get(brigade, 0) + 1
+    async def _load():
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(text(
+                """
+                SELECT
+                    COALESCE(brigade_number, 'Не назначено') AS brigade,
+                    COALESCE(company_title, 'Не указано') AS company,
+                    GROUPING(COALESCE(brigade_number, 'Не назначено')) AS by_brigade,
+                    GROUPING(COALESCE(company_title, 'Не указано')) AS by_company,
+                    COUNT(*) AS cnt,
+                    MAX(synced_at) AS last_sync
+                FROM houses
+                WHERE deleted_at IS NULL
+                GROUP BY GROUPING SETS (
+                    (COALESCE(brigade_number, 'Не назначено')),
+                    (COALESCE(company_title, 'Не указано')),
+                    ()
+                )
+                """
+            ))
+            rows = result.mappings().all()
         
-        # Статистика по УК
-        company = house.company_title or "Не указано"
-        stats["by_company"][company] = stats["by_company"].get(company, 0) + 1
+        stats = {
+            "total": 0,
+            "by_brigade": {},
+            "by_company": {},
+            "last_sync": None
+        }
+        
+        for row in rows:
+            if row["by_brigade"] and row["by_company"]:
+                # Итоговая строка: всего домов и последняя синхронизация
+                stats["total"] = row["cnt"]
+                stats["last_sync"] = row["last_sync"]
+            elif not row["by_brigade"]:
+                # Статистика по бригадам
+                stats["by_brigade"][row["brigade"]] = row["cnt"]
+            else:
+                # Статистика по УК
+                stats["by_company"][row["company"]] = row["cnt"]
         
-        # Последняя синхронизация
-        if house.synced_at:
-            if not stats["last_sync"] or house.synced_at > stats["last_sync"]:
-                stats["last_sync"] = house.synced_at
+        return stats
     
-    return stats
+    return await houses_cache.get_or_load("stats", _load)
 
 
 
@@ -316,7 +352,7 @@ async def sign_act(request: ActSignRequest):
     Ключевой показатель для компании
     """
     try:
-        from app.config.database import get_db_pool
+        from backend.app.config.database import get_db_pool
         
         db_pool = await get_db_pool()
         if not db_pool:
@@ -386,7 +422,7 @@ async def get_acts_stats(month: str):
         Статистика: всего домов, подписано, не подписано, процент
     """
     try:
-        from app.config.database import get_db_pool
+        from backend.app.config.database import get_db_pool
         
         db_pool = await get_db_pool()
         if not db_pool:
@@ -463,7 +499,7 @@ async def delete_act(house_id: str, month: str):
         month: Месяц в формате YYYY-MM
     """
     try:
-        from app.config.database import get_db_pool
+        from backend.app.config.database import get_db_pool
         
         db_pool = await get_db_pool()
         if not db_pool:
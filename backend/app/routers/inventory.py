@@ -5,10 +5,10 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
-import asyncpg
 import os
 import logging
 from uuid import uuid4
+from backend.app.config.database import acquire_db_connection, release_db_connection
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["inventory"])
@@ -50,14 +50,12 @@ class InventoryResponse(BaseModel):
 
 
 async def get_db_connection():
-    """Получить прямое соединение с БД"""
-    db_url = os.environ.get('DATABASE_URL', '')
-    
-    if not db_url:
+    """Взять соединение из общего asyncpg пула (вернуть через release_db_connection)"""
+    if not os.environ.get('DATABASE_URL', ''):
         raise HTTPException(status_code=500, detail="Database not configured")
     
     try:
-        return await asyncpg.connect(db_url)
+        return await acquire_db_connection()
     except Exception as e:
         logger.error(f"Failed to connect to database: {e}")
         raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
@@ -158,7 +156,7 @@ async def get_all_inventory():
                 }
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error fetching inventory: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -206,7 +204,7 @@ async def create_inventory_item(item: InventoryCreate):
                 "updated_at": row['updated_at']
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error creating inventory item: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -296,7 +294,7 @@ async def update_inventory_item(item_id: str, item: InventoryUpdate):
                 "updated_at": row['updated_at']
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except HTTPException:
         raise
     except Exception as e:
@@ -320,7 +318,7 @@ async def delete_inventory_item(item_id: str):
             
             return {"success": True, "message": "Inventory item deleted successfully"}
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except HTTPException:
         raise
     except Exception as e:
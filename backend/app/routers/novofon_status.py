@@ -33,6 +33,44 @@ async def get_scheduler_info():
         }
 
 
+@router.get("/pipeline")
+async def get_pipeline_info():
+    """
+    Метрики конвейера обработки звонков: стадии, очереди, задержки
+    """
+    try:
+        from backend.app.services.novofon_auto_processor import novofon_auto_processor
+        return {
+            "success": True,
+            "pipeline": novofon_auto_processor.get_stats()
+        }
+    except Exception as e:
+        logger.error(f"Error getting pipeline stats: {e}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+@router.get("/call-queue")
+async def get_call_queue_info():
+    """
+    Состояние очереди звонков call_events: статусы, воркеры, счётчики
+    """
+    try:
+        from backend.app.services.call_event_queue import call_event_queue
+        return {
+            "success": True,
+            "queue": await call_event_queue.status()
+        }
+    except Exception as e:
+        logger.error(f"Error getting call queue status: {e}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
 @router.get("/stats")
 async def get_processing_stats(db: AsyncSession = Depends(get_db)):
     """
@@ -40,12 +78,14 @@ async def get_processing_stats(db: AsyncSession = Depends(get_db)):
     """
     try:
         # Общая статистика
+        # status появляется после первого запуска конвейера - читаем через to_jsonb, чтобы не зависеть от колонки
         result = await db.execute(text("""
             SELECT 
                 COUNT(*) as total_calls,
                 COUNT(*) FILTER (WHERE success = TRUE) as successful,
-                COUNT(*) FILTER (WHERE success = FALSE) as failed
-            FROM processed_calls
+                COUNT(*) FILTER (WHERE success = FALSE AND COALESCE(to_jsonb(pc)->>'status', 'done') <> 'processing') as failed,
+                COUNT(*) FILTER (WHERE to_jsonb(pc)->>'status' = 'processing') as in_progress
+            FROM processed_calls pc
         """))
         stats = result.fetchone()
         
@@ -63,7 +103,8 @@ async def get_processing_stats(db: AsyncSession = Depends(get_db)):
             "stats": {
                 "total_calls": stats[0] if stats else 0,
                 "successful": stats[1] if stats else 0,
-                "failed": stats[2] if stats else 0
+                "failed": stats[2] if stats else 0,
+                "in_progress": stats[3] if stats else 0
             },
             "recent_calls": [
                 {
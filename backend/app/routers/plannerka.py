@@ -43,7 +43,7 @@ async def create_plannerka(data: PlannerkaCreate):
     Создать новую планёрку с транскрипцией
     """
     try:
-        from app.config.database import get_db_pool
+        from backend.app.config.database import get_db_pool
         import uuid
         
         db_pool = await get_db_pool()
@@ -96,7 +96,7 @@ async def analyze_plannerka(meeting_id: str):
     - Извлечение задач (кто, что, срок)
     """
     try:
-        from app.config.database import get_db_pool
+        from backend.app.config.database import get_db_pool
         
         # Получаем транскрипцию из БД
         db_pool = await get_db_pool()
@@ -220,7 +220,7 @@ async def list_plannerkas(limit: int = 20, offset: int = 0):
     Получить список планёрок
     """
     try:
-        from app.config.database import get_db_pool
+        from backend.app.config.database import get_db_pool
         
         db_pool = await get_db_pool()
         if not db_pool:
@@ -267,7 +267,7 @@ async def get_plannerka(meeting_id: str):
     Получить детали планёрки
     """
     try:
-        from app.config.database import get_db_pool
+        from backend.app.config.database import get_db_pool
         
         db_pool = await get_db_pool()
         if not db_pool:
@@ -312,7 +312,7 @@ async def delete_plannerka(meeting_id: str):
     Удалить планёрку
     """
     try:
-        from app.config.database import get_db_pool
+        from backend.app.config.database import get_db_pool
         
         db_pool = await get_db_pool()
         if not db_pool:
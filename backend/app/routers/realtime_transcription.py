@@ -1,80 +1,111 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from openai import AsyncOpenAI
-import os
+import asyncio
 import logging
 import json
 import base64
 
+from backend.app.config.http_clients import get_openai_client
+from backend.app.services.streaming_transcriber import SAMPLE_RATE, StreamingTranscriptionSession
+
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# Инициализация OpenAI клиента
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 @router.websocket("/ws/transcribe")
 async def websocket_transcribe(websocket: WebSocket):
     """
     WebSocket endpoint для транскрипции аудио в реальном времени.
-    Клиент отправляет аудио чанки, сервер возвращает транскрипцию через Whisper API.
+
+    Потоковый режим: {"type": "start", "sample_rate": 16000, "language": "ru"}, затем бинарные
+    кадры PCM16 моно, затем {"type": "stop"}. Сервер режет поток по паузам (VAD) и отвечает
+    {"type": "partial"|"final", "segment_id", "start", "end", "text"}, в конце - {"type": "done"}.
+
+    Старый режим: {"type": "audio", "audio": <base64 webm>} - один ответ "transcription" на чанк.
     """
     await websocket.accept()
     logger.info("🎤 WebSocket connection established for transcription")
-    
+
+    send_lock = asyncio.Lock()
+    session = None
+
+    async def send(payload):
+        # partial/final приходят из фоновых задач сессии - отправка по одной
+        async with send_lock:
+            await websocket.send_json(payload)
+
     try:
         while True:
-            # Получаем данные от клиента
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            
-            if message.get("type") == "audio":
+            # Получаем данные от клиента: бинарные кадры - аудио потока, текст - управляющие сообщения
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                break
+            if frame.get("bytes") is not None:
+                if session is None:
+                    session = StreamingTranscriptionSession(send)
+                await session.feed(frame["bytes"])
+                continue
+
+            message = json.loads(frame.get("text") or "{}")
+
+            if message.get("type") == "start":
+                if session is not None:
+                    await send(await session.finish())
+                sample_rate = int(message.get("sample_rate") or SAMPLE_RATE)
+                session = StreamingTranscriptionSession(send, language=message.get("language") or "ru", sample_rate=sample_rate)
+                await send({"type": "ready", "sample_rate": sample_rate})
+                logger.info(f"🎙️ Streaming transcription started ({sample_rate} Hz)")
+
+            elif message.get("type") == "stop":
+                if session is not None:
+                    done = await session.finish()
+                    session = None
+                    await send(done)
+                    logger.info(f"✅ Streaming transcription done: {done}")
+                else:
+                    await send({"type": "done"})
+
+            elif message.get("type") == "audio":
                 # Получаем base64 закодированное аудио
                 audio_base64 = message.get("audio")
-                
+
                 if not audio_base64:
-                    await websocket.send_json({
+                    await send({
                         "type": "error",
                         "message": "No audio data provided"
                     })
                     continue
-                
+
                 try:
-                    # Декодируем аудио из base64
+                    # Whisper принимает файл из памяти - без общего /tmp файла между сессиями
                     audio_data = base64.b64decode(audio_base64)
-                    
-                    # Сохраняем временно в файл (Whisper API требует файл)
-                    temp_file = "/tmp/temp_audio.webm"
-                    with open(temp_file, "wb") as f:
-                        f.write(audio_data)
-                    
-                    # Отправляем на Whisper API
+
                     logger.info("📤 Sending audio to Whisper API...")
-                    with open(temp_file, "rb") as audio_file:
-                        transcription = await client.audio.transcriptions.create(
-                            model="whisper-1",
-                            file=audio_file,
-                            language="ru",  # Русский язык
-                            response_format="text"
-                        )
-                    
+                    transcription = await get_openai_client().audio.transcriptions.create(
+                        model="whisper-1",
+                        file=("audio.webm", audio_data),
+                        language="ru",  # Русский язык
+                        response_format="text"
+                    )
+
                     # Отправляем транскрипцию обратно клиенту
-                    await websocket.send_json({
+                    await send({
                         "type": "transcription",
                         "text": transcription,
                         "is_final": True
                     })
                     logger.info(f"✅ Transcription: {transcription}")
-                    
+
                 except Exception as e:
                     logger.error(f"❌ Transcription error: {str(e)}")
-                    await websocket.send_json({
+                    await send({
                         "type": "error",
                         "message": f"Transcription failed: {str(e)}"
                     })
-            
+
             elif message.get("type") == "ping":
                 # Heartbeat
-                await websocket.send_json({"type": "pong"})
-                
+                await send({"type": "pong"})
+
     except WebSocketDisconnect:
         logger.info("🔌 WebSocket disconnected")
     except Exception as e:
@@ -86,3 +117,6 @@ async def websocket_transcribe(websocket: WebSocket):
             })
         except:
             pass
+    finally:
+        if session is not None:
+            await session.close()
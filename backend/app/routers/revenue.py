@@ -4,11 +4,12 @@ API для управления выручкой по месяцам
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
-import asyncpg
 import os
 import logging
 from datetime import datetime
 from uuid import uuid4
+from backend.app.config.database import acquire_db_connection, release_db_connection
+from backend.app.services.brain_answer_cache import brain_answer_cache
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["revenue"])
@@ -25,14 +26,12 @@ class UpdateRevenueRequest(BaseModel):
 
 
 async def get_db_connection():
-    """Получить прямое соединение с БД"""
-    db_url = os.environ.get('DATABASE_URL', '')
-    
-    if not db_url:
+    """Взять соединение из общего asyncpg пула (вернуть через release_db_connection)"""
+    if not os.environ.get('DATABASE_URL', ''):
         raise HTTPException(status_code=500, detail="Database not configured")
     
     try:
-        return await asyncpg.connect(db_url)
+        return await acquire_db_connection()
     except Exception as e:
         logger.error(f"Failed to connect to database: {e}")
         raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
@@ -109,7 +108,7 @@ async def get_monthly_revenue():
                 "total": len(revenues)
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error fetching monthly revenue: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -179,7 +178,7 @@ async def update_monthly_revenue(request: UpdateRevenueRequest):
                 "message": f"Создано: {created_count}, обновлено: {updated_count}"
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error updating monthly revenue: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -206,7 +205,7 @@ async def delete_monthly_revenue(month: str):
                 "message": f"Выручка за {month} удалена"
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except HTTPException:
         raise
     except Exception as e:
@@ -318,6 +317,8 @@ async def sync_revenue_to_transactions():
                     )
                     created_count += 1
             
+            if created_count or updated_count:
+                brain_answer_cache.invalidate("finance")
             return {
                 "success": True,
                 "created": created_count,
@@ -325,7 +326,7 @@ async def sync_revenue_to_transactions():
                 "message": f"Создано: {created_count}, обновлено: {updated_count} транзакций"
             }
         finally:
-            await conn.close()
+            await release_db_connection(conn)
     except Exception as e:
         logger.error(f"Error syncing revenue to transactions: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -14,6 +14,7 @@ from backend.app.models.task import Task, TaskStatus, TaskPriority
 from backend.app.schemas.task import TaskCreate, TaskUpdate, TaskResponse
 from backend.app.utils.auth_deps import get_current_user
 from backend.app.models.user import User
+from backend.app.services import dashboard_stats
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +53,7 @@ async def create_task(
         await db.commit()
         await db.refresh(new_task)
         
+        dashboard_stats.schedule_refresh()
         logger.info(f"Task created: {new_task.id} by user {current_user.id}")
         return new_task
         
@@ -158,6 +160,7 @@ async def update_task(
         await db.commit()
         await db.refresh(task)
         
+        dashboard_stats.schedule_refresh()
         logger.info(f"Task updated: {task_id} by user {current_user.id}")
         return task
         
@@ -187,6 +190,7 @@ async def delete_task(
         await db.delete(task)
         await db.commit()
         
+        dashboard_stats.schedule_refresh()
         logger.info(f"Task deleted: {task_id} by user {current_user.id}")
         return {"success": True, "message": "Task deleted successfully"}
         
@@ -426,6 +430,7 @@ async def generate_ai_tasks(
         for task in created_tasks:
             await db.refresh(task)
         
+        dashboard_stats.schedule_refresh()
         logger.info(f"AI generated {len(created_tasks)} tasks for user {current_user.id}")
         return {
             "success": True,
@@ -0,0 +1,149 @@
+"""
+In-memory address index for address_match_score lookups
+- Адреса разбираются (normalize_address + регулярки) один раз при добавлении
+- Поиск "улица X, дом N" идёт по индексу улиц, а не перебором всех адресов
+- Score совпадает с brain.address_match_score (0/50/100)
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from backend.app.services.brain import address_match_parts, score_address_parts
+
+AddressParts = Tuple[bool, str, Optional[str]]
+
+
+def _trigrams(s: str) -> Set[str]:
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class AddressIndex:
+    def __init__(self):
+        self._addr: Dict[Hashable, str] = {}
+        self._parts: Dict[Hashable, AddressParts] = {}
+        self._seq: Dict[Hashable, int] = {}
+        self._next_seq = 0
+        # очищенная улица -> номер дома (или None) -> ключи (только адреса, где улица есть)
+        self._by_street: Dict[str, Dict[Optional[str], Dict[Hashable, None]]] = {}
+        # триграмма -> улицы, которые её содержат
+        self._grams: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._parts)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._parts
+
+    def upsert(self, key: Hashable, address: Optional[str]) -> None:
+        address = address or ''
+        if self._addr.get(key) == address and key in self._parts:
+            return
+        self.remove(key, keep_seq=True)
+        parts = address_match_parts(address)
+        self._addr[key] = address
+        self._parts[key] = parts
+        if key not in self._seq:
+            self._seq[key] = self._next_seq
+            self._next_seq += 1
+        has_street, street, num = parts
+        if not has_street:
+            return
+        bucket = self._by_street.get(street)
+        if bucket is None:
+            bucket = self._by_street[street] = {}
+            for g in _trigrams(street):
+                self._grams.setdefault(g, set()).add(street)
+        bucket.setdefault(num, {})[key] = None
+
+    def remove(self, key: Hashable, keep_seq: bool = False) -> None:
+        parts = self._parts.pop(key, None)
+        self._addr.pop(key, None)
+        if not keep_seq:
+            self._seq.pop(key, None)
+        if not parts or not parts[0]:
+            return
+        street, num = parts[1], parts[2]
+        bucket = self._by_street.get(street)
+        if bucket is None:
+            return
+        keys = bucket.get(num)
+        if keys is not None:
+            keys.pop(key, None)
+            if not keys:
+                del bucket[num]
+        if not bucket:
+            del self._by_street[street]
+            for g in _trigrams(street):
+                streets = self._grams.get(g)
+                if streets is not None:
+                    streets.discard(street)
+                    if not streets:
+                        del self._grams[g]
+
+    def sync(self, items: Iterable[Tuple[Hashable, Optional[str]]]) -> None:
+        """Привести индекс к набору (key, address): изменённые обновить, исчезнувшие удалить"""
+        seen: Set[Hashable] = set()
+        for key, address in items:
+            seen.add(key)
+            self.upsert(key, address)
+        for key in [k for k in self._parts if k not in seen]:
+            self.remove(key)
+
+    def _matching_streets(self, query_street: str) -> Set[str]:
+        streets: Set[str] = set()
+        # Улицы индекса, которые являются подстрокой запроса (включая пустую)
+        n = len(query_street)
+        for i in range(n + 1):
+            for j in range(i, n + 1):
+                if query_street[i:j] in self._by_street:
+                    streets.add(query_street[i:j])
+        # Улицы индекса, которые содержат запрос
+        if n >= 3:
+            posting = sorted((self._grams.get(g, set()) for g in _trigrams(query_street)), key=len)
+            if posting and posting[0]:
+                candidates = set(posting[0])
+                for p in posting[1:]:
+                    candidates &= p
+                    if not candidates:
+                        break
+                streets.update(s for s in candidates if query_street in s)
+        else:
+            streets.update(s for s in self._by_street if query_street in s)
+        return streets
+
+    def match(self, query: Optional[str]) -> Dict[Hashable, int]:
+        """Все ключи с ненулевым score для запроса"""
+        if not query:
+            return {}
+        q = address_match_parts(query)
+        if not q[0]:
+            return {}
+        query_num = q[2]
+        out: Dict[Hashable, int] = {}
+        for street in self._matching_streets(q[1]):
+            bucket = self._by_street[street]
+            if query_num:
+                # Номер совпал -> 100, у адреса нет номера -> 50, другой номер -> 0
+                for key in bucket.get(query_num, ()):
+                    out[key] = 100
+                for key in bucket.get(None, ()):
+                    out[key] = 50
+            else:
+                for keys in bucket.values():
+                    for key in keys:
+                        out[key] = 50
+        return out
+
+    def search(self, query: Optional[str], limit: int = 3, min_score: int = 1) -> List[Tuple[Hashable, int]]:
+        """Top-k (key, score): по убыванию score, при равенстве - в порядке добавления"""
+        scored = [(k, s) for k, s in self.match(query).items() if s >= min_score]
+        scored.sort(key=lambda ks: (-ks[1], self._seq.get(ks[0], 0)))
+        return scored[:limit] if limit else scored
+
+    def score(self, query: Any, key: Hashable) -> int:
+        """Score одного ключа; query - строка или результат address_match_parts"""
+        target = self._parts.get(key)
+        if target is None or not query:
+            return 0
+        q = query if isinstance(query, tuple) else address_match_parts(query)
+        return score_address_parts(q, target)
@@ -3,10 +3,11 @@
 """
 import logging
 import os
-import httpx
 from datetime import datetime, timezone
 from typing import Dict, Any, List
 
+from backend.app.config.http_clients import http_clients
+
 logger = logging.getLogger(__name__)
 
 class AgentExecutor:
@@ -180,7 +181,7 @@ class AgentExecutor:
         sent_count = 0
         failed_count = 0
         
-        async with httpx.AsyncClient() as client:
+        async with http_clients.client('telegram') as client:
             for recipient in recipients_list:
                 try:
                     # Определяем chat_id
@@ -451,7 +452,6 @@ class AgentExecutor:
                     context = knowledge_result.get('context', '')
             
             # Отправляем запрос в OpenAI
-            import httpx
             openai_key = os.environ.get('OPENAI_API_KEY')
             
             if not openai_key:
@@ -465,7 +465,7 @@ class AgentExecutor:
                 {'role': 'user', 'content': query}
             ]
             
-            async with httpx.AsyncClient() as client:
+            async with http_clients.client('openai') as client:
                 response = await client.post(
                     'https://api.openai.com/v1/chat/completions',
                     headers={'Authorization': f'Bearer {openai_key}'},
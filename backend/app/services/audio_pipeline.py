@@ -0,0 +1,167 @@
+"""
+Аудио-конвейер моста LiveKit <-> OpenAI Realtime (server.py::_run_ai_agent_worker)
+- StreamingResampler: PCM16 -> моно + пересэмплирование на NumPy; состояние (хвост FIR-фильтра,
+  дробная фаза, последний отсчёт) переносится между кадрами - без щелчков на стыках 10-20 мс кадров
+- RealtimeInputPipeline: копит входные кадры до ~100 мс, конвертирует блок целиком и отдаёт
+  одно сообщение input_audio_buffer.append вместо 5-10 на каждые 10-20 мс кадры
+- PCMFramer: режет поток PCM (ответ TTS) на ровные кадры для AudioSource.capture_frame
+Заменяет audioop (удалён в Python 3.13)
+"""
+from __future__ import annotations
+
+import base64
+import json
+from typing import List, Optional
+
+import numpy as np
+
+# OpenAI Realtime: PCM16 24 кГц моно на вход и на выход; TTS response_format=pcm - тоже 24 кГц
+REALTIME_SAMPLE_RATE = 24000
+APPEND_MS = 100
+FRAME_MS = 20
+
+
+def _lowpass(cutoff: float, taps: int) -> np.ndarray:
+    """FIR ФНЧ (windowed sinc, окно Хэмминга); cutoff - доля частоты Найквиста входа"""
+    n = np.arange(taps) - (taps - 1) / 2
+    h = cutoff * np.sinc(cutoff * n) * np.hamming(taps)
+    return (h / h.sum()).astype(np.float32)
+
+
+class StreamingResampler:
+    """
+    Потоковое пересэмплирование PCM16 (interleaved) -> PCM16 моно out_rate.
+    При понижении частоты - ФНЧ перед прореживанием (без алиасинга), затем линейная интерполяция.
+    Один экземпляр на поток: process() вызывается для каждого кадра по порядку
+    """
+
+    def __init__(self, in_rate: int, out_rate: int, channels: int = 1, taps: int = 31):
+        self.in_rate = int(in_rate)
+        self.out_rate = int(out_rate)
+        self.channels = max(1, int(channels))
+        self.step = self.in_rate / self.out_rate
+        self._fir = _lowpass(0.9 * self.out_rate / self.in_rate, taps) if self.out_rate < self.in_rate else None
+        self._fir_tail = np.zeros(taps - 1, dtype=np.float32) if self._fir is not None else None
+        # Целый коэффициент (48k -> 24k, 48k -> 16k): фильтр считается только в выходных точках
+        self._decim = self.in_rate // self.out_rate if self._fir is not None and self.in_rate % self.out_rate == 0 else 0
+        self._skip = 0
+        # Последний входной отсчёт предыдущего кадра и позиция следующего выходного отсчёта
+        # относительно него (в отсчётах входа)
+        self._last = np.zeros(1, dtype=np.float32)
+        self._pos = 1.0
+
+    @property
+    def passthrough(self) -> bool:
+        return self.in_rate == self.out_rate and self.channels == 1
+
+    def matches(self, in_rate: int, channels: int) -> bool:
+        return self.in_rate == in_rate and self.channels == max(1, channels)
+
+    def process(self, pcm: bytes) -> bytes:
+        if self.passthrough:
+            return bytes(pcm)
+        x = np.frombuffer(pcm, dtype='<i2')
+        if self.channels > 1:
+            x = x[:len(x) - len(x) % self.channels].reshape(-1, self.channels).astype(np.float32)
+            x = x.sum(axis=1) * np.float32(1.0 / self.channels)
+        else:
+            x = x.astype(np.float32)
+        if not len(x):
+            return b''
+        if self.in_rate == self.out_rate:
+            return _to_pcm16(x)
+        if self._fir is not None:
+            padded = np.concatenate((self._fir_tail, x))
+            self._fir_tail = padded[-(len(self._fir) - 1):]
+            if self._decim:
+                # Окна фильтра только в позициях выходных отсчётов (фаза переносится между кадрами)
+                windows = np.lib.stride_tricks.sliding_window_view(padded, len(self._fir))[self._skip::self._decim]
+                self._skip += len(windows) * self._decim - (len(padded) - len(self._fir) + 1)
+                return _to_pcm16(windows @ self._fir)
+            x = np.convolve(padded, self._fir, mode='valid').astype(np.float32)
+
+        buf = np.concatenate((self._last, x))
+        last_idx = len(buf) - 1
+        # Выходные отсчёты в позициях pos, pos+step, ... строго меньше last_idx (нужен правый сосед)
+        n = int(np.ceil((last_idx - self._pos) / self.step)) if last_idx > self._pos else 0
+        if n > 0:
+            idx = self._pos + self.step * np.arange(n)
+            i0 = idx.astype(np.int64)
+            frac = (idx - i0).astype(np.float32)
+            out = buf[i0] + (buf[i0 + 1] - buf[i0]) * frac
+        else:
+            out = np.empty(0, dtype=np.float32)
+        self._pos = self._pos + n * self.step - last_idx
+        self._last = buf[-1:].copy()
+        return _to_pcm16(out)
+
+
+def _to_pcm16(x: np.ndarray) -> bytes:
+    return np.clip(np.rint(x), -32768, 32767).astype('<i2').tobytes()
+
+
+class PCMFramer:
+    """Режет поток PCM16 моно на кадры по frame_ms (остаток ждёт следующего куска)"""
+
+    def __init__(self, sample_rate: int = REALTIME_SAMPLE_RATE, frame_ms: int = FRAME_MS):
+        self.sample_rate = sample_rate
+        self.frame_bytes = sample_rate * frame_ms // 1000 * 2
+        self._buf = bytearray()
+
+    def feed(self, pcm: bytes) -> List[bytes]:
+        self._buf.extend(pcm)
+        n = len(self._buf) // self.frame_bytes * self.frame_bytes
+        frames = [bytes(self._buf[i:i + self.frame_bytes]) for i in range(0, n, self.frame_bytes)]
+        del self._buf[:n]
+        return frames
+
+    def flush(self) -> Optional[bytes]:
+        """Остаток, дополненный тишиной до целого кадра"""
+        if len(self._buf) < 2:
+            self._buf.clear()
+            return None
+        tail = bytes(self._buf[:len(self._buf) // 2 * 2]).ljust(self.frame_bytes, b'\x00')
+        self._buf.clear()
+        return tail
+
+
+class RealtimeInputPipeline:
+    """
+    PSTN -> OpenAI Realtime: копит входные кадры LiveKit (любая частота/каналы) до ~target_ms
+    и конвертирует блок целиком - NumPy работает на 100 мс за вызов, а не на 10-20 мс.
+    push() возвращает готовые сообщения input_audio_buffer.append
+    """
+
+    def __init__(self, out_rate: int = REALTIME_SAMPLE_RATE, target_ms: int = APPEND_MS):
+        self.out_rate = out_rate
+        self.target_ms = target_ms
+        self.resampler: Optional[StreamingResampler] = None
+        self._buf = bytearray()
+        self._block_bytes = 0
+
+    def push(self, pcm: bytes, sample_rate: int, channels: int) -> List[str]:
+        sample_rate = sample_rate or self.out_rate
+        channels = channels or 1
+        out = []
+        if self.resampler is None or not self.resampler.matches(sample_rate, channels):
+            # Формат кадров сменился: дослать накопленное старым ресэмплером
+            out.extend(self.flush())
+            self.resampler = StreamingResampler(sample_rate, self.out_rate, channels)
+            self._block_bytes = sample_rate * self.target_ms // 1000 * 2 * max(1, channels)
+        self._buf.extend(pcm)
+        if len(self._buf) >= self._block_bytes:
+            out.extend(self.flush())
+        return out
+
+    def flush(self) -> List[str]:
+        if not self._buf or self.resampler is None:
+            self._buf.clear()
+            return []
+        converted = self.resampler.process(bytes(self._buf))
+        self._buf.clear()
+        return [realtime_append_message(converted)] if converted else []
+
+
+def realtime_append_message(pcm: bytes) -> str:
+    """input_audio_buffer.append для OpenAI Realtime"""
+    return json.dumps({"type": "input_audio_buffer.append", "audio": base64.b64encode(pcm).decode('ascii')})
@@ -6,38 +6,117 @@ from __future__ import annotations
 import asyncio
 import logging
 import re
-from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
-from urllib.parse import urlparse
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlencode, urlparse
 from uuid import uuid4
 
 import httpx
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.app.config.settings import settings
-from backend.app.models.house import House
+from backend.app.services.bitrix_deal_mirror import BitrixDealMirror
+from backend.app.services.address_index import AddressIndex
+from backend.app.services import house_sync
+from backend.app.services.swr_cache import SWRCache
+from backend.app.services.bitrix_rate_limiter import bitrix_rate_limiter, is_rate_limited
+from backend.app.config.http_clients import http_clients
 
 logger = logging.getLogger(__name__)
 
 
-class TTLCache:
-    def __init__(self, ttl_seconds: int):
-        self.ttl = ttl_seconds
-        self.store: Dict[str, Tuple[float, Any]] = {}
+def _flatten_params(params: Dict[str, Any], prefix: str = '') -> List[Tuple[str, Any]]:
+    """{'filter': {'ID': 5}} -> [('filter[ID]', 5)] (как http_build_query в PHP)"""
+    out: List[Tuple[str, Any]] = []
+    for k, v in params.items():
+        key = f"{prefix}[{k}]" if prefix else str(k)
+        if isinstance(v, dict):
+            out.extend(_flatten_params(v, key))
+        elif isinstance(v, (list, tuple)):
+            for i, item in enumerate(v):
+                if isinstance(item, dict):
+                    out.extend(_flatten_params(item, f"{key}[{i}]"))
+                else:
+                    out.append((f"{key}[]", item))
+        else:
+            out.append((key, v))
+    return out
 
-    def get(self, key: str) -> Any:
-        rec = self.store.get(key)
-        if not rec:
-            return None
-        ts, val = rec
-        if (datetime.now(timezone.utc).timestamp() - ts) > self.ttl:
-            self.store.pop(key, None)
-            return None
-        return val
 
-    def set(self, key: str, val: Any):
-        self.store[key] = (datetime.now(timezone.utc).timestamp(), val)
+class BitrixBatcher:
+    """
+    Собирает одиночные запросы (crm.company.get, user.get, crm.deal.userfield.list)
+    от конкурентных корутин в вызовы batch по 50 команд и раздаёт результаты обратно.
+    Одинаковые команды в одном окне отправляются один раз
+    """
+    MAX_COMMANDS = 50
+
+    def __init__(self, service: "Bitrix24Service", window: float = 0.01):
+        self.service = service
+        self.window = window
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # Ссылки на отправки полных пачек: иначе задачу может собрать GC посреди запроса
+        self._sending: Set[asyncio.Task] = set()
+        self.stats = {'commands': 0, 'deduplicated': 0, 'batches': 0, 'errors': 0}
+
+    async def call(self, method: str, params: Dict[str, Any]) -> Any:
+        """Результат команды (поле result) или None при ошибке"""
+        cmd = f"{method}?{urlencode(_flatten_params(params))}"
+        fut = self._pending.get(cmd)
+        if fut is not None:
+            self.stats['deduplicated'] += 1
+            return await asyncio.shield(fut)
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending[cmd] = fut
+        self.stats['commands'] += 1
+        if len(self._pending) >= self.MAX_COMMANDS:
+            task = loop.create_task(self._send(self._take()))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+        elif self._flush_task is None:
+            self._flush_task = loop.create_task(self._delayed_flush())
+        return await asyncio.shield(fut)
+
+    def _take(self) -> List[Tuple[str, asyncio.Future]]:
+        items: List[Tuple[str, asyncio.Future]] = []
+        for cmd in list(self._pending.keys())[:self.MAX_COMMANDS]:
+            items.append((cmd, self._pending.pop(cmd)))
+        return items
+
+    async def _delayed_flush(self) -> None:
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            self._flush_task = None
+        chunks = []
+        while self._pending:
+            chunks.append(self._take())
+        if chunks:
+            await asyncio.gather(*[self._send(c) for c in chunks])
+
+    async def _send(self, items: List[Tuple[str, asyncio.Future]]) -> None:
+        if not items:
+            return
+        cmd = {f"c{i}": c for i, (c, _) in enumerate(items)}
+        results: Dict[str, Any] = {}
+        try:
+            async with http_clients.client('bitrix') as client:
+                data = await self.service._make_batch_request(client, cmd)
+            self.stats['batches'] += 1
+            # PHP отдаёт пустой массив вместо пустого объекта
+            results = data.get('result') if isinstance(data.get('result'), dict) else {}
+            errors = data.get('errors') if isinstance(data.get('errors'), dict) else {}
+            if errors:
+                self.stats['errors'] += len(errors)
+                logger.debug(f"Bitrix batch errors: {errors}")
+        except Exception as e:
+            self.stats['errors'] += len(items)
+            logger.warning(f"Bitrix batch of {len(items)} commands failed: {e}")
+        for i, (_, fut) in enumerate(items):
+            if not fut.done():
+                fut.set_result(results.get(f"c{i}"))
 
 
 def _portal_base(webhook_url: str) -> str:
@@ -49,21 +128,53 @@ def _portal_base(webhook_url: str) -> str:
 
 
 class Bitrix24Service:
+    # Поля сделки, которые нужны для DTO домов и зеркала
+    DEAL_SELECT_FIELDS = [
+        'ID','TITLE','CATEGORY_ID','STAGE_ID','COMPANY_ID','COMPANY_TITLE','ASSIGNED_BY_ID','ASSIGNED_BY_NAME','DATE_MODIFY',
+        'UF_CRM_1669561599956','UF_CRM_1669704529022','UF_CRM_1669705507390','UF_CRM_1669704631166','UF_CRM_1669706387893',
+        'UF_CRM_1741592774017','UF_CRM_1741592855565','UF_CRM_1741592892232','UF_CRM_1741592945060',
+        'UF_CRM_1741593004888','UF_CRM_1741593047994','UF_CRM_1741593067418','UF_CRM_1741593115407',
+        'UF_CRM_1741593156926','UF_CRM_1741593210242','UF_CRM_1741593231558','UF_CRM_1741593285121',
+        'UF_CRM_1741593340713','UF_CRM_1741593387667','UF_CRM_1741593408621','UF_CRM_1741593452062',
+    ]
+    # Enum-поля типов уборок (см. _build_cleaning_dates)
+    CLEANING_TYPE_FIELDS = [
+        'UF_CRM_1741593047994','UF_CRM_1741593115407','UF_CRM_1741593210242',
+        'UF_CRM_1741593285121','UF_CRM_1741593387667','UF_CRM_1741593452062',
+    ]
+    # Поля дат уборок (пары с CLEANING_TYPE_FIELDS в _build_cleaning_dates)
+    CLEANING_DATE_FIELDS = [
+        'UF_CRM_1741593004888','UF_CRM_1741593067418','UF_CRM_1741593156926',
+        'UF_CRM_1741593231558','UF_CRM_1741593340713','UF_CRM_1741593408621',
+    ]
+
     def __init__(self):
         self.webhook_url = settings.BITRIX24_WEBHOOK_URL.rstrip('/') + '/'
         self.timeout = httpx.Timeout(40.0)
         self.max_retries = 3
-        self.company_cache = TTLCache(int(getattr(settings, 'BITRIX_COMPANY_CACHE_TTL', 1800)))
-        self.user_cache = TTLCache(int(getattr(settings, 'BITRIX_USER_CACHE_TTL', 600)))
-        self.enum_cache = TTLCache(int(getattr(settings, 'BITRIX_ENUM_CACHE_TTL', 3600)))
-        self.deals_cache = TTLCache(int(getattr(settings, 'DEALS_CACHE_TTL', 120)))
+        self.company_cache = SWRCache('bitrix.company', int(getattr(settings, 'BITRIX_COMPANY_CACHE_TTL', 1800)), max_entries=5000)
+        self.user_cache = SWRCache('bitrix.user', int(getattr(settings, 'BITRIX_USER_CACHE_TTL', 600)), max_entries=2000)
+        self.enum_cache = SWRCache('bitrix.enum', int(getattr(settings, 'BITRIX_ENUM_CACHE_TTL', 3600)), max_entries=256)
+        # Полные отфильтрованные списки домов: после ttl ещё DEALS_CACHE_STALE секунд отдаются, пока идёт обновление
+        self.deals_cache = SWRCache(
+            'bitrix.deals',
+            int(getattr(settings, 'DEALS_CACHE_TTL', 120)),
+            stale_seconds=int(getattr(settings, 'DEALS_CACHE_STALE', 600)),
+            max_entries=int(getattr(settings, 'DEALS_CACHE_MAX_ENTRIES', 64)),
+            max_bytes=int(getattr(settings, 'DEALS_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+        )
         self.portal_base = _portal_base(self.webhook_url)
         
-        # Rate limiting: максимум 2 одновременных запросов
-        self._semaphore = asyncio.Semaphore(2)
-        # Минимальная задержка между запросами (секунды)
-        self._request_delay = 0.5
-        self._last_request_time = 0.0
+        # Rate limiting: общий для всех вызовов портала token bucket (см. bitrix_rate_limiter.py)
+        self.rate_limiter = bitrix_rate_limiter
+        
+        # Локальное зеркало сделок в Postgres (см. bitrix_deal_mirror.py)
+        self.mirror = BitrixDealMirror(self)
+        # Склейка одиночных lookup-запросов в batch
+        self._batcher = BitrixBatcher(self)
+        # Индекс адресов сделок (ключ - ID сделки) для поиска по адресу без перебора
+        self.address_index = AddressIndex()
+
     def _normalize_address(self, s: Optional[str]) -> Optional[str]:
         if not s:
             return s
@@ -231,81 +342,108 @@ class Bitrix24Service:
         return "не указана"
 
 
+    async def _request(self, client: httpx.AsyncClient, http_method: str, method: str, **kwargs) -> httpx.Response:
+        """
+        Любой HTTP-вызов вебхука через общий rate limiter (bitrix_rate_limiter).
+        503/429/QUERY_LIMIT_EXCEEDED замедляют limiter и повторяются; прочие ответы отдаются как есть
+        """
+        url = method if method.startswith('http') else f"{self.webhook_url}{method}"
+        resp = None
+        for attempt in range(1, self.max_retries + 1):
+            async with self.rate_limiter.slot():
+                resp = await client.request(http_method, url, timeout=self.timeout, **kwargs)
+            if not is_rate_limited(resp):
+                self.rate_limiter.on_success()
+                return resp
+            self.rate_limiter.on_throttled()
+            logger.warning(f"Bitrix24 rate limit ({resp.status_code}) for {url.rsplit('/', 1)[-1]} (attempt {attempt}/{self.max_retries})")
+        return resp
+
+    async def _make_batch_request(self, client: httpx.AsyncClient, cmd: Dict[str, str]) -> Dict[str, Any]:
+        """Вызов batch (до 50 команд) через тот же rate limiter, что и _make_request"""
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                resp = await self._request(client, 'POST', 'batch', json={'halt': 0, 'cmd': cmd})
+                if resp.status_code == 200:
+                    j = resp.json().get('result') or {}
+                    return {
+                        'ok': True,
+                        'result': j.get('result') or {},
+                        'errors': j.get('result_error') or {},
+                    }
+                if is_rate_limited(resp):
+                    break
+            except Exception as e:
+                logger.warning(f"Bitrix batch attempt {attempt} error: {e}")
+            if attempt < self.max_retries:
+                await asyncio.sleep(min(0.5 * attempt, 2.0))
+        logger.error(f"Bitrix batch failed after {self.max_retries} attempts")
+        return {'ok': False, 'result': {}, 'errors': {}}
+
+    async def _prefetch_lookups(self, client: httpx.AsyncClient, deals: List[Dict[str, Any]], companies: bool = True) -> None:
+        """
+        Параллельно прогревает кеши компаний, пользователей и enum-карт для набора сделок.
+        Конкурентные lookup'ы склеиваются BitrixBatcher в batch-вызовы, дальнейшая
+        последовательная сборка DTO идёт уже по кешам
+        """
+        company_ids = {str(d.get('COMPANY_ID')) for d in deals if d.get('COMPANY_ID')} if companies else set()
+        user_ids = {str(d.get('ASSIGNED_BY_ID')) for d in deals if d.get('ASSIGNED_BY_ID')}
+        await asyncio.gather(
+            *[self._company_title(client, cid) for cid in company_ids],
+            *[self._get_user_info(client, uid) for uid in user_ids],
+            *[self._get_enum_map(client, f) for f in self.CLEANING_TYPE_FIELDS],
+            return_exceptions=True,
+        )
+
     async def _make_request(self, client: httpx.AsyncClient, method: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-        """Выполнить запрос к Bitrix24 API с rate limiting и обработкой 503 ошибок"""
-        url = f"{self.webhook_url}{method}"
+        """Выполнить запрос к Bitrix24 API (rate limiting и 503 - в _request)"""
         select_fields = payload.get('select') or []
+        query = []
+        if 'filter' in payload and isinstance(payload['filter'], dict):
+            for k, v in payload['filter'].items():
+                if isinstance(v, (list, tuple)):
+                    query.extend((f"filter[{k}][]", x) for x in v)
+                else:
+                    query.append((f"filter[{k}]", v))
+        if 'order' in payload and isinstance(payload['order'], dict):
+            for k, v in payload['order'].items():
+                query.append((f"order[{k}]", v))
+        query.append(('start', payload.get('start', 0)))
+        if 'limit' in payload:
+            query.append(('limit', payload['limit']))
+        for f in select_fields:
+            query.append(("select[]", f))
         
-        # Используем семафор для ограничения одновременных запросов
-        async with self._semaphore:
-            # Добавляем задержку между запросами
-            current_time = asyncio.get_event_loop().time()
-            time_since_last = current_time - self._last_request_time
-            if time_since_last < self._request_delay:
-                await asyncio.sleep(self._request_delay - time_since_last)
-            self._last_request_time = asyncio.get_event_loop().time()
-            
-            for attempt in range(1, self.max_retries + 1):
-                try:
-                    query = []
-                    if 'filter' in payload and isinstance(payload['filter'], dict):
-                        for k, v in payload['filter'].items():
-                            query.append((f"filter[{k}]", v))
-                    if 'order' in payload and isinstance(payload['order'], dict):
-                        for k, v in payload['order'].items():
-                            query.append((f"order[{k}]", v))
-                    query.append(('start', payload.get('start', 0)))
-                    if 'limit' in payload:
-                        query.append(('limit', payload['limit']))
-                    for f in select_fields:
-                        query.append(("select[]", f))
-                    
-                    resp = await client.get(url, params=query, timeout=self.timeout)
-                    
-                    # Обработка 503 ошибок (rate limiting)
-                    if resp.status_code == 503:
-                        wait_time = min(2.0 ** attempt, 10.0)  # Exponential backoff: 2, 4, 8 секунд
-                        logger.warning(f"Bitrix24 rate limit (503) for {method}, waiting {wait_time}s (attempt {attempt}/{self.max_retries})")
-                        await asyncio.sleep(wait_time)
-                        continue
-                    
-                    if resp.status_code == 200:
-                        j = resp.json()
-                        return {
-                            'ok': True,
-                            'result': j.get('result') or [],
-                            'next': j.get('next'),
-                            'total': j.get('total'),
-                        }
-                    
-                    # Для других ошибок пробуем POST
-                    if resp.status_code != 200:
-                        resp2 = await client.post(url, json=payload, timeout=self.timeout)
-                        
-                        if resp2.status_code == 503:
-                            wait_time = min(2.0 ** attempt, 10.0)
-                            logger.warning(f"Bitrix24 rate limit (503) for {method} POST, waiting {wait_time}s")
-                            await asyncio.sleep(wait_time)
-                            continue
-                        
-                        if resp2.status_code == 200:
-                            j = resp2.json()
-                            return {
-                                'ok': True,
-                                'result': j.get('result') or [],
-                                'next': j.get('next'),
-                                'total': j.get('total'),
-                            }
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                resp = await self._request(client, 'GET', method, params=query)
                 
-                except Exception as e:
-                    logger.warning(f"Bitrix {method} attempt {attempt} error: {e}")
+                # Для других ошибок пробуем POST
+                if resp.status_code != 200 and not is_rate_limited(resp):
+                    resp = await self._request(client, 'POST', method, json=payload)
                 
-                # Задержка перед следующей попыткой
-                if attempt < self.max_retries:
-                    await asyncio.sleep(min(0.5 * attempt, 2.0))
+                if resp.status_code == 200:
+                    j = resp.json()
+                    return {
+                        'ok': True,
+                        'result': j.get('result') or [],
+                        'next': j.get('next'),
+                        'total': j.get('total'),
+                    }
+                
+                # Лимит не отпустил и после повторов в _request
+                if is_rate_limited(resp):
+                    break
+            
+            except Exception as e:
+                logger.warning(f"Bitrix {method} attempt {attempt} error: {e}")
             
-            logger.error(f"Bitrix {method} failed after {self.max_retries} attempts")
-            return {'ok': False, 'result': [], 'next': None, 'total': None}
+            # Задержка перед следующей попыткой
+            if attempt < self.max_retries:
+                await asyncio.sleep(min(0.5 * attempt, 2.0))
+        
+        logger.error(f"Bitrix {method} failed after {self.max_retries} attempts")
+        return {'ok': False, 'result': [], 'next': None, 'total': None}
 
     async def _company_title(self, client: httpx.AsyncClient, company_id: Any) -> Optional[str]:
         """Получить название компании по ID с кэшированием"""
@@ -328,10 +466,10 @@ class Bitrix24Service:
         if cached is not None:
             return cached
         
-        data = await self._make_request(client, 'crm.company.get', {'id': company_id})
+        data = await self._batcher.call('crm.company.get', {'id': company_id})
         title = None
-        if data.get('ok') and isinstance(data.get('result'), dict):
-            title = data['result'].get('TITLE')
+        if isinstance(data, dict):
+            title = data.get('TITLE')
         self.company_cache.set(key, title)
         return title
 
@@ -344,24 +482,32 @@ class Bitrix24Service:
             url = f"{self.webhook_url}crm.deal.userfield.list"
             start = 0
             found = None
-            for _ in range(0, 10):
-                resp = await client.get(url, params={'start': start, 'filter[FIELD_NAME]': field_code}, timeout=self.timeout)
-                if resp.status_code != 200:
+            # Первая страница по FIELD_NAME - через batch вместе с остальными lookup'ами
+            arr = await self._batcher.call('crm.deal.userfield.list', {'filter': {'FIELD_NAME': field_code}})
+            for uf in (arr if isinstance(arr, list) else []):
+                if str(uf.get('FIELD_NAME')) == field_code:
+                    found = uf
                     break
-                j = resp.json()
-                arr = j.get('result') or []
-                for uf in arr:
-                    if str(uf.get('FIELD_NAME')) == field_code:
-                        found = uf
+            # Фоллбек: постраничный поиск поля
+            if not found:
+                for _ in range(0, 10):
+                    resp = await self._request(client, 'GET', url, params={'start': start, 'filter[FIELD_NAME]': field_code})
+                    if resp.status_code != 200:
                         break
-                if found:
-                    break
-                nxt = j.get('next')
-                if nxt is None:
-                    break
-                start = nxt
+                    j = resp.json()
+                    arr = j.get('result') or []
+                    for uf in arr:
+                        if str(uf.get('FIELD_NAME')) == field_code:
+                            found = uf
+                            break
+                    if found:
+                        break
+                    nxt = j.get('next')
+                    if nxt is None:
+                        break
+                    start = nxt
             if not found:
-                resp2 = await client.get(url, timeout=self.timeout)
+                resp2 = await self._request(client, 'GET', url)
                 if resp2.status_code == 200:
                     j2 = resp2.json()
                     for uf in (j2.get('result') or []):
@@ -503,9 +649,8 @@ class Bitrix24Service:
             return cached
         
         try:
-            data = await self._make_request(client, 'user.get', {'filter': {'ID': str(user_id)}})
-            arr = data.get('result') or []
-            if not arr:
+            arr = await self._batcher.call('user.get', {'filter': {'ID': str(user_id)}})
+            if not arr or not isinstance(arr, list):
                 return None
             u = arr[0]
             name = (u.get('NAME') or '').strip()
@@ -552,7 +697,7 @@ class Bitrix24Service:
 
     async def get_brigade_options(self) -> List[Dict[str, str]]:
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_clients.client('bitrix') as client:
                 payload = {'select': ['ASSIGNED_BY_ID'], 'filter': {'CATEGORY_ID': '34'}, 'order': {'ID': 'DESC'}, 'start': 0, 'limit': 1000}
                 data = await self._make_request(client, 'crm.deal.list', payload)
                 
@@ -565,9 +710,10 @@ class Bitrix24Service:
                 
                 # Получаем информацию о каждом пользователе
                 opts: Dict[str, str] = {}
-                for uid in user_ids:
-                    user_info = await self._get_user_info(client, uid)
-                    if user_info:
+                uids = list(user_ids)
+                infos = await asyncio.gather(*[self._get_user_info(client, uid) for uid in uids], return_exceptions=True)
+                for uid, user_info in zip(uids, infos):
+                    if user_info and isinstance(user_info, dict):
                         full_name = user_info.get('full_name', '').strip()
                         if full_name and 'бригад' in full_name.lower():
                             opts[uid] = full_name
@@ -668,6 +814,112 @@ class Bitrix24Service:
         except Exception:
             return None
 
+    def _deal_dates(self, deal: Dict[str, Any]) -> List[str]:
+        """Даты уборок сделки (YYYY-MM-DD) из сырых полей - как в _collect_month, без enum'ов"""
+        out: List[str] = []
+        for code in self.CLEANING_DATE_FIELDS:
+            val = deal.get(code)
+            if not val:
+                continue
+            parts = val if isinstance(val, list) else [p.strip() for p in str(val).replace(',', ';').split(';') if p.strip()]
+            for p in parts:
+                d = self._normalize_date(p)
+                if d:
+                    out.append(d)
+        return out
+
+    async def _brigade_user_ids(self, brigade: str) -> Optional[List[str]]:
+        """ASSIGNED_BY_ID пользователей-бригад под фильтр brigade; None - сузить выборку на стороне Bitrix нельзя"""
+        val = brigade.strip().lower()
+        if val.startswith('id:'):
+            return [val.split(':', 1)[1]]
+        brigades = self.enum_cache.get('brigades:users')
+        if brigades is None:
+            brigades = await self.get_all_brigades()
+            if brigades:
+                self.enum_cache.set('brigades:users', brigades)
+        if not brigades:
+            return None
+        if val.isdigit():
+            ids = [str(b['id']) for b in brigades if self._parse_brigade_number(b.get('name')) == val]
+        else:
+            ids = [str(b['id']) for b in brigades if val in (b.get('name') or '').lower()]
+        return ids or None
+
+    async def _plan_deal_filters(
+        self,
+        brigade: Optional[str],
+        cleaning_date: Optional[str],
+        date_from: Optional[str],
+        date_to: Optional[str],
+    ) -> Tuple[List[Dict[str, Any]], Optional[List[str]]]:
+        """
+        Переводит фильтры list_houses в filter[...] для crm.deal.list.
+        Возвращает (фильтры, ID ответственных): несколько фильтров - объединение выборок
+        (по одному на поле дат уборки). Выборка на стороне Bitrix - надмножество ответа,
+        окончательная проверка остаётся в _match
+        """
+        base: Dict[str, Any] = {'CATEGORY_ID': '34'}
+        assigned_ids = None
+        if brigade and settings.BITRIX_FILTER_PUSHDOWN:
+            assigned_ids = await self._brigade_user_ids(brigade)
+            if assigned_ids:
+                base['ASSIGNED_BY_ID'] = assigned_ids
+        fr, to = (cleaning_date, cleaning_date) if cleaning_date else (date_from, date_to)
+        if not (fr or to) or not settings.BITRIX_FILTER_PUSHDOWN:
+            return [base], assigned_ids
+        filters = []
+        for code in self.CLEANING_DATE_FIELDS:
+            flt = dict(base)
+            if fr:
+                flt[f'>={code}'] = fr
+            if to:
+                # Поля с временем (2025-10-03T03:00:00+03:00): верхняя граница - начало следующего дня
+                try:
+                    flt[f'<{code}'] = (datetime.fromisoformat(to) + timedelta(days=1)).date().isoformat()
+                except ValueError:
+                    flt[f'<={code}'] = to
+            filters.append(flt)
+        return filters, assigned_ids
+
+    async def _iter_deal_pages(self, client: httpx.AsyncClient, filters: List[Dict[str, Any]]) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Страницы сделок (ID DESC) под план фильтров. Один фильтр - постранично, чтобы вызывающий
+        мог остановиться раньше; несколько - выборки целиком, объединённые по ID
+        """
+        async def _fetch(flt: Dict[str, Any]) -> AsyncIterator[List[Dict[str, Any]]]:
+            start_param = 0
+            while True:
+                payload = {'start': start_param, 'select': self.DEAL_SELECT_FIELDS, 'filter': flt, 'order': {'ID': 'DESC'}}
+                data = await self._make_request(client, 'crm.deal.list', payload)
+                if not data.get('ok'):
+                    # Неполный список не должен попасть в кеш как полный
+                    raise RuntimeError(f"crm.deal.list failed at start={start_param}")
+                deals = data.get('result') or []
+                if not deals:
+                    return
+                yield deals
+                next_val = data.get('next')
+                if next_val is None:
+                    return
+                start_param = next_val
+
+        if len(filters) == 1:
+            async for deals in _fetch(filters[0]):
+                yield deals
+            return
+
+        async def _collect(flt: Dict[str, Any]) -> List[Dict[str, Any]]:
+            return [d async for deals in _fetch(flt) for d in deals]
+
+        merged: Dict[str, Dict[str, Any]] = {}
+        for deals in await asyncio.gather(*[_collect(f) for f in filters]):
+            for d in deals:
+                merged.setdefault(str(d.get('ID')), d)
+        ordered = sorted(merged.values(), key=lambda d: self._safe_int(d.get('ID')) or 0, reverse=True)
+        for i in range(0, len(ordered), 50):
+            yield ordered[i:i + 50]
+
     async def list_houses(
         self,
         *,
@@ -680,26 +932,18 @@ class Bitrix24Service:
         date_to: Optional[str] = None,
         page: int = 1,
         limit: int = 3,
+        with_total: bool = False,
     ) -> Dict[str, Any]:
-        cache_key = f"deals:{brigade}:{status}:{management_company}:{cleaning_date}:{date_from}:{date_to}"
-        cached = self.deals_cache.get(cache_key)
-        if cached is not None:
-            items: List[Dict[str, Any]] = cached
-            total = len(items)
-            start = (page - 1) * limit
-            end = start + limit
-            return {'houses': items[start:end], 'total': total, 'page': page, 'limit': limit, 'pages': (total + limit - 1) // limit}
-
-        select_fields = [
-            'ID','TITLE','CATEGORY_ID','STAGE_ID','COMPANY_ID','COMPANY_TITLE','ASSIGNED_BY_ID','ASSIGNED_BY_NAME',
-            'UF_CRM_1669561599956','UF_CRM_1669704529022','UF_CRM_1669705507390','UF_CRM_1669704631166','UF_CRM_1669706387893',
-            'UF_CRM_1741592774017','UF_CRM_1741592855565','UF_CRM_1741592892232','UF_CRM_1741592945060',
-            'UF_CRM_1741593004888','UF_CRM_1741593047994','UF_CRM_1741593067418','UF_CRM_1741593115407',
-            'UF_CRM_1741593156926','UF_CRM_1741593210242','UF_CRM_1741593231558','UF_CRM_1741593285121',
-            'UF_CRM_1741593340713','UF_CRM_1741593387667','UF_CRM_1741593408621','UF_CRM_1741593452062',
-        ]
-
-        all_items: List[Dict[str, Any]] = []
+        """
+        Дома (сделки категории 34) с фильтрами и пагинацией.
+        Бригада и даты уборок сужают выборку на стороне Bitrix, DTO строятся только для сделок,
+        прошедших дешёвую проверку сырых полей. Без with_total (и без поиска по адресу) обход
+        останавливается, как только набрано page*limit подходящих домов: тогда total - нижняя
+        граница, total_exact=False, а pages = page + 1, если дальше есть ещё
+        """
+        cache_key = f"deals:{brigade}:{status}:{management_company}:{address}:{cleaning_date}:{date_from}:{date_to}"
+        start = (page - 1) * limit
+        end = start + limit
 
         # Нормализация адреса (локальная)
         def _normalize_addr_local(s: Optional[str]) -> str:
@@ -712,54 +956,17 @@ class Bitrix24Service:
             return ss
 
         norm_addr = _normalize_addr_local(address) if address else None
-        
-        # Импортируем функцию умного сравнения адресов
-        from backend.app.services.brain import address_match_score
 
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                start_param = 0
-                while True:
-                    payload = {'start': start_param, 'select': select_fields, 'filter': {'CATEGORY_ID': '34'}, 'order': {'ID': 'DESC'}}
-                    data = await self._make_request(client, 'crm.deal.list', payload)
-                    if not data.get('ok'):
-                        break
-                    deals = data.get('result') or []
-                    if not deals:
-                        break
+        # Импортируем функцию умного сравнения адресов
+        from backend.app.services.brain import address_match_parts, score_address_parts
 
-                    # Обрабатываем сделки последовательно (с rate limiting внутри)
-                    for d in deals:
-                        try:
-                            # Быстрая проверка адреса до дорогих запросов
-                            if address:
-                                raw_addr = (d.get('UF_CRM_1669561599956') or d.get('TITLE') or '')
-                                # Используем умное сравнение адресов - снижаем порог до 70 для более гибкого поиска
-                                match_score = address_match_score(address, raw_addr)
-                                if match_score < 70:  # Было 100, стало 70
-                                    continue
-                            # Только при потенциальном совпадении грузим компанию и строим DTO
-                            company_title = await self._company_title(client, d.get('COMPANY_ID'))
-                            item = await self._deal_to_house_dto(client, d, company_title)
-                            # Добавляем score для сортировки
-                            if address:
-                                item['_match_score'] = address_match_score(address, item.get('address') or item.get('title') or '')
-                            all_items.append(item)
-                            # При поиске по адресу продолжаем искать во всех страницах
-                            # Убираем раннее прерывание, чтобы найти все совпадения
-                        except Exception as e:
-                            logger.warning(f"deal parse skip: {e}")
-
-                    # Продолжаем поиск по всем страницам при поиске по адресу
-                    # чтобы найти все совпадения, не ограничиваясь первой страницей
+        # Запрос разбираем один раз, адреса сделок - через self.address_index
+        query_parts = address_match_parts(address) if address else None
 
-                    next_val = data.get('next')
-                    if next_val is None:
-                        break
-                    start_param = next_val
-        except Exception as e:
-            logger.error(f"Bitrix list error: {e}")
-            all_items = []
+        def _raw_score(d: Dict[str, Any]) -> int:
+            deal_key = str(d.get('ID'))
+            self.address_index.upsert(deal_key, d.get('UF_CRM_1669561599956') or d.get('TITLE') or '')
+            return self.address_index.score(query_parts, deal_key)
 
         # Server filters
 
@@ -773,7 +980,7 @@ class Bitrix24Service:
             # Address match with smart scoring - снижаем порог до 70 для гибкости
             if norm_addr:
                 target = item.get('address') or item.get('title') or ''
-                match_score = address_match_score(address, target)
+                match_score = score_address_parts(query_parts, address_match_parts(target)) if target else 0
                 if match_score < 70:  # Было 100, стало 70
                     return False
             def has_date(d: str) -> bool:
@@ -803,168 +1010,331 @@ class Bitrix24Service:
                 return False
             return True
 
-        filtered = [x for x in all_items if _match(x)]
-        
-        # Сортировка по match_score (если есть адрес)
-        if address:
-            filtered.sort(key=lambda x: x.get('_match_score', 0), reverse=True)
-        
+        def _raw_match(d: Dict[str, Any], assigned_ids: Optional[List[str]]) -> bool:
+            """Проверка по сырым полям сделки - до user.get/company.get и сборки DTO"""
+            if assigned_ids is not None and str(d.get('ASSIGNED_BY_ID')) not in assigned_ids:
+                return False
+            if status and str(status).lower() not in str(d.get('STAGE_ID') or '').lower():
+                return False
+            if cleaning_date or date_from or date_to:
+                dates = self._deal_dates(d)
+                if cleaning_date and cleaning_date not in dates:
+                    return False
+                if (date_from or date_to) and not any(
+                    (not date_from or dd >= date_from) and (not date_to or dd <= date_to) for dd in dates
+                ):
+                    return False
+            if address and _raw_score(d) < 70:
+                return False
+            return True
+
+        async def _consume(client: httpx.AsyncClient, d: Dict[str, Any], company_title: Optional[str], resolve_company: bool, out: List[Dict[str, Any]]) -> None:
+            try:
+                # Только при совпадении сырых полей грузим компанию и строим DTO
+                if resolve_company:
+                    company_title = await self._company_title(client, d.get('COMPANY_ID'))
+                item = await self._deal_to_house_dto(client, d, company_title)
+                if not _match(item):
+                    return
+                # Добавляем score для сортировки
+                if address:
+                    item['_match_score'] = score_address_parts(query_parts, address_match_parts(item.get('address') or item.get('title') or ''))
+                out.append(item)
+            except Exception as e:
+                logger.warning(f"deal parse skip: {e}")
+
+        async def _scan(need: Optional[int]) -> Tuple[List[Dict[str, Any]], bool]:
+            """Подходящие дома (до need штук, если задано) и признак полного обхода"""
+            items: List[Dict[str, Any]] = []
+            async with http_clients.client('bitrix') as client:
+                # Сначала пробуем локальное зеркало сделок - без обхода портала
+                mirrored = await self.mirror.get_deals()
+                if mirrored is not None:
+                    for field_code, mp in (await self.mirror.get_enum_maps()).items():
+                        if mp and self.enum_cache.peek(f"enum:{field_code}") is None:
+                            self.enum_cache.set(f"enum:{field_code}", mp)
+                    if address:
+                        # Индекс синхронизируем с зеркалом, кандидатов берём из индекса
+                        self.address_index.sync(
+                            (str(d.get('ID')), d.get('UF_CRM_1669561599956') or d.get('TITLE') or '')
+                            for d, _ in mirrored
+                        )
+                        hits = self.address_index.match(address)
+                        mirrored = [(d, t) for d, t in mirrored if hits.get(str(d.get('ID')), 0) >= 70]
+                    assigned_ids = await self._brigade_user_ids(brigade) if brigade and settings.BITRIX_FILTER_PUSHDOWN else None
+                    candidates = [(d, t) for d, t in mirrored if _raw_match(d, assigned_ids)]
+                    for i in range(0, len(candidates), 50):
+                        chunk = candidates[i:i + 50]
+                        await self._prefetch_lookups(client, [d for d, _ in chunk], companies=False)
+                        for d, company_title in chunk:
+                            await _consume(client, d, company_title, False, items)
+                        if need and len(items) >= need:
+                            return items, False
+                else:
+                    filters, assigned_ids = await self._plan_deal_filters(brigade, cleaning_date, date_from, date_to)
+                    pages = self._iter_deal_pages(client, filters)
+                    try:
+                        async for deals in pages:
+                            # Прогреваем кеши lookup'ов кандидатов страницы batch-запросами, затем собираем DTO
+                            candidates = [d for d in deals if _raw_match(d, assigned_ids)]
+                            await self._prefetch_lookups(client, candidates)
+                            for d in candidates:
+                                await _consume(client, d, None, True, items)
+                            if need and len(items) >= need:
+                                return items, False
+                    finally:
+                        await pages.aclose()
+            # Сортировка по match_score (если есть адрес)
+            if address:
+                items.sort(key=lambda x: x.get('_match_score', 0), reverse=True)
+            return items, True
+
+        async def _load_all() -> List[Dict[str, Any]]:
+            items, _ = await _scan(None)
+            return items
+
+        # Поиск по адресу сортирует по score - нужен полный обход; иначе хватает page*limit (+1 - есть ли дальше)
+        if with_total or address or self.deals_cache.peek(cache_key) is not None:
+            # Полный список - через кеш: конкурентные промахи ждут один обход, просроченный
+            # список отдаётся сразу и обновляется в фоне, при ошибке портала - последний удачный
+            try:
+                filtered = await self.deals_cache.get_or_load(cache_key, _load_all)
+            except Exception as e:
+                logger.error(f"Bitrix list error: {e}")
+                filtered = []
+            total = len(filtered)
+            return {'houses': filtered[start:end], 'total': total, 'page': page, 'limit': limit, 'pages': (total + limit - 1) // limit, 'total_exact': True}
+
+        try:
+            filtered, exhausted = await _scan(page * limit + 1)
+        except Exception as e:
+            logger.error(f"Bitrix list error: {e}")
+            filtered, exhausted = [], True
         total = len(filtered)
+        if not exhausted:
+            return {'houses': filtered[start:end], 'total': total, 'page': page, 'limit': limit, 'pages': page + 1, 'total_exact': False}
         self.deals_cache.set(cache_key, filtered)
+        return {'houses': filtered[start:end], 'total': total, 'page': page, 'limit': limit, 'pages': (total + limit - 1) // limit, 'total_exact': True}
 
-        start = (page - 1) * limit
-        end = start + limit
-        return {'houses': filtered[start:end], 'total': total, 'page': page, 'limit': limit, 'pages': (total + limit - 1) // limit}
+    @staticmethod
+    def _company_info(cj: Any, title_fallback: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Компания сделки из ответа crm.company.get (или только название из сделки)"""
+        if isinstance(cj, dict) and cj:
+            phones = [p.get('VALUE') for p in (cj.get('PHONE') or []) if p.get('VALUE')]
+            emails = [e.get('VALUE') for e in (cj.get('EMAIL') or []) if e.get('VALUE')]
+            return {'id': cj.get('ID'), 'title': cj.get('TITLE') or title_fallback, 'phones': phones, 'emails': emails}
+        if title_fallback:
+            return {'id': None, 'title': title_fallback, 'phones': [], 'emails': []}
+        return None
+
+    @staticmethod
+    def _contact_info(cj: Any) -> Optional[Dict[str, Any]]:
+        """Контакт старшего из ответа crm.contact.get"""
+        if not isinstance(cj, dict) or not cj:
+            return None
+        phones = [p.get('VALUE') for p in (cj.get('PHONE') or []) if p.get('VALUE')]
+        emails = [e.get('VALUE') for e in (cj.get('EMAIL') or []) if e.get('VALUE')]
+        name = ((cj.get('NAME') or '') + ' ' + (cj.get('LAST_NAME') or '')).strip() or cj.get('HONORIFIC')
+        return {'id': cj.get('ID'), 'name': name, 'phones': phones, 'emails': emails}
+
+    @staticmethod
+    def _deal_contact_id(deal: Dict[str, Any]) -> Optional[str]:
+        """CONTACT_ID сделки, иначе первый из CONTACT_IDS"""
+        contact_id = deal.get('CONTACT_ID')
+        if contact_id and str(contact_id) != '0':
+            return str(contact_id)
+        contact_ids = deal.get('CONTACT_IDS')
+        if contact_ids and isinstance(contact_ids, list):
+            return str(contact_ids[0])
+        return None
+
+    async def _deal_details_dto(
+        self,
+        client: httpx.AsyncClient,
+        deal: Dict[str, Any],
+        company: Optional[Dict[str, Any]],
+        contact: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        # assigned: получаем из user.get (ASSIGNED_BY_ID)
+        assigned_info = await self._get_user_info(client, deal.get('ASSIGNED_BY_ID'))
+        brigade_label = None
+        
+        if assigned_info:
+            name = (assigned_info.get('name') or '').strip()
+            last_name = (assigned_info.get('last_name') or '').strip()
+            full_name = f"{name} {last_name}".strip()
+            
+            # Проверяем, является ли это бригадой (содержит слово "бригада")
+            if 'бригад' in full_name.lower():
+                # Формируем название бригады
+                if last_name.lower() == 'бригада' and name:
+                    brigade_label = f"{name} {last_name}"
+                else:
+                    brigade_label = full_name
+        
+        # Если бригада не найдена, пробуем ASSIGNED_BY_NAME
+        if not brigade_label:
+            assigned_by_name = (deal.get('ASSIGNED_BY_NAME') or '').strip()
+            if assigned_by_name and 'бригад' in assigned_by_name.lower():
+                brigade_label = assigned_by_name
+        
+        # Если ничего не нашли - бригада не назначена
+        if not brigade_label:
+            brigade_label = 'Бригада не назначена'
+        
+        brigade_number = self._parse_brigade_number(brigade_label)
+
+        cleaning_dates = await self._build_cleaning_dates(client, deal)
+
+        return {
+            'id': str(deal.get('ID')),
+            'title': deal.get('TITLE') or (deal.get('UF_CRM_1669561599956') or ''),
+            'address': self._normalize_address(deal.get('UF_CRM_1669561599956') or deal.get('TITLE') or ''),
+            'brigade_name': brigade_label,
+            'brigade_number': brigade_number,
+            'assigned': assigned_info,
+            'management_company': company and company.get('title'),
+            'company': company,
+            'elder_contact': contact,
+            'status': deal.get('STAGE_ID'),
+            'apartments': self._safe_int(deal.get('UF_CRM_1669704529022')) or 0,
+            'entrances': self._safe_int(deal.get('UF_CRM_1669705507390')) or 1,
+            'floors': self._safe_int(deal.get('UF_CRM_1669704631166')) or 5,
+            'cleaning_dates': cleaning_dates,
+            'periodicity': self._compute_periodicity(cleaning_dates),
+            'bitrix_url': f"{self.portal_base}/crm/deal/details/{deal.get('ID')}/",
+        }
 
     async def get_deal_details(self, deal_id: str) -> Optional[Dict[str, Any]]:
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                url = f"{self.webhook_url}crm.deal.get"
-                resp = await client.get(url, params={"id": deal_id}, timeout=self.timeout)
+            async with http_clients.client('bitrix') as client:
+                resp = await self._request(client, 'GET', 'crm.deal.get', params={"id": deal_id})
                 if resp.status_code != 200:
                     return None
-                j = resp.json()
-                deal = j.get('result') or None
+                deal = resp.json().get('result') or None
                 if not deal:
                     return None
 
                 # company
                 company_id = deal.get('COMPANY_ID')
-                company = None
-                company_title_fallback = deal.get('COMPANY_TITLE')
+                cj = None
                 if company_id:
-                    cu = f"{self.webhook_url}crm.company.get"
-                    rc = await client.get(cu, params={"id": company_id}, timeout=self.timeout)
+                    rc = await self._request(client, 'GET', 'crm.company.get', params={"id": company_id})
                     if rc.status_code == 200:
                         cj = rc.json().get('result') or {}
-                        phones = [p.get('VALUE') for p in (cj.get('PHONE') or []) if p.get('VALUE')]
-                        emails = [e.get('VALUE') for e in (cj.get('EMAIL') or []) if e.get('VALUE')]
-                        company = {'id': cj.get('ID'), 'title': cj.get('TITLE') or company_title_fallback, 'phones': phones, 'emails': emails}
-                if not company and company_title_fallback:
-                    company = {'id': None, 'title': company_title_fallback, 'phones': [], 'emails': []}
+                company = self._company_info(cj, deal.get('COMPANY_TITLE'))
 
-                # contact (senior): пробуем CONTACT_ID, CONTACT_IDS, и crm.deal.contact.items.get
+                # contact (senior): пробуем CONTACT_ID / CONTACT_IDS, затем crm.deal.contact.items.get
                 contact = None
-                contact_id = deal.get('CONTACT_ID')
-                
-                # Сначала пробуем CONTACT_ID (один контакт)
-                if contact_id and contact_id != 0 and contact_id != '0':
+                contact_id = self._deal_contact_id(deal)
+                if contact_id:
                     try:
-                        cu = f"{self.webhook_url}crm.contact.get"
-                        rc = await client.get(cu, params={"id": contact_id}, timeout=self.timeout)
+                        rc = await self._request(client, 'GET', 'crm.contact.get', params={"id": contact_id})
                         if rc.status_code == 200:
-                            cj = rc.json().get('result') or {}
-                            phones = [p.get('VALUE') for p in (cj.get('PHONE') or []) if p.get('VALUE')]
-                            emails = [e.get('VALUE') for e in (cj.get('EMAIL') or []) if e.get('VALUE')]
-                            name = ((cj.get('NAME') or '') + ' ' + (cj.get('LAST_NAME') or '')).strip() or cj.get('HONORIFIC')
-                            contact = {'id': cj.get('ID'), 'name': name, 'phones': phones, 'emails': emails}
+                            contact = self._contact_info(rc.json().get('result'))
                     except Exception as e:
                         logger.warning(f"CONTACT_ID fetch failed: {e}")
                 
-                # Fallback 1: CONTACT_IDS (множественные контакты)
-                if not contact:
-                    contact_ids = deal.get('CONTACT_IDS')
-                    if contact_ids and isinstance(contact_ids, list) and len(contact_ids) > 0:
-                        try:
-                            cu = f"{self.webhook_url}crm.contact.get"
-                            rc = await client.get(cu, params={"id": contact_ids[0]}, timeout=self.timeout)
-                            if rc.status_code == 200:
-                                cj = rc.json().get('result') or {}
-                                phones = [p.get('VALUE') for p in (cj.get('PHONE') or []) if p.get('VALUE')]
-                                emails = [e.get('VALUE') for e in (cj.get('EMAIL') or []) if e.get('VALUE')]
-                                name = ((cj.get('NAME') or '') + ' ' + (cj.get('LAST_NAME') or '')).strip() or cj.get('HONORIFIC')
-                                contact = {'id': cj.get('ID'), 'name': name, 'phones': phones, 'emails': emails}
-                        except Exception as e:
-                            logger.warning(f"CONTACT_IDS fetch failed: {e}")
-                
-                # Fallback 2: crm.deal.contact.items.get
+                # Fallback: crm.deal.contact.items.get
                 if not contact:
                     try:
-                        cu = f"{self.webhook_url}crm.deal.contact.items.get"
-                        rc2 = await client.get(cu, params={"id": deal.get('ID')}, timeout=self.timeout)
+                        rc2 = await self._request(client, 'GET', 'crm.deal.contact.items.get', params={"id": deal.get('ID')})
                         if rc2.status_code == 200:
                             arr = rc2.json().get('result') or []
                             if isinstance(arr, list) and arr:
                                 cid = arr[0].get('CONTACT_ID') or arr[0].get('contact_id')
                                 if cid:
-                                    rc3 = await client.get(f"{self.webhook_url}crm.contact.get", params={"id": cid}, timeout=self.timeout)
+                                    rc3 = await self._request(client, 'GET', 'crm.contact.get', params={"id": cid})
                                     if rc3.status_code == 200:
-                                        cj = rc3.json().get('result') or {}
-                                        phones = [p.get('VALUE') for p in (cj.get('PHONE') or []) if p.get('VALUE')]
-                                        emails = [e.get('VALUE') for e in (cj.get('EMAIL') or []) if e.get('VALUE')]
-                                        name = ((cj.get('NAME') or '') + ' ' + (cj.get('LAST_NAME') or '')).strip() or cj.get('HONORIFIC')
-                                        contact = {'id': cj.get('ID'), 'name': name, 'phones': phones, 'emails': emails}
+                                        contact = self._contact_info(rc3.json().get('result'))
                     except Exception as e:
                         logger.warning(f"Elder contact fallback via crm.deal.contact.items.get failed: {e}")
 
-                # assigned: получаем из user.get (ASSIGNED_BY_ID)
-                assigned_info = await self._get_user_info(client, deal.get('ASSIGNED_BY_ID'))
-                brigade_label = None
-                
-                if assigned_info:
-                    name = (assigned_info.get('name') or '').strip()
-                    last_name = (assigned_info.get('last_name') or '').strip()
-                    full_name = f"{name} {last_name}".strip()
-                    
-                    # Проверяем, является ли это бригадой (содержит слово "бригада")
-                    if 'бригад' in full_name.lower():
-                        # Формируем название бригады
-                        if last_name.lower() == 'бригада' and name:
-                            brigade_label = f"{name} {last_name}"
-                        else:
-                            brigade_label = full_name
-                
-                # Если бригада не найдена, пробуем ASSIGNED_BY_NAME
-                if not brigade_label:
-                    assigned_by_name = (deal.get('ASSIGNED_BY_NAME') or '').strip()
-                    if assigned_by_name and 'бригад' in assigned_by_name.lower():
-                        brigade_label = assigned_by_name
-                
-                # Если ничего не нашли - бригада не назначена
-                if not brigade_label:
-                    brigade_label = 'Бригада не назначена'
-                
-                brigade_number = self._parse_brigade_number(brigade_label)
-
-                cleaning_dates = await self._build_cleaning_dates(client, deal)
-
-                return {
-                    'id': str(deal.get('ID')),
-                    'title': deal.get('TITLE') or (deal.get('UF_CRM_1669561599956') or ''),
-                    'address': self._normalize_address(deal.get('UF_CRM_1669561599956') or deal.get('TITLE') or ''),
-                    'brigade_name': brigade_label,
-                    'brigade_number': brigade_number,
-                    'assigned': assigned_info,
-                    'management_company': company and company.get('title'),
-                    'company': company,
-                    'elder_contact': contact,
-                    'status': deal.get('STAGE_ID'),
-                    'apartments': self._safe_int(deal.get('UF_CRM_1669704529022')) or 0,
-                    'entrances': self._safe_int(deal.get('UF_CRM_1669705507390')) or 1,
-                    'floors': self._safe_int(deal.get('UF_CRM_1669704631166')) or 5,
-                    'cleaning_dates': cleaning_dates,
-                    'periodicity': self._compute_periodicity(cleaning_dates),
-                    'bitrix_url': f"{self.portal_base}/crm/deal/details/{deal.get('ID')}/",
-                }
+                return await self._deal_details_dto(client, deal, company, contact)
         except Exception as e:
             logger.error(f"get_deal_details error: {e}")
             return None
 
+    async def iter_deal_details(
+        self,
+        deal_ids: List[Any],
+        chunk_size: int = BitrixBatcher.MAX_COMMANDS,
+        concurrency: int = 4,
+    ) -> AsyncIterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """
+        Детали многих сделок (как get_deal_details) в исходном порядке, по мере готовности пачек.
+        Сделки, компании и контакты идут через batch; одинаковые компании/контакты запрашиваются
+        один раз на весь вызов; одновременно обрабатывается не больше concurrency пачек
+        """
+        ids = [str(i) for i in deal_ids if i]
+        memo: Dict[str, asyncio.Future] = {}
+        sem = asyncio.Semaphore(max(1, concurrency))
+
+        def once(method: str, entity_id: Any) -> asyncio.Future:
+            key = f"{method}:{entity_id}"
+            fut = memo.get(key)
+            if fut is None:
+                fut = asyncio.ensure_future(self._batcher.call(method, {'id': entity_id}))
+                memo[key] = fut
+            return fut
+
+        async def resolve_one(client: httpx.AsyncClient, deal: Any) -> Optional[Dict[str, Any]]:
+            if not isinstance(deal, dict) or not deal:
+                return None
+            company_id = str(deal.get('COMPANY_ID') or '')
+            cj = await once('crm.company.get', company_id) if company_id.isdigit() and company_id != '0' else None
+            company = self._company_info(cj, deal.get('COMPANY_TITLE'))
+            contact = None
+            contact_id = self._deal_contact_id(deal)
+            if contact_id:
+                contact = self._contact_info(await once('crm.contact.get', contact_id))
+            if not contact:
+                items = await once('crm.deal.contact.items.get', deal.get('ID'))
+                if isinstance(items, list) and items:
+                    cid = items[0].get('CONTACT_ID') or items[0].get('contact_id')
+                    if cid:
+                        contact = self._contact_info(await once('crm.contact.get', cid))
+            return await self._deal_details_dto(client, deal, company, contact)
+
+        async def resolve_chunk(chunk: List[str]) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+            async with sem:
+                deals = await asyncio.gather(*[once('crm.deal.get', i) for i in chunk])
+                async with http_clients.client('bitrix') as client:
+                    await self._prefetch_lookups(client, [d for d in deals if isinstance(d, dict)], companies=False)
+                    results = await asyncio.gather(*[resolve_one(client, d) for d in deals], return_exceptions=True)
+            out = []
+            for deal_id, res in zip(chunk, results):
+                if isinstance(res, Exception):
+                    logger.warning(f"Deal details for {deal_id} failed: {res}")
+                    res = None
+                out.append((deal_id, res))
+            return out
+
+        tasks = [asyncio.ensure_future(resolve_chunk(ids[i:i + chunk_size])) for i in range(0, len(ids), chunk_size)]
+        try:
+            for task in tasks:
+                for item in await task:
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            for fut in memo.values():
+                fut.cancel()
+
+    async def get_deal_details_bulk(self, deal_ids: List[Any]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Детали многих сделок сразу: {deal_id: details | None} (см. iter_deal_details)"""
+        return {deal_id: details async for deal_id, details in self.iter_deal_details(deal_ids)}
+
     async def get_all_deals(self) -> List[Dict[str, Any]]:
+        mirrored = await self.mirror.get_deals()
+        if mirrored is not None:
+            return [d for d, _ in mirrored]
         items: List[Dict[str, Any]] = []
-        select_fields = [
-            'ID','TITLE','COMPANY_ID','COMPANY_TITLE','ASSIGNED_BY_ID','ASSIGNED_BY_NAME',
-            'UF_CRM_1669561599956','UF_CRM_1669704529022','UF_CRM_1669705507390','UF_CRM_1669704631166','UF_CRM_1669706387893',
-            'UF_CRM_1741592774017','UF_CRM_1741592855565','UF_CRM_1741592892232','UF_CRM_1741592945060',
-            'UF_CRM_1741593004888','UF_CRM_1741593047994','UF_CRM_1741593067418','UF_CRM_1741593115407',
-            'UF_CRM_1741593156926','UF_CRM_1741593210242','UF_CRM_1741593231558','UF_CRM_1741593285121',
-            'UF_CRM_1741593340713','UF_CRM_1741593387667','UF_CRM_1741593408621','UF_CRM_1741593452062',
-        ]
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_clients.client('bitrix') as client:
                 start_param = 0
                 while True:
-                    payload = {'start': start_param, 'select': select_fields, 'filter': {'CATEGORY_ID': '34'}, 'order': {'ID': 'DESC'}}
+                    payload = {'start': start_param, 'select': self.DEAL_SELECT_FIELDS, 'filter': {'CATEGORY_ID': '34'}, 'order': {'ID': 'DESC'}}
                     data = await self._make_request(client, 'crm.deal.list', payload)
                     if not data.get('ok'):
                         break
@@ -1004,36 +1374,20 @@ class Bitrix24Service:
         }
 
     async def sync_houses(self, db: AsyncSession) -> Dict[str, int]:
+        """Сделки -> таблица houses: пишутся только изменившиеся дома, пропавшие помечаются deleted_at"""
         deals = await self.get_all_deals()
-        created = 0
-        updated = 0
-        total = 0
+        houses = []
         for deal in deals:
             try:
-                data = self.parse_deal_to_house(deal)
-                if not (data.get('bitrix_id') and data.get('address')):
-                    continue
-                total += 1
-                res = await db.execute(select(House).where(House.bitrix_id == data['bitrix_id']))
-                existing = res.scalar_one_or_none()
-                if existing:
-                    for k, v in data.items():
-                        if k == 'id':
-                            continue
-                        setattr(existing, k, v)
-                    updated += 1
-                else:
-                    db.add(House(**data))
-                    created += 1
+                houses.append(self.parse_deal_to_house(deal))
             except Exception as e:
                 logger.warning(f"Deal sync skipped due to error: {e}")
-        await db.commit()
-        return {'total': total, 'created': created, 'updated': updated}
+        return await house_sync.sync_houses(db, houses)
 
     async def get_all_brigades(self) -> List[Dict[str, Any]]:
         """Получить список всех бригад (пользователей с 'бригада' в имени)"""
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_clients.client('bitrix') as client:
                 brigades = []
                 start = 0
                 while True:
@@ -1070,7 +1424,7 @@ class Bitrix24Service:
             if cached:
                 return cached
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_clients.client('bitrix') as client:
                 data = await self._make_request(client, 'crm.deal.userfield.list', {'filter': {'FIELD_NAME': field_name}})
                 fields = data.get('result') or []
                 if not fields:
@@ -1089,7 +1443,7 @@ class Bitrix24Service:
     async def get_all_contacts(self) -> List[Dict[str, Any]]:
         """Получить список всех контактов из Bitrix24"""
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_clients.client('bitrix') as client:
                 contacts = []
                 start = 0
                 while True:
@@ -1118,7 +1472,7 @@ class Bitrix24Service:
     async def create_contact(self, name: str, phone: str = '', comment: str = '') -> Optional[str]:
         """Создать новый контакт в Bitrix24"""
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_clients.client('bitrix') as client:
                 fields = {
                     'NAME': name,
                 }
@@ -1132,7 +1486,7 @@ class Bitrix24Service:
                     fields['COMMENTS'] = comment
                 
                 url = f"{self.webhook_url}crm.contact.add"
-                resp = await client.post(url, json={'fields': fields}, timeout=self.timeout)
+                resp = await self._request(client, 'POST', url, json={'fields': fields})
                 
                 if resp.status_code != 200:
                     logger.error(f"Failed to create contact: {resp.status_code}")
@@ -1151,7 +1505,7 @@ class Bitrix24Service:
     async def update_deal(self, deal_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Обновить сделку в Bitrix24"""
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_clients.client('bitrix') as client:
                 # Подготовим данные для обновления
                 update_fields = {'id': deal_id}
                 
@@ -1212,7 +1566,7 @@ class Bitrix24Service:
                 
                 # Отправляем обновление
                 url = f"{self.webhook_url}crm.deal.update"
-                resp = await client.post(url, json={'fields': update_fields}, timeout=self.timeout)
+                resp = await self._request(client, 'POST', url, json={'fields': update_fields})
                 
                 if resp.status_code != 200:
                     logger.error(f"Failed to update deal {deal_id}: {resp.status_code}")
@@ -1223,6 +1577,12 @@ class Bitrix24Service:
                     logger.error(f"Bitrix24 update failed: {result}")
                     return None
                 
+                # Сразу обновляем зеркало, не дожидаясь дельта-синхронизации
+                try:
+                    await self.mirror.apply_deal(deal_id)
+                except Exception as e:
+                    logger.warning(f"Mirror refresh failed for deal {deal_id}: {e}")
+                
                 # После обновления получаем свежие данные
                 updated_deal = await self.get_deal_details(deal_id)
                 return updated_deal
@@ -7,6 +7,9 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import os
 
+from backend.app.services.bitrix_rate_limiter import bitrix_rate_limiter, is_rate_limited
+from backend.app.config.http_clients import http_clients
+
 logger = logging.getLogger(__name__)
 
 class BitrixCallsService:
@@ -14,15 +17,26 @@ class BitrixCallsService:
         self.webhook_url = os.getenv("BITRIX24_WEBHOOK_URL", "").rstrip('/') + '/'
         self.timeout = httpx.Timeout(30.0)
     
+    async def _post(self, client: httpx.AsyncClient, method: str, json: Dict[str, Any]) -> httpx.Response:
+        """POST к вебхуку через общий с Bitrix24Service rate limiter"""
+        async with bitrix_rate_limiter.slot():
+            response = await client.post(f"{self.webhook_url}{method}", json=json)
+        if is_rate_limited(response):
+            bitrix_rate_limiter.on_throttled()
+        else:
+            bitrix_rate_limiter.on_success()
+        return response
+    
     async def get_recent_calls(self, limit: int = 50) -> List[Dict[str, Any]]:
         """
         Получить последние звонки из Bitrix24
         """
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_clients.client('bitrix') as client:
                 # Получаем список звонков через voximplant.statistic.get
-                response = await client.post(
-                    f"{self.webhook_url}voximplant.statistic.get",
+                response = await self._post(
+                    client,
+                    "voximplant.statistic.get",
                     json={
                         "FILTER": {
                             ">=CALL_START_DATE": (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
@@ -56,9 +70,10 @@ class BitrixCallsService:
         Получить детали конкретного звонка
         """
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.webhook_url}voximplant.statistic.get",
+            async with http_clients.client('bitrix') as client:
+                response = await self._post(
+                    client,
+                    "voximplant.statistic.get",
                     json={
                         "FILTER": {
                             "CALL_ID": call_id
@@ -98,9 +113,10 @@ class BitrixCallsService:
                 return None
             
             # Получаем ссылку на файл через disk.file.get
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.webhook_url}disk.file.get",
+            async with http_clients.client('bitrix') as client:
+                response = await self._post(
+                    client,
+                    "disk.file.get",
                     json={
                         "id": record_file_id
                     }
@@ -135,9 +151,10 @@ class BitrixCallsService:
             # Очищаем номер от лишних символов
             clean_phone = phone.replace("+", "").replace("-", "").replace(" ", "").replace("(", "").replace(")", "")
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.webhook_url}voximplant.statistic.get",
+            async with http_clients.client('bitrix') as client:
+                response = await self._post(
+                    client,
+                    "voximplant.statistic.get",
                     json={
                         "FILTER": {
                             "PHONE_NUMBER": clean_phone
@@ -0,0 +1,349 @@
+"""
+Bitrix24 deal mirror: локальная копия сделок воронки домов (CATEGORY_ID=34) в Postgres
+- Первая синхронизация заполняет зеркало целиком (сделки + названия УК + enum-карты)
+- Далее тянутся только сделки с DATE_MODIFY >= last_sync
+- bitrix_webhook применяет изменения отдельных сделок сразу
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+import httpx
+
+from backend.app.config.database import get_db_pool
+from backend.app.config.http_clients import http_clients
+from backend.app.services.brain_answer_cache import brain_answer_cache
+
+if TYPE_CHECKING:
+    from backend.app.services.bitrix24_service import Bitrix24Service
+
+logger = logging.getLogger(__name__)
+
+HOUSES_CATEGORY_ID = '34'
+_STATE_KEY = f"deals:{HOUSES_CATEGORY_ID}"
+
+
+def _parse_bitrix_dt(value: Any) -> Optional[datetime]:
+    """DATE_MODIFY приходит как '2025-10-13T12:34:56+03:00'"""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt
+    except Exception:
+        return None
+
+
+class BitrixDealMirror:
+    def __init__(self, service: "Bitrix24Service"):
+        self.service = service
+        self._sync_lock = asyncio.Lock()
+        self._ready = False
+        self.last_sync: Optional[datetime] = None
+        self.last_result: Dict[str, Any] = {}
+
+    async def is_ready(self) -> bool:
+        """Зеркало готово к чтению, если хотя бы одна полная синхронизация прошла"""
+        if self._ready:
+            return True
+        pool = await get_db_pool()
+        if not pool:
+            return False
+        try:
+            async with pool.acquire() as conn:
+                row = await conn.fetchrow(
+                    "SELECT last_sync, full_sync_at FROM bitrix_sync_state WHERE key = $1", _STATE_KEY
+                )
+        except Exception as e:
+            logger.debug(f"[mirror] state check failed: {e}")
+            return False
+        if row and row['full_sync_at']:
+            self._ready = True
+            self.last_sync = row['last_sync']
+        return self._ready
+
+    async def get_deals(self) -> Optional[List[Tuple[Dict[str, Any], Optional[str]]]]:
+        """
+        Сделки из зеркала в порядке ID DESC (как crm.deal.list с order[ID]=DESC).
+        Возвращает [(deal, company_title)] или None, если зеркало недоступно
+        """
+        if not await self.is_ready():
+            return None
+        pool = await get_db_pool()
+        if not pool:
+            return None
+        try:
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(
+                    """
+                    SELECT deal, company_title FROM bitrix_deals_mirror
+                    WHERE NOT deleted AND category_id = $1
+                    ORDER BY deal_id DESC
+                    """,
+                    HOUSES_CATEGORY_ID,
+                )
+        except Exception as e:
+            logger.warning(f"[mirror] read failed, falling back to live API: {e}")
+            return None
+        return [(json.loads(r['deal']), r['company_title']) for r in rows]
+
+    async def get_enum_maps(self) -> Dict[str, Dict[str, str]]:
+        pool = await get_db_pool()
+        if not pool:
+            return {}
+        try:
+            async with pool.acquire() as conn:
+                rows = await conn.fetch("SELECT field_code, enum_values FROM bitrix_enum_mirror")
+        except Exception as e:
+            logger.debug(f"[mirror] enum read failed: {e}")
+            return {}
+        return {r['field_code']: json.loads(r['enum_values']) for r in rows}
+
+    async def _fetch_deals(self, client: httpx.AsyncClient, flt: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Постраничная выгрузка crm.deal.list. None - если хоть одна страница не загрузилась"""
+        items: List[Dict[str, Any]] = []
+        start_param = 0
+        while True:
+            payload = {
+                'start': start_param,
+                'select': self.service.DEAL_SELECT_FIELDS,
+                'filter': flt,
+                'order': {'ID': 'DESC'},
+            }
+            data = await self.service._make_request(client, 'crm.deal.list', payload)
+            if not data.get('ok'):
+                return None
+            batch = data.get('result') or []
+            if not batch:
+                break
+            items.extend(batch)
+            next_val = data.get('next')
+            if next_val is None:
+                break
+            start_param = next_val
+        return items
+
+    async def _resolve_companies(self, client: httpx.AsyncClient, deals: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+        # Конкурентные _company_title склеиваются в batch-запросы по 50 компаний
+        ids = list({str(d.get('COMPANY_ID')) for d in deals if d.get('COMPANY_ID')})
+        results = await asyncio.gather(*[self.service._company_title(client, cid) for cid in ids], return_exceptions=True)
+        return {cid: (r if isinstance(r, str) else None) for cid, r in zip(ids, results)}
+
+    async def _fetch_enums(self, client: httpx.AsyncClient) -> Dict[str, Dict[str, str]]:
+        fields = self.service.CLEANING_TYPE_FIELDS
+        results = await asyncio.gather(*[self.service._get_enum_map(client, f) for f in fields], return_exceptions=True)
+        return {f: mp for f, mp in zip(fields, results) if isinstance(mp, dict) and mp}
+
+    @staticmethod
+    def _row(deal: Dict[str, Any], company_title: Optional[str]) -> tuple:
+        return (
+            int(deal.get('ID')),
+            str(deal.get('CATEGORY_ID') or HOUSES_CATEGORY_ID),
+            json.dumps(deal, ensure_ascii=False),
+            company_title,
+            deal.get('UF_CRM_1669561599956') or deal.get('TITLE') or '',
+            _parse_bitrix_dt(deal.get('DATE_MODIFY')),
+            str(deal.get('CATEGORY_ID') or HOUSES_CATEGORY_ID) != HOUSES_CATEGORY_ID,
+        )
+
+    async def _upsert(self, conn, deals: List[Dict[str, Any]], titles: Dict[str, Optional[str]]) -> None:
+        rows = [
+            self._row(d, titles.get(str(d.get('COMPANY_ID'))) or d.get('COMPANY_TITLE'))
+            for d in deals if d.get('ID')
+        ]
+        if not rows:
+            return
+        await conn.executemany(
+            """
+            INSERT INTO bitrix_deals_mirror
+                (deal_id, category_id, deal, company_title, address, date_modify, deleted, synced_at)
+            VALUES ($1, $2, $3::jsonb, $4, $5, $6, $7, NOW())
+            ON CONFLICT (deal_id) DO UPDATE SET
+                category_id = EXCLUDED.category_id,
+                deal = EXCLUDED.deal,
+                company_title = EXCLUDED.company_title,
+                address = EXCLUDED.address,
+                date_modify = EXCLUDED.date_modify,
+                deleted = EXCLUDED.deleted,
+                synced_at = NOW()
+            """,
+            rows,
+        )
+
+    async def _save_state(self, conn, last_sync: Optional[datetime], full: bool) -> None:
+        await conn.execute(
+            """
+            INSERT INTO bitrix_sync_state (key, last_sync, full_sync_at, updated_at)
+            VALUES ($1, $2, CASE WHEN $3 THEN NOW() ELSE NULL END, NOW())
+            ON CONFLICT (key) DO UPDATE SET
+                last_sync = COALESCE(EXCLUDED.last_sync, bitrix_sync_state.last_sync),
+                full_sync_at = COALESCE(EXCLUDED.full_sync_at, bitrix_sync_state.full_sync_at),
+                updated_at = NOW()
+            """,
+            _STATE_KEY, last_sync, full,
+        )
+
+    @staticmethod
+    def _max_modify(deals: List[Dict[str, Any]], current: Optional[datetime]) -> Optional[datetime]:
+        result = current
+        for d in deals:
+            dt = _parse_bitrix_dt(d.get('DATE_MODIFY'))
+            if dt and (result is None or dt > result):
+                result = dt
+        return result
+
+    def _invalidate(self) -> None:
+        self.service.deals_cache.clear()
+        brain_answer_cache.invalidate("bitrix")
+
+    async def full_sync(self) -> Dict[str, Any]:
+        """Полная выгрузка: заполняет зеркало и помечает исчезнувшие сделки удалёнными"""
+        pool = await get_db_pool()
+        if not pool:
+            return {'success': False, 'error': 'Database pool is not available'}
+        async with self._sync_lock:
+            started = datetime.now(timezone.utc)
+            async with http_clients.client('bitrix') as client:
+                deals = await self._fetch_deals(client, {'CATEGORY_ID': HOUSES_CATEGORY_ID})
+                if deals is None:
+                    logger.error("[mirror] full sync aborted: crm.deal.list failed")
+                    return {'success': False, 'error': 'crm.deal.list failed'}
+                titles = await self._resolve_companies(client, deals)
+                enums = await self._fetch_enums(client)
+
+            last_sync = self._max_modify(deals, None)
+            seen_ids = [int(d['ID']) for d in deals if d.get('ID')]
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await self._upsert(conn, deals, titles)
+                    deleted = await conn.execute(
+                        """
+                        UPDATE bitrix_deals_mirror SET deleted = TRUE, synced_at = NOW()
+                        WHERE NOT deleted AND NOT (deal_id = ANY($1::bigint[]))
+                        """,
+                        seen_ids,
+                    )
+                    if enums:
+                        await conn.executemany(
+                            """
+                            INSERT INTO bitrix_enum_mirror (field_code, enum_values, synced_at)
+                            VALUES ($1, $2::jsonb, NOW())
+                            ON CONFLICT (field_code) DO UPDATE SET
+                                enum_values = EXCLUDED.enum_values, synced_at = NOW()
+                            """,
+                            [(k, json.dumps(v, ensure_ascii=False)) for k, v in enums.items()],
+                        )
+                    await self._save_state(conn, last_sync, True)
+
+            self._ready = True
+            self.last_sync = last_sync
+            self._invalidate()
+            self.last_result = {
+                'success': True,
+                'mode': 'full',
+                'deals': len(deals),
+                'deleted': int(str(deleted).split()[-1]) if deleted else 0,
+                'enums': len(enums),
+                'duration_s': round((datetime.now(timezone.utc) - started).total_seconds(), 2),
+            }
+            logger.info(f"[mirror] full sync: {self.last_result}")
+            return self.last_result
+
+    async def delta_sync(self) -> Dict[str, Any]:
+        """Дельта по DATE_MODIFY; если зеркало пустое - полная синхронизация"""
+        if not await self.is_ready() or self.last_sync is None:
+            return await self.full_sync()
+        pool = await get_db_pool()
+        if not pool:
+            return {'success': False, 'error': 'Database pool is not available'}
+        async with self._sync_lock:
+            since = self.last_sync
+            async with http_clients.client('bitrix') as client:
+                # Без фильтра по CATEGORY_ID: так видны и сделки, ушедшие из воронки домов
+                deals = await self._fetch_deals(client, {'>=DATE_MODIFY': since.isoformat()})
+                if deals is None:
+                    return {'success': False, 'error': 'crm.deal.list failed'}
+                in_category = [d for d in deals if str(d.get('CATEGORY_ID')) == HOUSES_CATEGORY_ID]
+                moved_out = [int(d['ID']) for d in deals if d.get('ID') and str(d.get('CATEGORY_ID')) != HOUSES_CATEGORY_ID]
+                titles = await self._resolve_companies(client, in_category)
+
+            last_sync = self._max_modify(deals, since)
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await self._upsert(conn, in_category, titles)
+                    if moved_out:
+                        await conn.execute(
+                            "UPDATE bitrix_deals_mirror SET deleted = TRUE, synced_at = NOW() WHERE deal_id = ANY($1::bigint[])",
+                            moved_out,
+                        )
+                    await self._save_state(conn, last_sync, False)
+
+            self.last_sync = last_sync
+            if deals:
+                self._invalidate()
+            self.last_result = {'success': True, 'mode': 'delta', 'changed': len(in_category), 'removed': len(moved_out)}
+            if deals:
+                logger.info(f"[mirror] delta sync: {self.last_result}")
+            return self.last_result
+
+    async def apply_deal(self, deal_id: Any) -> bool:
+        """Обновить одну сделку в зеркале (событие ONCRMDEALADD/ONCRMDEALUPDATE)"""
+        pool = await get_db_pool()
+        if not pool or not await self.is_ready():
+            return False
+        async with http_clients.client('bitrix') as client:
+            resp = await self.service._request(client, 'GET', 'crm.deal.get', params={'id': deal_id})
+            if resp.status_code != 200:
+                return False
+            deal = resp.json().get('result')
+            if not isinstance(deal, dict) or not deal.get('ID'):
+                return False
+            titles = await self._resolve_companies(client, [deal])
+        async with pool.acquire() as conn:
+            await self._upsert(conn, [deal], titles)
+        if str(deal.get('CATEGORY_ID')) == HOUSES_CATEGORY_ID:
+            self.service.address_index.upsert(str(deal.get('ID')), deal.get('UF_CRM_1669561599956') or deal.get('TITLE') or '')
+        else:
+            self.service.address_index.remove(str(deal.get('ID')))
+        self._invalidate()
+        return True
+
+    async def remove_deal(self, deal_id: Any) -> bool:
+        """Пометить сделку удалённой (событие ONCRMDEALDELETE)"""
+        pool = await get_db_pool()
+        if not pool:
+            return False
+        try:
+            async with pool.acquire() as conn:
+                await conn.execute(
+                    "UPDATE bitrix_deals_mirror SET deleted = TRUE, synced_at = NOW() WHERE deal_id = $1",
+                    int(deal_id),
+                )
+        except Exception as e:
+            logger.warning(f"[mirror] remove_deal {deal_id} failed: {e}")
+            return False
+        self.service.address_index.remove(str(deal_id))
+        self._invalidate()
+        return True
+
+    async def status(self) -> Dict[str, Any]:
+        ready = await self.is_ready()
+        out: Dict[str, Any] = {
+            'ready': ready,
+            'last_sync': self.last_sync.isoformat() if self.last_sync else None,
+            'last_result': self.last_result,
+        }
+        pool = await get_db_pool()
+        if ready and pool:
+            async with pool.acquire() as conn:
+                out['deals'] = await conn.fetchval(
+                    "SELECT COUNT(*) FROM bitrix_deals_mirror WHERE NOT deleted AND category_id = $1",
+                    HOUSES_CATEGORY_ID,
+                )
+        return out
@@ -0,0 +1,163 @@
+"""
+Адаптивный rate limiter для REST API Bitrix24
+- Bitrix считает запросы портала по leaky bucket: запас (burst) и скорость восстановления в секунду
+- Токен резервируется до ожидания (без блокировки), поэтому ожидание идёт вне семафора и
+  конкурентные корутины обслуживаются по очереди, без гонок за общим временем последнего запроса
+- 503 / 429 / QUERY_LIMIT_EXCEEDED: скорость делится пополам, запас обнуляется;
+  после паузы скорость постепенно возвращается к номинальной
+Один экземпляр (bitrix_rate_limiter) общий для всех вызовов вебхука портала
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+
+import httpx
+
+from backend.app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ERRORS = {'QUERY_LIMIT_EXCEEDED', 'OPERATION_TIME_LIMIT'}
+
+
+def is_rate_limited(resp: httpx.Response) -> bool:
+    """Ответ Bitrix означает превышение лимита запросов"""
+    if resp.status_code in (429, 503):
+        return True
+    if resp.status_code == 200:
+        return False
+    try:
+        return str(resp.json().get('error') or '').upper() in RATE_LIMIT_ERRORS
+    except Exception:
+        return False
+
+
+class AdaptiveTokenBucket:
+    # Шаг восстановления - доля номинальной скорости раз в RECOVERY_STEP_SECONDS
+    RECOVERY_FRACTION = 0.1
+    RECOVERY_STEP_SECONDS = 1.0
+    # 503 на запросы, ушедшие до последнего замедления, скорость повторно не делят
+    DECREASE_HOLD_SECONDS = 1.0
+    # Окно для расчёта фактической скорости (запросов в секунду)
+    OBSERVE_WINDOW_SECONDS = 10.0
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_concurrency: int = 4,
+        min_rate: Optional[float] = None,
+        cooldown_seconds: float = 5.0,
+    ):
+        self.nominal_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.min_rate = float(min_rate) if min_rate else max(0.2, self.nominal_rate / 8)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.cooldown_seconds = cooldown_seconds
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._recover_at = 0.0
+        self._hold_until = 0.0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._sent: Deque[float] = deque()
+        self.waiting = 0
+        self.in_flight = 0
+        self.stats = {'requests': 0, 'delayed': 0, 'waited_seconds': 0.0, 'throttle_events': 0, 'last_throttled_at': None}
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Дождаться токена. Резерв делается сразу, ожидание - по уже занятой очереди"""
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens -= 1.0
+        if self._tokens < 0:
+            delay = -self._tokens / self.rate
+            self.waiting += 1
+            self.stats['delayed'] += 1
+            self.stats['waited_seconds'] += delay
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.waiting -= 1
+        self.stats['requests'] += 1
+        sent_at = time.monotonic()
+        self._sent.append(sent_at)
+        while self._sent and sent_at - self._sent[0] > self.OBSERVE_WINDOW_SECONDS:
+            self._sent.popleft()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Токен + место среди одновременных запросов на время одного HTTP-вызова"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        await self.acquire()
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+
+    def on_throttled(self) -> None:
+        """Портал ответил 503/QUERY_LIMIT_EXCEEDED: вдвое медленнее, запас в ноль, пауза перед восстановлением"""
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens = min(self._tokens, 0.0)
+        self._recover_at = now + self.cooldown_seconds
+        self.stats['throttle_events'] += 1
+        self.stats['last_throttled_at'] = time.time()
+        if now < self._hold_until:
+            return
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._hold_until = now + self.DECREASE_HOLD_SECONDS
+        logger.warning(f"Bitrix24 rate limit hit, slowing down to {self.rate:.2f} req/s")
+
+    def on_success(self) -> None:
+        """Успешный ответ: после паузы скорость ступенями возвращается к номинальной"""
+        if self.rate >= self.nominal_rate:
+            return
+        now = time.monotonic()
+        if now < self._recover_at:
+            return
+        self._refill(now)
+        self.rate = min(self.nominal_rate, self.rate + self.nominal_rate * self.RECOVERY_FRACTION)
+        self._recover_at = now + self.RECOVERY_STEP_SECONDS
+        if self.rate >= self.nominal_rate:
+            logger.info(f"Bitrix24 rate limit recovered to {self.rate:.2f} req/s")
+
+    def observed_rate(self) -> float:
+        now = time.monotonic()
+        recent = [t for t in self._sent if now - t <= self.OBSERVE_WINDOW_SECONDS]
+        if len(recent) < 2:
+            return float(len(recent))
+        return len(recent) / max(now - recent[0], 1.0)
+
+    def status(self) -> Dict[str, Any]:
+        self._refill(time.monotonic())
+        return {
+            'rate': round(self.rate, 3),
+            'nominal_rate': self.nominal_rate,
+            'observed_rate': round(self.observed_rate(), 3),
+            'burst': self.burst,
+            'tokens': round(max(self._tokens, 0.0), 2),
+            'queued': self.waiting,
+            'in_flight': self.in_flight,
+            'max_concurrency': self.max_concurrency,
+            **{k: (round(v, 3) if isinstance(v, float) else v) for k, v in self.stats.items()},
+        }
+
+
+bitrix_rate_limiter = AdaptiveTokenBucket(
+    rate=settings.BITRIX_RATE_LIMIT,
+    burst=settings.BITRIX_RATE_BURST,
+    max_concurrency=settings.BITRIX_MAX_CONCURRENCY,
+)
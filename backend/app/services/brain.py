@@ -4,7 +4,7 @@ Brain DTOs and utilities: address normalization, data structures
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import re
 
 
@@ -229,38 +229,30 @@ def extract_house_number(address: str) -> Optional[str]:
     return None
 
 
-def address_match_score(query_address: str, target_address: str) -> int:
+def address_match_parts(address: Optional[str]) -> Tuple[bool, str, Optional[str]]:
     """
-    Вычислить score совпадения адресов
-    100 = точное совпадение номера дома и улицы
-    50 = совпадение улицы, номер не совпадает
-    0 = не совпадение
+    Разобрать адрес для сравнения: (есть_улица, очищенная_улица, номер_дома).
+    Результат можно посчитать один раз и переиспользовать (см. address_index.AddressIndex)
     """
-    if not query_address or not target_address:
-        return 0
-    
-    query_norm = normalize_address(query_address).lower()
-    target_norm = normalize_address(target_address).lower()
-    
-    # Извлекаем номера домов
-    query_num = extract_house_number(query_norm)
-    target_num = extract_house_number(target_norm)
-    
-    # Извлекаем названия улиц (все до первого числа)
-    query_street = re.sub(r'\d.*$', '', query_norm).strip()
-    target_street = re.sub(r'\d.*$', '', target_norm).strip()
+    norm = normalize_address(address).lower()
+    # Извлекаем номер дома
+    num = extract_house_number(norm)
+    # Извлекаем название улицы (все до первого числа)
+    street = re.sub(r'\d.*$', '', norm).strip()
+    # Учитываем различные префиксы (ул, улица)
+    street_clean = street.replace('ул', '').replace('улица', '').strip()
+    return (bool(street), street_clean, num)
+
+
+def score_address_parts(query: Tuple[bool, str, Optional[str]], target: Tuple[bool, str, Optional[str]]) -> int:
+    """Score по заранее разобранным адресам (см. address_match_score)"""
+    query_has_street, query_street, query_num = query
+    target_has_street, target_street, target_num = target
     
     # Проверяем совпадение улицы
-    street_match = False
-    if query_street and target_street:
-        # Учитываем различные префиксы (ул, улица)
-        query_street_clean = query_street.replace('ул', '').replace('улица', '').strip()
-        target_street_clean = target_street.replace('ул', '').replace('улица', '').strip()
-        
-        if query_street_clean in target_street_clean or target_street_clean in query_street_clean:
-            street_match = True
-    
-    if not street_match:
+    if not (query_has_street and target_has_street):
+        return 0
+    if not (query_street in target_street or target_street in query_street):
         return 0
     
     # Если улица совпадает, проверяем номер дома
@@ -271,4 +263,17 @@ def address_match_score(query_address: str, target_address: str) -> int:
             return 0  # Улица совпадает, но номер дома другой - НЕ совпадение!
     
     # Улица совпадает, но номер не указан в одном из адресов
-    return 50
\ No newline at end of file
+    return 50
+
+
+def address_match_score(query_address: str, target_address: str) -> int:
+    """
+    Вычислить score совпадения адресов
+    100 = точное совпадение номера дома и улицы
+    50 = совпадение улицы, номер не совпадает
+    0 = не совпадение
+    """
+    if not query_address or not target_address:
+        return 0
+    
+    return score_address_parts(address_match_parts(query_address), address_match_parts(target_address))
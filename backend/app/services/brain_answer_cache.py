@@ -0,0 +1,115 @@
+"""
+Answer cache for Single Brain (Stage 11): results of try_fast_answer keyed by the detected intent
+- key: intent type + normalized entities (address, month, dates) + intent keywords found in the message,
+  so "график уборки Билибина 6 октябрь" and "График уборки: билибина 6, октябрь!" share one entry
+- per-intent TTLs (BRAIN_ANSWER_TTL); tasks are not cached: they change without any event we hear
+- invalidation by source: finance writes -> "finance", Bitrix sync / webhook -> "bitrix",
+  house writes and house sync -> "houses"; caches registered with watch() are dropped too
+- only answers of the intended resolver are stored: fallback answers depend on the raw text
+"""
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import copy
+import logging
+import os
+
+from backend.app.services.brain import normalize_address
+from backend.app.services.brain_intents import intent_matcher
+from backend.app.services.brain_metrics import brain_metrics
+from backend.app.services.swr_cache import SWRCache
+
+logger = logging.getLogger(__name__)
+
+# 0 - cache disabled
+ENABLED = os.getenv("BRAIN_ANSWER_CACHE", "1") != "0"
+
+# Seconds per intent; the TTL is only a safety net for changes no event reports
+BRAIN_ANSWER_TTL: Dict[str, int] = {
+    "elder_contact": 600,
+    "brigade": 600,
+    "contractor_contacts": 600,
+    "cleaning_month": 300,
+    "structural_totals": 600,
+    "finance_basic": 300,
+    "finance_breakdown": 300,
+    "finance_mom": 300,
+    "finance_yoy": 600,
+    "finance_cat_trends": 600,
+    "tasks_by_address": 0,
+    "tasks_by_brigade": 0,
+}
+
+# What an intent's answer is built from
+INTENT_SOURCES: Dict[str, Tuple[str, ...]] = {
+    "elder_contact": ("bitrix",),
+    "brigade": ("bitrix",),
+    "contractor_contacts": ("bitrix",),
+    "cleaning_month": ("bitrix",),
+    "structural_totals": ("bitrix", "houses"),
+    "finance_basic": ("finance",),
+    "finance_breakdown": ("finance",),
+    "finance_mom": ("finance",),
+    "finance_yoy": ("finance",),
+    "finance_cat_trends": ("finance",),
+}
+
+
+class BrainAnswerCache:
+    def __init__(self, ttls: Dict[str, int]):
+        self._caches: Dict[str, SWRCache] = {
+            intent: SWRCache(f"brain.answer.{intent}", ttl, max_entries=256, revalidate=False)
+            for intent, ttl in ttls.items()
+            if ttl > 0
+        }
+        self._watched: Dict[str, List[SWRCache]] = {}
+        # invalidate() bumps the generation: answers computed across an invalidation are not stored
+        self.generation = 0
+
+    def key(self, message: str, ent: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Cache key for a detected intent, None when the intent is not cached"""
+        if not ENABLED or not ent or ent.get("type") not in self._caches:
+            return None
+        terms = ",".join(sorted(intent_matcher.keywords(message.lower())))
+        # the day: "last 30 days" and the current-month fallback of the resolvers move with it
+        return "|".join((
+            ent["type"],
+            normalize_address(ent.get("address")),
+            str(ent.get("month") or ""),
+            str(ent.get("date_range") or ""),
+            str(ent.get("specific_date") or ""),
+            terms,
+            date.today().isoformat(),
+        ))
+
+    def get(self, intent: str, key: str) -> Optional[Dict[str, Any]]:
+        val = self._caches[intent].get(key)
+        brain_metrics.record_answer_cache(intent, val is not None)
+        # callers add debug to the answer - never hand out the stored dict
+        return copy.deepcopy(val) if val is not None else None
+
+    def put(self, intent: str, key: str, answer: Dict[str, Any], generation: int) -> None:
+        if generation != self.generation:
+            return
+        self._caches[intent].set(key, copy.deepcopy(answer))
+
+    def watch(self, source: str, *caches: SWRCache) -> None:
+        """Caches to clear together with the answers of a source (e.g. BrainStore caches)"""
+        self._watched.setdefault(source, []).extend(caches)
+
+    def invalidate(self, *sources: str) -> None:
+        self.generation += 1
+        for source in sources:
+            for cache in self._watched.get(source, ()):
+                cache.clear()
+            for intent in self._intents(source):
+                self._caches[intent].clear()
+            brain_metrics.record_answer_invalidation(source)
+        logger.info(f"🧠 Brain answer cache invalidated: {', '.join(sources)}")
+
+    def _intents(self, source: str) -> Iterable[str]:
+        return [i for i in self._caches if source in INTENT_SOURCES.get(i, ())]
+
+
+brain_answer_cache = BrainAnswerCache(BRAIN_ANSWER_TTL)
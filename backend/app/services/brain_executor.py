@@ -0,0 +1,164 @@
+"""
+Speculative resolver execution for brain_router (Stage 10):
+- candidates run concurrently under one global deadline; the answer is the highest-priority success
+- losers are cancelled as soon as every higher-priority candidate has finished
+- candidates sharing a lane (the request's AsyncSession) run one at a time in priority order;
+  a lane call already in flight is awaited rather than cancelled so the session stays usable
+- cost hints: speculative (hedged) candidates wait for the primary ones at most their cost hint,
+  lane candidates are not started when their hint no longer fits into the remaining budget
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+import time
+
+from backend.app.services.brain_metrics import brain_metrics
+
+logger = logging.getLogger(__name__)
+
+Result = Optional[Dict[str, Any]]
+
+
+@dataclass
+class Candidate:
+    rule: str
+    call: Optional[Callable[[], Awaitable[Result]]]  # None: known miss (required entity missing), not run
+    cost_ms: int = 50
+    lane: Optional[str] = None
+    hedge: bool = False  # start when the primary candidates are done or after hedge_ms, whichever is first
+    hedge_ms: int = 0
+
+
+@dataclass
+class Outcome:
+    rule: str
+    status: str  # hit / miss / timeout
+    elapsed_ms: int = 0
+    result: Result = None
+
+
+async def _invoke(c: Candidate) -> Outcome:
+    t0 = time.monotonic()
+    try:
+        res = await c.call()
+    except Exception as e:
+        logger.warning(f"brain_resolver_error rule={c.rule}: {e}")
+        res = None
+    elapsed_ms = (time.monotonic() - t0) * 1000
+    brain_metrics.observe_resolver(c.rule, elapsed_ms)
+    elapsed = int(elapsed_ms)
+    if res and res.get("success"):
+        return Outcome(c.rule, "hit", elapsed, res)
+    return Outcome(c.rule, "miss", elapsed)
+
+
+def _decide(outcomes: List[Optional[Outcome]]) -> Tuple[bool, Optional[int]]:
+    """(decided, winner): decided once the first hit has no unfinished candidate before it"""
+    for i, o in enumerate(outcomes):
+        if o is None:
+            return False, None
+        if o.status == "hit":
+            return True, i
+    return True, None
+
+
+async def run_sequential(candidates: List[Candidate], deadline_ms: int) -> Tuple[Optional[int], List[Outcome]]:
+    """Legacy behaviour: one candidate after another, first success wins; none is started after the deadline"""
+    deadline = time.monotonic() + deadline_ms / 1000
+    outcomes: List[Outcome] = []
+    for i, c in enumerate(candidates):
+        if c.call is None:
+            outcomes.append(Outcome(c.rule, "miss"))
+            continue
+        if time.monotonic() >= deadline:
+            outcomes.append(Outcome(c.rule, "timeout"))
+            continue
+        o = await _invoke(c)
+        outcomes.append(o)
+        if o.status == "hit":
+            return i, outcomes
+    return None, outcomes
+
+
+async def run_speculative(candidates: List[Candidate], deadline_ms: int) -> Tuple[Optional[int], List[Outcome]]:
+    """
+    Run candidates concurrently; returns (winner index or None, outcomes in priority order up to the winner).
+    On the deadline the best finished success wins and unfinished candidates before it are reported as timeout
+    """
+    t0 = time.monotonic()
+    deadline = t0 + deadline_ms / 1000
+    outcomes: List[Optional[Outcome]] = [None] * len(candidates)
+    locks: Dict[str, asyncio.Lock] = {}
+    in_flight: Set[int] = set()  # lane calls that must not be cancelled
+    primaries = [i for i, c in enumerate(candidates) if c.call is not None and not c.hedge]
+    primaries_done = asyncio.Event()
+    if not primaries:
+        primaries_done.set()
+    stopped = False  # decided: candidates that have not started yet must not start (wait_for may swallow a cancel)
+
+    async def run(i: int, c: Candidate) -> Outcome:
+        if c.hedge and not primaries_done.is_set():
+            try:
+                await asyncio.wait_for(primaries_done.wait(), c.hedge_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+        if stopped:
+            return Outcome(c.rule, "miss")
+        if c.lane is None:
+            return await _invoke(c)
+        lock = locks.setdefault(c.lane, asyncio.Lock())
+        async with lock:
+            if stopped:
+                return Outcome(c.rule, "miss")
+            if time.monotonic() + c.cost_ms / 1000 > deadline:
+                return Outcome(c.rule, "timeout")
+            in_flight.add(i)
+            try:
+                return await _invoke(c)
+            finally:
+                in_flight.discard(i)
+
+    tasks: Dict[asyncio.Task, int] = {}
+    for i, c in enumerate(candidates):
+        if c.call is None:
+            outcomes[i] = Outcome(c.rule, "miss")
+        else:
+            tasks[asyncio.ensure_future(run(i, c))] = i
+
+    pending: Set[asyncio.Task] = set(tasks)
+    decided, winner = _decide(outcomes)
+    finished = False
+    try:
+        while pending and not decided:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                outcomes[tasks[t]] = t.result()
+            decided, winner = _decide(outcomes)
+            if not decided and not primaries_done.is_set() and all(outcomes[i] is not None for i in primaries):
+                primaries_done.set()
+        finished = True
+    finally:
+        stopped = True
+        # Cancel the losers; lane calls in flight finish first (cancelled mid-statement the shared
+        # session would be unusable for the caller). If we are cancelled ourselves, cancel everything
+        for t in pending:
+            if not finished or tasks[t] not in in_flight:
+                t.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    if not decided:
+        # Deadline: best finished success, unfinished candidates before it count as timeouts
+        winner = next((i for i, o in enumerate(outcomes) if o is not None and o.status == "hit"), None)
+        for i, c in enumerate(candidates):
+            if outcomes[i] is None:
+                outcomes[i] = Outcome(c.rule, "timeout", int((time.monotonic() - t0) * 1000))
+
+    end = len(outcomes) if winner is None else winner + 1
+    return winner, list(outcomes[:end])
@@ -1,10 +1,12 @@
 """
 Advanced Intent detection and entity extraction for Brain (Phase 2)
 Includes sophisticated NER for addresses, months, dates, and date ranges
+Intents are a declarative table (INTENT_RULES) compiled once into a single-pass keyword scanner
 """
 from __future__ import annotations
 
-from typing import Any, Dict, Optional, List, Tuple
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional, List, Tuple
 from datetime import datetime, timedelta
 import re
 
@@ -24,6 +26,29 @@ ADDRESS_STOP_WORDS = {
 }
 
 
+# Месяцы с различными формами: падежи, сокращения, числовые форматы
+MONTH_PATTERNS = {
+    'october': [
+        'октябр', 'окт', 'октября', 'октябре', 'октябрь', 'октябрём',
+        r'\b10\b', r'\b10\.', r'10/2025', r'2025-10', r'10-2025'
+    ],
+    'november': [
+        'ноябр', 'ноя', 'ноября', 'ноябре', 'ноябрь', 'ноябрём',
+        r'\b11\b', r'\b11\.', r'11/2025', r'2025-11', r'11-2025'
+    ],
+    'december': [
+        'декабр', 'дек', 'декабря', 'декабре', 'декабрь', 'декабрём',
+        r'\b12\b', r'\b12\.', r'12/2025', r'2025-12', r'12-2025'
+    ]
+}
+# Один regex на месяц; месяцы проверяются по порядку, как раньше
+_MONTH_RES = [
+    (month_key, re.compile('|'.join(f'(?:{p})' for p in patterns)))
+    for month_key, patterns in MONTH_PATTERNS.items()
+]
+_DIGIT_RE = re.compile(r'\d')
+
+
 def normalize_address_parts(text: str) -> str:
     """Нормализовать части адреса (к1 -> к 1, стр2 -> стр 2)"""
     # к1, к2 -> к 1, к 2
@@ -49,6 +74,10 @@ def extract_address(text: str) -> Optional[str]:
     if not text:
         return None
     
+    # Все паттерны ниже требуют номер дома
+    if not _DIGIT_RE.search(text):
+        return None
+    
     text_lower = text.lower()
     
     # Нормализуем части адреса
@@ -120,30 +149,11 @@ def extract_month(text: str, use_current_as_fallback: bool = False) -> Optional[
             return current_month
         return None
     
-    text_lower = text.lower()
-    
-    # Словарь месяцев с различными формами
-    month_patterns = {
-        'october': [
-            'октябр', 'окт', 'октября', 'октябре', 'октябрь', 'октябрём',
-            r'\b10\b', r'\b10\.', r'10/2025', r'2025-10', r'10-2025'
-        ],
-        'november': [
-            'ноябр', 'ноя', 'ноября', 'ноябре', 'ноябрь', 'ноябрём',
-            r'\b11\b', r'\b11\.', r'11/2025', r'2025-11', r'11-2025'
-        ],
-        'december': [
-            'декабр', 'дек', 'декабря', 'декабре', 'декабрь', 'декабрём',
-            r'\b12\b', r'\b12\.', r'12/2025', r'2025-12', r'12-2025'
-        ]
-    }
-    
-    # Проверяем каждый месяц
-    for month_key, patterns in month_patterns.items():
-        for pattern in patterns:
-            if re.search(pattern, text_lower):
-                logger.info(f"[extract_month] Found month '{month_key}' in text: '{text}' via pattern: '{pattern}'")
-                return month_key
+    found = _find_month(text.lower())
+    if found:
+        month_key, matched = found
+        logger.info(f"[extract_month] Found month '{month_key}' in text: '{text}' via match: '{matched}'")
+        return month_key
     
     # Если месяц не найден и включен fallback
     if use_current_as_fallback:
@@ -155,6 +165,15 @@ def extract_month(text: str, use_current_as_fallback: bool = False) -> Optional[
     return None
 
 
+def _find_month(text_lower: str) -> Optional[Tuple[str, str]]:
+    """(month_key, совпавший фрагмент) по MONTH_PATTERNS, без логирования"""
+    for month_key, pattern in _MONTH_RES:
+        m = pattern.search(text_lower)
+        if m:
+            return month_key, m.group(0)
+    return None
+
+
 def _get_current_month() -> str:
     """
     Получить текущий месяц в формате october/november/december
@@ -307,134 +326,225 @@ def extract_date_range(text: str) -> Optional[Dict[str, Any]]:
     return None
 
 
-def detect_intent(message: str) -> Optional[Dict[str, Any]]:
+@dataclass(frozen=True)
+class IntentRule:
     """
-    Продвинутое определение намерения пользователя с извлечением сущностей
-    Использует приоритеты при множественных совпадениях
+    score = base (if any keyword found) + keyword weights + bonus groups + entity bonuses;
+    the intent is a candidate when score >= threshold, with `fixed` as its score if set
     """
-    if not message:
-        return None
-    
-    tl = message.lower()
-    result = {}
-    
-    # Извлекаем все возможные сущности
-    address = extract_address(message)
-    month = extract_month(message)
-    date_range = extract_date_range(message)
-    specific_date = extract_specific_date(message)
-    
-    # Вычисляем scores для каждого типа запроса
-    intent_scores = {}
-    
+    name: str
+    keywords: Tuple[Tuple[str, int], ...]
+    base: int = 0
+    threshold: int = 1
+    fixed: Optional[int] = None
+    entities: Tuple[Tuple[str, int], ...] = ()  # ('address' | 'month', points)
+    bonus: Tuple[Tuple[Tuple[str, ...], int], ...] = ()  # (group, points once if any found)
+    also_any: Tuple[str, ...] = ()  # one of these must be found as well
+    unless_any: Tuple[str, ...] = ()  # none of these may be found
+    unless_intents: Tuple[str, ...] = ()  # none of these may already be candidates
+
+
+def _kw(weight: int, *words: str) -> Tuple[Tuple[str, int], ...]:
+    return tuple((w, weight) for w in words)
+
+
+# Порядок важен: при равных score побеждает правило выше
+INTENT_RULES: Tuple[IntentRule, ...] = (
     # 1. Контакты старшего (высокий приоритет при явном упоминании)
-    elder_keywords = ["контакт", "телефон", "номер", "почта", "email", "связ"]
-    elder_targets = ["старш"]
-    elder_score = 0
-    for kw in elder_keywords:
-        if kw in tl:
-            elder_score += 2
-    for tg in elder_targets:
-        if tg in tl:
-            elder_score += 3
-    if address:
-        elder_score += 1
-    if elder_score >= 3:
-        intent_scores['elder_contact'] = elder_score
-    
+    IntentRule(
+        'elder_contact',
+        _kw(2, "контакт", "телефон", "номер", "почта", "email", "связ") + _kw(3, "старш"),
+        threshold=3,
+        entities=(('address', 1),),
+    ),
     # 2. График уборок (высокий приоритет при месяце + адресе)
-    cleaning_keywords = ["уборк", "график", "расписан", "когда", "дат"]
-    cleaning_score = 0
-    for kw in cleaning_keywords:
-        if kw in tl:
-            cleaning_score += 2
-    if month:
-        cleaning_score += 3
-    if address:
-        cleaning_score += 2
-    if cleaning_score >= 2:
-        intent_scores['cleaning_month'] = cleaning_score
-    
+    IntentRule(
+        'cleaning_month',
+        _kw(2, "уборк", "график", "расписан", "когда", "дат"),
+        threshold=2,
+        entities=(('month', 3), ('address', 2)),
+    ),
     # 3. Бригада по адресу
-    brigade_keywords = ["бригад", "кто убирает", "какая команда"]
-    brigade_score = 0
-    for kw in brigade_keywords:
-        if kw in tl:
-            brigade_score += 3
-    if address:
-        brigade_score += 2
-    if brigade_score >= 3:
-        intent_scores['brigade'] = brigade_score
-    
+    IntentRule(
+        'brigade',
+        _kw(3, "бригад", "кто убирает", "какая команда"),
+        threshold=3,
+        entities=(('address', 2),),
+    ),
     # 4. Структурные суммы (квартиры, этажи, подъезды, дома)
-    structural_keywords = ["квартир", "этаж", "подъезд", "сколько домов", "всего", "статистика"]
-    structural_score = 0
-    for kw in structural_keywords:
-        if kw in tl:
-            structural_score += 2
-    if structural_score >= 2:
-        intent_scores['structural_totals'] = structural_score
-    
+    IntentRule(
+        'structural_totals',
+        _kw(2, "квартир", "этаж", "подъезд", "сколько домов", "всего", "статистика"),
+        threshold=2,
+    ),
     # 5. Финансы - год к году (наивысший приоритет среди финансов)
-    if any(k in tl for k in ["yoy", "г/г", "год к году", "годовая динамика"]):
-        intent_scores['finance_yoy'] = 10
-    
+    IntentRule('finance_yoy', _kw(1, "yoy", "г/г", "год к году", "годовая динамика"), fixed=10),
     # 6. Финансы - месяц к месяцу
-    if any(k in tl for k in ["м/м", "месяц к месяц", "месячная динамика"]) and not any(k in tl for k in ["г/г", "год"]):
-        intent_scores['finance_mom'] = 9
-    
+    IntentRule(
+        'finance_mom',
+        _kw(1, "м/м", "месяц к месяц", "месячная динамика"),
+        fixed=9,
+        unless_any=("г/г", "год"),
+    ),
     # 7. Финансы - тренды категорий
-    trend_keywords = ["топ", "рост", "падени", "лидеры", "просели", "тренд"]
-    if any(k in tl for k in trend_keywords):
-        intent_scores['finance_cat_trends'] = 8
-    
+    IntentRule('finance_cat_trends', _kw(1, "топ", "рост", "падени", "лидеры", "просели", "тренд"), fixed=8),
     # 8. Финансы - разбивка по категориям
-    breakdown_keywords = ["категори", "разбивк", "по категор", "структура расходов"]
-    if any(k in tl for k in breakdown_keywords):
-        intent_scores['finance_breakdown'] = 7
-    
-    # 9. Финансы - базовые (самый низкий приоритет среди финансов)
-    finance_basic_keywords = ["финанс", "деньги", "баланс", "прибыль", "доход", "расход"]
-    finance_basic_score = 0
-    for kw in finance_basic_keywords:
-        if kw in tl:
-            finance_basic_score += 1
-    # Исключаем, если есть более специфичные финансовые запросы
-    if finance_basic_score >= 1 and not any(k in ['finance_yoy', 'finance_mom', 'finance_cat_trends', 'finance_breakdown'] for k in intent_scores.keys()):
-        intent_scores['finance_basic'] = 5
-    
+    IntentRule('finance_breakdown', _kw(1, "категори", "разбивк", "по категор", "структура расходов"), fixed=7),
+    # 9. Финансы - базовые (только если нет более специфичных финансовых запросов)
+    IntentRule(
+        'finance_basic',
+        _kw(1, "финанс", "деньги", "баланс", "прибыль", "доход", "расход"),
+        fixed=5,
+        unless_intents=('finance_yoy', 'finance_mom', 'finance_cat_trends', 'finance_breakdown'),
+    ),
     # 10. Контакты подрядчиков/УК
-    contractor_keywords = ["подрядчик", "управляющ", "компани", "ук", "контакты ук"]
-    contractor_score = 0
-    for kw in contractor_keywords:
-        if kw in tl:
-            contractor_score += 2
-    if contractor_score >= 2:
-        intent_scores['contractor_contacts'] = 6
-    
+    IntentRule('contractor_contacts', _kw(2, "подрядчик", "управляющ", "компани", "ук", "контакты ук"), threshold=2, fixed=6),
     # 11. Задачи/жалобы по адресу
-    if any(k in tl for k in ["задач", "жалоб", "заявк", "проблем"]):
-        tasks_score = 4
-        if address:
-            tasks_score += 2
-        if any(k in tl for k in ["по адресу", "на доме", "объект"]):
-            tasks_score += 1
-        if tasks_score >= 4:
-            intent_scores['tasks_by_address'] = tasks_score
-    
+    IntentRule(
+        'tasks_by_address',
+        _kw(0, "задач", "жалоб", "заявк", "проблем"),
+        base=4,
+        threshold=4,
+        entities=(('address', 2),),
+        bonus=((("по адресу", "на доме", "объект"), 1),),
+    ),
     # 12. Задачи по бригаде
-    if any(k in tl for k in ["задач", "жалоб", "заявк"]) and any(k in tl for k in ["бригад", "у бригады"]):
-        intent_scores['tasks_by_brigade'] = 7
-    
-    # Выбираем intent с наивысшим score
+    IntentRule(
+        'tasks_by_brigade',
+        _kw(0, "задач", "жалоб", "заявк"),
+        base=7,
+        threshold=7,
+        also_any=("бригад", "у бригады"),
+    ),
+)
+
+
+def _trie_regex(words: Iterable[str]) -> str:
+    """Regex из префиксного дерева слов: ветвление по первому символу, жадно - самое длинное слово"""
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node: Dict[str, Any]) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ''
+        body = alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+class IntentMatcher:
+    """
+    Собранный один раз сканер ключевых слов для INTENT_RULES: один проход regex по тексту
+    вместо десятков `kw in tl`, очки начисляются только правилам, чьи слова нашлись
+    """
+
+    def __init__(self, rules: Iterable[IntentRule]):
+        self.rules = tuple(rules)
+        words = set()
+        # слово -> [(номер правила, вес)]; бонусные группы считаются по одному разу, отдельно
+        self._index: Dict[str, List[Tuple[int, int]]] = {}
+        for i, r in enumerate(self.rules):
+            for w, weight in r.keywords:
+                self._index.setdefault(w, []).append((i, weight))
+            words.update(w for w, _ in r.keywords)
+            words.update(w for group, _ in r.bonus for w in group)
+            words.update(r.also_any)
+            words.update(r.unless_any)
+        self._entity_max = [sum(points for _, points in r.entities) for r in self.rules]
+        self._scanner = re.compile(_trie_regex(words))
+        # Самое длинное слово на позиции подразумевает все слова-префиксы, начинающиеся там же
+        self._implied = {w: frozenset(k for k in words if w.startswith(k)) for w in words}
+
+    def keywords(self, tl: str) -> set:
+        # search с каждой следующей позиции: пересекающиеся вхождения тоже находятся
+        found = set()
+        search, implied = self._scanner.search, self._implied
+        m = search(tl)
+        while m:
+            found |= implied[m.group()]
+            m = search(tl, m.start() + 1)
+        return found
+
+    def scores(self, tl: str, entity: Callable[[str], Any]) -> Dict[str, int]:
+        found = self.keywords(tl)
+        n = len(self.rules)
+        points = [0] * n
+        hit = [False] * n
+        for w in found:
+            for i, weight in self._index.get(w, ()):
+                points[i] += weight
+                hit[i] = True
+
+        scores: Dict[str, int] = {}
+        for i, r in enumerate(self.rules):
+            score = points[i]
+            if hit[i]:
+                score += r.base
+            if r.bonus:
+                for group, bonus in r.bonus:
+                    if not found.isdisjoint(group):
+                        score += bonus
+            elif not hit[i] and not self._entity_max[i]:
+                continue
+            if score + self._entity_max[i] < r.threshold:
+                continue  # не дотянуть и с сущностями - не извлекаем их ради этого правила
+            for name, bonus in r.entities:
+                if entity(name):
+                    score += bonus
+            if score < r.threshold:
+                continue
+            if r.also_any and found.isdisjoint(r.also_any):
+                continue
+            if r.unless_any and not found.isdisjoint(r.unless_any):
+                continue
+            if r.unless_intents and not scores.keys().isdisjoint(r.unless_intents):
+                continue
+            scores[r.name] = r.fixed if r.fixed is not None else score
+        return scores
+
+
+intent_matcher = IntentMatcher(INTENT_RULES)
+
+
+def detect_intent(message: str) -> Optional[Dict[str, Any]]:
+    """
+    Продвинутое определение намерения пользователя с извлечением сущностей
+    Использует приоритеты при множественных совпадениях (INTENT_RULES)
+    Адрес и месяц извлекаются, только когда могут изменить score; даты - только для найденного намерения
+    """
+    if not message:
+        return None
+
+    tl = message.lower()
+    entities: Dict[str, Any] = {}
+
+    def entity(name: str) -> Any:
+        if name not in entities:
+            if name == 'address':
+                entities[name] = extract_address(message)
+            else:
+                found = _find_month(tl)
+                entities[name] = found[0] if found else None
+        return entities[name]
+
+    intent_scores = intent_matcher.scores(tl, entity)
     if not intent_scores:
         return None
-    
+
     best_intent = max(intent_scores.items(), key=lambda x: x[1])
-    result['type'] = best_intent[0]
-    result['confidence'] = best_intent[1]
-    
+    result: Dict[str, Any] = {'type': best_intent[0], 'confidence': best_intent[1]}
+
     # Добавляем извлечённые сущности
+    address = entity('address')
+    month = entity('month')
+    date_range = extract_date_range(message)
+    specific_date = extract_specific_date(message)
     if address:
         result['address'] = address
     if month:
@@ -443,5 +553,5 @@ def detect_intent(message: str) -> Optional[Dict[str, Any]]:
         result['date_range'] = date_range
     if specific_date:
         result['specific_date'] = specific_date
-    
-    return result
\ No newline at end of file
+
+    return result
@@ -3,32 +3,125 @@ In-memory metrics for Single Brain (Stage 7):
 - resolver_counts: how many times each rule answered
 - resolver_times_ms: cumulative time per rule
 - cache_stats: counters of hit/miss per store key
+- answer_cache_*: answer cache hit/miss per intent, invalidations per source (Stage 11)
+Instrumentation (Stage 12):
+- fixed-bucket latency histograms per resolver call and per BrainStore area (p50/p95/p99 in snapshot())
+- circuit breaker opens and stale serves per BrainStore area
+- render_text(): Prometheus text format for /metrics
+- flush_brain_metrics(): the interval since the previous flush as a row of brain_metrics_snapshots
+Recording is a dict lookup and a list increment: no locks (one event loop per process), no new objects
+after the first observation of a key
 """
 from __future__ import annotations
 
-from typing import Dict
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
 from collections import defaultdict
 from datetime import datetime, timezone
+import json
+import logging
+import os
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency buckets, ms; the last bucket is +Inf
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "sum_ms")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.sum_ms = 0.0
+
+    def observe(self, elapsed_ms: float) -> None:
+        # bucket i holds LATENCY_BUCKETS_MS[i-1] < ms <= LATENCY_BUCKETS_MS[i]
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        self.sum_ms += elapsed_ms
+
+
+def quantile(counts: List[int], q: float) -> Optional[float]:
+    """Quantile estimate from bucket counts: linear inside the bucket, as histogram_quantile in Prometheus"""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for i, c in enumerate(counts):
+        if c and seen + c >= rank:
+            if i == len(LATENCY_BUCKETS_MS):
+                return float(LATENCY_BUCKETS_MS[-1])
+            lower = LATENCY_BUCKETS_MS[i - 1] if i else 0.0
+            return round(lower + (LATENCY_BUCKETS_MS[i] - lower) * (rank - seen) / c, 2)
+        seen += c
+    return float(LATENCY_BUCKETS_MS[-1])
+
+
+def _histogram_summary(counts: List[int], sum_ms: float) -> Dict[str, Any]:
+    return {
+        "count": sum(counts),
+        "sum_ms": round(sum_ms, 2),
+        "buckets": list(counts),
+        "p50": quantile(counts, 0.50),
+        "p95": quantile(counts, 0.95),
+        "p99": quantile(counts, 0.99),
+    }
 
 
 class BrainMetrics:
     def __init__(self):
         self.started_at = datetime.now(timezone.utc).isoformat()
+        self.started_ts = time.time()
         self.resolver_counts: Dict[str, int] = defaultdict(int)
         self.resolver_times_ms: Dict[str, int] = defaultdict(int)
         self.cache_hits: Dict[str, int] = defaultdict(int)
         self.cache_misses: Dict[str, int] = defaultdict(int)
+        self.answer_cache_hits: Dict[str, int] = defaultdict(int)
+        self.answer_cache_misses: Dict[str, int] = defaultdict(int)
+        self.answer_cache_invalidations: Dict[str, int] = defaultdict(int)
+        self.resolver_latency: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.store_latency: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.breaker_opens: Dict[str, int] = defaultdict(int)
+        self.stale_serves: Dict[str, int] = defaultdict(int)
+        # cumulative state at the last flush_brain_metrics() - intervals are differences to it
+        self._flushed: Dict[str, Any] = {}
 
     def record_resolver(self, rule: str, elapsed_ms: int) -> None:
         self.resolver_counts[rule] += 1
         self.resolver_times_ms[rule] += int(elapsed_ms)
 
+    def observe_resolver(self, rule: str, elapsed_ms: float) -> None:
+        """Latency of one resolver call, hit or miss"""
+        self.resolver_latency[rule].observe(elapsed_ms)
+
+    def observe_store(self, area: str, elapsed_ms: float) -> None:
+        """Latency of one BrainStore lookup, cached or loaded"""
+        self.store_latency[area].observe(elapsed_ms)
+
+    def record_breaker_open(self, area: str) -> None:
+        self.breaker_opens[area] += 1
+
+    def record_stale(self, area: str) -> None:
+        self.stale_serves[area] += 1
+
     def record_cache(self, area: str, hit: bool) -> None:
         if hit:
             self.cache_hits[area] += 1
         else:
             self.cache_misses[area] += 1
 
+    def record_answer_cache(self, intent: str, hit: bool) -> None:
+        if hit:
+            self.answer_cache_hits[intent] += 1
+        else:
+            self.answer_cache_misses[intent] += 1
+
+    def record_answer_invalidation(self, source: str) -> None:
+        self.answer_cache_invalidations[source] += 1
+
     def snapshot(self) -> Dict[str, dict]:
         return {
             "started_at": self.started_at,
@@ -36,7 +129,113 @@ class BrainMetrics:
             "resolver_times_ms": dict(self.resolver_times_ms),
             "cache_hits": dict(self.cache_hits),
             "cache_misses": dict(self.cache_misses),
+            "answer_cache_hits": dict(self.answer_cache_hits),
+            "answer_cache_misses": dict(self.answer_cache_misses),
+            "answer_cache_invalidations": dict(self.answer_cache_invalidations),
+            "breaker_opens": dict(self.breaker_opens),
+            "stale_serves": dict(self.stale_serves),
+            "latency_buckets_ms": list(LATENCY_BUCKETS_MS),
+            "resolver_latency_ms": {k: _histogram_summary(h.counts, h.sum_ms) for k, h in self.resolver_latency.items()},
+            "store_latency_ms": {k: _histogram_summary(h.counts, h.sum_ms) for k, h in self.store_latency.items()},
         }
 
+    # --- Prometheus text format ---
+
+    _COUNTERS = (
+        ("brain_resolver_answers_total", "Answers per rule", "rule", "resolver_counts"),
+        ("brain_store_cache_hits_total", "BrainStore cache hits per area", "area", "cache_hits"),
+        ("brain_store_cache_misses_total", "BrainStore cache misses per area", "area", "cache_misses"),
+        ("brain_answer_cache_hits_total", "Answer cache hits per intent", "intent", "answer_cache_hits"),
+        ("brain_answer_cache_misses_total", "Answer cache misses per intent", "intent", "answer_cache_misses"),
+        ("brain_answer_cache_invalidations_total", "Answer cache invalidations per source", "source", "answer_cache_invalidations"),
+        ("brain_breaker_opens_total", "Circuit breaker opens per BrainStore area", "area", "breaker_opens"),
+        ("brain_stale_serves_total", "Stale values served per BrainStore area", "area", "stale_serves"),
+    )
+
+    def render_text(self) -> str:
+        lines: List[str] = [
+            "# HELP brain_start_time_seconds Start of the metrics window (process start)",
+            "# TYPE brain_start_time_seconds gauge",
+            f"brain_start_time_seconds {self.started_ts:.3f}",
+        ]
+        for name, help_text, label, attr in self._COUNTERS:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(getattr(self, attr).items()):
+                lines.append(f'{name}{{{label}="{_escape(key)}"}} {value}')
+        for name, help_text, label, hists in (
+            ("brain_resolver_latency_ms", "Resolver call latency, ms", "rule", self.resolver_latency),
+            ("brain_store_latency_ms", "BrainStore lookup latency, ms", "area", self.store_latency),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, h in sorted(hists.items()):
+                lv = _escape(key)
+                cumulative = 0
+                for bound, c in zip(LATENCY_BUCKETS_MS + ("+Inf",), h.counts):
+                    cumulative += c
+                    lines.append(f'{name}_bucket{{{label}="{lv}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{label}="{lv}"}} {h.sum_ms:.3f}')
+                lines.append(f'{name}_count{{{label}="{lv}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+    # --- snapshots for brain_metrics_snapshots ---
+
+    def _cumulative(self) -> Dict[str, Any]:
+        state: Dict[str, Any] = {attr: dict(getattr(self, attr)) for _, _, _, attr in self._COUNTERS}
+        state["resolver_latency"] = {k: (list(h.counts), h.sum_ms) for k, h in self.resolver_latency.items()}
+        state["store_latency"] = {k: (list(h.counts), h.sum_ms) for k, h in self.store_latency.items()}
+        return state
+
+    def interval(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Counters and histograms of `state` (from _cumulative) minus the last flushed state"""
+        prev = self._flushed
+        out: Dict[str, Any] = {}
+        for _, _, _, attr in self._COUNTERS:
+            before = prev.get(attr, {})
+            out[attr] = {k: v - before.get(k, 0) for k, v in state[attr].items() if v - before.get(k, 0)}
+        for attr in ("resolver_latency", "store_latency"):
+            before = prev.get(attr, {})
+            hists = {}
+            for k, (counts, sum_ms) in state[attr].items():
+                b_counts, b_sum = before.get(k, ([0] * len(counts), 0.0))
+                delta = [c - b for c, b in zip(counts, b_counts)]
+                if any(delta):
+                    hists[k] = _histogram_summary(delta, sum_ms - b_sum)
+            out[attr + "_ms"] = hists
+        return out
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+brain_metrics = BrainMetrics()
+
+INSTANCE = f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def flush_brain_metrics() -> bool:
+    """Write the interval since the previous flush to brain_metrics_snapshots (agent dashboard trends)"""
+    from backend.app.config.database import get_db_pool
 
-brain_metrics = BrainMetrics()
\ No newline at end of file
+    pool = await get_db_pool()
+    if not pool:
+        return False
+    state = brain_metrics._cumulative()
+    data = brain_metrics.interval(state)
+    try:
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO brain_metrics_snapshots (instance, started_at, data)
+                VALUES ($1, $2, $3::jsonb)
+                """,
+                INSTANCE, datetime.fromisoformat(brain_metrics.started_at), json.dumps(data, ensure_ascii=False),
+            )
+    except Exception as e:
+        # the interval is not lost: the next flush covers it too
+        logger.warning(f"⚠️ Brain metrics flush failed: {e}")
+        return False
+    brain_metrics._flushed = state
+    return True
@@ -9,11 +9,15 @@ import re
 from sqlalchemy import text as sql_text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.app.services.brain_answer_cache import brain_answer_cache
 from backend.app.services.brain_intents import extract_address, extract_month
 from backend.app.services.brain_store import BrainStore
 
 # Singleton BrainStore instance
 _brain_store = BrainStore()
+# Answers are rebuilt from the store: drop its entries with them
+brain_answer_cache.watch("bitrix", _brain_store.addr_cache, _brain_store.contact_cache)
+brain_answer_cache.watch("finance", _brain_store.finance_cache)
 
 
 def _success(answer: str, data: Optional[Dict[str, Any]] = None, rule: Optional[str] = None, sources: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -321,6 +325,7 @@ async def resolve_structural_totals(text: str, db: AsyncSession, ent: Optional[D
                     SUM(floors_count) as total_floors,
                     SUM(entrances_count) as total_entrances
                 FROM houses
+                WHERE deleted_at IS NULL
                 """
             )
             res = await db.execute(q)
@@ -1,13 +1,21 @@
 """
 Observability (Stage 9): structured logging, matched_rules trace, sources in debug
+Speculative execution (Stage 10): the intended resolver and the legacy fallback chain run concurrently
+via brain_executor under BRAIN_FAST_DEADLINE_MS; resolvers without their required entities are skipped
+Answer cache (Stage 11): answers of the intended resolver are served from brain_answer_cache
 """
 from __future__ import annotations
 
+from dataclasses import dataclass
 from typing import Any, Optional, Dict, List, Tuple
 import logging
+import os
 import time
 
-from backend.app.services.brain_intents import detect_intent
+from backend.app.services.brain_answer_cache import brain_answer_cache
+from backend.app.services.brain_executor import Candidate, run_sequential, run_speculative
+from backend.app.services.brain_intents import detect_intent, extract_address, extract_month
+from backend.app.services.brain_metrics import brain_metrics
 from backend.app.services.brain_resolvers import (
     resolve_elder_contact,
     resolve_cleaning_month,
@@ -27,122 +35,175 @@ from backend.app.services.brain_resolvers_stage6 import (
 
 logger = logging.getLogger(__name__)
 
+# Global budget for the fast path; after it ai_chat falls through to the LLM
+FAST_DEADLINE_MS = int(os.getenv("BRAIN_FAST_DEADLINE_MS", "4000"))
+# 0 - legacy sequential chain (same trace, no concurrency)
+SPECULATIVE = os.getenv("BRAIN_SPECULATIVE", "1") != "0"
+
+
+@dataclass(frozen=True)
+class ResolverSpec:
+    fn: Any
+    needs_db: bool
+    cost_ms: int  # typical latency on a cold cache: hedge delay and deadline admission
+    requires: Tuple[str, ...] = ()  # entities without which the resolver can only miss
+
+
+RESOLVERS: Dict[str, ResolverSpec] = {
+    # Bitrix-backed (BrainStore caches)
+    "elder_contact": ResolverSpec(resolve_elder_contact, False, 400, ("address",)),
+    "cleaning_month": ResolverSpec(resolve_cleaning_month, False, 300, ("address",)),
+    "brigade": ResolverSpec(resolve_brigade_by_address, False, 300, ("address",)),
+    "contractor_contacts": ResolverSpec(resolve_contractor_contacts, False, 300, ("address",)),
+    # DB-backed: share the request session, so they run one at a time
+    "structural_totals": ResolverSpec(resolve_structural_totals, True, 30),
+    "finance_basic": ResolverSpec(resolve_finance_basic, True, 40),
+    "finance_breakdown": ResolverSpec(resolve_finance_breakdown, True, 60),
+    "finance_mom": ResolverSpec(resolve_finance_mom, True, 60),
+    "finance_yoy": ResolverSpec(resolve_finance_yoy, True, 120),
+    "finance_cat_trends": ResolverSpec(resolve_finance_category_trends, True, 120),
+    "tasks_by_address": ResolverSpec(resolve_tasks_by_address, True, 30, ("address",)),
+    "tasks_by_brigade": ResolverSpec(resolve_tasks_by_brigade, True, 30),
+}
+
+# Legacy fallback order: Bitrix-backed first, then DB-backed (only with a session)
+FALLBACK_WITHOUT_DB = ["elder_contact", "cleaning_month", "brigade", "contractor_contacts"]
+FALLBACK_WITH_DB = [
+    "structural_totals",
+    "finance_basic",
+    "finance_breakdown",
+    "finance_mom",
+    "finance_yoy",
+    "finance_cat_trends",
+    "tasks_by_address",
+    "tasks_by_brigade",
+]
+
+
+def _candidates(message: str, db: Any, ent: Optional[Dict[str, Any]]) -> List[Candidate]:
+    entities: Dict[str, Any] = {}
+
+    def has(name: str) -> bool:
+        if name not in entities:
+            if name == "address":
+                entities[name] = (ent or {}).get("address") or extract_address(message)
+            elif name == "month":
+                entities[name] = (ent or {}).get("month") or extract_month(message)
+            else:
+                entities[name] = None
+        return bool(entities[name])
+
+    def make(rule: str, with_ent: bool, hedge_ms: int = 0) -> Candidate:
+        spec = RESOLVERS[rule]
+        args = (message, db) if spec.needs_db else (message,)
+        if with_ent:
+            args += (ent,)
+        call = None
+        if all(has(e) for e in spec.requires):
+            call = lambda: spec.fn(*args)  # noqa: E731
+        return Candidate(
+            rule,
+            call,
+            cost_ms=spec.cost_ms,
+            lane="db" if spec.needs_db else None,
+            hedge=hedge_ms > 0,
+            hedge_ms=hedge_ms,
+        )
+
+    out: List[Candidate] = []
+    intended = (ent or {}).get("type")
+    if intended not in RESOLVERS or (RESOLVERS[intended].needs_db and db is None):
+        intended = None
+    if intended:
+        out.append(make(intended, True))
+    # The fallback chain is speculative. Bitrix-backed resolvers start at once: for one address they
+    # share the single-flight BrainStore load. DB-backed ones would add queries, so they are hedged:
+    # started when the intended resolver is done or after its cost hint, whichever comes first
+    hedge_ms = RESOLVERS[intended].cost_ms if intended else 0
+    for rule in FALLBACK_WITHOUT_DB + (FALLBACK_WITH_DB if db is not None else []):
+        cand = make(rule, False, hedge_ms if RESOLVERS[rule].needs_db else 0)
+        if rule == intended:
+            # Same resolver without entities: cannot hit where the intended call missed
+            cand.call = None
+        out.append(cand)
+    return out
+
+
+def _log_answer(rule: str, res: Dict[str, Any], elapsed: int, t0: float) -> None:
+    # Structured log with sources and cache meta if present
+    sources = res.get("sources") or {}
+    log_obj = {
+        "event": "brain_answer",
+        "rule": rule,
+        "elapsed_ms": elapsed,
+        "total_ms": int((time.monotonic() - t0) * 1000),
+        "sources": sources,
+    }
+    # Try to surface cache meta if exists
+    cache_meta = {}
+    if isinstance(sources, dict):
+        if "cache" in sources:
+            cache_meta["root"] = sources.get("cache")
+        # common nested shapes we used earlier
+        for k in ("houses", "elder", "cleaning", "finance"):
+            if k in sources and isinstance(sources[k], dict) and "cache" in sources[k]:
+                cache_meta[k] = sources[k]["cache"]
+        if cache_meta:
+            log_obj["cache_meta"] = cache_meta
+    logger.info(log_obj)
+
+
+def _cached_answer(rule: str, res: Dict[str, Any], t0: float, return_debug: bool) -> Dict[str, Any]:
+    elapsed = int((time.monotonic() - t0) * 1000)
+    logger.info({"event": "brain_answer", "rule": rule, "elapsed_ms": elapsed, "total_ms": elapsed, "cache": "answer"})
+    if return_debug:
+        res.setdefault("debug", {})
+        res["debug"].update({
+            "matched_rule": rule,
+            "matched_rules": [rule],
+            "elapsed_ms": elapsed,
+            "trace": [{"rule": rule, "status": "cached", "elapsed_ms": 0}],
+            "answer_cache": "hit",
+        })
+    return res
+
 
 async def try_fast_answer(message: str, db: Any = None, return_debug: bool = False) -> Optional[Dict[str, Any]]:
     t0 = time.monotonic()
     ent = detect_intent(message)
-    trace: List[Dict[str, Any]] = []
-
-    async def attempt(rule: str, fn, *args, **kwargs) -> Optional[Dict[str, Any]]:
-        t_rule = time.monotonic()
-        try:
-            res = await fn(*args, **kwargs)
-        except Exception as e:
-            logger.warning(f"brain_resolver_error rule={rule}: {e}")
-            res = None
-        elapsed = int((time.monotonic() - t_rule) * 1000)
-        status = "hit" if (res and res.get("success")) else "miss"
-        trace.append({"rule": rule, "status": status, "elapsed_ms": elapsed})
-        if res and res.get("success"):
-            # Structured log with sources and cache meta if present
-            sources = res.get("sources") or {}
-            log_obj = {
-                "event": "brain_answer",
-                "rule": rule,
-                "elapsed_ms": elapsed,
-                "total_ms": int((time.monotonic() - t0) * 1000),
-                "sources": sources,
-            }
-            # Try to surface cache meta if exists
-            cache_meta = {}
-            if isinstance(sources, dict):
-                if "cache" in sources:
-                    cache_meta["root"] = sources.get("cache")
-                # common nested shapes we used earlier
-                for k in ("houses", "elder", "cleaning", "finance"):
-                    if k in sources and isinstance(sources[k], dict) and "cache" in sources[k]:
-                        cache_meta[k] = sources[k]["cache"]
-                if cache_meta:
-                    log_obj["cache_meta"] = cache_meta
-            logger.info(log_obj)
-            if return_debug:
-                res.setdefault("debug", {})
-                res["debug"].update({
-                    "matched_rule": rule,
-                    "matched_rules": [tr["rule"] for tr in trace if tr.get("status") == "hit"],
-                    "elapsed_ms": int((time.monotonic() - t0) * 1000),
-                    "trace": trace,
-                })
-            return res
-        return None
-
-    # Intent-driven attempts first
-    if ent:
-        t = ent.get("type")
-        if t == "elder_contact":
-            res = await attempt("elder_contact", resolve_elder_contact, message, ent)
-            if res: return res
-        elif t == "cleaning_month":
-            res = await attempt("cleaning_month", resolve_cleaning_month, message, ent)
-            if res: return res
-        elif t == "brigade":
-            res = await attempt("brigade", resolve_brigade_by_address, message, ent)
-            if res: return res
-        elif t == "structural_totals" and db is not None:
-            res = await attempt("structural_totals", resolve_structural_totals, message, db, ent)
-            if res: return res
-        elif t == "finance_basic" and db is not None:
-            res = await attempt("finance_basic", resolve_finance_basic, message, db, ent)
-            if res: return res
-        elif t == "finance_breakdown" and db is not None:
-            res = await attempt("finance_breakdown", resolve_finance_breakdown, message, db, ent)
-            if res: return res
-        elif t == "finance_mom" and db is not None:
-            res = await attempt("finance_mom", resolve_finance_mom, message, db, ent)
-            if res: return res
-        elif t == "finance_yoy" and db is not None:
-            res = await attempt("finance_yoy", resolve_finance_yoy, message, db, ent)
-            if res: return res
-        elif t == "finance_cat_trends" and db is not None:
-            res = await attempt("finance_cat_trends", resolve_finance_category_trends, message, db, ent)
-            if res: return res
-        elif t == "contractor_contacts":
-            res = await attempt("contractor_contacts", resolve_contractor_contacts, message, ent)
-            if res: return res
-        elif t == "tasks_by_address" and db is not None:
-            res = await attempt("tasks_by_address", resolve_tasks_by_address, message, db, ent)
-            if res: return res
-        elif t == "tasks_by_brigade" and db is not None:
-            res = await attempt("tasks_by_brigade", resolve_tasks_by_brigade, message, db, ent)
-            if res: return res
-
-    # Legacy fallback order
-    order_wo_db: List[Tuple[str, Any]] = [
-        ("elder_contact", resolve_elder_contact),
-        ("cleaning_month", resolve_cleaning_month),
-        ("brigade", resolve_brigade_by_address),
-        ("contractor_contacts", resolve_contractor_contacts),
+    intended = (ent or {}).get("type")
+    cache_key = None
+    if intended in RESOLVERS and not (RESOLVERS[intended].needs_db and db is None):
+        cache_key = brain_answer_cache.key(message, ent)
+    if cache_key:
+        res = brain_answer_cache.get(intended, cache_key)
+        if res is not None:
+            return _cached_answer(intended, res, t0, return_debug)
+    generation = brain_answer_cache.generation
+
+    candidates = _candidates(message, db, ent)
+    run = run_speculative if SPECULATIVE else run_sequential
+    winner, outcomes = await run(candidates, FAST_DEADLINE_MS)
+    trace: List[Dict[str, Any]] = [
+        {"rule": o.rule, "status": o.status, "elapsed_ms": o.elapsed_ms} for o in outcomes
     ]
-    for rule, fn in order_wo_db:
-        res = await attempt(rule, fn, message)
-        if res:
-            return res
-
-    if db is not None:
-        order_with_db: List[Tuple[str, Any]] = [
-            ("structural_totals", lambda m: resolve_structural_totals(m, db)),
-            ("finance_basic", lambda m: resolve_finance_basic(m, db)),
-            ("finance_breakdown", lambda m: resolve_finance_breakdown(m, db)),
-            ("finance_mom", lambda m: resolve_finance_mom(m, db)),
-            ("finance_yoy", lambda m: resolve_finance_yoy(m, db)),
-            ("finance_cat_trends", lambda m: resolve_finance_category_trends(m, db)),
-            ("tasks_by_address", lambda m: resolve_tasks_by_address(m, db)),
-            ("tasks_by_brigade", lambda m: resolve_tasks_by_brigade(m, db)),
-        ]
-        for rule, fn in order_with_db:
-            res = await attempt(rule, fn, message)
-            if res:
-                return res
+
+    if winner is not None:
+        hit = outcomes[winner]
+        res = hit.result
+        if cache_key and winner == 0 and hit.rule == intended:
+            brain_answer_cache.put(intended, cache_key, res, generation)
+        brain_metrics.record_resolver(hit.rule, hit.elapsed_ms)
+        _log_answer(hit.rule, res, hit.elapsed_ms, t0)
+        if return_debug:
+            res.setdefault("debug", {})
+            res["debug"].update({
+                "matched_rule": hit.rule,
+                "matched_rules": [tr["rule"] for tr in trace if tr.get("status") == "hit"],
+                "elapsed_ms": int((time.monotonic() - t0) * 1000),
+                "trace": trace,
+            })
+        return res
 
     # No match — structured log with trace
     logger.info({
@@ -1,16 +1,14 @@
 """
 BrainStore (Stage 7 updates):
-- Per-key locks to coalesce concurrent requests
-- Circuit breaker with last_good fallback
+- Shared SWRCache: single-flight loads per key, bounded LRU, stale fallback
+- Circuit breaker with stale fallback
 - Metrics recording for cache hits/misses
+- Latency per area, breaker opens and stale serves into BrainMetrics (Stage 12)
 """
 from __future__ import annotations
 
-from dataclasses import asdict
-from typing import Any, Dict, List, Optional, Tuple, Union
-from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 import logging
-import asyncio
 import time
 
 from backend.app.services.brain import (
@@ -22,38 +20,21 @@ from backend.app.services.brain import (
 )
 from backend.app.services.brain_metrics import brain_metrics
 from backend.app.services.bitrix24_service import bitrix24_service
+from backend.app.services.swr_cache import SWRCache
 
 logger = logging.getLogger(__name__)
 
-
-class TTLCache:
-    def __init__(self, ttl_seconds: int):
-        self.ttl = ttl_seconds
-        self.store: Dict[str, Tuple[float, Any]] = {}
-
-    def get(self, key: str) -> Any:
-        rec = self.store.get(key)
-        if not rec:
-            return None
-        ts, val = rec
-        if (datetime.now(timezone.utc).timestamp() - ts) > self.ttl:
-            # do not drop immediately, keep for potential stale usage by caller
-            return None
-        return val
-
-    def set(self, key: str, val: Any) -> None:
-        self.store[key] = (datetime.now(timezone.utc).timestamp(), val)
+# How long an expired value is still served while refreshing / as a fallback on errors
+STALE_SECONDS = 3600
 
 
 class BrainStore:
     def __init__(self):
-        self.addr_cache = TTLCache(180)
-        self.contact_cache = TTLCache(300)
-        self.finance_cache = TTLCache(180)
-        # last good values for stale fallback
-        self._last_good: Dict[str, Any] = {}
-        # per-key locks
-        self._locks: Dict[str, asyncio.Lock] = {}
+        self.addr_cache = SWRCache("brain.addr", 180, stale_seconds=STALE_SECONDS, max_entries=512)
+        self.contact_cache = SWRCache("brain.contact", 300, stale_seconds=STALE_SECONDS, max_entries=512)
+        # finance loader opens its own session (not the request's), so coalesced waiters and
+        # background refreshes never depend on a session the first caller may already be closing
+        self.finance_cache = SWRCache("brain.finance", 180, stale_seconds=STALE_SECONDS, max_entries=64)
         # circuit breaker (per area)
         self._cb: Dict[str, Dict[str, float]] = {
             "houses": {"fails": 0, "opened_until": 0.0},
@@ -63,11 +44,6 @@ class BrainStore:
         self._cb_threshold = 3
         self._cb_open_secs = 30.0
 
-    def _lock(self, key: str) -> asyncio.Lock:
-        if key not in self._locks:
-            self._locks[key] = asyncio.Lock()
-        return self._locks[key]
-
     def _cb_open(self, area: str) -> bool:
         st = self._cb.get(area, {})
         return time.time() < st.get("opened_until", 0.0)
@@ -80,6 +56,7 @@ class BrainStore:
         if st["fails"] >= self._cb_threshold:
             st["opened_until"] = time.time() + self._cb_open_secs
             st["fails"] = 0
+            brain_metrics.record_breaker_open(area)
 
     def _cb_success(self, area: str) -> None:
         st = self._cb.get(area)
@@ -92,6 +69,62 @@ class BrainStore:
         brain_metrics.record_cache(area, hit)
         return {"cache": "hit" if hit else "miss", "area": area}
 
+    async def _cached(
+        self,
+        cache: SWRCache,
+        area: str,
+        cache_key: str,
+        loader: Callable[[Dict[str, Any]], Awaitable[Any]],
+        default: Any,
+    ) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Value for cache_key via cache.get_or_load (concurrent misses share one load).
+        loader(meta) returns the value (None = nothing to cache) and reports success to the breaker;
+        exceptions count as breaker failures and fall back to the stale value or default
+        """
+        t0 = time.monotonic()
+        try:
+            return await self._cached_value(cache, area, cache_key, loader, default)
+        finally:
+            brain_metrics.observe_store(area, (time.monotonic() - t0) * 1000)
+
+    async def _cached_value(
+        self,
+        cache: SWRCache,
+        area: str,
+        cache_key: str,
+        loader: Callable[[Dict[str, Any]], Awaitable[Any]],
+        default: Any,
+    ) -> Tuple[Any, Dict[str, Any]]:
+        state = cache.state(cache_key)
+        meta = self._record_cache_meta(area, state == "fresh")
+        meta.update({"cache_key": cache_key})
+        if state != "fresh" and self._cb_open(area):
+            val = cache.peek(cache_key)
+            meta.update({"circuit": "open", "stale": val is not None})
+            if val is not None:
+                brain_metrics.record_stale(area)
+            return (val if val is not None else default), meta
+
+        async def _load() -> Any:
+            try:
+                return await loader(meta)
+            except Exception as e:
+                logger.error(f"BrainStore {area} load error: {e}")
+                self._cb_fail(area)
+                raise
+
+        try:
+            val = await cache.get_or_load(cache_key, _load)
+        except Exception:
+            meta.update({"stale": False})
+            return default, meta
+        if cache.state(cache_key) == "stale":
+            # served stale: refreshing in background or the load just failed
+            meta.update({"stale": True})
+            brain_metrics.record_stale(area)
+        return (val if val is not None else default), meta
+
     @staticmethod
     def _map_house_dict(h: Dict[str, Any]) -> HouseDTO:
         cd = CleaningDates.from_dict(h.get("cleaning_dates") or {})
@@ -132,97 +165,49 @@ class BrainStore:
         addr_norm = normalize_address(address)
         area = "houses"
         cache_key = f"addr:{addr_norm}:{limit}"
-        cached = self.addr_cache.get(cache_key)
-        meta = self._record_cache_meta(area, cached is not None)
-        meta.update({"cache_key": cache_key})
-        if cached is not None:
-            return (cached, meta) if return_debug else cached
 
-        # Circuit breaker: return last good if open
-        if self._cb_open(area):
-            val = self._last_good.get(cache_key, [])
-            meta.update({"circuit": "open", "stale": bool(val)})
-            return (val, meta) if return_debug else val
+        async def _load(meta: Dict[str, Any]) -> List[HouseDTO]:
+            data = await bitrix24_service.list_houses(address=address, limit=limit)
+            houses = (data or {}).get("houses") or []
+            result = [self._map_house_dict(h) for h in houses[:limit]]
+            self._cb_success(area)
+            return result
 
-        lock = self._lock(cache_key)
-        async with lock:
-            # recheck cache after await
-            cached2 = self.addr_cache.get(cache_key)
-            if cached2 is not None:
-                meta = self._record_cache_meta(area, True)
-                meta.update({"cache_key": cache_key})
-                return (cached2, meta) if return_debug else cached2
-            try:
-                data = await bitrix24_service.list_houses(address=address, limit=limit)
-                houses = (data or {}).get("houses") or []
-                result = [self._map_house_dict(h) for h in houses[:limit]]
-                self.addr_cache.set(cache_key, result)
-                self._last_good[cache_key] = result
-                self._cb_success(area)
-                return (result, meta) if return_debug else result
-            except Exception as e:
-                logger.error(f"BrainStore.get_houses_by_address error: {e}")
-                self._cb_fail(area)
-                val = self._last_good.get(cache_key, [])
-                meta.update({"stale": bool(val)})
-                return (val, meta) if return_debug else val
+        val, meta = await self._cached(self.addr_cache, area, cache_key, _load, [])
+        return (val, meta) if return_debug else val
 
     async def get_elder_contact_by_address(self, address: str, return_debug: bool = False) -> Union[Optional[ElderContact], Tuple[Optional[ElderContact], Dict[str, Any]]]:
         addr_norm = normalize_address(address)
         area = "elder"
         cache_key = f"elder:{addr_norm}"
-        cached = self.contact_cache.get(cache_key)
-        meta = self._record_cache_meta(area, cached is not None)
-        meta.update({"cache_key": cache_key})
-        if cached is not None:
-            return (cached, meta) if return_debug else cached
-
-        if self._cb_open(area):
-            val = self._last_good.get(cache_key)
-            meta.update({"circuit": "open", "stale": bool(val)})
-            return (val, meta) if return_debug else val
 
-        lock = self._lock(cache_key)
-        async with lock:
-            cached2 = self.contact_cache.get(cache_key)
-            if cached2 is not None:
-                meta = self._record_cache_meta(area, True)
-                meta.update({"cache_key": cache_key})
-                return (cached2, meta) if return_debug else cached2
-            try:
-                hb = await self.get_houses_by_address(address, limit=1, return_debug=True)
-                houses, hmeta = hb if isinstance(hb, tuple) else (hb, {})
-                meta["houses"] = hmeta
-                if not houses:
-                    self._cb_fail(area)
-                    return (None, meta) if return_debug else None
-                h = houses[0]
-                if h.elder_contact and not h.elder_contact.is_empty():
-                    self.contact_cache.set(cache_key, h.elder_contact)
-                    self._last_good[cache_key] = h.elder_contact
-                    self._cb_success(area)
-                    return (h.elder_contact, meta) if return_debug else h.elder_contact
-                details = await bitrix24_service.get_deal_details(h.id)
-                contact_dict = (details or {}).get("elder_contact") or {}
-                phones = contact_dict.get("phones") or []
-                emails = contact_dict.get("emails") or []
-                name = contact_dict.get("name") or ""
-                company = (details or {}).get("company") or {}
-                if not phones:
-                    phones = company.get("phones") or []
-                if not emails:
-                    emails = company.get("emails") or []
-                elder = ElderContact(name=str(name or ""), phones=[str(p) for p in phones], emails=[str(em) for em in emails])
-                self.contact_cache.set(cache_key, elder)
-                self._last_good[cache_key] = elder
-                self._cb_success(area)
-                return (elder, meta) if return_debug else elder
-            except Exception as e:
-                logger.error(f"BrainStore.get_elder_contact_by_address error: {e}")
+        async def _load(meta: Dict[str, Any]) -> Optional[ElderContact]:
+            hb = await self.get_houses_by_address(address, limit=1, return_debug=True)
+            houses, hmeta = hb if isinstance(hb, tuple) else (hb, {})
+            meta["houses"] = hmeta
+            if not houses:
                 self._cb_fail(area)
-                val = self._last_good.get(cache_key)
-                meta.update({"stale": bool(val)})
-                return (val, meta) if return_debug else val
+                return None
+            h = houses[0]
+            if h.elder_contact and not h.elder_contact.is_empty():
+                self._cb_success(area)
+                return h.elder_contact
+            details = await bitrix24_service.get_deal_details(h.id)
+            contact_dict = (details or {}).get("elder_contact") or {}
+            phones = contact_dict.get("phones") or []
+            emails = contact_dict.get("emails") or []
+            name = contact_dict.get("name") or ""
+            company = (details or {}).get("company") or {}
+            if not phones:
+                phones = company.get("phones") or []
+            if not emails:
+                emails = company.get("emails") or []
+            elder = ElderContact(name=str(name or ""), phones=[str(p) for p in phones], emails=[str(em) for em in emails])
+            self._cb_success(area)
+            return elder
+
+        val, meta = await self._cached(self.contact_cache, area, cache_key, _load, None)
+        return (val, meta) if return_debug else val
 
     async def get_cleaning_for_month_by_address(self, address: str, month_key: str, return_debug: bool = False) -> Union[Optional[CleaningDates], Tuple[Optional[CleaningDates], Dict[str, Any]]]:
         hb = await self.get_houses_by_address(address, limit=1, return_debug=True)
@@ -235,13 +220,11 @@ class BrainStore:
     async def get_finance_aggregate(self, db: Any, date_from: Optional[str] = None, date_to: Optional[str] = None, return_debug: bool = False) -> Union[Dict[str, Any], Tuple[Dict[str, Any], Dict[str, Any]]]:
         area = "finance"
         cache_key = f"fin:{date_from}:{date_to}"
-        cached = self.finance_cache.get(cache_key)
-        meta = self._record_cache_meta(area, cached is not None)
-        meta.update({"cache_key": cache_key})
-        if cached is not None:
-            return (cached, meta) if return_debug else cached
-        try:
+
+        async def _load(meta: Dict[str, Any]) -> Dict[str, Any]:
             from sqlalchemy import text
+            from backend.app.config.database import AsyncSessionLocal
+            # db only tells whether the caller has a database; the query runs on a session of its own
             if hasattr(db, "execute"):
                 q = text(
                     """
@@ -254,8 +237,9 @@ class BrainStore:
                       AND (:date_to IS NULL OR date <= :date_to)
                     """
                 )
-                res = await db.execute(q, {"date_from": date_from, "date_to": date_to})
-                row = res.first()
+                async with AsyncSessionLocal() as session:
+                    res = await session.execute(q, {"date_from": date_from, "date_to": date_to})
+                    row = res.first()
                 out = {
                     "transactions": int(row[0] or 0) if row else 0,
                     "income": float(row[1] or 0) if row else 0.0,
@@ -263,12 +247,10 @@ class BrainStore:
                 }
             else:
                 out = {"transactions": 0, "income": 0.0, "expense": 0.0}
-            self.finance_cache.set(cache_key, out)
-            self._last_good[cache_key] = out
             self._cb_success(area)
-            return (out, meta) if return_debug else out
-        except Exception:
-            self._cb_fail(area)
-            val = self._last_good.get(cache_key, {"transactions": 0, "income": 0.0, "expense": 0.0})
-            meta.update({"stale": True})
-            return (val, meta) if return_debug else val
\ No newline at end of file
+            return out
+
+        val, meta = await self._cached(
+            self.finance_cache, area, cache_key, _load, {"transactions": 0, "income": 0.0, "expense": 0.0}
+        )
+        return (val, meta) if return_debug else val
@@ -0,0 +1,411 @@
+"""
+Call event queue: очередь звонков на саммари в Postgres (таблица call_events)
+- Одна строка на звонок (call_key), поэтому повторные webhook'и / опросы не ставят звонок второй раз
+- Воркеры забирают задачи через SELECT ... FOR UPDATE SKIP LOCKED - безопасно для нескольких процессов
+- Метаданные NOTIFY_END хранятся в строке звонка и доступны при SPEECH_RECOGNITION после рестарта
+- Перед БД - ограниченный LRU в памяти (метаданные и уже завершённые звонки)
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import socket
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from backend.app.config.database import get_db_pool
+
+logger = logging.getLogger(__name__)
+
+CALL_QUEUE_WORKERS = int(os.getenv("CALL_QUEUE_WORKERS", "2"))
+CALL_QUEUE_POLL_SECONDS = float(os.getenv("CALL_QUEUE_POLL_SECONDS", "5"))
+CALL_QUEUE_MAX_ATTEMPTS = int(os.getenv("CALL_QUEUE_MAX_ATTEMPTS", "3"))
+# Задача в processing дольше этого считается брошенной (процесс упал) и забирается снова
+CALL_QUEUE_STALE_MINUTES = int(os.getenv("CALL_QUEUE_STALE_MINUTES", "30"))
+CALL_QUEUE_CACHE_SIZE = int(os.getenv("CALL_QUEUE_CACHE_SIZE", "2000"))
+
+# Статусы, при которых звонок повторно не ставится
+_FINAL_OR_ACTIVE = ("pending", "processing", "done", "failed", "skipped")
+
+Handler = Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[Any]]
+
+
+def call_key(source: str, call_id: Any) -> str:
+    return f"{source}:{call_id}"
+
+
+class _LRU:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        if key not in self._data:
+            return None
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def set(self, key: str, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def _json(value: Any) -> Dict[str, Any]:
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            return json.loads(value)
+        except Exception:
+            return {}
+    return {}
+
+
+class CallEventQueue:
+    def __init__(self):
+        self._handlers: Dict[str, Handler] = {}
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._metadata = _LRU(CALL_QUEUE_CACHE_SIZE)
+        self._settled = _LRU(CALL_QUEUE_CACHE_SIZE)
+        self.stats: Dict[str, int] = {"enqueued": 0, "duplicates": 0, "done": 0, "failed": 0, "retried": 0}
+
+    def register(self, kind: str, handler: Handler) -> None:
+        """handler(payload, metadata) - обработчик задач данного kind"""
+        self._handlers[kind] = handler
+
+    # ===== Метаданные =====
+
+    async def remember_metadata(self, key: str, metadata: Dict[str, Any], source: str = "novofon") -> None:
+        """Сохранить/дополнить метаданные звонка (например, из NOTIFY_END)"""
+        merged = {**(self._metadata.get(key) or {}), **metadata}
+        self._metadata.set(key, merged)
+        pool = await get_db_pool()
+        if not pool:
+            return
+        try:
+            async with pool.acquire() as conn:
+                await conn.execute(
+                    """
+                    INSERT INTO call_events (call_key, source, metadata)
+                    VALUES ($1, $2, $3::jsonb)
+                    ON CONFLICT (call_key) DO UPDATE
+                    SET metadata = call_events.metadata || EXCLUDED.metadata, updated_at = NOW()
+                    """,
+                    key, source, json.dumps(metadata, ensure_ascii=False),
+                )
+        except Exception as e:
+            logger.warning(f"[call-queue] remember_metadata {key} failed: {e}")
+
+    async def get_metadata(self, key: str) -> Dict[str, Any]:
+        cached = self._metadata.get(key)
+        if cached is not None:
+            return dict(cached)
+        pool = await get_db_pool()
+        if not pool:
+            return {}
+        try:
+            async with pool.acquire() as conn:
+                raw = await conn.fetchval("SELECT metadata FROM call_events WHERE call_key = $1", key)
+        except Exception as e:
+            logger.warning(f"[call-queue] get_metadata {key} failed: {e}")
+            return {}
+        metadata = _json(raw)
+        if metadata:
+            self._metadata.set(key, metadata)
+        return dict(metadata)
+
+    # ===== Постановка =====
+
+    async def is_known(self, key: str) -> bool:
+        """Звонок уже поставлен, в работе или завершён (в этом или другом процессе)"""
+        if self._settled.get(key):
+            return True
+        pool = await get_db_pool()
+        if not pool:
+            return False
+        try:
+            async with pool.acquire() as conn:
+                status = await conn.fetchval("SELECT status FROM call_events WHERE call_key = $1", key)
+        except Exception as e:
+            logger.warning(f"[call-queue] is_known {key} failed: {e}")
+            return False
+        if status in ("done", "failed", "skipped"):
+            self._settled.set(key, status)
+        return status in _FINAL_OR_ACTIVE
+
+    async def enqueue(
+        self,
+        key: str,
+        kind: str,
+        payload: Dict[str, Any],
+        source: str = "novofon",
+        metadata: Optional[Dict[str, Any]] = None,
+        status: str = "pending",
+    ) -> Optional[bool]:
+        """
+        Поставить звонок в очередь. True - поставлен, False - уже был поставлен/обработан,
+        None - очередь недоступна (нет БД/таблицы), вызывающий решает сам
+        """
+        if self._settled.get(key):
+            self.stats["duplicates"] += 1
+            return False
+        pool = await get_db_pool()
+        if not pool:
+            return None
+        try:
+            async with pool.acquire() as conn:
+                row = await conn.fetchrow(
+                    """
+                    INSERT INTO call_events (call_key, source, kind, payload, metadata, status, available_at)
+                    VALUES ($1, $2, $3, $4::jsonb, $5::jsonb, $6, NOW())
+                    ON CONFLICT (call_key) DO UPDATE
+                    SET kind = EXCLUDED.kind,
+                        payload = EXCLUDED.payload,
+                        metadata = call_events.metadata || EXCLUDED.metadata,
+                        status = EXCLUDED.status,
+                        available_at = NOW(),
+                        updated_at = NOW()
+                    WHERE call_events.status = 'waiting'
+                    RETURNING call_key
+                    """,
+                    key, source, kind,
+                    json.dumps(payload, ensure_ascii=False, default=str),
+                    json.dumps(metadata or {}, ensure_ascii=False, default=str),
+                    status,
+                )
+        except Exception as e:
+            logger.warning(f"[call-queue] enqueue {key} failed: {e}")
+            return None
+        if not row:
+            self.stats["duplicates"] += 1
+            return False
+        if status == "pending":
+            self.stats["enqueued"] += 1
+            if self._wakeup is not None:
+                self._wakeup.set()
+        else:
+            self._settled.set(key, status)
+        return True
+
+    async def mark_skipped(self, key: str, source: str, reason: str) -> None:
+        """Звонок не подлежит обработке (нет записи, слишком короткий) - больше не проверять"""
+        await self.enqueue(key, "skip", {"reason": reason}, source=source, status="skipped")
+
+    async def claim(self, key: str, source: str, owner: str) -> bool:
+        """Захватить звонок для внешнего обработчика (автопроцессор): строка сразу в processing"""
+        if self._settled.get(key):
+            return False
+        pool = await get_db_pool()
+        if not pool:
+            return True  # без БД дедупликацию обеспечивает сам обработчик
+        try:
+            async with pool.acquire() as conn:
+                row = await conn.fetchrow(
+                    """
+                    INSERT INTO call_events (call_key, source, kind, status, attempts, locked_at, locked_by)
+                    VALUES ($1, $2, 'external', 'processing', 1, NOW(), $3)
+                    ON CONFLICT (call_key) DO UPDATE
+                    SET kind = 'external', status = 'processing', attempts = call_events.attempts + 1,
+                        locked_at = NOW(), locked_by = EXCLUDED.locked_by, updated_at = NOW()
+                    WHERE call_events.status = 'waiting'
+                       OR (call_events.status = 'processing'
+                           AND call_events.locked_at < NOW() - make_interval(mins => $4))
+                    RETURNING call_key
+                    """,
+                    key, source, owner, CALL_QUEUE_STALE_MINUTES,
+                )
+        except Exception as e:
+            # закрыто: без подтверждённого захвата звонок не обрабатываем, следующий опрос попробует снова
+            logger.warning(f"[call-queue] claim {key} failed: {e}")
+            return False
+        return bool(row)
+
+    async def release(self, key: str, error: Optional[str] = None) -> None:
+        """Вернуть захваченный внешним обработчиком звонок в waiting - следующий claim возьмёт его сразу"""
+        pool = await get_db_pool()
+        if not pool:
+            return
+        try:
+            async with pool.acquire() as conn:
+                await conn.execute(
+                    """
+                    UPDATE call_events
+                    SET status = 'waiting', last_error = $2, locked_at = NULL, updated_at = NOW()
+                    WHERE call_key = $1 AND status = 'processing'
+                    """,
+                    key, error,
+                )
+        except Exception as e:
+            logger.warning(f"[call-queue] release {key} failed: {e}")
+
+    async def complete(self, key: str, success: bool = True, error: Optional[str] = None) -> None:
+        status = "done" if success else "failed"
+        self._settled.set(key, status)
+        self.stats["done" if success else "failed"] += 1
+        pool = await get_db_pool()
+        if not pool:
+            return
+        try:
+            async with pool.acquire() as conn:
+                await conn.execute(
+                    """
+                    UPDATE call_events
+                    SET status = $2, last_error = $3, locked_at = NULL, updated_at = NOW()
+                    WHERE call_key = $1
+                    """,
+                    key, status, error,
+                )
+        except Exception as e:
+            logger.warning(f"[call-queue] complete {key} failed: {e}")
+
+    # ===== Воркеры =====
+
+    async def _claim_next(self) -> Optional[Dict[str, Any]]:
+        pool = await get_db_pool()
+        if not pool:
+            return None
+        async with pool.acquire() as conn:
+            # Брошенные задачи без оставшихся попыток (процесс падал на них каждый раз) - в failed
+            exhausted = await conn.fetch(
+                """
+                UPDATE call_events
+                SET status = 'failed', locked_at = NULL, updated_at = NOW(),
+                    last_error = COALESCE(last_error, 'abandoned in processing after ' || attempts || ' attempts')
+                WHERE status = 'processing' AND kind <> 'external'
+                  AND locked_at < NOW() - make_interval(mins => $1)
+                  AND attempts >= $2
+                RETURNING call_key
+                """,
+                CALL_QUEUE_STALE_MINUTES, CALL_QUEUE_MAX_ATTEMPTS,
+            )
+            for r in exhausted:
+                logger.error(f"❌ [call-queue] {r['call_key']} abandoned after {CALL_QUEUE_MAX_ATTEMPTS} attempts")
+                self._settled.set(r["call_key"], "failed")
+                self.stats["failed"] += 1
+            row = await conn.fetchrow(
+                """
+                UPDATE call_events
+                SET status = 'processing', attempts = attempts + 1,
+                    locked_at = NOW(), locked_by = $1, updated_at = NOW()
+                WHERE call_key = (
+                    SELECT call_key FROM call_events
+                    WHERE (status = 'pending' AND available_at <= NOW())
+                       OR (status = 'processing' AND kind <> 'external'
+                           AND locked_at < NOW() - make_interval(mins => $2)
+                           AND attempts < $3)
+                    ORDER BY available_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING call_key, kind, payload, metadata, attempts
+                """,
+                self._worker_id, CALL_QUEUE_STALE_MINUTES, CALL_QUEUE_MAX_ATTEMPTS,
+            )
+        return dict(row) if row else None
+
+    async def _retry_later(self, key: str, attempts: int, error: str) -> None:
+        if attempts >= CALL_QUEUE_MAX_ATTEMPTS:
+            await self.complete(key, success=False, error=error)
+            return
+        self.stats["retried"] += 1
+        pool = await get_db_pool()
+        if not pool:
+            return
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE call_events
+                SET status = 'pending', last_error = $2, locked_at = NULL,
+                    available_at = NOW() + make_interval(secs => $3), updated_at = NOW()
+                WHERE call_key = $1
+                """,
+                key, error, float(30 * 2 ** (attempts - 1)),
+            )
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            try:
+                job = await self._claim_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[call-queue] worker {n} claim failed: {e}")
+                job = None
+            if not job:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=CALL_QUEUE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            key = job["call_key"]
+            handler = self._handlers.get(job["kind"])
+            if handler is None:
+                await self._retry_later(key, job["attempts"], f"no handler for kind={job['kind']}")
+                continue
+            try:
+                await handler(_json(job["payload"]), _json(job["metadata"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ [call-queue] {key} attempt {job['attempts']} failed: {e}")
+                try:
+                    await self._retry_later(key, job["attempts"], str(e))
+                except Exception as retry_error:
+                    logger.warning(f"[call-queue] retry bookkeeping for {key} failed: {retry_error}")
+                continue
+            await self.complete(key, success=True)
+
+    def start(self) -> None:
+        """Запустить воркеры в текущем event loop (повторный вызов ничего не делает)"""
+        if self._workers and not all(t.done() for t in self._workers):
+            return
+        # Обработчики регистрируются при импорте модулей-владельцев
+        import backend.app.tasks.call_summary_agent  # noqa: F401  (регистрирует и call_summary)
+        self._wakeup = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"call-queue-{i}")
+            for i in range(max(1, CALL_QUEUE_WORKERS))
+        ]
+        logger.info(f"📬 Call event queue started: {len(self._workers)} workers ({self._worker_id})")
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._workers = []
+
+    async def status(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        pool = await get_db_pool()
+        if pool:
+            try:
+                async with pool.acquire() as conn:
+                    rows = await conn.fetch("SELECT status, COUNT(*) AS n FROM call_events GROUP BY status")
+                counts = {r["status"]: r["n"] for r in rows}
+            except Exception as e:
+                logger.debug(f"[call-queue] status failed: {e}")
+        return {
+            "workers": len([t for t in self._workers if not t.done()]),
+            "worker_id": self._worker_id,
+            "counts": counts,
+            "stats": dict(self.stats),
+            "cache": {"metadata": len(self._metadata), "settled": len(self._settled), "maxsize": CALL_QUEUE_CACHE_SIZE},
+        }
+
+
+# Глобальный экземпляр
+call_event_queue = CallEventQueue()
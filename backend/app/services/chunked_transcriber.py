@@ -0,0 +1,259 @@
+"""
+Chunked Whisper transcription для длинных записей звонков
+- Запись скачивается потоком во временный файл (не в память)
+- PyAV декодирует файл потоково и режет его на WAV-сегменты (16 кГц, моно) по паузам,
+  не длиннее CHUNK_MAX_SECONDS - каждый сегмент укладывается в лимит Whisper API
+- Сегменты транскрибируются параллельно, текст склеивается по смещениям
+Память не зависит от длины звонка: в ней только текущее окно декодера и текст
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import wave
+from dataclasses import dataclass
+from typing import List, Optional
+
+import httpx
+
+from backend.app.config.http_clients import get_openai_client, http_clients
+
+try:
+    import av
+    import numpy as np
+    AV_AVAILABLE = True
+except ImportError:  # pragma: no cover
+    av = None
+    np = None
+    AV_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Лимит Whisper API - 25 МБ на файл; 480 с WAV 16 кГц моно = ~15 МБ
+WHISPER_MAX_BYTES = 24 * 1024 * 1024
+CHUNK_MAX_SECONDS = float(os.getenv("WHISPER_CHUNK_MAX_SECONDS", "480"))
+# Резать начинаем после этой длины сегмента, на первой паузе
+CHUNK_MIN_SECONDS = float(os.getenv("WHISPER_CHUNK_MIN_SECONDS", "240"))
+CHUNK_CONCURRENCY = int(os.getenv("WHISPER_CHUNK_CONCURRENCY", "3"))
+SILENCE_DB = float(os.getenv("WHISPER_SILENCE_DB", "-40"))
+SILENCE_MIN_SECONDS = 0.3
+
+SAMPLE_RATE = 16000
+WINDOW = SAMPLE_RATE * 30 // 1000  # окно анализа тишины - 30 мс
+
+@dataclass
+class AudioSegment:
+    path: str
+    start: float
+    end: float
+    voiced: bool = True
+
+
+@dataclass
+class SegmentText:
+    start: float
+    end: float
+    text: str
+
+
+async def download_to_tempfile(
+    url: str,
+    client: Optional[httpx.AsyncClient] = None,
+    suffix: str = ".mp3",
+    timeout: float = 120.0,
+) -> Optional[str]:
+    """Скачать запись потоком в уникальный временный файл. Путь или None; файл удаляет вызывающий"""
+    fd, path = tempfile.mkstemp(prefix="call_", suffix=suffix)
+    client = client or http_clients.get("novofon")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async with client.stream("GET", url, timeout=timeout) as response:
+                if response.status_code != 200:
+                    logger.error(f"Failed to download recording: {response.status_code}")
+                    raise RuntimeError(f"HTTP {response.status_code}")
+                async for chunk in response.aiter_bytes(64 * 1024):
+                    f.write(chunk)
+        return path
+    except Exception as e:
+        logger.error(f"Error downloading recording: {e}")
+        remove_tempfile(path)
+        return None
+
+
+def bytes_to_tempfile(data: bytes, suffix: str = ".mp3") -> str:
+    fd, path = tempfile.mkstemp(prefix="call_", suffix=suffix)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+def remove_tempfile(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class _SegmentWriter:
+    """Пишет PCM окна в текущий WAV-сегмент и режет на паузах"""
+
+    def __init__(self, out_dir: str, max_seconds: float, min_seconds: float, silence_db: float):
+        self.out_dir = out_dir
+        self.max_samples = int(max_seconds * SAMPLE_RATE)
+        self.min_samples = int(min_seconds * SAMPLE_RATE)
+        self.silence_samples = int(SILENCE_MIN_SECONDS * SAMPLE_RATE)
+        self.threshold = 32768.0 * (10 ** (silence_db / 20))
+        self.segments: List[AudioSegment] = []
+        self._wav: Optional[wave.Wave_write] = None
+        self._path = ""
+        self._start = 0  # в сэмплах от начала записи
+        self._samples = 0
+        self._silent_run = 0
+        self._voiced = False
+
+    def _open(self) -> None:
+        self._path = os.path.join(self.out_dir, f"seg_{len(self.segments):04d}.wav")
+        self._wav = wave.open(self._path, "wb")
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(SAMPLE_RATE)
+
+    def _close(self) -> None:
+        if self._wav is None:
+            return
+        self._wav.close()
+        self._wav = None
+        end = self._start + self._samples
+        self.segments.append(AudioSegment(self._path, self._start / SAMPLE_RATE, end / SAMPLE_RATE, self._voiced))
+        self._start = end
+        self._samples = 0
+        self._silent_run = 0
+        self._voiced = False
+
+    def feed(self, pcm: "np.ndarray") -> None:
+        """pcm - int16 моно, длина кратна WINDOW (кроме последнего вызова)"""
+        n_windows = max(1, len(pcm) // WINDOW)
+        windows = pcm[: n_windows * WINDOW].reshape(n_windows, -1) if len(pcm) >= WINDOW else pcm.reshape(1, -1)
+        rms = np.sqrt(np.mean(windows.astype(np.float32) ** 2, axis=1))
+        silent = rms < self.threshold
+        start = 0
+        for i in range(len(windows)):
+            if self._wav is None:
+                self._open()
+            size = windows[i].shape[0]
+            self._samples += size
+            if silent[i]:
+                self._silent_run += size
+            else:
+                self._silent_run = 0
+                self._voiced = True
+            cut = self._samples >= self.max_samples or (
+                self._samples >= self.min_samples and self._silent_run >= self.silence_samples
+            )
+            if cut:
+                self._wav.writeframes(windows[start:i + 1].tobytes())
+                start = i + 1
+                self._close()
+        if start < len(windows):
+            if self._wav is None:
+                self._open()
+            self._wav.writeframes(windows[start:].tobytes())
+
+    def finish(self) -> List[AudioSegment]:
+        self._close()
+        return self.segments
+
+
+def split_on_silence(
+    src: str,
+    out_dir: str,
+    max_seconds: float = CHUNK_MAX_SECONDS,
+    min_seconds: float = CHUNK_MIN_SECONDS,
+    silence_db: float = SILENCE_DB,
+) -> List[AudioSegment]:
+    """Потоково декодировать src и разрезать на WAV-сегменты по паузам (синхронно - звать через to_thread)"""
+    writer = _SegmentWriter(out_dir, max_seconds, min_seconds, silence_db)
+    carry = np.zeros(0, dtype=np.int16)
+    with av.open(src) as container:
+        stream = container.streams.audio[0]
+        resampler = av.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+
+        def _push(frames) -> None:
+            nonlocal carry
+            for rf in frames:
+                pcm = rf.to_ndarray().reshape(-1)
+                carry = np.concatenate([carry, pcm]) if carry.size else pcm
+                full = (carry.size // WINDOW) * WINDOW
+                if full:
+                    writer.feed(carry[:full])
+                    carry = carry[full:].copy()
+
+        for frame in container.decode(stream):
+            _push(resampler.resample(frame))
+        _push(resampler.resample(None))
+    if carry.size:
+        writer.feed(carry)
+    return writer.finish()
+
+
+async def _transcribe_one(path: str, language: str, client=None) -> str:
+    with open(path, "rb") as f:
+        result = await (client or get_openai_client()).audio.transcriptions.create(model="whisper-1", file=f, language=language)
+    return result.text or ""
+
+
+async def transcribe_file_segments(path: str, language: str = "ru", client=None) -> Optional[List[SegmentText]]:
+    """Транскрипция файла записи сегментами: [(start, end, text)] по порядку или None при неудаче"""
+    size = os.path.getsize(path)
+    out_dir = tempfile.mkdtemp(prefix="call_segments_")
+    try:
+        segments: List[AudioSegment] = []
+        if AV_AVAILABLE:
+            try:
+                segments = await asyncio.to_thread(split_on_silence, path, out_dir)
+            except Exception as e:
+                logger.warning(f"Audio split failed, sending file as is: {e}")
+                segments = []
+        # Короткая запись одним сегментом (или файл, который не удалось декодировать) - отправляем оригинал
+        if len(segments) <= 1:
+            if size > WHISPER_MAX_BYTES:
+                logger.error(f"Recording is {size} bytes and cannot be split")
+                return None
+            end = segments[0].end if segments else 0.0
+            return [SegmentText(0.0, end, await _transcribe_one(path, language, client))]
+
+        sem = asyncio.Semaphore(max(1, CHUNK_CONCURRENCY))
+
+        async def _one(seg: AudioSegment) -> Optional[SegmentText]:
+            if not seg.voiced:
+                return SegmentText(seg.start, seg.end, "")
+            async with sem:
+                for attempt in range(2):
+                    try:
+                        return SegmentText(seg.start, seg.end, await _transcribe_one(seg.path, language, client))
+                    except Exception as e:
+                        logger.warning(f"Segment {seg.start:.0f}-{seg.end:.0f}s attempt {attempt + 1} failed: {e}")
+                return None
+
+        results = await asyncio.gather(*(_one(s) for s in segments))
+        if all(r is None for r in results):
+            return None
+        logger.info(f"🎧 Transcribed {len(segments)} segments ({segments[-1].end:.0f}s of audio)")
+        return [r if r is not None else SegmentText(s.start, s.end, "[неразборчиво]") for r, s in zip(results, segments)]
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def stitch(segments: List[SegmentText]) -> str:
+    return "\n".join(s.text.strip() for s in segments if s.text and s.text.strip())
+
+
+async def transcribe_file(path: str, language: str = "ru", client=None) -> Optional[str]:
+    segments = await transcribe_file_segments(path, language, client)
+    if segments is None:
+        return None
+    return stitch(segments)
@@ -0,0 +1,165 @@
+"""
+Снимок статистики дашборда (/dashboard/stats, /dashboard/houses-by-brigade)
+- все счётчики - один запрос: агрегаты houses / tasks / users / logs в подзапросах по одной строке
+- дома, удалённые из Bitrix (deleted_at), не считаются - как в /houses и /houses/stats/summary
+- распределение домов по бригадам - один запрос (UNION ALL с запасной группировкой по ответственному)
+- снимки в SWRCache с коротким TTL: вкладки, опрашивающие дашборд, делят одну загрузку,
+  просроченный снимок отдаётся сразу и обновляется в фоне
+- после синхронизации домов и изменений задач снимки пересчитываются в фоне (schedule_refresh)
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import exists, func, literal, select, true, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.config.database import AsyncSessionLocal
+from backend.app.models.house import House
+from backend.app.models.log import Log
+from backend.app.models.task import Task, TaskStatus
+from backend.app.models.user import User
+from backend.app.services.swr_cache import SWRCache
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_STATS_TTL = int(os.getenv("DASHBOARD_STATS_TTL", "30"))
+
+# Загрузчики открывают свою сессию (не сессию запроса) - снимок можно обновлять в фоне
+dashboard_cache = SWRCache("dashboard", DASHBOARD_STATS_TTL, stale_seconds=300, max_entries=8)
+
+STATS_KEY = "stats"
+BRIGADES_KEY = "houses_by_brigade"
+
+BRIGADE_COLORS = ['#3B82F6', '#10B981', '#F59E0B', '#EF4444', '#8B5CF6', '#EC4899', '#14B8A6']
+
+
+def stats_statement(since: datetime):
+    """Все счётчики дашборда одной строкой; подзапросы - по одному проходу на таблицу; удалённые дома не считаются"""
+    houses = select(
+        func.count(House.id).label("total_houses"),
+        func.coalesce(func.sum(House.apartments_count), 0).label("total_apartments"),
+        func.coalesce(func.sum(House.entrances_count), 0).label("total_entrances"),
+        func.coalesce(func.sum(House.floors_count), 0).label("total_floors"),
+        # COUNT(DISTINCT) не считает NULL - как прежние WHERE ... IS NOT NULL
+        func.count(func.distinct(House.brigade_number)).label("active_brigades"),
+        func.count(func.distinct(House.company_title)).label("total_companies"),
+    ).where(House.deleted_at.is_(None)).subquery("h")
+    tasks = select(
+        func.count(Task.id).label("total_tasks"),
+        func.count(Task.id).filter(Task.status.in_([TaskStatus.TODO, TaskStatus.IN_PROGRESS])).label("active_tasks"),
+    ).subquery("t")
+    users = select(func.count(User.id).label("employees")).subquery("u")
+    logs = select(func.count(Log.id).label("recent_logs")).where(Log.created_at >= since).subquery("l")
+    return select(houses, tasks, users, logs).select_from(
+        houses.join(tasks, true()).join(users, true()).join(logs, true())
+    )
+
+
+def houses_by_brigade_statement():
+    """Дома по brigade_number; если номеров нет ни у одного дома - топ-7 по assigned_by_id"""
+    by_brigade = (
+        select(literal("brigade").label("kind"), House.brigade_number.label("key"), func.count(House.id).label("count"))
+        .where(House.deleted_at.is_(None), House.brigade_number.isnot(None))
+        .group_by(House.brigade_number)
+    )
+    by_assigned = (
+        select(literal("assigned").label("kind"), House.assigned_by_id.label("key"), func.count(House.id).label("count"))
+        .where(
+            House.deleted_at.is_(None),
+            House.assigned_by_id.isnot(None),
+            ~exists().where(House.deleted_at.is_(None), House.brigade_number.isnot(None)),
+        )
+        .group_by(House.assigned_by_id)
+        .order_by(func.count(House.id).desc())
+        .limit(7)
+        .subquery()
+    )
+    return union_all(by_brigade, select(by_assigned))
+
+
+async def load_stats(db: AsyncSession) -> Dict[str, Any]:
+    # created_at в logs - без часового пояса
+    since = (datetime.now(timezone.utc) - timedelta(days=1)).replace(tzinfo=None)
+    row = (await db.execute(stats_statement(since))).one()
+    total_tasks = row.total_tasks or 0
+    active_tasks = row.active_tasks or 0
+    return {
+        "total_houses": row.total_houses or 0,
+        "total_apartments": row.total_apartments or 0,
+        "total_entrances": row.total_entrances or 0,
+        "total_floors": row.total_floors or 0,
+        "active_brigades": row.active_brigades or 0,
+        "total_tasks": total_tasks,
+        "active_tasks": active_tasks,
+        "completed_tasks": total_tasks - active_tasks,
+        "employees": row.employees or 0,
+        "recent_logs": row.recent_logs or 0,
+        "total_companies": row.total_companies or 0,
+        # время снимка
+        "last_sync": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+async def load_houses_by_brigade(db: AsyncSession) -> List[Dict[str, Any]]:
+    rows = (await db.execute(houses_by_brigade_statement())).all()
+    brigades = sorted((r for r in rows if r.kind == "brigade"), key=lambda r: r.key)
+    if brigades:
+        labels = [(f"Бригада {r.key}", r.count) for r in brigades]
+    else:
+        assigned = sorted((r for r in rows if r.kind == "assigned"), key=lambda r: -r.count)
+        labels = [(f"Бригада {idx + 1}", r.count) for idx, r in enumerate(assigned)]
+    return [
+        {"label": label, "value": count, "color": BRIGADE_COLORS[idx % len(BRIGADE_COLORS)]}
+        for idx, (label, count) in enumerate(labels)
+    ]
+
+
+async def _load(loader) -> Any:
+    async with AsyncSessionLocal() as db:
+        return await loader(db)
+
+
+async def get_stats() -> Dict[str, Any]:
+    return dict(await dashboard_cache.get_or_load(STATS_KEY, lambda: _load(load_stats)))
+
+
+async def get_houses_by_brigade() -> List[Dict[str, Any]]:
+    return list(await dashboard_cache.get_or_load(BRIGADES_KEY, lambda: _load(load_houses_by_brigade)))
+
+
+_refresh_task: Optional[asyncio.Future] = None
+_refresh_again = False
+
+
+def schedule_refresh() -> None:
+    """
+    Пересчитать снимки в фоне (после синхронизации домов, изменений задач).
+    Вызовы во время пересчёта склеиваются в ещё один пересчёт после него
+    """
+    global _refresh_task, _refresh_again
+    if _refresh_task is not None and not _refresh_task.done():
+        _refresh_again = True
+        return
+    _refresh_task = asyncio.ensure_future(_refresh())
+
+
+async def _refresh() -> None:
+    global _refresh_again
+    while True:
+        _refresh_again = False
+        try:
+            async with AsyncSessionLocal() as db:
+                stats = await load_stats(db)
+                brigades = await load_houses_by_brigade(db)
+            dashboard_cache.set(STATS_KEY, stats)
+            dashboard_cache.set(BRIGADES_KEY, brigades)
+        except Exception as e:
+            # прежний снимок остаётся до конца TTL
+            logger.warning(f"⚠️ Dashboard stats refresh failed: {e}")
+        if not _refresh_again:
+            return
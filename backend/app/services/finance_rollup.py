@@ -0,0 +1,92 @@
+"""
+Свёртки financial_transactions (migrations/create_financial_rollup.sql)
+- financial_monthly_rollup: сумма и число транзакций по (company, type, month, project, category)
+- financial_daily_rollup: по (day, type) для cash-flow
+Свёртки ведут триггеры в БД; здесь - сверка с исходной таблицей и полная пересборка
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# Группировки - те же выражения, что в триггере financial_rollup_apply
+MONTHLY_AGGREGATE_SQL = """
+    SELECT COALESCE(company, '') AS company, type, date_trunc('month', date AT TIME ZONE 'UTC')::date AS month,
+           COALESCE(project, '') AS project, category, SUM(amount) AS amount, COUNT(*) AS tx_count
+    FROM financial_transactions
+    GROUP BY 1, 2, 3, 4, 5
+"""
+
+DAILY_AGGREGATE_SQL = """
+    SELECT (date AT TIME ZONE 'UTC')::date AS day, type, SUM(amount) AS amount, COUNT(*) AS tx_count
+    FROM financial_transactions
+    GROUP BY 1, 2
+"""
+
+_MONTHLY_DIFF_SQL = f"""
+    SELECT COALESCE(r.company, t.company) AS company, COALESCE(r.type, t.type) AS type,
+           COALESCE(r.month, t.month) AS month, COALESCE(r.project, t.project) AS project,
+           COALESCE(r.category, t.category) AS category,
+           r.amount AS rollup_amount, t.amount AS actual_amount, r.tx_count AS rollup_count, t.tx_count AS actual_count
+    FROM financial_monthly_rollup r
+    FULL OUTER JOIN ({MONTHLY_AGGREGATE_SQL}) t
+      ON r.company = t.company AND r.type = t.type AND r.month = t.month
+     AND r.project = t.project AND r.category = t.category
+    WHERE r.amount IS DISTINCT FROM t.amount OR r.tx_count IS DISTINCT FROM t.tx_count
+"""
+
+_DAILY_DIFF_SQL = f"""
+    SELECT COALESCE(r.day, t.day) AS day, COALESCE(r.type, t.type) AS type,
+           r.amount AS rollup_amount, t.amount AS actual_amount, r.tx_count AS rollup_count, t.tx_count AS actual_count
+    FROM financial_daily_rollup r
+    FULL OUTER JOIN ({DAILY_AGGREGATE_SQL}) t ON r.day = t.day AND r.type = t.type
+    WHERE r.amount IS DISTINCT FROM t.amount OR r.tx_count IS DISTINCT FROM t.tx_count
+"""
+
+
+def _jsonable(row) -> Dict[str, Any]:
+    out = {}
+    for k, v in dict(row).items():
+        if hasattr(v, 'isoformat'):
+            v = v.isoformat()
+        elif v is not None and not isinstance(v, (str, int)):
+            v = float(v)
+        out[k] = v
+    return out
+
+
+async def check(conn, sample: int = 20) -> Dict[str, Any]:
+    """Сверить свёртки с агрегатом по financial_transactions (полный проход по таблице)"""
+    # REPEATABLE READ: свёртки и транзакции читаются из одного снимка
+    async with conn.transaction(isolation='repeatable_read', readonly=True):
+        monthly = await conn.fetch(_MONTHLY_DIFF_SQL)
+        daily = await conn.fetch(_DAILY_DIFF_SQL)
+        rows = await conn.fetchval("SELECT COUNT(*) FROM financial_monthly_rollup")
+    result = {
+        "consistent": not monthly and not daily,
+        "monthly_rollup_rows": rows,
+        "monthly_mismatches": len(monthly),
+        "daily_mismatches": len(daily),
+        "sample": [_jsonable(r) for r in monthly[:sample]] + [_jsonable(r) for r in daily[:sample]],
+        "checked_at": datetime.now(timezone.utc).isoformat(),
+    }
+    if not result["consistent"]:
+        logger.warning(f"⚠️ Finance rollup mismatch: {len(monthly)} monthly, {len(daily)} daily groups")
+    return result
+
+
+async def rebuild(conn) -> Dict[str, Any]:
+    """Пересобрать свёртки с нуля; записи в financial_transactions на это время ждут"""
+    async with conn.transaction():
+        await conn.execute("LOCK TABLE financial_transactions IN SHARE ROW EXCLUSIVE MODE")
+        await conn.execute("TRUNCATE financial_monthly_rollup, financial_daily_rollup")
+        await conn.execute(
+            f"INSERT INTO financial_monthly_rollup (company, type, month, project, category, amount, tx_count) {MONTHLY_AGGREGATE_SQL}"
+        )
+        await conn.execute(f"INSERT INTO financial_daily_rollup (day, type, amount, tx_count) {DAILY_AGGREGATE_SQL}")
+        rows = await conn.fetchval("SELECT COUNT(*) FROM financial_monthly_rollup")
+    logger.info(f"✅ Finance rollup rebuilt: {rows} monthly groups")
+    return {"rebuilt": True, "monthly_rollup_rows": rows}
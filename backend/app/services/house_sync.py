@@ -0,0 +1,137 @@
+"""
+Синхронизация таблицы houses со сделками Bitrix24 (один движок для /cleaning/sync, /houses/sync-bitrix24
+и планировщика)
+- Хэш содержимого (sha256 по полям из Bitrix) на каждый дом; существующие хэши - одним запросом
+- Пишутся только новые и изменившиеся дома: INSERT ... ON CONFLICT (bitrix_id) DO UPDATE пачками
+- Дома, пропавшие из Bitrix, помечаются deleted_at (мягкое удаление), вернувшиеся - восстанавливаются
+- Локальные поля (рекламации, заметки, графики, акты) при обновлении не перезаписываются
+- houses_cache (ответы /houses и /houses/stats/summary) сбрасывается, если синхронизация что-то записала,
+  вместе с ответами brain_answer_cache по домам; снимок дашборда пересчитывается в фоне
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.models.house import House
+from backend.app.services import dashboard_stats
+from backend.app.services.brain_answer_cache import brain_answer_cache
+from backend.app.services.swr_cache import SWRCache
+
+logger = logging.getLogger(__name__)
+
+# Поля, которые приходят из Bitrix: по ним считается хэш и только они обновляются
+SYNC_FIELDS = (
+    'address',
+    'apartments_count',
+    'entrances_count',
+    'floors_count',
+    'company_id',
+    'company_title',
+    'assigned_by_id',
+    'assigned_by_name',
+    'brigade_number',
+    'tariff',
+)
+# ~23 параметра на строку: пачка 1000 строк укладывается в лимит 32767 параметров asyncpg
+BATCH_SIZE = 1000
+
+# Короткий TTL: правки домов и синхронизация сбрасывают кеш сами, TTL - страховка от правок мимо API
+houses_cache = SWRCache("houses", 30, max_entries=128, max_bytes=32 * 1024 * 1024, revalidate=False)
+
+
+def house_hash(data: Dict[str, Any]) -> str:
+    payload = json.dumps([data.get(f) for f in SYNC_FIELDS], ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def plan_sync(
+    houses: Iterable[Dict[str, Any]],
+    existing: Dict[str, Tuple[Optional[str], bool]],
+) -> Tuple[List[Dict[str, Any]], Dict[str, int], List[str]]:
+    """
+    houses - результат parse_deal_to_house, existing - {bitrix_id: (content_hash, deleted)} из БД.
+    Возвращает (строки на запись, счётчики, все bitrix_id из Bitrix)
+    """
+    latest: Dict[str, Dict[str, Any]] = {}
+    for data in houses:
+        if data.get('bitrix_id') and data.get('address'):
+            latest[data['bitrix_id']] = data  # дубликаты сделки - побеждает последняя
+
+    rows = []
+    counts = {'total': len(latest), 'created': 0, 'updated': 0, 'unchanged': 0}
+    for bitrix_id, data in latest.items():
+        digest = house_hash(data)
+        known = existing.get(bitrix_id)
+        if known is None:
+            counts['created'] += 1
+        elif known[0] == digest and not known[1]:
+            counts['unchanged'] += 1
+            continue
+        else:
+            counts['updated'] += 1
+        rows.append({**data, 'content_hash': digest})
+    return rows, counts, list(latest)
+
+
+def upsert_statement(rows: List[Dict[str, Any]], now: datetime):
+    """Пачка строк одним INSERT ... ON CONFLICT (bitrix_id) DO UPDATE (только поля из Bitrix)"""
+    stmt = insert(House).values([{**row, 'synced_at': now, 'updated_at': now, 'deleted_at': None} for row in rows])
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[House.bitrix_id],
+        set_={
+            **{f: getattr(excluded, f) for f in SYNC_FIELDS},
+            'content_hash': excluded.content_hash,
+            'synced_at': excluded.synced_at,
+            'updated_at': excluded.updated_at,
+            'deleted_at': None,
+        },
+    )
+
+
+async def sync_houses(
+    db: AsyncSession,
+    houses: Iterable[Dict[str, Any]],
+    *,
+    batch_size: int = BATCH_SIZE,
+    soft_delete: bool = True,
+) -> Dict[str, int]:
+    """Записать дома из Bitrix в houses; возвращает total/created/updated/unchanged/deleted"""
+    res = await db.execute(
+        select(House.bitrix_id, House.content_hash, House.deleted_at).where(House.bitrix_id.isnot(None))
+    )
+    existing = {r.bitrix_id: (r.content_hash, r.deleted_at is not None) for r in res}
+
+    rows, counts, seen = plan_sync(houses, existing)
+    now = datetime.utcnow()
+    for i in range(0, len(rows), batch_size):
+        await db.execute(upsert_statement(rows[i:i + batch_size], now))
+
+    counts['deleted'] = 0
+    alive = [b for b, (_, deleted) in existing.items() if not deleted]
+    if soft_delete and seen:
+        # Пустой ответ Bitrix (ошибка выгрузки) не должен пометить удалёнными все дома
+        gone = set(alive) - set(seen)
+        if gone:
+            result = await db.execute(
+                update(House)
+                .where(House.bitrix_id.in_(gone), House.deleted_at.is_(None))
+                .values(deleted_at=now, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            counts['deleted'] = result.rowcount or 0
+    await db.commit()
+    if rows or counts['deleted']:
+        houses_cache.clear()
+        brain_answer_cache.invalidate("houses", "bitrix")
+        dashboard_stats.schedule_refresh()
+    logger.info(f"🏠 House sync: {counts}")
+    return counts
@@ -3,24 +3,92 @@
 Проверяет новые звонки каждую минуту, транскрибирует и отправляет протокол в Telegram
 """
 import os
+import time
 import logging
-import httpx
 import json
-from typing import Optional, Dict, Any, List
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Set
 from datetime import datetime, timedelta
 import asyncio
 
 from backend.app.services.novofon_service import novofon_service
 from backend.app.config.database import AsyncSessionLocal
+from backend.app.services.call_event_queue import call_event_queue, call_key
+from backend.app.services import chunked_transcriber
+from backend.app.config.http_clients import get_openai_client, http_clients
 
 logger = logging.getLogger(__name__)
 
 # Конфигурация
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
 TG_NEDVIGKA = os.getenv("TG_NEDVIGKA", "-5007549435")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 TARGET_PHONE = os.getenv("NOVOFON_CALLER_ID", "+79843330712")  # Номер для фильтрации
 
+# Конвейер: стадии и число воркеров на каждой
+PIPELINE_STAGES = ("download", "transcribe", "analyze", "deliver")
+STAGE_WORKERS = {
+    "download": int(os.getenv("NOVOFON_DOWNLOAD_WORKERS", "4")),
+    "transcribe": int(os.getenv("NOVOFON_TRANSCRIBE_WORKERS", "3")),
+    "analyze": int(os.getenv("NOVOFON_ANALYZE_WORKERS", "4")),
+    "deliver": int(os.getenv("NOVOFON_DELIVER_WORKERS", "2")),
+}
+# Ёмкость очереди перед стадией: при заполнении предыдущая стадия ждёт (backpressure)
+STAGE_QUEUE_SIZE = int(os.getenv("NOVOFON_QUEUE_SIZE", "20"))
+# Захват звонка в processed_calls, не завершённый за это время, считается брошенным
+CLAIM_TIMEOUT_MINUTES = int(os.getenv("NOVOFON_CLAIM_TIMEOUT_MINUTES", "30"))
+
+
+@dataclass
+class CallJob:
+    """Звонок в конвейере: результаты стадий накапливаются по мере прохождения"""
+    call: Dict[str, Any]
+    call_id: str
+    enqueued_at: float = field(default_factory=time.monotonic)
+    audio_path: Optional[str] = None  # временный файл записи, живёт до конца стадии transcribe
+    transcription: Optional[str] = None
+    analysis: Optional[Dict[str, Any]] = None
+
+    @property
+    def duration(self) -> int:
+        try:
+            return int(self.call.get("duration") or 0)
+        except (TypeError, ValueError):
+            return 0
+
+
+class StageMetrics:
+    """Счётчики и задержки стадии конвейера"""
+
+    def __init__(self):
+        self.processed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = 0.0
+
+    def observe(self, seconds: float, ok: bool) -> None:
+        if ok:
+            self.processed += 1
+        else:
+            self.failed += 1
+        self.total_seconds += seconds
+        self.last_seconds = seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        count = self.processed + self.failed
+        return {
+            "processed": self.processed,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "avg_seconds": round(self.total_seconds / count, 3) if count else 0.0,
+            "max_seconds": round(self.max_seconds, 3),
+            "last_seconds": round(self.last_seconds, 3),
+        }
+
 
 class NovofonAutoProcessor:
     """Автоматический процессор звонков из Novofon"""
@@ -28,12 +96,21 @@ class NovofonAutoProcessor:
     def __init__(self):
         self.target_phone = TARGET_PHONE
         self.is_running = False
+        # Конвейер: очередь перед каждой стадией (короткие звонки - первыми) и воркеры
+        self._queues: Dict[str, asyncio.PriorityQueue] = {}
+        self._workers: List[asyncio.Task] = []
+        self._seq = 0
+        self._in_flight: Set[str] = set()
+        self.metrics: Dict[str, StageMetrics] = {stage: StageMetrics() for stage in PIPELINE_STAGES}
+        self.end_to_end = StageMetrics()
+        self._tables_ready = False
         logger.info(f"🔧 NovofonAutoProcessor initialized for phone: {self.target_phone}")
     
     async def process_new_calls(self):
         """
-        Главная функция: проверяет новые звонки и обрабатывает их
-        Вызывается каждую минуту через scheduler
+        Главная функция: проверяет новые звонки и ставит их в конвейер
+        Вызывается каждую минуту через scheduler; обработка идёт в воркерах стадий,
+        поэтому тик не ждёт транскрибации и следующий тик не пропускается
         """
         if self.is_running:
             logger.debug("⏭️ Previous check still running, skipping...")
@@ -70,19 +147,12 @@ class NovofonAutoProcessor:
             
             logger.info(f"✅ Found {len(filtered_calls)} calls with {self.target_phone}")
             
-            # Обрабатываем каждый звонок
+            # Ставим каждый звонок в конвейер
             for call in filtered_calls:
                 try:
-                    # Проверяем, не обработан ли уже
-                    if await self._is_call_processed(call.get("id")):
-                        logger.debug(f"⏭️ Call {call.get('id')} already processed")
-                        continue
-                    
-                    # Обрабатываем звонок
-                    await self._process_single_call(call)
-                    
+                    await self.submit(call)
                 except Exception as e:
-                    logger.error(f"❌ Error processing call {call.get('id')}: {e}")
+                    logger.error(f"❌ Error queueing call {call.get('id')}: {e}")
                     continue
         
         except Exception as e:
@@ -93,6 +163,127 @@ class NovofonAutoProcessor:
         finally:
             self.is_running = False
     
+    async def submit(self, call: Dict[str, Any]) -> bool:
+        """Захватывает звонок в processed_calls и ставит в очередь загрузки. False - уже обработан/в работе"""
+        call_id = str(call.get("id") or "")
+        if not call_id or call_id in self._in_flight:
+            return False
+        if not await self._claim_call(call_id):
+            logger.debug(f"⏭️ Call {call_id} already processed")
+            return False
+        self._ensure_pipeline()
+        self._in_flight.add(call_id)
+        await self._put("download", CallJob(call=call, call_id=call_id))
+        return True
+    
+    # ===== Конвейер =====
+    
+    def _ensure_pipeline(self) -> None:
+        """Лениво поднимает очереди и воркеры стадий в текущем event loop"""
+        if self._workers and not all(t.done() for t in self._workers):
+            return
+        self._queues = {stage: asyncio.PriorityQueue(maxsize=STAGE_QUEUE_SIZE) for stage in PIPELINE_STAGES}
+        self._workers = [
+            asyncio.create_task(self._stage_worker(stage), name=f"novofon-{stage}-{i}")
+            for stage in PIPELINE_STAGES
+            for i in range(max(1, STAGE_WORKERS[stage]))
+        ]
+        logger.info(f"🚦 Novofon pipeline started: {STAGE_WORKERS}")
+    
+    async def _put(self, stage: str, job: CallJob) -> None:
+        # Приоритет - длительность звонка: короткие не ждут за длинной транскрибацией
+        self._seq += 1
+        await self._queues[stage].put((job.duration, self._seq, job))
+    
+    async def _stage_worker(self, stage: str) -> None:
+        handler = getattr(self, f"_stage_{stage}")
+        queue = self._queues[stage]
+        metrics = self.metrics[stage]
+        next_stage = PIPELINE_STAGES[PIPELINE_STAGES.index(stage) + 1] if stage != PIPELINE_STAGES[-1] else None
+        while True:
+            _, _, job = await queue.get()
+            metrics.in_flight += 1
+            started = time.monotonic()
+            ok = False
+            try:
+                ok = bool(await handler(job))
+            except Exception as e:
+                logger.error(f"❌ [{stage}] call {job.call_id} failed: {e}")
+            finally:
+                metrics.in_flight -= 1
+                metrics.observe(time.monotonic() - started, ok)
+            try:
+                if ok and next_stage:
+                    await self._put(next_stage, job)
+                else:
+                    if not ok:
+                        await self._mark_as_processed(job.call_id, success=False)
+                    self.end_to_end.observe(time.monotonic() - job.enqueued_at, ok)
+                    self._in_flight.discard(job.call_id)
+            finally:
+                queue.task_done()
+    
+    async def _stage_download(self, job: CallJob) -> bool:
+        recording_url = await self._get_recording_url(job.call)
+        if not recording_url:
+            logger.warning(f"⚠️ No recording URL for call {job.call_id}")
+            return False
+        job.audio_path = await self._download_audio(recording_url)
+        if not job.audio_path:
+            logger.error(f"❌ Failed to download audio for call {job.call_id}")
+            return False
+        return True
+    
+    async def _stage_transcribe(self, job: CallJob) -> bool:
+        try:
+            job.transcription = await self._transcribe_audio(job.audio_path)
+        finally:
+            chunked_transcriber.remove_tempfile(job.audio_path)
+            job.audio_path = None
+        if not job.transcription:
+            logger.error(f"❌ Failed to transcribe call {job.call_id}")
+            return False
+        logger.info(f"✅ Transcription completed: {len(job.transcription)} characters")
+        return True
+    
+    async def _stage_analyze(self, job: CallJob) -> bool:
+        job.analysis = await self._analyze_call(job.transcription, job.call)
+        return True
+    
+    async def _stage_deliver(self, job: CallJob) -> bool:
+        await self._save_to_database(job.call_id, job.call, job.transcription, job.analysis)
+        await self._send_to_telegram(job.call, job.transcription, job.analysis)
+        await self._mark_as_processed(job.call_id, success=True)
+        logger.info(f"✅ Call {job.call_id} processed successfully!")
+        return True
+    
+    async def wait_idle(self) -> None:
+        """Ждёт, пока все поставленные звонки пройдут конвейер"""
+        for stage in PIPELINE_STAGES:
+            if stage in self._queues:
+                await self._queues[stage].join()
+    
+    def stop(self) -> None:
+        """Останавливает воркеры конвейера (незавершённые звонки подхватятся после CLAIM_TIMEOUT_MINUTES)"""
+        for task in self._workers:
+            task.cancel()
+        self._workers = []
+        self._in_flight.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики стадий, глубина очередей и сквозная задержка"""
+        return {
+            "running": bool(self._workers) and not all(t.done() for t in self._workers),
+            "workers": dict(STAGE_WORKERS),
+            "queue_size": STAGE_QUEUE_SIZE,
+            "in_flight_calls": len(self._in_flight),
+            "stages": {
+                stage: {**self.metrics[stage].to_dict(), "queued": self._queues[stage].qsize() if stage in self._queues else 0}
+                for stage in PIPELINE_STAGES
+            },
+            "end_to_end": self.end_to_end.to_dict(),
+        }
+    
     def _filter_calls_by_phone(self, calls: List[Dict]) -> List[Dict]:
         """Фильтрует звонки по номеру телефона"""
         filtered = []
@@ -113,73 +304,82 @@ class NovofonAutoProcessor:
         
         return filtered
     
-    async def _is_call_processed(self, call_id: str) -> bool:
-        """Проверяет, был ли звонок уже обработан"""
+    async def _ensure_tables(self, session) -> None:
+        """Создаёт processed_calls (и добавляет колонки захвата) один раз за процесс"""
+        if self._tables_ready:
+            return
+        from sqlalchemy import text
+        await session.execute(text("""
+            CREATE TABLE IF NOT EXISTS processed_calls (
+                call_id VARCHAR PRIMARY KEY,
+                processed_at TIMESTAMP DEFAULT NOW(),
+                success BOOLEAN DEFAULT TRUE
+            )
+        """))
+        # status: processing - захвачен воркером, done - завершён (успешно или нет)
+        await session.execute(text("ALTER TABLE processed_calls ADD COLUMN IF NOT EXISTS status VARCHAR DEFAULT 'done'"))
+        await session.execute(text("ALTER TABLE processed_calls ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP DEFAULT NOW()"))
+        self._tables_ready = True
+    
+    async def _claim_call(self, call_id: str) -> bool:
+        """
+        Идемпотентный захват звонка: строка call_events (общая с webhook и агентом опроса)
+        и строка processed_calls со status='processing'.
+        Повторно захватить можно только брошенный захват (старше CLAIM_TIMEOUT_MINUTES)
+        """
+        key = call_key("novofon", call_id)
+        if not await call_event_queue.claim(key, "novofon", "novofon_auto"):
+            return False
         try:
             async with AsyncSessionLocal() as session:
                 from sqlalchemy import text
                 
+                await self._ensure_tables(session)
                 result = await session.execute(
-                    text("SELECT COUNT(*) FROM processed_calls WHERE call_id = :call_id"),
-                    {"call_id": call_id}
+                    text("""
+                        INSERT INTO processed_calls (call_id, success, status, claimed_at)
+                        VALUES (:call_id, FALSE, 'processing', NOW())
+                        ON CONFLICT (call_id) DO UPDATE SET claimed_at = NOW()
+                        WHERE processed_calls.status = 'processing'
+                          AND processed_calls.claimed_at < NOW() - make_interval(mins => :timeout)
+                        RETURNING call_id
+                    """),
+                    {"call_id": call_id, "timeout": CLAIM_TIMEOUT_MINUTES}
                 )
-                count = result.scalar()
-                return count > 0
+                claimed = result.scalar() is not None
+                await session.commit()
                 
         except Exception as e:
-            # Если таблицы нет, создадим позже
-            logger.debug(f"Table check error (expected on first run): {e}")
+            logger.error(f"Error claiming call {call_id}: {e}")
+            # строка call_events не должна висеть в processing до таймаута
+            await call_event_queue.release(key, error=str(e))
             return False
+        if not claimed:
+            # уже обработан (или обрабатывается) по processed_calls - закрываем строку очереди
+            await call_event_queue.complete(key, success=True)
+        return claimed
     
     async def _process_single_call(self, call: Dict[str, Any]):
-        """Обрабатывает один звонок полностью"""
-        call_id = call.get("id")
+        """Обрабатывает один звонок полностью, без конвейера (стадии по очереди)"""
+        job = CallJob(call=call, call_id=str(call.get("id") or ""))
         
         try:
-            logger.info(f"🎙️ Processing call {call_id}...")
-            
-            # 1. Получаем URL записи
-            recording_url = await self._get_recording_url(call)
-            if not recording_url:
-                logger.warning(f"⚠️ No recording URL for call {call_id}")
-                await self._mark_as_processed(call_id, success=False)
-                return
-            
-            # 2. Скачиваем аудио
-            audio_data = await self._download_audio(recording_url)
-            if not audio_data:
-                logger.error(f"❌ Failed to download audio for call {call_id}")
-                await self._mark_as_processed(call_id, success=False)
-                return
-            
-            # 3. Транскрибируем
-            transcription = await self._transcribe_audio(audio_data)
-            if not transcription:
-                logger.error(f"❌ Failed to transcribe call {call_id}")
-                await self._mark_as_processed(call_id, success=False)
-                return
-            
-            logger.info(f"✅ Transcription completed: {len(transcription)} characters")
-            
-            # 4. Анализируем через AI
-            analysis = await self._analyze_call(transcription, call)
-            
-            # 5. Сохраняем в БД
-            await self._save_to_database(call_id, call, transcription, analysis)
-            
-            # 6. Отправляем в Telegram
-            await self._send_to_telegram(call, transcription, analysis)
-            
-            # 7. Помечаем как обработанный
-            await self._mark_as_processed(call_id, success=True)
-            
-            logger.info(f"✅ Call {call_id} processed successfully!")
+            logger.info(f"🎙️ Processing call {job.call_id}...")
+            for stage in PIPELINE_STAGES:
+                if not await getattr(self, f"_stage_{stage}")(job):
+                    await self._mark_as_processed(job.call_id, success=False)
+                    return
             
         except Exception as e:
-            logger.error(f"❌ Error processing call {call_id}: {e}")
+            logger.error(f"❌ Error processing call {job.call_id}: {e}")
             import traceback
             logger.error(traceback.format_exc())
-            await self._mark_as_processed(call_id, success=False)
+            await self._mark_as_processed(job.call_id, success=False)
+        finally:
+            chunked_transcriber.remove_tempfile(job.audio_path)
+    
+    def _get_openai(self):
+        return get_openai_client(OPENAI_API_KEY)
     
     async def _get_recording_url(self, call: Dict) -> Optional[str]:
         """Получает URL записи звонка"""
@@ -197,49 +397,14 @@ class NovofonAutoProcessor:
             logger.error(f"Error getting recording URL: {e}")
             return None
     
-    async def _download_audio(self, recording_url: str) -> Optional[bytes]:
-        """Скачивает аудиозапись"""
-        try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.get(recording_url)
-                
-                if response.status_code == 200:
-                    return response.content
-                else:
-                    logger.error(f"Failed to download: {response.status_code}")
-                    return None
-                    
-        except Exception as e:
-            logger.error(f"Error downloading audio: {e}")
-            return None
+    async def _download_audio(self, recording_url: str) -> Optional[str]:
+        """Скачивает аудиозапись потоком в уникальный временный файл, возвращает путь"""
+        return await chunked_transcriber.download_to_tempfile(recording_url, timeout=60.0)
     
-    async def _transcribe_audio(self, audio_data: bytes) -> Optional[str]:
-        """Транскрибирует аудио через OpenAI Whisper"""
+    async def _transcribe_audio(self, audio_path: str) -> Optional[str]:
+        """Транскрибирует аудио через OpenAI Whisper (длинные звонки - сегментами по паузам)"""
         try:
-            from openai import AsyncOpenAI
-            
-            client = AsyncOpenAI(api_key=OPENAI_API_KEY)
-            
-            # Сохраняем временно
-            temp_file = f"/tmp/novofon_call_{datetime.now().timestamp()}.mp3"
-            with open(temp_file, "wb") as f:
-                f.write(audio_data)
-            
-            # Транскрибируем
-            with open(temp_file, "rb") as audio_file:
-                transcription = await client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language="ru"
-                )
-            
-            # Удаляем временный файл
-            try:
-                os.remove(temp_file)
-            except:
-                pass
-            
-            return transcription.text
+            return await chunked_transcriber.transcribe_file(audio_path, client=self._get_openai())
             
         except Exception as e:
             logger.error(f"Error transcribing audio: {e}")
@@ -251,10 +416,7 @@ class NovofonAutoProcessor:
         Специальный промпт для агентств недвижимости
         """
         try:
-            from openai import AsyncOpenAI
-            import json
-            
-            client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+            client = self._get_openai()
             
             # Определяем направление
             direction = self._get_call_direction(call)
@@ -532,9 +694,9 @@ class NovofonAutoProcessor:
 """
 
             # Отправляем в Telegram
-            async with httpx.AsyncClient(timeout=30.0) as client:
+            async with http_clients.client('telegram') as client:
                 response = await client.post(
-                    f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
+                    f"{TELEGRAM_API_BASE}/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
                     json={
                         "chat_id": TG_NEDVIGKA,
                         "text": message,
@@ -553,26 +715,22 @@ class NovofonAutoProcessor:
             logger.error(traceback.format_exc())
     
     async def _mark_as_processed(self, call_id: str, success: bool = True):
-        """Помечает звонок как обработанный"""
+        """Помечает звонок как обработанный (завершает захват)"""
+        await call_event_queue.complete(call_key("novofon", call_id), success=success)
         try:
             async with AsyncSessionLocal() as session:
                 from sqlalchemy import text
                 
-                # Создаём таблицу если не существует
-                await session.execute(text("""
-                    CREATE TABLE IF NOT EXISTS processed_calls (
-                        call_id VARCHAR PRIMARY KEY,
-                        processed_at TIMESTAMP DEFAULT NOW(),
-                        success BOOLEAN DEFAULT TRUE
-                    )
-                """))
+                await self._ensure_tables(session)
                 
-                # Вставляем запись
+                # Вставляем запись или закрываем захват
                 await session.execute(
                     text("""
-                        INSERT INTO processed_calls (call_id, success)
-                        VALUES (:call_id, :success)
-                        ON CONFLICT (call_id) DO NOTHING
+                        INSERT INTO processed_calls (call_id, success, status, processed_at)
+                        VALUES (:call_id, :success, 'done', NOW())
+                        ON CONFLICT (call_id) DO UPDATE
+                        SET success = EXCLUDED.success, status = 'done', processed_at = NOW()
+                        WHERE processed_calls.status = 'processing'
                     """),
                     {"call_id": call_id, "success": success}
                 )
@@ -4,10 +4,11 @@
 """
 import os
 import logging
-import httpx
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 
+from backend.app.config.http_clients import http_clients
+
 logger = logging.getLogger(__name__)
 
 NOVOFON_API_BASE_URL = "https://api.novofon.com/v1"
@@ -107,7 +108,7 @@ class NovofonService:
             method_path = "/statistics/outgoing-calls/"
             url = f"{NOVOFON_API_BASE_URL}{method_path}"
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
+            async with http_clients.client('novofon') as client:
                 response = await client.get(
                     url,
                     params=params,
@@ -144,7 +145,7 @@ class NovofonService:
             
             url = f"{NOVOFON_API_BASE_URL}/call/recording"
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
+            async with http_clients.client('novofon') as client:
                 response = await client.get(
                     url,
                     params=params,
@@ -174,7 +175,7 @@ class NovofonService:
             Аудиоданные или None
         """
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
+            async with http_clients.client('novofon') as client:
                 response = await client.get(recording_url)
                 
                 if response.status_code == 200:
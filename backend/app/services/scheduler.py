@@ -46,6 +46,8 @@ def stop_scheduler():
         if scheduler.running:
             scheduler.shutdown()
             logger.info("✅ Scheduler stopped")
+        from backend.app.services.novofon_auto_processor import novofon_auto_processor
+        novofon_auto_processor.stop()
     except Exception as e:
         logger.error(f"Error stopping scheduler: {e}")
 
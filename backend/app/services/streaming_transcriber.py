@@ -0,0 +1,263 @@
+"""
+Потоковая транскрипция для /ws/transcribe
+- Клиент шлёт бинарные кадры PCM16 моно (частота - в сообщении start, по умолчанию 16 кГц)
+- Серверный VAD (энергия по окнам 30 мс) режет поток на фразы по паузам; буфер сессии в памяти -
+  только текущая фраза, закрытые фразы отдаются в Whisper и освобождаются
+- Пока фраза открыта, раз в STREAM_PARTIAL_SECONDS новой речи отправляется partial, по закрытию - final;
+  оба с segment_id и таймкодами (секунды от начала потока)
+- Запросов к Whisper на сессию одновременно не больше STREAM_MAX_INFLIGHT: final ждёт слот,
+  partial при занятых слотах пропускается
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+import os
+import wave
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+from backend.app.config.http_clients import get_openai_client
+from backend.app.services.audio_pipeline import StreamingResampler
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+WINDOW = SAMPLE_RATE * 30 // 1000  # окно VAD - 30 мс
+SILENCE_DB = float(os.getenv("STREAM_SILENCE_DB", "-40"))
+SILENCE_MS = int(os.getenv("STREAM_SILENCE_MS", "600"))
+MIN_SPEECH_MS = int(os.getenv("STREAM_MIN_SPEECH_MS", "250"))
+PREROLL_MS = 300
+MAX_SEGMENT_SECONDS = float(os.getenv("STREAM_MAX_SEGMENT_SECONDS", "15"))
+PARTIAL_SECONDS = float(os.getenv("STREAM_PARTIAL_SECONDS", "1.5"))
+MAX_INFLIGHT = int(os.getenv("STREAM_MAX_INFLIGHT", "2"))
+
+Sender = Callable[[Dict[str, Any]], Awaitable[None]]
+Transcriber = Callable[[bytes, str], Awaitable[str]]
+
+
+@dataclass
+class SpeechSegment:
+    id: int
+    start: float
+    end: float
+    pcm: bytes
+
+
+class VADSegmenter:
+    """Режет поток PCM16 16 кГц моно на фразы: речь - окна с RMS выше порога, конец - пауза SILENCE_MS"""
+
+    def __init__(
+        self,
+        silence_db: float = SILENCE_DB,
+        silence_ms: int = SILENCE_MS,
+        min_speech_ms: int = MIN_SPEECH_MS,
+        max_segment_seconds: float = MAX_SEGMENT_SECONDS,
+    ):
+        self.threshold = 32768.0 * (10 ** (silence_db / 20))
+        self.silence_windows = max(1, silence_ms * SAMPLE_RATE // 1000 // WINDOW)
+        self.min_speech_windows = max(1, min_speech_ms * SAMPLE_RATE // 1000 // WINDOW)
+        self.max_windows = int(max_segment_seconds * SAMPLE_RATE) // WINDOW
+        self.preroll_windows = PREROLL_MS * SAMPLE_RATE // 1000 // WINDOW
+        self._pending = b''  # хвост меньше окна
+        self._windows_seen = 0
+        self._preroll: List[bytes] = []
+        self._segment: Optional[bytearray] = None
+        self._seg_start = 0  # в окнах
+        self._seg_windows = 0
+        self._speech_windows = 0
+        self._silent_run = 0
+        self._next_id = 0
+
+    @property
+    def open_segment(self) -> Optional[SpeechSegment]:
+        """Текущая фраза (для partial) или None"""
+        if self._segment is None:
+            return None
+        return SpeechSegment(self._next_id, self._seconds(self._seg_start), self._seconds(self._seg_start + self._seg_windows), bytes(self._segment))
+
+    @property
+    def position(self) -> float:
+        return self._seconds(self._windows_seen)
+
+    @staticmethod
+    def _seconds(windows: int) -> float:
+        return round(windows * WINDOW / SAMPLE_RATE, 2)
+
+    def feed(self, pcm: bytes) -> List[SpeechSegment]:
+        data = self._pending + pcm
+        n = len(data) // (WINDOW * 2)
+        self._pending = data[n * WINDOW * 2:]
+        if not n:
+            return []
+        windows = np.frombuffer(data[:n * WINDOW * 2], dtype='<i2').reshape(n, WINDOW)
+        voiced = np.sqrt(np.mean(windows.astype(np.float32) ** 2, axis=1)) >= self.threshold
+        closed = []
+        for i in range(n):
+            chunk = windows[i].tobytes()
+            if self._segment is None:
+                if voiced[i]:
+                    self._segment = bytearray(b''.join(self._preroll))
+                    self._seg_start = self._windows_seen - len(self._preroll)
+                    self._seg_windows = len(self._preroll)
+                    self._speech_windows = 0
+                    self._silent_run = 0
+                    self._preroll = []
+                else:
+                    self._preroll.append(chunk)
+                    if len(self._preroll) > self.preroll_windows:
+                        self._preroll.pop(0)
+            if self._segment is not None:
+                self._segment.extend(chunk)
+                self._seg_windows += 1
+                if voiced[i]:
+                    self._speech_windows += 1
+                    self._silent_run = 0
+                else:
+                    self._silent_run += 1
+                if self._silent_run >= self.silence_windows or self._seg_windows >= self.max_windows:
+                    seg = self._close()
+                    if seg:
+                        closed.append(seg)
+            self._windows_seen += 1
+        return closed
+
+    def _close(self) -> Optional[SpeechSegment]:
+        seg = self.open_segment
+        speech = self._speech_windows
+        self._segment = None
+        self._preroll = []
+        if seg is None or speech < self.min_speech_windows:
+            # Щелчок или короткий шум - не фраза
+            return None
+        self._next_id += 1
+        # Конец фразы - последнее окно речи, а не конец паузы, по которой её закрыли
+        seg.end = self._seconds(self._seg_start + self._seg_windows - self._silent_run)
+        return seg
+
+    def finish(self) -> List[SpeechSegment]:
+        if self._pending:
+            self.feed(b'\x00' * (WINDOW * 2 - len(self._pending)))
+        seg = self._close() if self._segment is not None else None
+        return [seg] if seg else []
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int = SAMPLE_RATE) -> bytes:
+    bio = io.BytesIO()
+    with wave.open(bio, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(pcm)
+    return bio.getvalue()
+
+
+async def whisper_transcribe(pcm: bytes, language: str) -> str:
+    """Whisper по фразе PCM16 16 кГц (WAV собирается в памяти)"""
+    result = await get_openai_client().audio.transcriptions.create(
+        model="whisper-1",
+        file=("segment.wav", pcm_to_wav(pcm)),
+        language=language,
+        response_format="text",
+    )
+    return (result if isinstance(result, str) else getattr(result, "text", "") or "").strip()
+
+
+class StreamingTranscriptionSession:
+    """Сессия /ws/transcribe в потоковом режиме: feed() на каждый бинарный кадр, finish() по stop"""
+
+    def __init__(
+        self,
+        send: Sender,
+        language: str = "ru",
+        sample_rate: int = SAMPLE_RATE,
+        transcribe: Optional[Transcriber] = None,
+        max_inflight: int = MAX_INFLIGHT,
+        partial_seconds: float = PARTIAL_SECONDS,
+    ):
+        self.send = send
+        self.language = language
+        self.transcribe = transcribe or whisper_transcribe
+        self.resampler = StreamingResampler(sample_rate, SAMPLE_RATE) if sample_rate != SAMPLE_RATE else None
+        self.segmenter = VADSegmenter()
+        self.partial_seconds = partial_seconds
+        self.max_inflight = max(1, max_inflight)
+        self._slots = asyncio.Semaphore(self.max_inflight)
+        self._inflight = 0
+        self._tasks: Set[asyncio.Task] = set()
+        self._finalized: Set[int] = set()
+        self._partial_at: Dict[int, float] = {}
+        self.stats = {'partials': 0, 'finals': 0, 'partials_skipped': 0, 'errors': 0}
+
+    async def feed(self, pcm: bytes) -> None:
+        if self.resampler is not None:
+            pcm = self.resampler.process(pcm)
+        for seg in self.segmenter.feed(pcm):
+            self._spawn(self._final(seg))
+        self._maybe_partial()
+
+    def _maybe_partial(self) -> None:
+        seg = self.segmenter.open_segment
+        if seg is None:
+            return
+        last = self._partial_at.get(seg.id, seg.start)
+        if seg.end - last < self.partial_seconds:
+            return
+        if self._inflight >= self.max_inflight:
+            # Слоты заняты - partial пропускаем, final своё дождётся
+            self.stats['partials_skipped'] += 1
+            return
+        self._partial_at[seg.id] = seg.end
+        self._spawn(self._partial(seg))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, seg: SpeechSegment) -> Optional[str]:
+        self._inflight += 1
+        try:
+            async with self._slots:
+                return await self.transcribe(seg.pcm, self.language)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"❌ Segment {seg.id} transcription failed: {e}")
+            return None
+        finally:
+            self._inflight -= 1
+
+    async def _partial(self, seg: SpeechSegment) -> None:
+        text = await self._run(seg)
+        # Final мог прийти раньше - устаревший partial не отправляем
+        if text is None or seg.id in self._finalized:
+            return
+        self.stats['partials'] += 1
+        await self.send({"type": "partial", "segment_id": seg.id, "start": seg.start, "end": seg.end, "text": text})
+
+    async def _final(self, seg: SpeechSegment) -> None:
+        self._finalized.add(seg.id)
+        self._partial_at.pop(seg.id, None)
+        text = await self._run(seg)
+        if text is None:
+            await self.send({"type": "error", "segment_id": seg.id, "message": "Transcription failed"})
+            return
+        self.stats['finals'] += 1
+        await self.send({"type": "final", "segment_id": seg.id, "start": seg.start, "end": seg.end, "text": text, "is_final": True})
+
+    async def finish(self) -> Dict[str, Any]:
+        """Закрыть открытую фразу и дождаться всех ответов"""
+        for seg in self.segmenter.finish():
+            self._spawn(self._final(seg))
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        return {"type": "done", "duration": self.segmenter.position, **self.stats}
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
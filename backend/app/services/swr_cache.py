@@ -0,0 +1,237 @@
+"""
+Общий in-memory кеш для сервисов (Bitrix24Service, BrainStore):
+- LRU с ограничением по числу записей и (приблизительно) по байтам
+- single-flight: конкурентные промахи по одному ключу ждут одну загрузку
+- refresh-ahead: свежая запись старше refresh_ahead*ttl обновляется в фоне
+- stale-while-revalidate: просроченная запись (в пределах stale_ttl) отдаётся сразу, обновление - в фоне;
+  при ошибке загрузки отдаётся последнее значение
+Счётчики hit/miss/evict - в stats(), сводка по всем кешам - cache_stats() (/health)
+"""
+import asyncio
+import logging
+import sys
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_caches: "weakref.WeakSet[SWRCache]" = weakref.WeakSet()
+
+
+def approx_size(obj: Any, _depth: int = 0) -> int:
+    """Грубая оценка размера значения в байтах (контейнеры - рекурсивно, до 6 уровней)"""
+    size = sys.getsizeof(obj)
+    if _depth >= 6:
+        return size
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += approx_size(k, _depth + 1) + approx_size(v, _depth + 1)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for v in obj:
+            size += approx_size(v, _depth + 1)
+    elif hasattr(obj, '__dict__'):
+        size += approx_size(vars(obj), _depth + 1)
+    return size
+
+
+class _Entry:
+    __slots__ = ('value', 'stored_at', 'size')
+
+    def __init__(self, value: Any, stored_at: float, size: int):
+        self.value = value
+        self.stored_at = stored_at
+        self.size = size
+
+
+class SWRCache:
+    """
+    get/set - как у прежнего TTLCache (None = нет свежего значения), get_or_load - с загрузчиком.
+    None не кешируется
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl_seconds: float,
+        *,
+        stale_seconds: float = 0.0,
+        max_entries: int = 1024,
+        max_bytes: Optional[int] = None,
+        refresh_ahead: float = 0.8,
+        revalidate: bool = True,
+    ):
+        self.name = name
+        self.ttl = float(ttl_seconds)
+        self.stale_ttl = float(stale_seconds)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # revalidate=False: без фоновых обновлений (загрузчик привязан к запросу, например к сессии БД),
+        # просроченное значение - только фоллбек при ошибке
+        self.refresh_ahead = refresh_ahead if revalidate else 0.0
+        self.revalidate = revalidate
+        self._store: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # clear() увеличивает поколение - загрузки, начатые до очистки, результат не сохраняют
+        self._generation = 0
+        self._counters: Dict[str, int] = {
+            'hits': 0, 'misses': 0, 'stale_hits': 0, 'evictions': 0, 'expired': 0,
+            'loads': 0, 'coalesced': 0, 'refreshes': 0, 'load_errors': 0, 'stale_on_error': 0,
+        }
+        _caches.add(self)
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def _age(self, entry: _Entry) -> float:
+        return time.monotonic() - entry.stored_at
+
+    def _lookup(self, key: str) -> Optional[_Entry]:
+        """Запись, если она ещё в окне ttl + stale_ttl (иначе удаляется)"""
+        entry = self._store.get(key)
+        if entry is None:
+            return None
+        if self._age(entry) > self.ttl + self.stale_ttl:
+            self._drop(key)
+            self._counters['expired'] += 1
+            return None
+        self._store.move_to_end(key)
+        return entry
+
+    def _drop(self, key: str) -> None:
+        entry = self._store.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def get(self, key: str) -> Any:
+        """Свежее значение или None"""
+        entry = self._lookup(key)
+        if entry is None or self._age(entry) > self.ttl:
+            self._counters['misses'] += 1
+            return None
+        self._counters['hits'] += 1
+        return entry.value
+
+    def peek(self, key: str) -> Any:
+        """Значение в пределах ttl + stale_ttl, без счётчиков (для фоллбеков)"""
+        entry = self._lookup(key)
+        return entry.value if entry is not None else None
+
+    def state(self, key: str) -> Optional[str]:
+        """'fresh' | 'stale' | None - без счётчиков"""
+        entry = self._lookup(key)
+        if entry is None:
+            return None
+        return 'fresh' if self._age(entry) <= self.ttl else 'stale'
+
+    def set(self, key: str, val: Any) -> None:
+        if val is None:
+            return
+        self._drop(key)
+        size = approx_size(val) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            logger.warning(f"[cache:{self.name}] value for {key} ({size} B) exceeds max_bytes, not cached")
+            return
+        self._store[key] = _Entry(val, time.monotonic(), size)
+        self._bytes += size
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._store and (
+            len(self._store) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            key, entry = self._store.popitem(last=False)
+            self._bytes -= entry.size
+            self._counters['evictions'] += 1
+
+    def pop(self, key: str) -> None:
+        self._drop(key)
+
+    def clear(self) -> None:
+        self._store.clear()
+        self._bytes = 0
+        self._generation += 1
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Свежее значение из кеша либо результат loader() (один на всех конкурентных ждущих).
+        Просроченное в окне stale - сразу, с обновлением в фоне. Ошибка загрузки при наличии
+        старого значения - старое значение, иначе исключение loader'а
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            age = self._age(entry)
+            if age <= self.ttl:
+                self._counters['hits'] += 1
+                if self.refresh_ahead and age > self.ttl * self.refresh_ahead:
+                    self._refresh(key, loader)
+                return entry.value
+            if self.revalidate:
+                self._counters['stale_hits'] += 1
+                self._refresh(key, loader)
+                return entry.value
+
+        self._counters['misses'] += 1
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self._counters['coalesced'] += 1
+        else:
+            fut = self._start_load(key, loader)
+        try:
+            # shield: отмена одного ждущего не отменяет общую загрузку
+            return await asyncio.shield(fut)
+        except Exception:
+            stale = self.peek(key)
+            if stale is not None:
+                self._counters['stale_on_error'] += 1
+                return stale
+            raise
+
+    def _refresh(self, key: str, loader: Callable[[], Awaitable[Any]]) -> None:
+        if key in self._inflight:
+            return
+        self._counters['refreshes'] += 1
+        self._start_load(key, loader)
+
+    def _start_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        generation = self._generation
+
+        async def _run() -> Any:
+            self._counters['loads'] += 1
+            try:
+                val = await loader()
+            except Exception as e:
+                self._counters['load_errors'] += 1
+                logger.warning(f"[cache:{self.name}] load failed for {key}: {e}")
+                raise
+            finally:
+                self._inflight.pop(key, None)
+            if generation == self._generation:
+                self.set(key, val)
+            return val
+
+        task = asyncio.ensure_future(_run())
+        # Фоновые обновления никто не ждёт - забираем исключение, чтобы не было "never retrieved"
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return task
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            'entries': len(self._store),
+            'bytes': self._bytes if self.max_bytes else None,
+            'inflight': len(self._inflight),
+            'ttl': self.ttl,
+            'stale_ttl': self.stale_ttl,
+            'revalidate': self.revalidate,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+        }
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Счётчики всех живых SWRCache по имени"""
+    return {c.name: c.stats() for c in list(_caches)}
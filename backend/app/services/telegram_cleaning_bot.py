@@ -10,7 +10,8 @@ import os
 import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime, date
-import httpx
+
+from backend.app.config.http_clients import http_clients
 
 logger = logging.getLogger(__name__)
 
@@ -58,7 +59,7 @@ async def send_message(
 ) -> bool:
     """Отправить текстовое сообщение"""
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
+        async with http_clients.client('telegram') as client:
             payload = {
                 "chat_id": chat_id,
                 "text": text,
@@ -91,7 +92,7 @@ async def send_photo(
     Возвращает dict с message_id и chat_id в случае успеха
     """
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
+        async with http_clients.client('telegram') as client:
             payload = {
                 "chat_id": chat_id,
                 "photo": photo_file_id
@@ -148,7 +149,7 @@ async def send_media_group(
             
             media.append(media_item)
         
-        async with httpx.AsyncClient(timeout=30) as client:
+        async with http_clients.client('telegram') as client:
             payload = {
                 "chat_id": chat_id,
                 "media": media
@@ -390,7 +391,7 @@ async def handle_house_selection(
         )
         
         # Отвечаем на callback query
-        async with httpx.AsyncClient(timeout=10) as client:
+        async with http_clients.client('telegram') as client:
             await client.post(
                 f"{API_URL}/answerCallbackQuery",
                 json={"callback_query_id": callback_query_id, "text": "Дом выбран ✅"}
@@ -532,7 +533,7 @@ async def handle_done_command(chat_id: int, user_id: int, db_session):
         # Сохраняем в БД
         try:
             from datetime import datetime
-            from app.config.database import get_db_pool
+            from backend.app.config.database import get_db_pool
             
             db_pool = await get_db_pool()
             if db_pool:
@@ -11,6 +11,7 @@ from datetime import datetime, timezone
 import os
 
 from backend.app.config.settings import settings
+from backend.app.config.http_clients import http_clients
 
 logger = logging.getLogger(__name__)
 
@@ -35,7 +36,7 @@ class TelegramService:
         """Отправка текстового сообщения"""
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_clients.client('telegram') as client:
                 url = f"{self.api_url}/sendMessage"
                 payload = {
                     "chat_id": chat_id,
@@ -70,7 +71,7 @@ class TelegramService:
         """Отправка фото"""
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_clients.client('telegram') as client:
                 url = f"{self.api_url}/sendPhoto"
                 
                 if photo_url:
@@ -129,7 +130,7 @@ class TelegramService:
         full_caption += f"🕒 {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M UTC')}"
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_clients.client('telegram') as client:
                 url = f"{self.api_url}/sendPhoto"
                 payload = {
                     "chat_id": self.photos_channel_id,
@@ -233,7 +234,7 @@ class TelegramService:
         """Получение информации о webhook"""
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_clients.client('telegram') as client:
                 url = f"{self.api_url}/getWebhookInfo"
                 response = await client.get(url)
                 
@@ -250,7 +251,7 @@ class TelegramService:
         """Установка webhook для бота"""
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with http_clients.client('telegram') as client:
                 url = f"{self.api_url}/setWebhook"
                 payload = {
                     "url": webhook_url,
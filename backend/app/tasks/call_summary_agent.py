@@ -2,20 +2,16 @@
 Агент для автоматической обработки звонков из Novofon и Bitrix24
 Проверяет новые звонки каждые 5 минут и создаёт саммари
 """
-import asyncio
 import logging
 from datetime import datetime, timedelta
-from typing import Set
 
 from backend.app.services.bitrix_calls_service import BitrixCallsService
 from backend.app.services.novofon_service import novofon_service
+from backend.app.services.call_event_queue import call_event_queue, call_key
 from backend.app.routers.call_summary import process_call_recording
 
 logger = logging.getLogger(__name__)
 
-# Храним ID обработанных звонков, чтобы не обрабатывать дважды
-processed_calls: Set[str] = set()
-
 class CallSummaryAgent:
     def __init__(self):
         self.bitrix_service = BitrixCallsService()
@@ -24,7 +20,8 @@ class CallSummaryAgent:
     
     async def check_and_process_calls(self):
         """
-        Проверяет новые звонки из Novofon и Bitrix24 и создаёт саммари
+        Проверяет новые звонки из Novofon и Bitrix24 и ставит их в очередь call_events
+        (саммари создают воркеры очереди; дедупликация - по call_key в БД)
         """
         try:
             if self.is_running:
@@ -47,18 +44,21 @@ class CallSummaryAgent:
                 if novofon_calls:
                     logger.info(f"📞 Found {len(novofon_calls)} calls from Novofon")
                     for call in novofon_calls:
-                        call_id = f"novofon_{call.get('id', call.get('call_id'))}"
+                        key = call_key("novofon", call.get('id', call.get('call_id')))
                         
-                        if call_id in processed_calls:
+                        if await call_event_queue.is_known(key):
                             continue
                         
                         try:
-                            await self.process_novofon_call(call)
-                            processed_calls.add(call_id)
-                            processed_count += 1
-                            await asyncio.sleep(2)
+                            queued = await call_event_queue.enqueue(key, "novofon_api", call, source="novofon")
+                            if queued is None:
+                                # Очередь недоступна - обрабатываем здесь, дедупликация только в памяти
+                                await self.process_novofon_call(call)
+                                await call_event_queue.complete(key)
+                            if queued is not False:
+                                processed_count += 1
                         except Exception as e:
-                            logger.error(f"❌ Failed to process Novofon call {call_id}: {e}")
+                            logger.error(f"❌ Failed to queue Novofon call {key}: {e}")
             except Exception as e:
                 logger.error(f"❌ Error fetching Novofon calls: {e}")
             
@@ -69,9 +69,9 @@ class CallSummaryAgent:
                 if bitrix_calls:
                     logger.info(f"📞 Found {len(bitrix_calls)} calls from Bitrix24")
                     for call in bitrix_calls:
-                        call_id = f"bitrix_{call.get('CALL_ID')}"
+                        key = call_key("bitrix", call.get('CALL_ID'))
                         
-                        if call_id in processed_calls:
+                        if await call_event_queue.is_known(key):
                             continue
                         
                         has_record = bool(call.get("RECORD_FILE_ID"))
@@ -79,29 +79,26 @@ class CallSummaryAgent:
                         call_status = call.get("CALL_STATUS")
                         
                         if not has_record or duration < 10 or call_status != "200":
-                            processed_calls.add(call_id)
+                            await call_event_queue.mark_skipped(key, "bitrix", "no_record_or_short")
                             continue
                         
                         try:
-                            await self.process_single_call(call)
-                            processed_calls.add(call_id)
-                            processed_count += 1
-                            await asyncio.sleep(2)
+                            queued = await call_event_queue.enqueue(key, "bitrix_api", call, source="bitrix")
+                            if queued is None:
+                                await self.process_single_call(call)
+                                await call_event_queue.complete(key)
+                            if queued is not False:
+                                processed_count += 1
                         except Exception as e:
-                            logger.error(f"❌ Failed to process Bitrix call {call_id}: {e}")
+                            logger.error(f"❌ Failed to queue Bitrix call {key}: {e}")
             except Exception as e:
                 logger.error(f"❌ Error fetching Bitrix24 calls: {e}")
             
             if processed_count > 0:
-                logger.info(f"✅ Processed {processed_count} calls total")
+                logger.info(f"✅ Queued {processed_count} calls total")
             else:
                 logger.info("📭 No new calls to process")
             
-            # Очищаем старые ID из памяти
-            if len(processed_calls) > 1000:
-                logger.info("🧹 Cleaning old call IDs from memory...")
-                processed_calls.clear()
-            
         except Exception as e:
             logger.error(f"❌ Error in call summary agent: {e}")
             import traceback
@@ -109,7 +106,7 @@ class CallSummaryAgent:
         finally:
             self.is_running = False
     
-    async def process_single_call(self, call: dict):
+    async def process_single_call(self, call: dict, raise_errors: bool = False):
         """
         Обработать один звонок из Bitrix24
         """
@@ -134,9 +131,9 @@ class CallSummaryAgent:
         }
         
         # Обрабатываем (транскрипция + саммари + отправка)
-        await process_call_recording(webhook_data, None)
+        await process_call_recording(webhook_data, None, raise_errors=raise_errors)
     
-    async def process_novofon_call(self, call: dict):
+    async def process_novofon_call(self, call: dict, raise_errors: bool = False):
         """
         Обработать один звонок из Novofon
         """
@@ -172,12 +169,24 @@ class CallSummaryAgent:
         }
         
         # Обрабатываем (транскрипция + саммари + отправка)
-        await process_call_recording(webhook_data, None)
+        await process_call_recording(webhook_data, None, raise_errors=raise_errors)
         logger.info(f"✅ Successfully processed Novofon call {call_id}")
 
 # Глобальный экземпляр агента
 call_summary_agent = CallSummaryAgent()
 
+
+async def _handle_novofon_api(payload: dict, metadata: dict):
+    await call_summary_agent.process_novofon_call(payload, raise_errors=True)
+
+
+async def _handle_bitrix_api(payload: dict, metadata: dict):
+    await call_summary_agent.process_single_call(payload, raise_errors=True)
+
+
+call_event_queue.register("novofon_api", _handle_novofon_api)
+call_event_queue.register("bitrix_api", _handle_bitrix_api)
+
 async def run_call_summary_agent():
     """
     Функция для запуска агента (вызывается из scheduler)
@@ -1,11 +1,14 @@
 """
 Планировщик задач - автоматические задачи по расписанию
 - Синхронизация Bitrix24 каждые 15 минут
+- Дельта-синхронизация зеркала сделок Bitrix24 каждые 5 минут
 - Напоминания о планерках
 - AI звонки сотрудникам
+- Снимки метрик Single Brain в БД (BRAIN_METRICS_FLUSH_MINUTES, 0 - выключено)
 """
 import asyncio
 import logging
+import os
 from datetime import datetime, timezone
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
@@ -13,12 +16,15 @@ from apscheduler.triggers.interval import IntervalTrigger
 import pytz
 
 from backend.app.services.bitrix24_service import bitrix24_service
+from backend.app.services.brain_metrics import flush_brain_metrics
 from backend.app.services.telegram_service import telegram_service
 from backend.app.config.database import AsyncSessionLocal
 from backend.app.tasks.call_summary_agent import run_call_summary_agent
 
 logger = logging.getLogger(__name__)
 
+BRAIN_METRICS_FLUSH_MINUTES = int(os.getenv("BRAIN_METRICS_FLUSH_MINUTES", "5"))
+
 class TaskScheduler:
     """Планировщик автоматических задач"""
     
@@ -43,9 +49,28 @@ class TaskScheduler:
             replace_existing=True
         )
         
+        # Дельта-синхронизация зеркала сделок Bitrix24 (DATE_MODIFY > last_sync)
+        self.scheduler.add_job(
+            self.sync_bitrix24_mirror,
+            trigger=IntervalTrigger(minutes=5),
+            id='sync_bitrix24_mirror',
+            name='Дельта-синхронизация зеркала сделок Bitrix24',
+            next_run_time=datetime.now(timezone.utc),
+            replace_existing=True
+        )
+        
         # Московский часовой пояс
         moscow_tz = pytz.timezone('Europe/Moscow')
         
+        # Полная сверка зеркала каждую ночь в 3:00 MSK (удалённые сделки)
+        self.scheduler.add_job(
+            self.full_sync_bitrix24_mirror,
+            trigger=CronTrigger(hour=3, minute=0, timezone=moscow_tz),
+            id='full_sync_bitrix24_mirror',
+            name='Полная сверка зеркала сделок Bitrix24',
+            replace_existing=True
+        )
+        
         # Напоминание о планерке каждый день в 8:25 MSK
         self.scheduler.add_job(
             self.send_plannerka_reminder,
@@ -73,6 +98,17 @@ class TaskScheduler:
             replace_existing=True
         )
         
+        # Снимки метрик Single Brain для трендов на дашборде агентов
+        if BRAIN_METRICS_FLUSH_MINUTES > 0:
+            self.scheduler.add_job(
+                self.flush_brain_metrics,
+                trigger=IntervalTrigger(minutes=BRAIN_METRICS_FLUSH_MINUTES),
+                id='brain_metrics_flush',
+                name='Снимок метрик Single Brain',
+                replace_existing=True,
+                max_instances=1
+            )
+        
         self.scheduler.start()
         self.running = True
         
@@ -103,49 +139,19 @@ class TaskScheduler:
         
         try:
             async with AsyncSessionLocal() as db:
-                # Загрузка всех сделок
-                deals = await bitrix24_service.get_all_deals()
+                result = await bitrix24_service.sync_houses(db)
+                synced = result["total"]
+                created = result["created"]
+                updated = result["updated"]
                 
-                if not deals:
+                if not synced:
                     logger.warning("No deals loaded from Bitrix24")
                     return
                 
-                synced = 0
-                created = 0
-                updated = 0
-                
-                from backend.app.models.house import House
-                from sqlalchemy import select
-                
-                for deal in deals:
-                    house_data = bitrix24_service.parse_deal_to_house(deal)
-                    
-                    if not house_data.get("address"):
-                        continue
-                    
-                    # Проверка существования
-                    result = await db.execute(
-                        select(House).where(House.bitrix_id == house_data["bitrix_id"])
-                    )
-                    existing = result.scalar_one_or_none()
-                    
-                    if existing:
-                        # Обновление
-                        for key, value in house_data.items():
-                            if key != "id":
-                                setattr(existing, key, value)
-                        updated += 1
-                    else:
-                        # Создание
-                        new_house = House(**house_data)
-                        db.add(new_house)
-                        created += 1
-                    
-                    synced += 1
-                
-                await db.commit()
-                
-                logger.info(f"✅ Bitrix24 sync complete: {synced} total, {created} created, {updated} updated")
+                logger.info(
+                    f"✅ Bitrix24 sync complete: {synced} total, {created} created, {updated} updated, "
+                    f"{result['unchanged']} unchanged, {result['deleted']} deleted"
+                )
                 
                 # Логирование в БД
                 from backend.app.models.log import Log, LogLevel, LogCategory
@@ -154,8 +160,8 @@ class TaskScheduler:
                     id=str(uuid4()),
                     level=LogLevel.INFO,
                     category=LogCategory.INTEGRATION,
-                    message=f"Автосинхронизация Bitrix24 завершена: {synced} домов ({created} создано, {updated} обновлено)",
-                    extra_data={"synced": synced, "created": created, "updated": updated}
+                    message=f"Автосинхронизация Bitrix24 завершена: {synced} домов ({created} создано, {updated} обновлено, {result['deleted']} удалено)",
+                    extra_data={"synced": synced, **result}
                 )
                 db.add(log)
                 await db.commit()
@@ -179,6 +185,27 @@ class TaskScheduler:
             except:
                 pass
     
+    async def sync_bitrix24_mirror(self):
+        """Задача: Дельта-синхронизация зеркала сделок"""
+        try:
+            await bitrix24_service.mirror.delta_sync()
+        except Exception as e:
+            logger.error(f"❌ Bitrix24 mirror delta sync error: {e}")
+    
+    async def full_sync_bitrix24_mirror(self):
+        """Задача: Полная сверка зеркала сделок"""
+        try:
+            await bitrix24_service.mirror.full_sync()
+        except Exception as e:
+            logger.error(f"❌ Bitrix24 mirror full sync error: {e}")
+    
+    async def flush_brain_metrics(self):
+        """Задача: Снимок метрик Single Brain за интервал"""
+        try:
+            await flush_brain_metrics()
+        except Exception as e:
+            logger.error(f"❌ Brain metrics flush error: {e}")
+    
     async def send_plannerka_reminder(self):
         """Задача: Напоминание о планерке в 8:25"""
         logger.info("🔔 Sending plannerka reminders...")
@@ -487,8 +487,13 @@ async def _run_ai_agent_worker(room_name: str, call_id: str, prompt_id: str, voi
 
     import websockets
     import base64
-    import audioop
     import time
+    from backend.app.config.http_clients import http_clients
+    from backend.app.services.audio_pipeline import (
+        REALTIME_SAMPLE_RATE,
+        PCMFramer,
+        RealtimeInputPipeline,
+    )
 
 
     try:
@@ -811,13 +816,27 @@ async def _run_ai_agent_worker(room_name: str, call_id: str, prompt_id: str, voi
             if not text:
                 return
             try:
-                import io
-                import wave
                 ai_talking = True
-                # Call OpenAI TTS
+                # Потоковый TTS: raw PCM16 24 кГц моно (как у AudioSource) - кадры уходят в LiveKit
+                # по мере прихода ответа, без декодирования WAV целиком в памяти
+                framer = PCMFramer(REALTIME_SAMPLE_RATE)
+                total = 0
+
+                async def _play(chunk: bytes) -> None:
+                    nonlocal total
+                    frame = rtc.AudioFrame(
+                        data=chunk,
+                        sample_rate=REALTIME_SAMPLE_RATE,
+                        num_channels=1,
+                        samples_per_channel=len(chunk)//2
+                    )
+                    await source.capture_frame(frame)
+                    total += len(chunk)
+
                 try:
-                    async with httpx.AsyncClient(timeout=60) as cli:
-                        resp = await cli.post(
+                    async with http_clients.client('openai') as cli:
+                        async with cli.stream(
+                            'POST',
                             'https://api.openai.com/v1/audio/speech',
                             headers={
                                 'Authorization': f'Bearer {openai_key}',
@@ -827,74 +846,22 @@ async def _run_ai_agent_worker(room_name: str, call_id: str, prompt_id: str, voi
                                 'model': 'gpt-4o-mini-tts',
                                 'voice': (voice or 'marin'),
                                 'input': text,
-                                'format': 'wav'
+                                'response_format': 'pcm'
                             }
-                        )
-                        if resp.status_code != 200:
-                            logger.error(f"[AI-CALL {call_id}] TTS error: {resp.status_code} {resp.text}")
-                            return
-                        wav_bytes = resp.content
+                        ) as resp:
+                            if resp.status_code != 200:
+                                body = await resp.aread()
+                                logger.error(f"[AI-CALL {call_id}] TTS error: {resp.status_code} {body[:500]!r}")
+                                return
+                            async for piece in resp.aiter_bytes():
+                                for chunk in framer.feed(piece):
+                                    await _play(chunk)
+                    tail = framer.flush()
+                    if tail:
+                        await _play(tail)
                 except Exception as e:
-                    logger.error(f"[AI-CALL {call_id}] TTS request failed: {e}")
-                    return
-
-                # Decode WAV -> PCM16 mono 16k
-                try:
-                    bio = io.BytesIO(wav_bytes)
-                    w = wave.open(bio, 'rb')
-                    sr = w.getframerate()
-                    ch = w.getnchannels()
-                    sampw = w.getsampwidth()
-                    nframes = w.getnframes()
-                    pcm = w.readframes(nframes)
-                    w.close()
-                    # ensure 16-bit
-                    if sampw != 2:
-                        try:
-                            pcm = audioop.lin2lin(pcm, sampw, 2)
-                        except Exception as e:
-                            logger.error(f"[AI-CALL {call_id}] TTS lin2lin failed: {e}")
-                            return
-                    # to mono
-                    if ch and ch > 1:
-                        try:
-                            pcm = audioop.tomono(pcm, 2, 0.5, 0.5)
-                            ch = 1
-                        except Exception as e:
-                            logger.error(f"[AI-CALL {call_id}] TTS tomono failed: {e}")
-                            return
-                    # resample to 16k if needed
-                    if sr != 16000:
-                        try:
-                            pcm, _ = audioop.ratecv(pcm, 2, ch or 1, sr, 16000, None)
-                            sr = 16000
-                        except Exception as e:
-                            logger.error(f"[AI-CALL {call_id}] TTS ratecv failed: {e}")
-                            return
-                    # Stream into LiveKit source in ~20ms frames
-                    frame_bytes = int(0.02 * 16000 * 2)  # 640 bytes
-                    # playback chunking defined at worker scope
-
-                    total = 0
-                    for i in range(0, len(pcm), frame_bytes):
-                        chunk = pcm[i:i+frame_bytes]
-                        if not chunk:
-                            continue
-                        try:
-                            frame = rtc.AudioFrame(
-                                data=chunk,
-                                sample_rate=16000,
-                                num_channels=1,
-                                samples_per_channel=len(chunk)//2
-                            )
-                            await source.capture_frame(frame)
-                            total += len(chunk)
-                        except Exception as e:
-                            logger.error(f"[AI-CALL {call_id}] TTS capture_frame error: {e}")
-                            break
-                    logger.info(f"[AI-CALL {call_id}] TTS played: bytes={total}, text_len={len(text)}")
-                except Exception as e:
-                    logger.error(f"[AI-CALL {call_id}] TTS decode/play failed: {e}")
+                    logger.error(f"[AI-CALL {call_id}] TTS stream/play failed: {e}")
+                logger.info(f"[AI-CALL {call_id}] TTS played: bytes={total}, text_len={len(text)}")
             finally:
                 ai_talking = False
 
@@ -997,10 +964,12 @@ async def _run_ai_agent_worker(room_name: str, call_id: str, prompt_id: str, voi
                 audio_stream = rtc.AudioStream(pstn_track)
                 logger.info(f"[AI-CALL {call_id}] Forwarding PSTN audio to OpenAI (Server VAD mode)")
                 frame_count = 0
+                messages_sent = 0
                 bytes_sent = 0
                 last_log = time.time()
                 first_frame_logged = False
                 mismatch_logged = False
+                audio_in = RealtimeInputPipeline(REALTIME_SAMPLE_RATE)
 
                 async for evt in audio_stream:
                     # Unwrap AudioFrameEvent -> AudioFrame when needed
@@ -1029,37 +998,31 @@ async def _run_ai_agent_worker(room_name: str, call_id: str, prompt_id: str, voi
                     if not data:
                         continue
                     
-                    # Basic audio processing - convert to 24kHz mono PCM16 for OpenAI
-                    # to mono if needed
-                    if ch and ch > 1:
-                        try:
-                            data = audioop.tomono(data, 2, 0.5, 0.5)
-                            ch = 1
-                        except Exception as e:
-                            logger.error(f"[AI-CALL {call_id}] tomono failed: {e}")
-                    
-                    # resample to 24k if needed (OpenAI Realtime prefers 24kHz)
-                    if sr and sr != 24000:
-                        try:
-                            before = len(data)
-                            data, _ = audioop.ratecv(data, 2, ch or 1, sr, 24000, None)
-                            sr = 24000
-                            logger.debug(f"[AI-CALL {call_id}] PSTN resampled to 24k: bytes {before}->{len(data)}")
-                        except Exception as e:
-                            logger.error(f"[AI-CALL {call_id}] ratecv failed (sr={sr}): {e}")
-                    
-                    # Send directly to OpenAI - let server VAD handle everything
-                    audio_b64 = base64.b64encode(data).decode('utf-8')
-                    await openai_ws.send(json.dumps({"type": "input_audio_buffer.append", "audio": audio_b64}))
+                    # Моно PCM16 24 кГц для OpenAI: кадры копятся до ~100 мс и конвертируются блоком
+                    # (ресэмплер хранит состояние между блоками), одно input_audio_buffer.append на блок
+                    try:
+                        messages = audio_in.push(data, sr, ch)
+                    except Exception as e:
+                        logger.error(f"[AI-CALL {call_id}] resample failed (sr={sr}, ch={ch}): {e}")
+                        continue
                     frame_count += 1
-                    bytes_sent += len(data)
+
+                    # Send to OpenAI - let server VAD handle everything
+                    for msg in messages:
+                        await openai_ws.send(msg)
+                        messages_sent += 1
+                        bytes_sent += len(msg)
 
                     # Simple periodic logging
                     if time.time() - last_log > 5.0:
-                        logger.info(f"[AI-CALL {call_id}] PSTN->OpenAI: frames={frame_count}, bytes_sent={bytes_sent}, sr={sr}, ch={ch}")
-                        _add_call_log(call_id, 'metric', f'PSTN->OpenAI frames={frame_count} bytes={bytes_sent} sr={sr} ch={ch}')
+                        logger.info(f"[AI-CALL {call_id}] PSTN->OpenAI: frames={frame_count}, messages={messages_sent}, bytes_sent={bytes_sent}, sr={sr}, ch={ch}")
+                        _add_call_log(call_id, 'metric', f'PSTN->OpenAI frames={frame_count} messages={messages_sent} bytes={bytes_sent} sr={sr} ch={ch}')
                         last_log = time.time()
 
+                if is_running:
+                    for msg in audio_in.flush():
+                        await openai_ws.send(msg)
+
             except Exception as e:
                 logger.error(f"[AI-CALL {call_id}] PSTN audio forwarding error: {e}")
 
@@ -1349,12 +1312,20 @@ async def startup_event():
             from backend.app.migrations.run_migrations import run_migrations
             from backend.app.config.database import get_db_pool
             
+            # Общий asyncpg пул приложения создаётся здесь и живёт до shutdown
             db_pool = await get_db_pool()
             if db_pool:
                 await run_migrations(db_pool)
                 logger.info("✅ Database migrations completed")
         except Exception as migration_error:
             logger.warning(f"⚠️ Migrations skipped: {migration_error}")
+        
+        # Воркеры очереди звонков (call_events) - подхватывают и задачи, оставшиеся с прошлого запуска
+        try:
+            from backend.app.services.call_event_queue import call_event_queue
+            call_event_queue.start()
+        except Exception as queue_error:
+            logger.warning(f"⚠️ Call event queue not started: {queue_error}")
             
     except Exception as e:
         logger.error(f"❌ Database initialization failed: {e}")
@@ -1436,6 +1407,27 @@ async def shutdown_event():
     except Exception as e:
         logger.warning(f'⚠️ Could not stop task scheduler: {e}')
     
+    # Остановка воркеров очереди звонков (до закрытия пула)
+    try:
+        from backend.app.services.call_event_queue import call_event_queue
+        await call_event_queue.stop()
+    except Exception as e:
+        logger.warning(f'⚠️ Could not stop call event queue: {e}')
+    
+    # Закрытие общего asyncpg пула
+    try:
+        from backend.app.config.database import close_db_pool
+        await close_db_pool()
+    except Exception as e:
+        logger.warning(f'⚠️ Could not close asyncpg pool: {e}')
+    
+    # Закрытие общих HTTP-клиентов интеграций
+    try:
+        from backend.app.config.http_clients import close_http_clients
+        await close_http_clients()
+    except Exception as e:
+        logger.warning(f'⚠️ Could not close HTTP clients: {e}')
+    
     # Остановка Novofon scheduler (отключен - используем webhook)
     # try:
     #     from backend.app.services.scheduler import stop_scheduler
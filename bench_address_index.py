@@ -0,0 +1,123 @@
+"""
+Стенд AddressIndex против перебора brain.address_match_score на 5k и 50k синтетических адресов
+- сверка: для каждого запроса все ненулевые score (0/50/100) и top-3 совпадают с перебором
+- время построения индекса и время запроса "улица X, дом N": перебор против AddressIndex.search
+Адреса - в разных записях (ул./улица/пр-т/пер., с городом и без, литеры и корпуса), часть запросов -
+с другим номером дома, без номера и по несуществующей улице.
+
+Перебор на 50k - секунды на запрос, поэтому запросов по умолчанию немного.
+
+Запуск: python bench_address_index.py [5000,50000] [запросов]
+"""
+import logging
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("BITRIX24_WEBHOOK_URL", "https://test.bitrix24.ru/rest/1/test/")
+
+from backend.app.services.address_index import AddressIndex  # noqa: E402
+from backend.app.services.brain import address_match_score  # noqa: E402
+
+SIZES = [int(x) for x in sys.argv[1].split(",")] if len(sys.argv) > 1 else [5_000, 50_000]
+QUERIES = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+TOP_K = 3
+
+STREETS = [
+    "Кибальчича", "Билибина", "Ленина", "Московская", "Никитина", "Гагарина", "Кирова", "Суворова",
+    "Тульская", "Садовая", "Пролетарская", "Маршала Жукова", "Академика Королёва", "Генерала Попова",
+    "Вишневского", "Островского", "Чижевского", "Баумана", "Плеханова", "Фридриха Энгельса",
+]
+PREFIXES = ["ул. ", "улица ", "пр-т ", "проспект ", "пер. ", ""]
+SUFFIXES = ["", "а", "к1", "/2", " корп. 2"]
+
+
+def street_name(rng: random.Random, i: int) -> str:
+    # 20 базовых названий x номер квартала - несколько тысяч различных улиц
+    base = STREETS[i % len(STREETS)]
+    return base if rng.random() < 0.3 else f"{base} {rng.randint(1, 200)}-я"
+
+
+def make_addresses(n: int):
+    rng = random.Random(n)
+    out = []
+    for i in range(n):
+        street = street_name(rng, i)
+        number = f"{rng.randint(1, 150)}{rng.choice(SUFFIXES)}"
+        city = "г. Калуга, " if rng.random() < 0.5 else ""
+        house = f", д. {number}" if rng.random() < 0.9 else ""
+        out.append((f"deal{i}", f"{city}{rng.choice(PREFIXES)}{street}{house}"))
+    return out
+
+
+def make_queries(addresses, count: int):
+    rng = random.Random(7)
+    queries = []
+    for _ in range(count):
+        _, addr = rng.choice(addresses)
+        kind = rng.random()
+        if kind < 0.5:
+            queries.append(addr)
+        elif kind < 0.7:
+            queries.append(addr.rsplit(",", 1)[0] + f", {rng.randint(151, 300)}")
+        elif kind < 0.85:
+            queries.append(addr.rsplit(",", 1)[0])
+        else:
+            queries.append(f"ул. Несуществующая {rng.randint(1, 99)}, д. 5")
+    return queries
+
+
+def reference(addresses, query):
+    """Как было: address_match_score по всем адресам"""
+    scored = {}
+    for key, addr in addresses:
+        s = address_match_score(query, addr)
+        if s:
+            scored[key] = s
+    return scored
+
+
+def run(size: int) -> None:
+    addresses = make_addresses(size)
+    order = {key: i for i, (key, _) in enumerate(addresses)}
+    queries = make_queries(addresses, QUERIES)
+
+    started = time.perf_counter()
+    index = AddressIndex()
+    index.sync(addresses)
+    built = time.perf_counter() - started
+
+    started = time.perf_counter()
+    expected = [reference(addresses, q) for q in queries]
+    scan = (time.perf_counter() - started) / len(queries)
+
+    started = time.perf_counter()
+    found = [index.search(q, limit=TOP_K) for q in queries]
+    lookup = (time.perf_counter() - started) / len(queries)
+
+    hits = 0
+    for q, exp, top in zip(queries, expected, found):
+        assert index.match(q) == exp, f"score расходится для {q!r}"
+        exp_top = sorted(exp.items(), key=lambda ks: (-ks[1], order[ks[0]]))[:TOP_K]
+        assert top == exp_top, f"top-{TOP_K} расходится для {q!r}: {top} != {exp_top}"
+        hits += bool(exp)
+
+    print(f"\n🏠 {size} адресов, {len(queries)} запросов ({hits} с совпадениями)")
+    print(f"   построение индекса                {built * 1000:9.1f} мс")
+    print(f"   перебор address_match_score       {scan * 1000:9.3f} мс на запрос")
+    print(f"   AddressIndex.search top-{TOP_K}          {lookup * 1000:9.3f} мс на запрос | x{scan / lookup:,.0f}")
+    print("   ✅ score и top-k совпадают с перебором")
+
+
+def main():
+    logging.disable(logging.WARNING)
+    print("=" * 90)
+    print(f"📍 AddressIndex: {', '.join(map(str, SIZES))} адресов")
+    print("=" * 90)
+    for size in SIZES:
+        run(size)
+
+
+if __name__ == "__main__":
+    main()
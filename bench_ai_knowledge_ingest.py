@@ -0,0 +1,104 @@
+"""
+Бенчмарк эмбеддингов для загрузки в базу знаний (routers/ai_knowledge.py)
+- Поднимает локальный фейковый /v1/embeddings (aiohttp) с задержкой на запрос
+- Сравнивает старую схему (один запрос на чанк, по очереди) с _embed_texts_dynamic
+  (input-массивы батчами по AI_EMBED_BATCH_SIZE, AI_EMBED_CONCURRENCY параллельно)
+
+Запуск: python bench_ai_knowledge_ingest.py [число_чанков] [задержка_мс]
+"""
+import asyncio
+import os
+import sys
+import time
+
+from aiohttp import web
+
+CHUNKS = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+LATENCY_MS = float(sys.argv[2]) if len(sys.argv) > 2 else 80.0
+PER_INPUT_MS = 0.5
+DIMS = 1536
+PORT = 18765
+
+stats = {"requests": 0, "inputs": 0}
+
+
+async def fake_embeddings(request: web.Request) -> web.Response:
+    body = await request.json()
+    inputs = body.get("input")
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    stats["requests"] += 1
+    stats["inputs"] += len(inputs)
+    await asyncio.sleep((LATENCY_MS + PER_INPUT_MS * len(inputs)) / 1000)
+    data = [
+        {"object": "embedding", "index": i, "embedding": [((len(t) + k) % 7) / 7.0 for k in range(DIMS)]}
+        for i, t in enumerate(inputs)
+    ]
+    return web.json_response({
+        "object": "list",
+        "data": data,
+        "model": body.get("model"),
+        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+    })
+
+
+async def main():
+    # Окружение до импорта роутера: ключ/URL читаются при импорте, БД не нужна (dims=1536)
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+    os.environ.pop("DATABASE_URL", None)
+    os.environ.pop("NEON_DATABASE_URL", None)
+    from backend.app.routers import ai_knowledge as ak
+
+    app = web.Application()
+    app.router.add_post("/v1/embeddings", fake_embeddings)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+
+    texts = [f"Чанк документа №{i}. " * 40 for i in range(CHUNKS)]
+    client = ak._get_openai_client()
+
+    print("=" * 60)
+    print(f"📄 Чанков: {CHUNKS}, задержка фейкового API: {LATENCY_MS:.0f} мс/запрос")
+    print("=" * 60)
+
+    try:
+        # Старая схема: по одному запросу на чанк
+        stats.update(requests=0, inputs=0)
+        t0 = time.perf_counter()
+        old = []
+        for t in texts:
+            r = await client.embeddings.create(model="text-embedding-3-small", input=t)
+            old.append(r.data[0].embedding)
+        t_old = time.perf_counter() - t0
+        print(f"⏱  по одному:  {t_old:7.2f} с, запросов: {stats['requests']}")
+
+        # Новая схема
+        stats.update(requests=0, inputs=0)
+        t0 = time.perf_counter()
+        new = await ak._embed_texts_dynamic(texts)
+        t_new = time.perf_counter() - t0
+        print(
+            f"⚡ батчами:    {t_new:7.2f} с, запросов: {stats['requests']} "
+            f"(batch={ak.EMBED_BATCH_SIZE}, concurrency={ak.EMBED_CONCURRENCY})"
+        )
+        assert new == old, "порядок/значения эмбеддингов разошлись"
+        print(f"✅ результаты совпадают, ускорение x{t_old / max(t_new, 1e-9):.1f}")
+
+        # Сериализация вектора для текстового COPY (используется без pgvector)
+        t0 = time.perf_counter()
+        for v in new:
+            "[" + ",".join(str(float(x)) for x in v) + "]"
+        t_fmt_old = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for v in new:
+            ak._vector_literal(v)
+        t_fmt_new = time.perf_counter() - t0
+        print(f"🧮 vector literal: {t_fmt_old * 1000:.0f} мс -> {t_fmt_new * 1000:.0f} мс (с pgvector - бинарный COPY)")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
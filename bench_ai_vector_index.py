@@ -0,0 +1,117 @@
+"""
+Бенчмарк recall@k / задержки ANN-индексов pgvector для поиска по ai_chunks
+- Синтетический корпус (по умолчанию 100k чанков) в отдельной таблице bench_ai_chunks
+- Эталон - точный поиск (enable_indexscan=off), затем ivfflat (probes) и hnsw (ef_search)
+- Настройки ставятся так же, как в /ai-knowledge/search: set_config(..., true) на транзакцию
+
+Запуск: BENCH_DATABASE_URL=postgresql://... python bench_ai_vector_index.py [строк] [размерность]
+Нужна тестовая БД с расширением vector (рабочие таблицы не трогаются)
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import psycopg
+from pgvector.psycopg import register_vector
+
+DSN = os.environ.get("BENCH_DATABASE_URL") or ""
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+DIMS = int(sys.argv[2]) if len(sys.argv) > 2 else 384
+QUERIES = 100
+K = 10
+TABLE = "bench_ai_chunks"
+
+
+def make_corpus(rng):
+    # Кластеры похожих чанков - ближе к реальным документам, чем равномерный шум
+    centers = rng.normal(size=(ROWS // 200, DIMS)).astype(np.float32)
+    labels = rng.integers(0, len(centers), ROWS)
+    data = centers[labels] + 0.35 * rng.normal(size=(ROWS, DIMS)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    queries = centers[rng.integers(0, len(centers), QUERIES)] + 0.35 * rng.normal(size=(QUERIES, DIMS)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return data, queries
+
+
+def load(conn, data):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cur.execute(f"CREATE TABLE {TABLE} (id integer PRIMARY KEY, embedding vector({DIMS}))")
+        with cur.copy(f"COPY {TABLE} (id, embedding) FROM STDIN WITH (FORMAT BINARY)") as copy:
+            copy.set_types(["int4", "vector"])
+            for i, v in enumerate(data):
+                copy.write_row((i, v))
+        cur.execute(f"ANALYZE {TABLE}")
+    conn.commit()
+
+
+def run_queries(conn, queries, settings):
+    ids, lat = [], []
+    for q in queries:
+        with conn.cursor() as cur:
+            for name, value in settings.items():
+                cur.execute("SELECT set_config(%s, %s, true)", (name, str(value)))
+            t0 = time.perf_counter()
+            cur.execute(f"SELECT id FROM {TABLE} ORDER BY embedding <=> %s LIMIT {K}", (q,))
+            ids.append([r[0] for r in cur.fetchall()])
+            lat.append(time.perf_counter() - t0)
+        conn.rollback()
+    return ids, lat
+
+
+def recall(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / K for f, t in zip(found, truth)]))
+
+
+def report(label, found, lat, truth):
+    lat_ms = np.array(lat) * 1000
+    print(f"{label:<28} recall@{K}={recall(found, truth):.3f}  p50={np.percentile(lat_ms, 50):7.2f} мс  p95={np.percentile(lat_ms, 95):7.2f} мс")
+
+
+def build(conn, method, with_clause):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP INDEX IF EXISTS {TABLE}_embedding_idx")
+        t0 = time.perf_counter()
+        cur.execute(f"CREATE INDEX {TABLE}_embedding_idx ON {TABLE} USING {method} (embedding vector_cosine_ops) WITH ({with_clause})")
+        conn.commit()
+        cur.execute(f"ANALYZE {TABLE}")
+        conn.commit()
+    print(f"🔧 {method} ({with_clause}) построен за {time.perf_counter() - t0:.1f} с")
+
+
+def main():
+    if not DSN:
+        print("❌ Укажите BENCH_DATABASE_URL (тестовая БД с pgvector)")
+        sys.exit(1)
+    rng = np.random.default_rng(42)
+    data, queries = make_corpus(rng)
+    with psycopg.connect(DSN) as conn:
+        conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        conn.commit()
+        register_vector(conn)
+        print("=" * 70)
+        print(f"📦 Загрузка {ROWS} векторов размерности {DIMS}")
+        print("=" * 70)
+        load(conn, data)
+
+        truth, lat = run_queries(conn, queries, {"enable_indexscan": "off"})
+        report("exact (seq scan)", truth, lat, truth)
+
+        lists = max(10, ROWS // 1000)
+        build(conn, "ivfflat", f"lists = {lists}")
+        for probes in (1, 5, 10, 20, 50):
+            found, lat = run_queries(conn, queries, {"ivfflat.probes": probes})
+            report(f"ivfflat probes={probes}", found, lat, truth)
+
+        build(conn, "hnsw", "m = 16, ef_construction = 64")
+        for ef in (10, 20, 40, 80, 160):
+            found, lat = run_queries(conn, queries, {"hnsw.ef_search": ef})
+            report(f"hnsw ef_search={ef}", found, lat, truth)
+
+        conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        conn.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Стенд аудио-конвейера PSTN -> OpenAI Realtime (_run_ai_agent_worker в server.py)
+Синтетический PCM: 60 с речеподобного сигнала (сумма тонов 200-3400 Гц + шум), кадры LiveKit
+по 10 мс, 48 кГц стерео -> 24 кГц моно
+- "audioop": как было - tomono + ratecv(state=None) на каждый кадр, base64 + json.dumps на кадр
+- "numpy": RealtimeInputPipeline - блоки ~100 мс, StreamingResampler с состоянием, одно сообщение на блок
+Считаем CPU на секунду звонка (-> сколько звонков тянет одно ядро), сообщений в секунду,
+добавленную задержку (обработка + ожидание в буфере) и искажения на стыках кадров (SNR тона 1 кГц).
+Сквозной прогон: CALLS звонков одновременно в реальном времени шлют кадры через websocket в локальный
+aiohttp-сервер (вместо OpenAI) - CPU процесса с отправкой и задержка от захвата кадра до приёма
+
+Запуск: python bench_audio_pipeline.py [секунд_аудио] [звонков] [секунд_сквозного]
+"""
+import asyncio
+import base64
+import json
+import sys
+import time
+import warnings
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+
+from backend.app.services.audio_pipeline import RealtimeInputPipeline, StreamingResampler
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    try:
+        import audioop
+    except ImportError:  # Python 3.13+
+        audioop = None
+
+SECONDS = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+CALLS = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+E2E_SECONDS = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+PORT = 18769
+IN_RATE = 48000
+OUT_RATE = 24000
+CHANNELS = 2
+FRAME_MS = 10
+FRAME_SAMPLES = IN_RATE * FRAME_MS // 1000
+
+
+def synth_frames(seconds: int, tones=(200, 450, 1000, 2100, 3400), noise=0.05):
+    rng = np.random.default_rng(5)
+    t = np.arange(seconds * IN_RATE) / IN_RATE
+    x = sum(np.sin(2 * np.pi * f * t + rng.uniform(0, 6.28)) for f in tones) / len(tones)
+    x = (x + noise * rng.standard_normal(len(t))) * 12000
+    stereo = np.repeat(x[:, None], CHANNELS, axis=1).astype('<i2')
+    return [stereo[i:i + FRAME_SAMPLES].tobytes() for i in range(0, len(stereo), FRAME_SAMPLES)]
+
+
+def run_audioop(frames):
+    """Возвращает (сообщения, время отправки каждого кадра от начала его обработки)"""
+    messages, latencies = [], []
+    for data in frames:
+        started = time.perf_counter()
+        mono = audioop.tomono(data, 2, 0.5, 0.5)
+        out, _ = audioop.ratecv(mono, 2, 1, IN_RATE, OUT_RATE, None)
+        messages.append(json.dumps({"type": "input_audio_buffer.append", "audio": base64.b64encode(out).decode('utf-8')}))
+        latencies.append(time.perf_counter() - started)
+    return messages, latencies
+
+
+def run_numpy(frames):
+    pipeline = RealtimeInputPipeline(OUT_RATE)
+    messages, latencies, pending = [], [], []
+    for i, data in enumerate(frames):
+        started = time.perf_counter()
+        out = pipeline.push(data, IN_RATE, CHANNELS)
+        messages.extend(out)
+        cost = time.perf_counter() - started
+        pending.append(i)
+        if out:
+            # кадр j ждал в буфере (i - j) кадров по FRAME_MS + обработку блока
+            latencies.extend((i - j) * FRAME_MS / 1000 + cost for j in pending)
+            pending = []
+    return messages, latencies
+
+
+def cpu_per_call_second(fn, frames) -> float:
+    started = time.process_time()
+    fn(frames)
+    return (time.process_time() - started) / (len(frames) * FRAME_MS / 1000)
+
+
+def tone_snr(pcm: bytes, freq: float = 1000.0) -> float:
+    """SNR (дБ) выхода относительно идеального тона: МНК-подгонка a*sin + b*cos, остаток - искажения"""
+    y = np.frombuffer(pcm, dtype='<i2').astype(np.float64)[OUT_RATE // 10:-OUT_RATE // 10]
+    t = np.arange(len(y)) / OUT_RATE
+    basis = np.stack([np.sin(2 * np.pi * freq * t), np.cos(2 * np.pi * freq * t), np.ones_like(t)], axis=1)
+    coef, *_ = np.linalg.lstsq(basis, y, rcond=None)
+    resid = y - basis @ coef
+    return 10 * np.log10(np.sum((basis @ coef) ** 2) / max(np.sum(resid ** 2), 1e-9))
+
+
+def snr_report(name: str, convert, in_rate: int, channels: int) -> str:
+    t = np.arange(5 * in_rate) / in_rate
+    tone = np.repeat((np.sin(2 * np.pi * 1000 * t) * 12000)[:, None], channels, axis=1).astype('<i2')
+    step = in_rate * FRAME_MS // 1000
+    frames = [tone[i:i + step].tobytes() for i in range(0, len(tone), step)]
+    out = b''.join(convert(frames, in_rate, channels))
+    return f"{name:<8} {in_rate:>5} Гц x{channels}: SNR тона 1 кГц {tone_snr(out):5.1f} дБ"
+
+
+async def e2e(mode: str, frames) -> str:
+    """CALLS звонков в реальном времени -> websocket; CPU процесса на звонко-секунду и задержка до приёма"""
+    arrivals = {}
+
+    async def handler(request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        got = arrivals.setdefault(request.query['call'], [])
+        async for _ in ws:
+            got.append(time.perf_counter())
+        return ws
+
+    app = web.Application()
+    app.router.add_get('/realtime', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', PORT).start()
+    origins = {}
+
+    async def call(idx: int, session: aiohttp.ClientSession) -> None:
+        sent = origins.setdefault(str(idx), [])
+        pipeline = RealtimeInputPipeline(OUT_RATE)
+        pending_since = None
+        async with session.ws_connect(f'http://127.0.0.1:{PORT}/realtime?call={idx}') as ws:
+            start = time.perf_counter() + idx * 0.0005
+            for i, data in enumerate(frames):
+                delay = start + i * FRAME_MS / 1000 - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                captured = time.perf_counter()
+                if mode == 'audioop':
+                    mono = audioop.tomono(data, 2, 0.5, 0.5)
+                    out, _ = audioop.ratecv(mono, 2, 1, IN_RATE, OUT_RATE, None)
+                    sent.append(captured)
+                    await ws.send_str(json.dumps({"type": "input_audio_buffer.append", "audio": base64.b64encode(out).decode('utf-8')}))
+                    continue
+                pending_since = pending_since or captured
+                for msg in pipeline.push(data, IN_RATE, CHANNELS):
+                    sent.append(pending_since)
+                    pending_since = None
+                    await ws.send_str(msg)
+
+    cpu0 = time.process_time()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*[call(i, session) for i in range(CALLS)])
+    await asyncio.sleep(0.2)
+    cpu = (time.process_time() - cpu0) / (CALLS * len(frames) * FRAME_MS / 1000)
+    await runner.cleanup()
+    lat = np.array([a - o for k in origins for o, a in zip(origins[k], arrivals.get(k, []))]) * 1000
+    msgs = sum(len(v) for v in arrivals.values())
+    return (f"{mode:<8} {CALLS} звонков: CPU {cpu * 1000:6.2f} мс на звонко-секунду (~{1 / cpu:5.0f} звонков на ядро) | "
+            f"{msgs / (CALLS * E2E_SECONDS):5.1f} сообщений/с на звонок | от захвата до приёма: "
+            f"ср. {lat.mean():6.2f} мс, p95 {np.percentile(lat, 95):6.2f} мс")
+
+
+def main() -> None:
+    frames = synth_frames(SECONDS)
+    print("=" * 90)
+    print(f"🎧 {SECONDS} с звонка: {len(frames)} кадров по {FRAME_MS} мс, {IN_RATE} Гц x{CHANNELS} -> {OUT_RATE} Гц моно")
+    print("=" * 90)
+
+    rows = []
+    if audioop is not None:
+        rows.append(("audioop", run_audioop))
+    else:
+        print("audioop недоступен (Python 3.13+) - только numpy")
+    rows.append(("numpy", run_numpy))
+
+    for name, fn in rows:
+        cpu = cpu_per_call_second(fn, frames)
+        messages, latencies = fn(frames)
+        lat = np.array(latencies) * 1000
+        payload = sum(len(m) for m in messages)
+        print(f"{name:<8} CPU {cpu * 1000:6.3f} мс на 1 с звонка (~{1 / cpu:7.0f} звонков на ядро) | "
+              f"{len(messages) / SECONDS:5.1f} сообщений/с, {payload / SECONDS / 1024:5.1f} КБ/с | "
+              f"задержка ср. {lat.mean():6.2f} мс, p95 {np.percentile(lat, 95):6.2f} мс, макс {lat.max():6.2f} мс")
+
+    print()
+    print(f"Сквозной прогон: {E2E_SECONDS} с, websocket в локальный сервер (CPU - клиент и сервер вместе):")
+    for name, _ in rows:
+        print(asyncio.run(e2e(name, frames[:E2E_SECONDS * 1000 // FRAME_MS])))
+
+    print()
+    print("Искажения (кадры по 10 мс):")
+
+    def stateless(frames, in_rate, channels):
+        for f in frames:
+            if channels > 1:
+                f = audioop.tomono(f, 2, 0.5, 0.5)
+            yield audioop.ratecv(f, 2, 1, in_rate, OUT_RATE, None)[0]
+
+    def stateful(frames, in_rate, channels):
+        r = StreamingResampler(in_rate, OUT_RATE, channels)
+        for f in frames:
+            yield r.process(f)
+
+    for in_rate, channels in ((48000, 2), (44100, 1), (16000, 1), (8000, 1)):
+        if audioop is not None:
+            print(snr_report("audioop", stateless, in_rate, channels))
+        print(snr_report("numpy", stateful, in_rate, channels))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Стенд BitrixBatcher: обогащение сделок (компания, ответственный, enum-поля уборок) для синтетического портала
+- Портал (httpx.MockTransport): leaky bucket 2 зап/с с запасом 50, как у Bitrix24, сверх - 503 QUERY_LIMIT_EXCEEDED;
+  задержка ответа LATENCY_MS, batch - BATCH_LATENCY_MS
+- 500 сделок, у каждой своя компания, ~150 ответственных, 6 enum-полей
+- "по одному": каждая команда отдельным GET (как было до batch) - на выборке, с экстраполяцией
+- "batch": BitrixBatcher, пачки до 50 команд
+Число HTTP-запросов к порталу и время.
+
+Запуск: python bench_bitrix_batch.py [число_сделок] [выборка_для_старого]
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from urllib.parse import parse_qsl
+
+import httpx
+
+os.environ.setdefault("BITRIX24_WEBHOOK_URL", "https://bench.bitrix24.ru/rest/1/bench/")
+# БД стенду не нужна, но модули сервиса создают engine при импорте
+os.environ.setdefault("DATABASE_URL", "postgresql://bench@127.0.0.1:1/bench")
+
+from backend.app.config.http_clients import http_clients  # noqa: E402
+from backend.app.services.bitrix24_service import Bitrix24Service, _flatten_params  # noqa: E402
+
+DEALS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+SAMPLE = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+USERS = 150
+PORTAL_RATE = 2.0
+PORTAL_BURST = 50
+LATENCY_MS = 150
+BATCH_LATENCY_MS = 400
+ENUM_FIELDS = Bitrix24Service.CLEANING_TYPE_FIELDS
+
+
+def make_deals():
+    rng = random.Random(3)
+    return [
+        {
+            'ID': str(i),
+            'TITLE': f'ул. Тестовая, д. {i}',
+            'UF_CRM_1669561599956': f'Калуга, ул. Тестовая, д. {i}',
+            'COMPANY_ID': str(1000 + i),
+            'ASSIGNED_BY_ID': str(rng.randint(1, USERS)),
+            'STAGE_ID': 'C34:WON',
+            'UF_CRM_1741593004888': ['2025-10-03T03:00:00+03:00', '2025-10-17T03:00:00+03:00'],
+            'UF_CRM_1741593047994': '1',
+        }
+        for i in range(1, DEALS + 1)
+    ]
+
+
+class Portal:
+    def __init__(self):
+        self.level = 0.0
+        self.updated = time.monotonic()
+        self.requests = 0
+        self.rejected = 0
+
+    def _admit(self) -> bool:
+        now = time.monotonic()
+        self.level = max(0.0, self.level - (now - self.updated) * PORTAL_RATE)
+        self.updated = now
+        if self.level + 1 > PORTAL_BURST:
+            self.rejected += 1
+            return False
+        self.level += 1
+        self.requests += 1
+        return True
+
+    @staticmethod
+    def call(method: str, params: dict):
+        if method == 'crm.company.get':
+            pid = params.get('id')
+            return {'ID': pid, 'TITLE': f'УК {pid}'}
+        if method == 'user.get':
+            uid = params.get('filter[ID]')
+            return [{'ID': uid, 'NAME': f'Сотрудник {uid}', 'LAST_NAME': 'бригада'}]
+        if method == 'crm.deal.userfield.list':
+            field = params.get('filter[FIELD_NAME]')
+            return [{'FIELD_NAME': f, 'LIST': [{'ID': '1', 'VALUE': 'Подметание лестничных площадок всех этажей'}]}
+                    for f in ENUM_FIELDS if not field or f == field]
+        return None
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if not self._admit():
+            return httpx.Response(503, json={'error': 'QUERY_LIMIT_EXCEEDED'})
+        method = request.url.path.rstrip('/').rsplit('/', 1)[-1]
+        if method == 'batch':
+            cmd = json.loads(request.content)['cmd']
+            await asyncio.sleep(BATCH_LATENCY_MS / 1000)
+            result = {}
+            for key, c in cmd.items():
+                m, _, q = c.partition('?')
+                result[key] = self.call(m, dict(parse_qsl(q)))
+            return httpx.Response(200, json={'result': {'result': result, 'result_error': []}})
+        await asyncio.sleep(LATENCY_MS / 1000)
+        res = self.call(method, dict(request.url.params))
+        if res is None:
+            return httpx.Response(400, json={'error': 'NOT_FOUND'})
+        return httpx.Response(200, json={'result': res})
+
+
+class OneByOne:
+    """Замена BitrixBatcher: каждая команда - отдельный GET через общий limiter, как было до batch"""
+
+    def __init__(self, service: Bitrix24Service):
+        self.service = service
+        self.stats = {'commands': 0}
+
+    async def call(self, method, params):
+        self.stats['commands'] += 1
+        async with http_clients.client('bitrix') as client:
+            resp = await self.service._request(client, 'GET', method, params=_flatten_params(params))
+        if resp.status_code != 200:
+            return None
+        return resp.json().get('result')
+
+
+def fresh_service(portal: Portal) -> Bitrix24Service:
+    """Новый сервис с пустыми кешами и свежим limiter'ом (2 зап/с, запас 50)"""
+    from backend.app.services.bitrix_rate_limiter import AdaptiveTokenBucket
+    http_clients._clients['bitrix'] = httpx.AsyncClient(transport=httpx.MockTransport(portal.handle))
+    service = Bitrix24Service()
+    service.rate_limiter = AdaptiveTokenBucket(rate=PORTAL_RATE, burst=PORTAL_BURST)
+    return service
+
+
+async def enrich(service: Bitrix24Service, deals) -> list:
+    async def one(client, d):
+        company_title = await service._company_title(client, d.get('COMPANY_ID'))
+        return await service._deal_to_house_dto(client, d, company_title)
+
+    async with http_clients.client('bitrix') as client:
+        return await asyncio.gather(*[one(client, d) for d in deals])
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.ERROR)
+    deals = make_deals()
+    print("=" * 90)
+    print(f"🏠 Сделок: {DEALS}; портал {PORTAL_RATE:.0f} зап/с, запас {PORTAL_BURST}, задержка {LATENCY_MS}/{BATCH_LATENCY_MS} мс")
+    print("=" * 90)
+
+    portal = Portal()
+    service = fresh_service(portal)
+    service._batcher = OneByOne(service)
+    started = time.perf_counter()
+    await enrich(service, deals[:SAMPLE])
+    elapsed = time.perf_counter() - started
+    # нижняя граница на весь портал: по команде на компанию и ответственного, enum-поля - один раз
+    expected = DEALS + len({d['ASSIGNED_BY_ID'] for d in deals}) + len(ENUM_FIELDS)
+    print(f"по одному    {SAMPLE} сделок за {elapsed:6.1f} с ({portal.requests} запросов) -> "
+          f"на {DEALS}: не меньше {expected} запросов, ~{(expected - PORTAL_BURST) / PORTAL_RATE / 60:4.1f} мин")
+
+    portal = Portal()
+    service = fresh_service(portal)
+    started = time.perf_counter()
+    items = await enrich(service, deals)
+    elapsed = time.perf_counter() - started
+    titled = sum(1 for it in items if it.get('management_company'))
+    print(f"batch        {DEALS} сделок за {elapsed:6.1f} с ({portal.requests} запросов, 503: {portal.rejected}); "
+          f"компания найдена у {titled}")
+    print(f"batcher: {service._batcher.stats}")
+    await http_clients.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+"""
+Стенд массовой загрузки деталей сделок (контакты старших для /cleaning/missing-data-report)
+- Портал (httpx.MockTransport): leaky bucket 2 зап/с с запасом 50, как у Bitrix24, сверх - 503 QUERY_LIMIT_EXCEEDED;
+  задержка ответа LATENCY_MS, batch - BATCH_LATENCY_MS
+- 500 сделок, ~40 общих управляющих компаний; у 70% сделок CONTACT_ID, у 20% контакт
+  только через crm.deal.contact.items.get, у 10% контакта нет
+- "по одному": get_deal_details последовательно (как было в отчёте) - на выборке, с экстраполяцией
+- "bulk": iter_deal_details по всем сделкам
+
+Запуск: python bench_bitrix_bulk_details.py [число_сделок] [выборка_для_старого]
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from urllib.parse import parse_qsl
+
+import httpx
+
+os.environ.setdefault("BITRIX24_WEBHOOK_URL", "https://bench.bitrix24.ru/rest/1/bench/")
+# БД стенду не нужна, но модули сервиса создают engine при импорте
+os.environ.setdefault("DATABASE_URL", "postgresql://bench@127.0.0.1:1/bench")
+
+from backend.app.config.http_clients import http_clients  # noqa: E402
+from backend.app.services.bitrix24_service import Bitrix24Service  # noqa: E402
+
+DEALS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+SAMPLE = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+PORTAL_RATE = 2.0
+PORTAL_BURST = 50
+LATENCY_MS = 150
+BATCH_LATENCY_MS = 400
+ENUM_FIELDS = ['UF_CRM_1741593047994', 'UF_CRM_1741593115407', 'UF_CRM_1741593210242',
+               'UF_CRM_1741593285121', 'UF_CRM_1741593387667', 'UF_CRM_1741593452062']
+
+
+def make_portal_data():
+    rng = random.Random(11)
+    deals, contacts, items = {}, {}, {}
+    for i in range(1, DEALS + 1):
+        deal = {
+            'ID': str(i),
+            'TITLE': f'ул. Тестовая, д. {i}',
+            'UF_CRM_1669561599956': f'Калуга, ул. Тестовая, д. {i}',
+            'COMPANY_ID': str(1000 + rng.randint(1, 40)),
+            'ASSIGNED_BY_ID': str(rng.randint(1, 7)),
+            'STAGE_ID': 'C34:WON',
+            'UF_CRM_1669704529022': '60', 'UF_CRM_1669705507390': '4', 'UF_CRM_1669704631166': '9',
+            'UF_CRM_1741593004888': ['2025-10-03T03:00:00+03:00', '2025-10-17T03:00:00+03:00'],
+            'UF_CRM_1741593047994': '1',
+        }
+        kind = rng.random()
+        contacts[str(5000 + i)] = {'ID': str(5000 + i), 'NAME': f'Старший {i}', 'PHONE': [{'VALUE': f'+7900{i:07d}'}]}
+        if kind < 0.7:
+            deal['CONTACT_ID'] = str(5000 + i)
+        elif kind < 0.9:
+            items[str(i)] = [{'CONTACT_ID': str(5000 + i)}]
+        deals[str(i)] = deal
+    return deals, contacts, items
+
+
+class Portal:
+    def __init__(self):
+        self.deals, self.contacts, self.items = make_portal_data()
+        self.level = 0.0
+        self.updated = time.monotonic()
+        self.requests = 0
+        self.rejected = 0
+
+    def _admit(self) -> bool:
+        now = time.monotonic()
+        self.level = max(0.0, self.level - (now - self.updated) * PORTAL_RATE)
+        self.updated = now
+        if self.level + 1 > PORTAL_BURST:
+            self.rejected += 1
+            return False
+        self.level += 1
+        self.requests += 1
+        return True
+
+    def call(self, method: str, params: dict):
+        pid = params.get('id') or params.get('ID')
+        if method == 'crm.deal.get':
+            return self.deals.get(pid)
+        if method == 'crm.company.get':
+            return {'ID': pid, 'TITLE': f'УК {pid}', 'PHONE': [{'VALUE': '+74842000000'}]}
+        if method == 'crm.contact.get':
+            return self.contacts.get(pid)
+        if method == 'crm.deal.contact.items.get':
+            return self.items.get(pid, [])
+        if method == 'user.get':
+            uid = params.get('filter[ID]') or pid
+            return [{'ID': uid, 'NAME': uid, 'LAST_NAME': 'бригада'}]
+        if method == 'crm.deal.userfield.list':
+            field = params.get('filter[FIELD_NAME]')
+            return [{'FIELD_NAME': f, 'LIST': [{'ID': '1', 'VALUE': 'Подметание лестничных площадок всех этажей'}]}
+                    for f in ENUM_FIELDS if not field or f == field]
+        return None
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if not self._admit():
+            return httpx.Response(503, json={'error': 'QUERY_LIMIT_EXCEEDED'})
+        method = request.url.path.rstrip('/').rsplit('/', 1)[-1]
+        if method == 'batch':
+            cmd = json.loads(request.content)['cmd']
+            await asyncio.sleep(BATCH_LATENCY_MS / 1000)
+            result = {}
+            for key, c in cmd.items():
+                m, _, q = c.partition('?')
+                result[key] = self.call(m, dict(parse_qsl(q)))
+            return httpx.Response(200, json={'result': {'result': result, 'result_error': []}})
+        await asyncio.sleep(LATENCY_MS / 1000)
+        res = self.call(method, dict(request.url.params))
+        if res is None:
+            return httpx.Response(400, json={'error': 'NOT_FOUND'})
+        return httpx.Response(200, json={'result': res})
+
+
+def fresh_service(portal: Portal) -> Bitrix24Service:
+    """Новый сервис с пустыми кешами и свежим limiter'ом (2 зап/с, запас 50)"""
+    from backend.app.services.bitrix_rate_limiter import AdaptiveTokenBucket
+    http_clients._clients['bitrix'] = httpx.AsyncClient(transport=httpx.MockTransport(portal.handle))
+    service = Bitrix24Service()
+    service.rate_limiter = AdaptiveTokenBucket(rate=PORTAL_RATE, burst=PORTAL_BURST)
+    return service
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.ERROR)
+    ids = [str(i) for i in range(1, DEALS + 1)]
+    print("=" * 90)
+    print(f"🏠 Сделок: {DEALS}; портал {PORTAL_RATE:.0f} зап/с, запас {PORTAL_BURST}, задержка {LATENCY_MS}/{BATCH_LATENCY_MS} мс")
+    print("=" * 90)
+
+    portal = Portal()
+    service = fresh_service(portal)
+    started = time.perf_counter()
+    for deal_id in ids[:SAMPLE]:
+        await service.get_deal_details(deal_id)
+    per_deal = (time.perf_counter() - started) / SAMPLE
+    print(f"по одному    {SAMPLE} сделок за {per_deal * SAMPLE:6.1f} с ({portal.requests} запросов) -> "
+          f"не меньше ~{per_deal * DEALS / 60:5.1f} мин на {DEALS} (после запаса - 2 зап/с)")
+
+    portal = Portal()
+    service = fresh_service(portal)
+    started = time.perf_counter()
+    first_at = None
+    found = 0
+    async for _, details in service.iter_deal_details(ids):
+        first_at = first_at or time.perf_counter() - started
+        found += bool(details and details.get('elder_contact'))
+    total = time.perf_counter() - started
+    print(f"bulk         {DEALS} сделок за {total:6.1f} с ({portal.requests} запросов, 503: {portal.rejected}); "
+          f"первая строка через {first_at:.1f} с; контакты найдены у {found}")
+    print(f"batcher: {service._batcher.stats}")
+    await http_clients.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
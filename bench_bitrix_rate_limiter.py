@@ -0,0 +1,128 @@
+"""
+Стенд rate limiter'а Bitrix24Service на симуляции портала
+- Портал (httpx.MockTransport) считает запросы по leaky bucket, как Bitrix: запас PORTAL_BURST,
+  утекает PORTAL_RATE запросов в секунду, сверх лимита - 503 QUERY_LIMIT_EXCEEDED
+- "старый": семафор на 2 запроса + пауза 0.5 с внутри семафора (как было в _make_request)
+- "bucket": AdaptiveTokenBucket с номинальной скоростью портала
+- "bucket x2": скорость в конфиге вдвое выше реальной - limiter должен сам замедлиться по 503
+Скорости портала уменьшены в масштабе, чтобы стенд шёл секунды, а не минуты
+
+Запуск: python bench_bitrix_rate_limiter.py [число_запросов]
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+import httpx
+
+os.environ.setdefault("BITRIX24_WEBHOOK_URL", "https://bench.bitrix24.ru/rest/1/bench/")
+# БД стенду не нужна, но модули сервиса создают engine при импорте
+os.environ.setdefault("DATABASE_URL", "postgresql://bench@127.0.0.1:1/bench")
+
+from backend.app.services.bitrix24_service import Bitrix24Service  # noqa: E402
+from backend.app.services.bitrix_rate_limiter import AdaptiveTokenBucket  # noqa: E402
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+PORTAL_RATE = 20.0
+PORTAL_BURST = 50
+LATENCY_MS = 40
+CONCURRENCY = 16  # одновременных корутин-клиентов (list_houses, зеркало, lookup'ы)
+
+
+class Portal:
+    """Leaky bucket портала"""
+
+    def __init__(self):
+        self.level = 0.0
+        self.updated = time.monotonic()
+        self.ok = 0
+        self.rejected = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        now = time.monotonic()
+        self.level = max(0.0, self.level - (now - self.updated) * PORTAL_RATE)
+        self.updated = now
+        if self.level + 1 > PORTAL_BURST:
+            self.rejected += 1
+            return httpx.Response(503, json={"error": "QUERY_LIMIT_EXCEEDED", "error_description": "Too many requests"})
+        self.level += 1
+        await asyncio.sleep(LATENCY_MS / 1000)
+        self.ok += 1
+        return httpx.Response(200, json={"result": [{"ID": "1"}], "total": 1})
+
+
+class LegacyLimiter:
+    """Прежняя схема: Semaphore(2) и задержка 0.5 с между запросами внутри семафора"""
+
+    def __init__(self):
+        self._semaphore = asyncio.Semaphore(2)
+        self._last = 0.0
+        self.stats = {"throttle_events": 0}
+
+    def slot(self):
+        limiter = self
+
+        class _Slot:
+            async def __aenter__(self):
+                await limiter._semaphore.acquire()
+                since = time.monotonic() - limiter._last
+                if since < 0.5:
+                    await asyncio.sleep(0.5 - since)
+                limiter._last = time.monotonic()
+
+            async def __aexit__(self, *exc):
+                limiter._semaphore.release()
+
+        return _Slot()
+
+    def on_throttled(self):
+        self.stats["throttle_events"] += 1
+
+    def on_success(self):
+        pass
+
+    def status(self):
+        return dict(self.stats)
+
+
+async def run(label: str, limiter) -> None:
+    portal = Portal()
+    service = Bitrix24Service()
+    service.rate_limiter = limiter
+    queue = list(range(REQUESTS))
+    done = 0
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal done
+        while queue:
+            queue.pop()
+            data = await service._make_request(client, "crm.deal.list", {"filter": {"CATEGORY_ID": "34"}})
+            if data.get("ok"):
+                done += 1
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(portal.handle)) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(CONCURRENCY)])
+        total = time.perf_counter() - started
+    stats = limiter.status()
+    print(
+        f"{label:<12} {done:4d}/{REQUESTS} за {total:6.2f} с | {done / total:6.2f} зап/с | "
+        f"503 от портала: {portal.rejected:3d} | троттлинг: {stats.get('throttle_events', 0):3d} | "
+        f"скорость в конце: {stats.get('rate', '-')}"
+    )
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.ERROR)
+    print("=" * 100)
+    print(f"🏢 Портал: {PORTAL_RATE:.0f} зап/с, запас {PORTAL_BURST}, задержка {LATENCY_MS} мс; запросов: {REQUESTS}")
+    print("=" * 100)
+    await run("старый", LegacyLimiter())
+    await run("bucket", AdaptiveTokenBucket(rate=PORTAL_RATE, burst=PORTAL_BURST, max_concurrency=8))
+    await run("bucket x2", AdaptiveTokenBucket(rate=PORTAL_RATE * 2, burst=PORTAL_BURST, max_concurrency=8, cooldown_seconds=1.0))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,224 @@
+"""
+Стенд brain_router.try_fast_answer: p50/p99 задержки на корпусе запросов диспетчеров
+- "как было": прежняя цепочка, резолверы без адреса не пропускаются
+- "последовательно": BRAIN_SPECULATIVE=0 - run_sequential с пропуском резолверов без сущностей
+- "спекулятивно": brain_executor.run_speculative - намеренный резолвер и резервная цепочка параллельно
+- "кеш ответов": спекулятивно с brain_answer_cache - повторы корпуса отвечаются из кеша
+Хранилища заглушены: BrainStore отвечает с задержкой Bitrix (без кеша - худший случай),
+сессия БД - с задержкой запроса и падает при параллельном использовании (как AsyncSession).
+Ответы обоих режимов сверяются между собой.
+
+Запуск: python bench_brain_fast_answer.py [повторов] [задержки Bitrix, мс: 150,600] [задержка SQL, мс]
+"""
+import asyncio
+import dataclasses
+import logging
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("BITRIX24_WEBHOOK_URL", "https://test.bitrix24.ru/rest/1/test/")
+# Меряем резолверы, а не кеш ответов (повторы корпуса иначе отвечались бы из brain_answer_cache)
+os.environ.setdefault("BRAIN_ANSWER_CACHE", "0")
+
+from backend.app.services import brain_answer_cache, brain_resolvers, brain_router  # noqa: E402
+from backend.app.services.brain import CleaningDates, CompanyInfo, ElderContact, HouseDTO  # noqa: E402
+
+ROUNDS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+BITRIX_LATENCIES = [int(x) for x in sys.argv[2].split(",")] if len(sys.argv) > 2 else [150, 600]
+BITRIX_MS = BITRIX_LATENCIES[0]
+SQL_MS = int(sys.argv[3]) if len(sys.argv) > 3 else 15
+
+CORPUS = [
+    # попадания намеренного резолвера
+    "контакты старшего на Кибальчича 3",
+    "телефон старшего по адресу Билибина 6",
+    "график уборок на Кибальчича 3 в октябре",
+    "когда уборка на Билибина 6 в ноябре",
+    "какая бригада на Кибальчича 3",
+    "кто убирает Билибина 6",
+    "сколько квартир всего",
+    "статистика по этажам и подъездам",
+    "покажи финансы",
+    "какая прибыль и баланс",
+    "разбивка расходов по категориям",
+    "динамика м/м",
+    "доход год к году",
+    "топ категорий по росту",
+    "контакты УК на Кибальчича 3",
+    "задачи на Кибальчича 3",
+    "жалобы у бригады 2",
+    # намеренный промахивается - решает резервная цепочка
+    "номер старшего на Ленина 5",
+    "уборка на Ленина 5",
+    "бригада Ленина 5",
+    "заявки по адресу Ленина 5",
+    "расходы за месяц",
+    "телефон старшего и график уборок на Ленина 5",
+    "контакты старшего и УК на Ленина 5",
+    "сколько квартир на Ленина 5 и телефон старшего",
+    "график уборок и задачи на Ленина 5",
+    # ничего не подходит - уходим в LLM
+    "привет",
+    "как дела?",
+    "напиши письмо жильцам о собрании",
+    "что такое амортизация",
+    "объясни договор подряда простыми словами",
+    "переведи на английский: уборка подъезда",
+    "сделай отчёт для директора",
+    "кто ты",
+]
+
+_KNOWN = {
+    "кибальчича 3": "Кибальчича 3",
+    "билибина 6": "Билибина 6",
+}
+
+
+def _house(title: str) -> HouseDTO:
+    return HouseDTO(
+        id="1001",
+        title=f"г. Москва, ул. {title}",
+        address=title,
+        brigade_name="Бригада 2",
+        cleaning_dates=CleaningDates.from_dict({
+            "october_1": {"dates": ["2025-10-07", "2025-10-21"], "type": "Влажная уборка"},
+            "november_1": {"dates": ["2025-11-04"], "type": "Подметание"},
+        }),
+        bitrix_url="https://test.bitrix24.ru/crm/deal/details/1001/",
+        elder_contact=ElderContact(name="Иванова Анна", phones=["+7 900 000-00-00"]),
+        company=CompanyInfo(id="7", title="УК Уют", phones=["+7 495 000-00-00"]),
+    )
+
+
+class StubStore:
+    """BrainStore без кеша: каждый вызов - поход в Bitrix"""
+
+    async def get_houses_by_address(self, address, limit=3, return_debug=False):
+        await asyncio.sleep(BITRIX_MS / 1000)
+        key = next((k for k in _KNOWN if k in address.lower()), None)
+        houses = [_house(_KNOWN[key])] if key else []
+        meta = {"cache": "miss", "area": "houses"}
+        return (houses, meta) if return_debug else houses
+
+    async def get_elder_contact_by_address(self, address, return_debug=False):
+        houses, meta = await self.get_houses_by_address(address, limit=1, return_debug=True)
+        elder = houses[0].elder_contact if houses else None
+        return (elder, {"cache": "miss", "houses": meta}) if return_debug else elder
+
+    async def get_cleaning_for_month_by_address(self, address, month_key, return_debug=False):
+        houses, meta = await self.get_houses_by_address(address, limit=1, return_debug=True)
+        dates = houses[0].cleaning_dates if houses else None
+        return (dates, {"houses": meta}) if return_debug else dates
+
+    async def get_finance_aggregate(self, db, date_from=None, date_to=None, return_debug=False):
+        res = await db.execute("SELECT finance_aggregate")
+        row = res.first()
+        data = {"transactions": row[0], "income": row[1], "expense": row[2]}
+        return (data, {"cache": "miss", "area": "finance"}) if return_debug else data
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+
+class StubSession:
+    """Как AsyncSession: один запрос за раз, иначе ошибка"""
+
+    def __init__(self):
+        self.busy = False
+        self.statements = 0
+        self.conflicts = 0
+
+    async def execute(self, query, params=None):
+        if self.busy:
+            self.conflicts += 1
+            raise RuntimeError("concurrent operations are not permitted on the session")
+        self.busy = True
+        try:
+            self.statements += 1
+            await asyncio.sleep(SQL_MS / 1000)
+        finally:
+            self.busy = False
+        sql = str(query)
+        if "FROM tasks" in sql:
+            if "brigade_pattern" in sql:
+                return _Result([("Вынос мусора", "", "open", "Высокая", None)])
+            return _Result([])
+        if "GROUP BY category" in sql:
+            return _Result([("Зарплата", 1000.0, 120000.0, 80000.0, 90000.0), ("Топливо", 0.0, 30000.0, 0.0, 45000.0)])
+        return _Result([(120, 2_500_000.0, 1_900_000.0, 2_300_000.0)])
+
+
+RESOLVERS = dict(brain_router.RESOLVERS)
+
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+async def measure(speculative: bool, skip_missing: bool = True, cached: bool = False):
+    brain_router.SPECULATIVE = speculative
+    brain_answer_cache.ENABLED = cached
+    for source in ("bitrix", "finance", "houses"):
+        brain_answer_cache.brain_answer_cache.invalidate(source)
+    brain_router.RESOLVERS = RESOLVERS if skip_missing else {
+        rule: dataclasses.replace(spec, requires=()) for rule, spec in RESOLVERS.items()
+    }
+    latencies, answers, statements, conflicts = [], {}, 0, 0
+    for _ in range(ROUNDS):
+        for msg in CORPUS:
+            db = StubSession()
+            started = time.perf_counter()
+            res = await brain_router.try_fast_answer(msg, db=db, return_debug=True)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statements += db.statements
+            conflicts += db.conflicts
+            answers[msg] = (res.get("debug", {}).get("matched_rule"), res.get("answer") or res.get("response"))
+    assert conflicts == 0, f"{conflicts} concurrent statements on one session"
+    return latencies, answers, statements
+
+
+async def run(bitrix_ms: int):
+    global BITRIX_MS
+    BITRIX_MS = bitrix_ms
+    print(f"\n🧠 try_fast_answer: {len(CORPUS)} запросов x {ROUNDS}, Bitrix {BITRIX_MS} мс, SQL {SQL_MS} мс")
+    results = {}
+    modes = (
+        ("как было", False, False, False),
+        ("последовательно", False, True, False),
+        ("спекулятивно", True, True, False),
+        ("кеш ответов", True, True, True),
+    )
+    for name, speculative, skip_missing, cached in modes:
+        latencies, answers, statements = await measure(speculative, skip_missing, cached)
+        results[name] = answers
+        print(
+            f"   {name:<16} p50 {pct(latencies, 50):7.1f} мс | p99 {pct(latencies, 99):7.1f} мс"
+            f" | среднее {statistics.mean(latencies):7.1f} мс | SQL на запрос {statements / len(latencies):.1f}"
+        )
+    diff = [m for m in CORPUS if len({str(answers[m]) for answers in results.values()}) > 1]
+    print(f"   {'✅ Ответы совпадают' if not diff else '❌ Расходятся: ' + ', '.join(diff)}")
+
+
+async def main():
+    logging.disable(logging.WARNING)
+    brain_resolvers._brain_store = StubStore()
+    print("=" * 90)
+    print("🧠 brain_router.try_fast_answer: последовательная цепочка против спекулятивной")
+    print("=" * 90)
+    for bitrix_ms in BITRIX_LATENCIES:
+        await run(bitrix_ms)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+"""
+Стенд brain_intents.detect_intent: сообщений в секунду
+- "как было": прежний detect_intent (эталон из test_brain_intent_parity, без логирования extract_month -
+  прежняя версия на каждое сообщение без месяца ещё и писала warning в лог)
+- "сейчас": INTENT_RULES, собранные в один сканер ключевых слов, сущности - лениво
+Корпуса: типовые запросы диспетчеров, сгенерированные сочетания, длинные сообщения без намерения
+
+Запуск: python bench_brain_intents.py [секунд на замер]
+"""
+import logging
+import os
+import sys
+import time
+
+os.environ.setdefault("BITRIX24_WEBHOOK_URL", "https://test.bitrix24.ru/rest/1/test/")
+
+from backend.app.services.brain_intents import detect_intent  # noqa: E402
+from test_brain_intent_parity import CORPUS, generated, reference_detect_intent  # noqa: E402
+
+SECONDS = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+
+LONG = [
+    "Добрый день! Подскажите, пожалуйста, как правильно оформить акт выполненных работ для жильцов, "
+    "если председатель совета дома уехал и подписать его некому, а управляющая сторона просит сдать до пятницы",
+    "Напиши вежливое письмо жильцам о том, что в следующий вторник будет проводиться плановая дезинсекция "
+    "подвальных помещений и просьба обеспечить доступ",
+] * 10
+
+
+def throughput(fn, messages):
+    count, started = 0, time.perf_counter()
+    while time.perf_counter() - started < SECONDS:
+        for msg in messages:
+            fn(msg)
+        count += len(messages)
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    logging.disable(logging.WARNING)
+    corpora = [
+        ("типовые запросы", CORPUS),
+        ("сгенерированные", list(generated(2000, seed=11))),
+        ("длинные без намерения", LONG),
+    ]
+    print("=" * 90)
+    print(f"🧭 detect_intent: сообщений в секунду ({SECONDS:.0f} с на замер)")
+    print("=" * 90)
+    for label, messages in corpora:
+        before = throughput(reference_detect_intent, messages)
+        after = throughput(detect_intent, messages)
+        print(f"   {label:<24} как было {before:10,.0f}/с | сейчас {after:10,.0f}/с | x{after / before:.1f}")
+
+
+if __name__ == "__main__":
+    main()
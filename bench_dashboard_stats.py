@@ -0,0 +1,184 @@
+"""
+Стенд /dashboard/stats: 50 клиентов одновременно опрашивают дашборд, Postgres (DATABASE_URL)
+- как было: 10 отдельных запросов на каждый вызов
+- один запрос dashboard_stats.load_stats (подзапросы по одной строке на таблицу)
+- снимок dashboard_stats.get_stats из dashboard_cache
+Запросы в секунду, p50/p99 на вызов и число SQL-запросов на вызов. Таблицы - во временной схеме
+bench_dashboard_stats (рабочие не трогаются), схема удаляется в конце.
+
+Запуск: DATABASE_URL=postgresql://... python bench_dashboard_stats.py [домов]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("BITRIX24_WEBHOOK_URL", "https://test.bitrix24.ru/rest/1/test/")
+
+from sqlalchemy import event, func, insert, select, text  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from backend.app.config.database import Base, connect_args, db_url  # noqa: E402
+from backend.app.models.house import House  # noqa: E402
+from backend.app.models.log import Log  # noqa: E402
+from backend.app.models.task import Task, TaskStatus  # noqa: E402
+from backend.app.models.user import User  # noqa: E402
+from backend.app.services import dashboard_stats  # noqa: E402
+
+HOUSES = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+SCHEMA = "bench_dashboard_stats"
+CLIENTS = 50
+PER_CLIENT = 20
+TASKS = 5_000
+USERS = 200
+LOGS = 50_000
+
+
+async def stats_old(db: AsyncSession):
+    """Прежняя реализация get_dashboard_stats: по запросу на каждый счётчик"""
+    total_houses = (await db.execute(select(func.count(House.id)))).scalar() or 0
+    total_apartments = (await db.execute(select(func.sum(House.apartments_count)))).scalar() or 0
+    total_entrances = (await db.execute(select(func.sum(House.entrances_count)))).scalar() or 0
+    total_floors = (await db.execute(select(func.sum(House.floors_count)))).scalar() or 0
+    active_brigades = (await db.execute(
+        select(func.count(func.distinct(House.brigade_number))).where(House.brigade_number.isnot(None))
+    )).scalar() or 0
+    total_tasks = (await db.execute(select(func.count(Task.id)))).scalar() or 0
+    active_tasks = (await db.execute(
+        select(func.count(Task.id)).where(Task.status.in_([TaskStatus.TODO, TaskStatus.IN_PROGRESS]))
+    )).scalar() or 0
+    employees = (await db.execute(select(func.count(User.id)))).scalar() or 0
+    since = (datetime.now(timezone.utc) - timedelta(days=1)).replace(tzinfo=None)
+    recent_logs = (await db.execute(select(func.count(Log.id)).where(Log.created_at >= since))).scalar() or 0
+    total_companies = (await db.execute(
+        select(func.count(func.distinct(House.company_title))).where(House.company_title.isnot(None))
+    )).scalar() or 0
+    return {
+        "total_houses": total_houses,
+        "total_apartments": total_apartments,
+        "total_entrances": total_entrances,
+        "total_floors": total_floors,
+        "active_brigades": active_brigades,
+        "total_tasks": total_tasks,
+        "active_tasks": active_tasks,
+        "completed_tasks": total_tasks - active_tasks,
+        "employees": employees,
+        "recent_logs": recent_logs,
+        "total_companies": total_companies,
+    }
+
+
+async def fill(sessions):
+    rng = random.Random(5)
+    now = datetime.utcnow()
+    statuses = list(TaskStatus)
+    async with sessions() as db:
+        await db.execute(insert(User), [
+            {"id": f"u{i}", "email": f"user{i}@example.com", "full_name": f"Сотрудник {i}", "password_hash": "x"}
+            for i in range(USERS)
+        ])
+        await db.execute(insert(House), [
+            {
+                "id": f"h{i:07d}",
+                "address": f"г. Калуга, ул. Улица {rng.randint(1, 400)}, д. {rng.randint(1, 120)}",
+                "apartments_count": rng.randint(20, 300),
+                "entrances_count": rng.randint(1, 10),
+                "floors_count": rng.randint(2, 17),
+                "company_title": f"УК {rng.randint(1, 200)}" if rng.random() > 0.05 else None,
+                "assigned_by_id": str(rng.randint(1, 7)),
+                "brigade_number": str(rng.randint(1, 7)) if rng.random() > 0.05 else None,
+            }
+            for i in range(HOUSES)
+        ])
+        await db.execute(insert(Task), [
+            {"id": f"t{i}", "title": f"Задача {i}", "status": statuses[i % len(statuses)], "created_at": now}
+            for i in range(TASKS)
+        ])
+        await db.execute(insert(Log), [
+            {"id": f"l{i}", "message": "bench", "created_at": now - timedelta(minutes=i % (3 * 24 * 60))}
+            for i in range(LOGS)
+        ])
+        await db.commit()
+        for table in ("houses", "tasks", "users", "logs"):
+            await db.execute(text(f"ANALYZE {table}"))
+        await db.commit()
+
+
+async def load(label: str, call, statements):
+    latencies = []
+
+    async def client():
+        for _ in range(PER_CLIENT):
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+
+    statements[0] = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(CLIENTS)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    n = len(latencies)
+    print(
+        f"   {label:<34} {n / elapsed:8.0f} зап/с | p50 {latencies[n // 2] * 1000:7.1f} мс"
+        f" | p99 {latencies[int(n * 0.99)] * 1000:7.1f} мс | SQL на вызов {statements[0] / n:5.2f}"
+    )
+
+
+async def main():
+    args = dict(connect_args, server_settings={**connect_args["server_settings"], "search_path": SCHEMA})
+    engine = create_async_engine(db_url, connect_args=args, pool_size=10, max_overflow=20)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    # загрузчики снимка открывают сессии стенда
+    dashboard_stats.AsyncSessionLocal = sessions
+
+    statements = [0]
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_statement(*_):
+        statements[0] += 1
+
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    print("=" * 90)
+    print(f"📊 /dashboard/stats: {HOUSES} домов, {CLIENTS} клиентов x {PER_CLIENT} вызовов ({SCHEMA})")
+    print("=" * 90)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(lambda c: Base.metadata.create_all(
+                c, tables=[House.__table__, User.__table__, Task.__table__, Log.__table__]
+            ))
+        started = time.perf_counter()
+        await fill(sessions)
+        print(f"📥 Заполнение: {time.perf_counter() - started:.1f} с\n")
+
+        async with sessions() as db:
+            old = await stats_old(db)
+            new = await dashboard_stats.load_stats(db)
+        new.pop("last_sync")
+        assert old == new, f"счётчики расходятся: {old} != {new}"
+        print("   ✅ счётчики совпадают с прежней реализацией\n")
+
+        async def call_old():
+            async with sessions() as db:
+                await stats_old(db)
+
+        async def call_single():
+            async with sessions() as db:
+                await dashboard_stats.load_stats(db)
+
+        dashboard_stats.dashboard_cache.clear()
+        await load("как было: 10 запросов", call_old, statements)
+        await load("один запрос, без кеша", call_single, statements)
+        await load("снимок из dashboard_cache", dashboard_stats.get_stats, statements)
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
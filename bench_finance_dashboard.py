@@ -0,0 +1,142 @@
+"""
+Стенд /finances/dashboard: соединение на запрос (asyncpg.connect) против общего пула, Postgres (DATABASE_URL)
+- CLIENTS клиентов одновременно по PER_CLIENT вызовов get_finances_dashboard
+- как было: каждый эндпоинт внутри сводки открывает и закрывает своё соединение
+- общий пул app/config/database.py (DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE)
+Запросы в секунду, p50/p99 на вызов, число новых соединений. Таблицы - во временной схеме
+bench_finance_dashboard (рабочие не трогаются), схема удаляется в конце.
+С TLS до удалённой базы (Yandex PostgreSQL) разница больше, чем с локальной.
+
+Запуск: DATABASE_URL=postgresql://... python bench_finance_dashboard.py [транзакций]
+"""
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("BITRIX24_WEBHOOK_URL", "https://test.bitrix24.ru/rest/1/test/")
+
+import asyncpg  # noqa: E402
+
+from backend.app.config import database  # noqa: E402
+from backend.app.config.settings import settings  # noqa: E402
+from backend.app.routers import finances  # noqa: E402
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+SCHEMA = "bench_finance_dashboard"
+CLIENTS = 20
+PER_CLIENT = 10
+MIGRATIONS = Path(__file__).parent / "backend/app/migrations"
+SERVER_SETTINGS = {"search_path": SCHEMA, "timezone": "UTC"}
+
+FILL_SQL = """
+    INSERT INTO financial_transactions (id, date, amount, category, type, project, company)
+    SELECT 'tx' || g,
+           d,
+           (random() * 100000)::numeric(15, 2),
+           'Категория ' || (g % 30),
+           CASE WHEN g % 4 = 0 THEN 'income' ELSE 'expense' END,
+           TO_CHAR(d, 'YYYY-MM'),
+           (ARRAY['ВАШ ДОМ ФАКТ', 'УФИЦ модель', 'ВАШ ДОМ модель'])[1 + g % 3]
+    FROM generate_series(1, $1) g,
+         LATERAL (SELECT TIMESTAMPTZ '2024-01-01 00:00+00'
+                         + (g % 730) * INTERVAL '1 day' + (g % 86400) * INTERVAL '1 second') t(d)
+"""
+
+DEBTS_SQL = """
+    INSERT INTO debts (id, creditor, amount, due_date, status, type)
+    SELECT 'd' || g, 'Кредитор ' || g, 10000 + g, CURRENT_DATE + g,
+           (ARRAY['active', 'overdue', 'paid'])[1 + g % 3], 'loan'
+    FROM generate_series(1, 50) g
+"""
+
+
+async def apply_sql(conn, name: str, whole: bool = False):
+    sql = (MIGRATIONS / name).read_text(encoding="utf-8")
+    if whole:
+        async with conn.transaction():
+            await conn.execute(sql)
+        return
+    for cmd in sql.split(";"):
+        if cmd.strip():
+            await conn.execute(cmd)
+
+
+async def load(label: str, opened):
+    latencies = []
+
+    async def client():
+        for _ in range(PER_CLIENT):
+            started = time.perf_counter()
+            await finances.get_finances_dashboard()
+            latencies.append(time.perf_counter() - started)
+
+    opened[0] = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(CLIENTS)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    n = len(latencies)
+    print(
+        f"   {label:<28} {n / elapsed:7.1f} зап/с | p50 {latencies[n // 2] * 1000:7.1f} мс"
+        f" | p99 {latencies[int(n * 0.99)] * 1000:7.1f} мс | новых соединений {opened[0]}"
+    )
+
+
+async def main():
+    dsn = os.environ["DATABASE_URL"]
+    conn = await asyncpg.connect(dsn, server_settings=SERVER_SETTINGS)
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+    print("=" * 90)
+    print(f"💰 /finances/dashboard: {ROWS} транзакций, {CLIENTS} клиентов x {PER_CLIENT} вызовов ({SCHEMA})")
+    print("=" * 90)
+    originals = (finances.get_db_connection, finances.release_db_connection)
+    opened = [0]
+    try:
+        await apply_sql(conn, "create_financial_transactions_table.sql")
+        # как add_company_to_monthly_revenue.py и рабочая база: колонка company в обеих таблицах
+        for table in ("financial_transactions", "monthly_revenue"):
+            await conn.execute(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS company VARCHAR(100) DEFAULT 'ООО ВАШ ДОМ'"
+            )
+        await apply_sql(conn, "create_debts_inventory_tables.sql")
+        await conn.execute(FILL_SQL, ROWS)
+        await conn.execute(DEBTS_SQL)
+        await apply_sql(conn, "create_financial_rollup.sql", whole=True)
+        await conn.execute("ANALYZE")
+
+        # Как было: asyncpg.connect на каждый эндпоинт внутри сводки
+        async def connect_per_request():
+            opened[0] += 1
+            return await asyncpg.connect(dsn, server_settings=SERVER_SETTINGS)
+
+        async def close(c):
+            await c.close()
+
+        finances.get_db_connection, finances.release_db_connection = connect_per_request, close
+        await load("asyncpg.connect на запрос", opened)
+        finances.get_db_connection, finances.release_db_connection = originals
+
+        # Общий пул; init считает новые соединения
+        async def init(_):
+            opened[0] += 1
+
+        database._db_pool = await asyncpg.create_pool(
+            dsn, min_size=settings.DB_POOL_MIN_SIZE, max_size=settings.DB_POOL_MAX_SIZE,
+            server_settings=SERVER_SETTINGS, init=init,
+        )
+        await load("общий пул (холодный)", opened)
+        await load("общий пул (прогретый)", opened)
+        stats = database.get_db_pool_stats()
+        print(f"\n🧮 Пул: size {stats['size']}, max {stats['max_size']}, выдано соединений {stats['acquired_total']}")
+    finally:
+        finances.get_db_connection, finances.release_db_connection = originals
+        await database.close_db_pool()
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,179 @@
+"""
+Стенд помесячных свёрток финансов: 1M транзакций в Postgres (DATABASE_URL)
+- отчёты как было (GROUP BY по financial_transactions) против чтения financial_monthly_rollup /
+  financial_daily_rollup: profit-loss, expense-analysis, export-expenses, cash-flow
+- цена триггеров: вставка пачки транзакций без свёрток и со свёртками
+- сверка finance_rollup.check после вставок, обновлений и удалений
+Таблицы - во временной схеме bench_finance_rollup (рабочие не трогаются), схема удаляется в конце.
+
+Запуск: DATABASE_URL=postgresql://... python bench_finance_rollup.py [транзакций]
+"""
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("BITRIX24_WEBHOOK_URL", "https://test.bitrix24.ru/rest/1/test/")
+
+import asyncpg  # noqa: E402
+
+from backend.app.services import finance_rollup  # noqa: E402
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+SCHEMA = "bench_finance_rollup"
+INSERT_BATCH = 10_000
+RUNS = 5
+MIGRATIONS = Path(__file__).parent / "backend/app/migrations"
+
+# Синтетика: 3 компании, 24 месяца, 30 категорий; project - подпись месяца, как в импорте
+FILL_SQL = """
+    INSERT INTO financial_transactions (id, date, amount, category, type, project, company)
+    SELECT 'tx' || g + $2,
+           d,
+           (random() * 100000)::numeric(15, 2),
+           'Категория ' || (g % 30),
+           CASE WHEN g % 4 = 0 THEN 'income' ELSE 'expense' END,
+           TO_CHAR(d, 'YYYY-MM'),
+           (ARRAY['ВАШ ДОМ ФАКТ', 'УФИЦ модель', 'ВАШ ДОМ модель'])[1 + g % 3]
+    FROM generate_series(1, $1) g,
+         LATERAL (SELECT TIMESTAMPTZ '2024-01-01 00:00+00'
+                         + (g % 730) * INTERVAL '1 day' + (g % 86400) * INTERVAL '1 second') t(d)
+"""
+
+REPORTS = [
+    (
+        "profit-loss 2025",
+        """SELECT TO_CHAR(date, 'YYYY-MM'), SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END),
+                  SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END)
+           FROM financial_transactions
+           WHERE date IS NOT NULL AND EXTRACT(YEAR FROM date) = 2025 AND company = 'ВАШ ДОМ ФАКТ'
+           GROUP BY TO_CHAR(date, 'YYYY-MM') ORDER BY 1""",
+        """SELECT TO_CHAR(month, 'YYYY-MM'), SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END),
+                  SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END)
+           FROM financial_monthly_rollup
+           WHERE month >= DATE '2025-01-01' AND month < DATE '2026-01-01' AND company = 'ВАШ ДОМ ФАКТ'
+           GROUP BY month ORDER BY 1""",
+    ),
+    (
+        "expense-analysis",
+        """SELECT category, SUM(amount) FROM financial_transactions
+           WHERE type = 'expense' AND company = 'ВАШ ДОМ ФАКТ' GROUP BY category ORDER BY 1""",
+        """SELECT category, SUM(amount) FROM financial_monthly_rollup
+           WHERE type = 'expense' AND company = 'ВАШ ДОМ ФАКТ' GROUP BY category ORDER BY 1""",
+    ),
+    (
+        "export-expenses 2025",
+        """SELECT TO_CHAR(date, 'YYYY-MM'), category, SUM(amount), COUNT(*) FROM financial_transactions
+           WHERE type = 'expense' AND EXTRACT(YEAR FROM date) = 2025 GROUP BY 1, 2 ORDER BY 1, 2""",
+        """SELECT TO_CHAR(month, 'YYYY-MM'), category, SUM(amount), SUM(tx_count) FROM financial_monthly_rollup
+           WHERE type = 'expense' AND month >= DATE '2025-01-01' AND month < DATE '2026-01-01'
+           GROUP BY month, category ORDER BY 1, 2""",
+    ),
+    (
+        "cash-flow 30 дней",
+        """SELECT (date AT TIME ZONE 'UTC')::date, SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END),
+                  SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END)
+           FROM financial_transactions GROUP BY 1 ORDER BY 1 DESC LIMIT 30""",
+        """SELECT day, SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END),
+                  SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END)
+           FROM financial_daily_rollup GROUP BY day ORDER BY day DESC LIMIT 30""",
+    ),
+]
+
+
+async def timed(conn, sql, *args):
+    best, result = None, None
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        result = await conn.fetch(sql, *args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, [tuple(r) for r in result]
+
+
+async def apply_sql(conn, name: str, whole: bool = False):
+    sql = (MIGRATIONS / name).read_text(encoding="utf-8")
+    if whole:
+        async with conn.transaction():
+            await conn.execute(sql)
+        return
+    for cmd in sql.split(";"):
+        if cmd.strip():
+            await conn.execute(cmd)
+
+
+async def insert_batch(conn, offset: int) -> float:
+    started = time.perf_counter()
+    await conn.execute(FILL_SQL, INSERT_BATCH, offset)
+    return time.perf_counter() - started
+
+
+async def main():
+    conn = await asyncpg.connect(os.environ["DATABASE_URL"], server_settings={"search_path": SCHEMA, "timezone": "UTC"})
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+    print("=" * 90)
+    print(f"💰 Свёртки финансов: {ROWS} транзакций ({SCHEMA})")
+    print("=" * 90)
+    try:
+        await apply_sql(conn, "create_financial_transactions_table.sql")
+        await conn.execute(
+            "ALTER TABLE financial_transactions ADD COLUMN IF NOT EXISTS company VARCHAR(100) DEFAULT 'ООО ВАШ ДОМ'"
+        )
+        started = time.perf_counter()
+        await conn.execute(FILL_SQL, ROWS, 0)
+        await conn.execute("ANALYZE financial_transactions")
+        print(f"📥 Заполнение: {time.perf_counter() - started:.1f} с")
+
+        # Вставка без триггеров - до миграции свёрток
+        plain = min([await insert_batch(conn, ROWS + i * INSERT_BATCH) for i in range(3)])
+
+        started = time.perf_counter()
+        await apply_sql(conn, "create_financial_rollup.sql", whole=True)
+        await conn.execute("ANALYZE financial_monthly_rollup; ANALYZE financial_daily_rollup")
+        groups = await conn.fetchval("SELECT COUNT(*) FROM financial_monthly_rollup")
+        print(f"🧮 Миграция свёрток с первичным заполнением: {time.perf_counter() - started:.1f} с, {groups} групп\n")
+
+        for label, raw_sql, rollup_sql in REPORTS:
+            raw_t, raw_rows = await timed(conn, raw_sql)
+            rollup_t, rollup_rows = await timed(conn, rollup_sql)
+            same = "✅" if raw_rows == rollup_rows else "❌ расходится"
+            print(
+                f"   {label:<22} таблица {raw_t * 1000:8.1f} мс | свёртка {rollup_t * 1000:6.1f} мс"
+                f" | x{raw_t / rollup_t:6.1f} {same}"
+            )
+
+        with_triggers = min([await insert_batch(conn, ROWS + (3 + i) * INSERT_BATCH) for i in range(3)])
+        print(
+            f"\n⏱️ Вставка {INSERT_BATCH} строк одним INSERT: без свёрток {plain * 1000:.0f} мс, "
+            f"со свёртками {with_triggers * 1000:.0f} мс (+{(with_triggers / plain - 1) * 100:.0f}%)"
+        )
+        started = time.perf_counter()
+        for i in range(200):
+            await conn.execute(
+                "INSERT INTO financial_transactions (id, date, amount, category, type, project, company) "
+                "VALUES ($1, now(), 100, 'Категория 1', 'expense', '2025-10', 'ВАШ ДОМ ФАКТ')",
+                f"single{i}",
+            )
+        print(f"⏱️ Одиночная вставка со свёртками: {(time.perf_counter() - started) / 200 * 1000:.2f} мс")
+
+        await conn.execute(
+            "UPDATE financial_transactions SET amount = amount + 1, category = 'Категория 0' WHERE id LIKE 'tx1%1'"
+        )
+        await conn.execute("UPDATE financial_transactions SET date = date - INTERVAL '40 days' WHERE id LIKE 'tx2%2'")
+        await conn.execute("DELETE FROM financial_transactions WHERE id LIKE 'tx3%3'")
+        started = time.perf_counter()
+        result = await finance_rollup.check(conn)
+        print(
+            f"\n🔍 Сверка после UPDATE/DELETE: {'✅ совпадает' if result['consistent'] else '❌ расходится'} "
+            f"(monthly {result['monthly_mismatches']}, daily {result['daily_mismatches']}), "
+            f"{time.perf_counter() - started:.1f} с"
+        )
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
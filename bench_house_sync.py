@@ -0,0 +1,138 @@
+"""
+Стенд синхронизации домов: 5000 синтетических сделок -> Postgres (DATABASE_URL)
+- "построчно": как было - SELECT по bitrix_id на каждую сделку, затем setattr / db.add, один commit
+- "пачками": services/house_sync.sync_houses - хэши одним запросом, INSERT ... ON CONFLICT пачками,
+  мягкое удаление пропавших
+Сценарии: первая загрузка, повторная без изменений, повторная с 2% изменённых и 1% пропавших сделок.
+Считаем время и число SQL-запросов к БД.
+Таблица создаётся во временной схеме bench_house_sync (рабочая houses не трогается), схема удаляется в конце.
+
+Запуск: DATABASE_URL=postgresql://... python bench_house_sync.py [сделок]
+"""
+import asyncio
+import copy
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("BITRIX24_WEBHOOK_URL", "https://test.bitrix24.ru/rest/1/test/")
+
+from sqlalchemy import event, select, text  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from backend.app.config.database import connect_args, db_url  # noqa: E402
+from backend.app.models.house import House  # noqa: E402
+from backend.app.services import house_sync  # noqa: E402
+from backend.app.services.bitrix24_service import bitrix24_service  # noqa: E402
+
+DEALS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+SCHEMA = "bench_house_sync"
+
+
+def synth_deals(n: int):
+    rng = random.Random(11)
+    streets = ["Ленина", "Кирова", "Жукова", "Московская", "Гагарина", "Победы", "Мира"]
+    return [
+        {
+            "ID": str(100000 + i),
+            "TITLE": f"{rng.choice(streets)} {rng.randint(1, 120)}",
+            "UF_CRM_1669561599956": f"г. Калуга, ул. {rng.choice(streets)}, д. {rng.randint(1, 120)}",
+            "UF_CRM_1669704529022": str(rng.randint(20, 300)),
+            "UF_CRM_1669705507390": str(rng.randint(1, 10)),
+            "UF_CRM_1669704631166": str(rng.randint(2, 17)),
+            "COMPANY_ID": str(rng.randint(1, 40)),
+            "COMPANY_TITLE": f"УК {rng.randint(1, 40)}",
+            "ASSIGNED_BY_ID": str(rng.randint(1, 7)),
+            "ASSIGNED_BY_NAME": f"Бригада {rng.randint(1, 7)}",
+            "UF_CRM_1669706387893": rng.choice(["2 раза в неделю", "1 раз в неделю", "4 раза в месяц"]),
+        }
+        for i in range(n)
+    ]
+
+
+def mutate(deals, changed: float, removed: float):
+    rng = random.Random(12)
+    out = []
+    for d in deals:
+        r = rng.random()
+        if r < removed:
+            continue
+        d = copy.copy(d)
+        if r < removed + changed:
+            d["ASSIGNED_BY_NAME"] = f"Бригада {rng.randint(1, 7)}"
+            d["UF_CRM_1669704529022"] = str(rng.randint(20, 300))
+        out.append(d)
+    return out
+
+
+async def sync_rowwise(db: AsyncSession, deals):
+    """Прежний цикл из TaskScheduler.sync_bitrix24_houses"""
+    created = updated = 0
+    for deal in deals:
+        house_data = bitrix24_service.parse_deal_to_house(deal)
+        if not house_data.get("address"):
+            continue
+        result = await db.execute(select(House).where(House.bitrix_id == house_data["bitrix_id"]))
+        existing = result.scalar_one_or_none()
+        if existing:
+            for key, value in house_data.items():
+                if key != "id":
+                    setattr(existing, key, value)
+            updated += 1
+        else:
+            db.add(House(**house_data))
+            created += 1
+    await db.commit()
+    return {"created": created, "updated": updated}
+
+
+async def sync_batched(db: AsyncSession, deals):
+    return await house_sync.sync_houses(db, [bitrix24_service.parse_deal_to_house(d) for d in deals])
+
+
+async def main():
+    args = dict(connect_args, server_settings={**connect_args["server_settings"], "search_path": SCHEMA})
+    engine = create_async_engine(db_url, connect_args=args, pool_size=2)
+    statements = 0
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _count(*_):
+        nonlocal statements
+        statements += 1
+
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+
+    base = synth_deals(DEALS)
+    scenarios = [
+        ("первая загрузка", base),
+        ("повтор без изменений", base),
+        ("2% изменено, 1% пропало", mutate(base, 0.02, 0.01)),
+    ]
+    print("=" * 90)
+    print(f"🏠 Синхронизация {DEALS} сделок в Postgres ({SCHEMA}.houses)")
+    print("=" * 90)
+    try:
+        for name, fn in (("построчно", sync_rowwise), ("пачками", sync_batched)):
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP TABLE IF EXISTS {SCHEMA}.houses"))
+                await conn.run_sync(lambda c: House.__table__.create(c))
+            for label, deals in scenarios:
+                statements = 0
+                started = time.perf_counter()
+                async with sessions() as db:
+                    result = await fn(db, deals)
+                elapsed = time.perf_counter() - started
+                print(f"{name:<10} {label:<26} {elapsed:7.2f} с, SQL-запросов: {statements:6d} | {result}")
+            print()
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
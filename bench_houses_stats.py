@@ -0,0 +1,171 @@
+"""
+Стенд /houses/stats/summary и /houses на 10k и 100k домов в Postgres (DATABASE_URL)
+- статистика: как было (select(House) + подсчёт в Python) против GROUP BY GROUPING SETS
+- список: дальняя страница через skip (OFFSET) против keyset-курсора по (brigade_number, id)
+- повторный запрос из houses_cache
+Время и пик памяти Python (tracemalloc) на запрос. Таблица - во временной схеме bench_houses_stats
+(рабочая houses не трогается), индексы - из add_houses_listing_indexes.sql, схема удаляется в конце.
+
+Запуск: DATABASE_URL=postgresql://... python bench_houses_stats.py [10000,100000]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault("BITRIX24_WEBHOOK_URL", "https://test.bitrix24.ru/rest/1/test/")
+
+from fastapi import Response  # noqa: E402
+from sqlalchemy import select, text  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from backend.app.config.database import connect_args, db_url  # noqa: E402
+from backend.app.models.house import House  # noqa: E402
+from backend.app.routers import houses as houses_router  # noqa: E402
+from backend.app.services.house_sync import houses_cache, upsert_statement  # noqa: E402
+
+SIZES = [int(x) for x in sys.argv[1].split(",")] if len(sys.argv) > 1 else [10_000, 100_000]
+SCHEMA = "bench_houses_stats"
+PAGE = 100
+INDEXES_SQL = Path(__file__).parent / "backend/app/migrations/add_houses_listing_indexes.sql"
+
+
+def synth_houses(n: int):
+    rng = random.Random(3)
+    now = datetime.utcnow()
+    for i in range(n):
+        yield {
+            "id": f"h{i:07d}",
+            "bitrix_id": str(100000 + i),
+            "address": f"г. Калуга, ул. Улица {rng.randint(1, 400)}, д. {rng.randint(1, 120)}",
+            "apartments_count": rng.randint(20, 300),
+            "entrances_count": rng.randint(1, 10),
+            "floors_count": rng.randint(2, 17),
+            "company_id": str(rng.randint(1, 200)),
+            "company_title": f"УК {rng.randint(1, 200)}" if rng.random() > 0.05 else None,
+            "assigned_by_id": str(rng.randint(1, 7)),
+            "assigned_by_name": None,
+            "brigade_number": str(rng.randint(1, 7)) if rng.random() > 0.05 else None,
+            "tariff": "2 раза в неделю",
+            "cleaning_schedule": {"october_2025": [{"date": "2025-10-05", "type": "1"}]},
+            "complaints": [],
+            "notes": None,
+            "elder_contact": None,
+            "act_signed": None,
+            "last_cleaning": now - timedelta(days=rng.randint(0, 60)),
+            "created_at": now,
+            "content_hash": None,
+        }
+
+
+async def stats_orm(db: AsyncSession):
+    """Прежняя реализация get_houses_stats"""
+    result = await db.execute(select(House).where(House.deleted_at.is_(None)))
+    houses = result.scalars().all()
+    stats = {"total": len(houses), "by_brigade": {}, "by_company": {}, "last_sync": None}
+    for house in houses:
+        brigade = house.brigade_number or "Не назначено"
+        stats["by_brigade"][brigade] = stats["by_brigade"].get(brigade, 0) + 1
+        company = house.company_title or "Не указано"
+        stats["by_company"][company] = stats["by_company"].get(company, 0) + 1
+        if house.synced_at and (not stats["last_sync"] or house.synced_at > stats["last_sync"]):
+            stats["last_sync"] = house.synced_at
+    return stats
+
+
+async def measure(sessions, fn, clear_cache=True):
+    if clear_cache:
+        houses_cache.clear()
+    tracemalloc.start()
+    started = time.perf_counter()
+    async with sessions() as db:
+        result = await fn(db)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def row(label: str, elapsed: float, peak: int) -> str:
+    return f"   {label:<44} {elapsed * 1000:9.1f} мс, пик памяти {peak / 1024 / 1024:7.1f} МБ"
+
+
+async def run(size: int, engine, sessions):
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE IF EXISTS {SCHEMA}.houses"))
+        await conn.run_sync(lambda c: House.__table__.create(c))
+        for cmd in INDEXES_SQL.read_text(encoding="utf-8").split(";"):
+            if cmd.strip():
+                await conn.execute(text(cmd))
+    batch, now = [], datetime.utcnow()
+    async with sessions() as db:
+        for h in synth_houses(size):
+            batch.append(h)
+            if len(batch) == 1000:
+                await db.execute(upsert_statement(batch, now))
+                batch = []
+        if batch:
+            await db.execute(upsert_statement(batch, now))
+        await db.commit()
+        await db.execute(text("ANALYZE houses"))
+        await db.commit()
+
+    print(f"\n🏠 {size} домов")
+    old, t, peak = await measure(sessions, stats_orm)
+    print(row("stats: select(House) + Python", t, peak))
+    new, t, peak = await measure(sessions, lambda db: houses_router.get_houses_stats())
+    print(row("stats: GROUPING SETS", t, peak))
+    assert old["total"] == new["total"] and old["by_brigade"] == new["by_brigade"] and old["by_company"] == new["by_company"]
+    _, t, peak = await measure(sessions, lambda db: houses_router.get_houses_stats(), clear_cache=False)
+    print(row("stats: из houses_cache", t, peak))
+
+    deep = size - PAGE * 2
+
+    def listing(**kw):
+        params = {"skip": 0, "cursor": None, "order_by": "brigade_number", **kw}
+        return lambda db: houses_router.get_houses(
+            Response(), limit=PAGE, company_id=None, brigade_number=None, **params
+        )
+
+    offset_page, t, peak = await measure(sessions, listing(skip=deep))
+    print(row(f"list: skip={deep}, order_by=brigade_number", t, peak))
+    # Курсор на ту же глубину: последняя строка предыдущей страницы
+    async with sessions() as db:
+        res = await db.execute(
+            select(houses_router._SORT_KEYS["brigade_number"], House.id)
+            .order_by(houses_router._SORT_KEYS["brigade_number"], House.id).offset(deep - 1).limit(1)
+        )
+        sort_value, house_id = res.one()
+    cursor = houses_router._encode_cursor(sort_value, house_id)
+    keyset_page, t, peak = await measure(sessions, listing(cursor=cursor))
+    print(row("list: cursor на той же глубине", t, peak))
+    assert [h["id"] for h in offset_page] == [h["id"] for h in keyset_page]
+
+
+async def main():
+    args = dict(connect_args, server_settings={**connect_args["server_settings"], "search_path": SCHEMA})
+    engine = create_async_engine(db_url, connect_args=args, pool_size=2)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    # загрузки houses_cache открывают свои сессии - сессии стенда
+    houses_router.AsyncSessionLocal = sessions
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    print("=" * 90)
+    print(f"📊 /houses/stats/summary и /houses: {', '.join(map(str, SIZES))} домов ({SCHEMA})")
+    print("=" * 90)
+    try:
+        for size in SIZES:
+            await run(size, engine, sessions)
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
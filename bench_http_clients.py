@@ -0,0 +1,74 @@
+"""
+Стенд общих HTTP-клиентов: 200 последовательных sendMessage в заглушку Telegram Bot API
+- "новый клиент": httpx.AsyncClient на каждый вызов (как было в TelegramService и др.)
+- "общий пул": TelegramService.send_message через http_clients (keep-alive соединение)
+Заглушка - локальный aiohttp без TLS, поэтому разница здесь - только создание клиента и TCP connect;
+на api.telegram.org к этому добавляется DNS и TLS handshake на каждый вызов
+
+Запуск: python bench_http_clients.py [число_сообщений]
+"""
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from aiohttp import web
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "bench")
+
+from backend.app.config.http_clients import close_http_clients, http_clients  # noqa: E402
+from backend.app.services.telegram_service import TelegramService  # noqa: E402
+
+MESSAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+PORT = 18767
+peers = set()  # клиентские порты = разные TCP-соединения
+
+
+async def send_message(request: web.Request) -> web.Response:
+    await request.json()
+    peers.add(request.transport.get_extra_info("peername")[1])
+    return web.json_response({"ok": True, "result": {"message_id": 1}})
+
+
+def report(label: str, started: float, conns: int) -> None:
+    total = time.perf_counter() - started
+    print(f"{label:<14} {MESSAGES} сообщений за {total:6.3f} с | {total / MESSAGES * 1000:6.2f} мс/сообщение | TCP-соединений: {conns}")
+
+
+async def main() -> None:
+    app = web.Application()
+    app.router.add_post("/botbench/sendMessage", send_message)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+    url = f"http://127.0.0.1:{PORT}/botbench/sendMessage"
+
+    print("=" * 90)
+    print(f"✉️  sendMessage x{MESSAGES} в локальную заглушку (http2 в общем пуле: {http_clients.stats()['http2']})")
+    print("=" * 90)
+    try:
+        peers.clear()
+        started = time.perf_counter()
+        for i in range(MESSAGES):
+            async with httpx.AsyncClient(timeout=httpx.Timeout(30.0)) as client:
+                await client.post(url, json={"chat_id": "1", "text": f"Сообщение {i}", "parse_mode": "HTML"})
+        report("новый клиент", started, len(peers))
+
+        service = TelegramService()
+        service.api_url = f"http://127.0.0.1:{PORT}/botbench"
+        peers.clear()
+        started = time.perf_counter()
+        ok = 0
+        for i in range(MESSAGES):
+            ok += await service.send_message("1", f"Сообщение {i}")
+        report("общий пул", started, len(peers))
+        print(f"✅ Доставлено через общий пул: {ok}/{MESSAGES}")
+        print(http_clients.stats())
+    finally:
+        await close_http_clients()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+"""
+Стенд конвейера NovofonAutoProcessor: пропускная способность и сквозная задержка
+- Локальный заглушечный сервер (aiohttp): записи звонков, OpenAI (Whisper + chat), Telegram
+- Транскрибация тем дольше, чем длиннее звонок; анализ и доставка - фиксированная задержка
+- processed_calls / nedvigka_calls подменены памятью, чтобы стенд не требовал БД
+- Сравнивает последовательную обработку (_process_single_call) и конвейер (submit + воркеры стадий)
+
+Запуск: python bench_novofon_pipeline.py [число_звонков]
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+from aiohttp import web
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+PORT = 18766
+DOWNLOAD_MS = 50
+WHISPER_MS_PER_SEC = 5  # 10 минут разговора -> 3 с транскрибации
+CHAT_MS = 300
+TELEGRAM_MS = 20
+AUDIO_BYTES_PER_SEC = 1000
+
+
+async def recording(request: web.Request) -> web.Response:
+    await asyncio.sleep(DOWNLOAD_MS / 1000)
+    duration = int(request.query.get("duration", "60"))
+    return web.Response(body=b"\0" * (duration * AUDIO_BYTES_PER_SEC), content_type="audio/mpeg")
+
+
+async def transcriptions(request: web.Request) -> web.Response:
+    form = await request.post()
+    size = len(form["file"].file.read())
+    await asyncio.sleep(size / AUDIO_BYTES_PER_SEC * WHISPER_MS_PER_SEC / 1000)
+    return web.json_response({"text": f"Разговор длиной {size // AUDIO_BYTES_PER_SEC} с"})
+
+
+async def chat(request: web.Request) -> web.Response:
+    await asyncio.sleep(CHAT_MS / 1000)
+    content = json.dumps({"agency_name": "Стенд", "lead_category": "ТЁПЛЫЙ ЛИД", "interest_rating": 6, "summary": "ok"})
+    return web.json_response({
+        "id": "bench", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+    })
+
+
+async def telegram(request: web.Request) -> web.Response:
+    await asyncio.sleep(TELEGRAM_MS / 1000)
+    return web.json_response({"ok": True})
+
+
+def make_processor():
+    from backend.app.services.novofon_auto_processor import NovofonAutoProcessor
+
+    class BenchProcessor(NovofonAutoProcessor):
+        """processed_calls в памяти; время завершения каждого звонка"""
+
+        def __init__(self):
+            super().__init__()
+            self.claimed = set()
+            self.done_at = {}
+
+        async def _claim_call(self, call_id):
+            if call_id in self.claimed:
+                return False
+            self.claimed.add(call_id)
+            return True
+
+        async def _save_to_database(self, call_id, call, transcription, analysis):
+            return None
+
+        async def _mark_as_processed(self, call_id, success=True):
+            self.done_at[call_id] = time.perf_counter()
+
+    return BenchProcessor()
+
+
+def make_calls():
+    rng = random.Random(7)
+    calls = []
+    for i in range(CALLS):
+        # Каждый пятый - длинный разговор, остальные короткие
+        duration = rng.randint(300, 600) if i % 5 == 0 else rng.randint(15, 90)
+        calls.append({
+            "id": f"bench-{i}",
+            "caller": "+79843330712",
+            "called": f"+7900000{i:04d}",
+            "duration": duration,
+            "record_url": f"http://127.0.0.1:{PORT}/rec/{i}?duration={duration}",
+        })
+    return calls
+
+
+def report(label, calls, started, done_at):
+    total = max(done_at.values()) - started
+    lat = sorted(done_at[c["id"]] - started for c in calls)
+    short = sorted(done_at[c["id"]] - started for c in calls if c["duration"] < 300)
+    print(
+        f"{label:<14} всего {total:6.2f} с | {len(calls) / total:5.2f} зв/с | "
+        f"p50 {lat[len(lat) // 2]:6.2f} с | короткие p50 {short[len(short) // 2]:6.2f} с"
+    )
+
+
+async def main():
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+    os.environ["TELEGRAM_API_BASE"] = f"http://127.0.0.1:{PORT}"
+    os.environ["TELEGRAM_BOT_TOKEN"] = "bench"
+
+    app = web.Application()
+    app.router.add_get("/rec/{id}", recording)
+    app.router.add_post("/v1/audio/transcriptions", transcriptions)
+    app.router.add_post("/v1/chat/completions", chat)
+    app.router.add_post("/botbench/sendMessage", telegram)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+
+    calls = make_calls()
+    print("=" * 78)
+    print(f"📞 Звонков: {len(calls)} (длинных: {sum(c['duration'] >= 300 for c in calls)})")
+    print("=" * 78)
+    try:
+        seq = make_processor()
+        started = time.perf_counter()
+        for call in calls:
+            await seq._process_single_call(call)
+        report("по очереди", calls, started, seq.done_at)
+
+        pipe = make_processor()
+        started = time.perf_counter()
+        for call in calls:
+            await pipe.submit(call)
+        await pipe.wait_idle()
+        report("конвейер", calls, started, pipe.done_at)
+        print(json.dumps(pipe.get_stats(), ensure_ascii=False, indent=2))
+        pipe.stop()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
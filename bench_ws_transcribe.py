@@ -0,0 +1,196 @@
+"""
+Стенд потоковой транскрипции /ws/transcribe
+Клиент проигрывает аудио в реальном времени кадрами по 20 мс (PCM16 16 кГц моно, бинарные сообщения)
+и меряет:
+- время до первого partial (от начала потока)
+- задержку final: от конца речи во фразе до прихода final (по каждой фразе: среднее и p95;
+  включает паузу STREAM_SILENCE_MS, по которой фраза закрывается)
+- время от stop до done
+Для сравнения - старый режим: весь файл одним base64-чанком после окончания записи
+
+Без URL поднимает локальный aiohttp-сервер с StreamingTranscriptionSession и имитацией Whisper
+(задержка WHISPER_MS, без OpenAI). С URL - бьёт в живой сервер (нужен OPENAI_API_KEY на сервере).
+
+Запуск: python bench_ws_transcribe.py [файл.wav|mp3|webm] [ws://localhost:8001/api/ws/transcribe]
+"""
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+import wave
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+
+from backend.app.services.streaming_transcriber import SAMPLE_RATE, StreamingTranscriptionSession, pcm_to_wav
+
+FILE = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith("ws") else None
+URL = next((a for a in sys.argv[1:] if a.startswith("ws")), None)
+WHISPER_MS = int(os.getenv("WHISPER_MS", "700"))
+FRAME_MS = 20
+PORT = 18770
+
+
+def load_pcm(path: str) -> bytes:
+    """PCM16 16 кГц моно из WAV (как есть) или любого формата через PyAV"""
+    if path.endswith(".wav"):
+        with wave.open(path, "rb") as w:
+            if w.getframerate() == SAMPLE_RATE and w.getnchannels() == 1 and w.getsampwidth() == 2:
+                return w.readframes(w.getnframes())
+    import av
+    chunks = []
+    with av.open(path) as container:
+        resampler = av.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+        for frame in container.decode(audio=0):
+            for out in resampler.resample(frame):
+                chunks.append(out.to_ndarray().tobytes())
+        for out in resampler.resample(None):
+            chunks.append(out.to_ndarray().tobytes())
+    return b"".join(chunks)
+
+
+def synth_speech(phrases=(3.0, 5.5, 2.0, 8.0), pause=1.2) -> bytes:
+    """Речеподобные фразы (тоны 200-3400 Гц с амплитудной модуляцией) с паузами - шум -60 дБ"""
+    rng = np.random.default_rng(7)
+    parts = [rng.standard_normal(int(0.5 * SAMPLE_RATE)) * 30]
+    for seconds in phrases:
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        voice = sum(np.sin(2 * np.pi * f * t) for f in (220, 700, 1500, 3100)) / 4
+        envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)
+        parts.append(voice * envelope * 8000)
+        parts.append(rng.standard_normal(int(pause * SAMPLE_RATE)) * 30)
+    return np.clip(np.concatenate(parts), -32768, 32767).astype("<i2").tobytes()
+
+
+async def fake_whisper(pcm: bytes, language: str) -> str:
+    await asyncio.sleep(WHISPER_MS / 1000)
+    return f"{len(pcm) / 2 / SAMPLE_RATE:.2f} с речи"
+
+
+async def local_server() -> web.AppRunner:
+    """Тот же протокол, что у роутера /ws/transcribe, но Whisper - имитация"""
+
+    async def handler(request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        lock = asyncio.Lock()
+
+        async def send(payload):
+            async with lock:
+                await ws.send_json(payload)
+
+        session = None
+        async for msg in ws:
+            if msg.type == aiohttp.WSMsgType.BINARY:
+                await session.feed(msg.data)
+                continue
+            data = json.loads(msg.data)
+            if data["type"] == "start":
+                session = StreamingTranscriptionSession(send, sample_rate=data.get("sample_rate", SAMPLE_RATE), transcribe=fake_whisper)
+                await send({"type": "ready"})
+            elif data["type"] == "stop":
+                await send(await session.finish())
+            elif data["type"] == "audio":
+                # старый режим: один запрос на весь чанк
+                text = await fake_whisper(base64.b64decode(data["audio"]), "ru")
+                await send({"type": "transcription", "text": text, "is_final": True})
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/api/ws/transcribe", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+    return runner
+
+
+async def run_streaming(url: str, pcm: bytes) -> dict:
+    frame_bytes = SAMPLE_RATE * FRAME_MS // 1000 * 2
+    events = []
+    async with aiohttp.ClientSession() as http, http.ws_connect(url, max_msg_size=0) as ws:
+        await ws.send_str(json.dumps({"type": "start", "sample_rate": SAMPLE_RATE, "language": "ru"}))
+        await ws.receive()  # ready
+
+        async def reader():
+            async for msg in ws:
+                data = json.loads(msg.data)
+                events.append((time.perf_counter(), data))
+                if data["type"] == "done":
+                    return
+
+        reading = asyncio.create_task(reader())
+        started = time.perf_counter()
+        for i in range(0, len(pcm), frame_bytes):
+            delay = started + i / 2 / SAMPLE_RATE - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await ws.send_bytes(pcm[i:i + frame_bytes])
+        stopped = time.perf_counter()
+        await ws.send_str(json.dumps({"type": "stop"}))
+        await reading
+
+    partials = [t - started for t, e in events if e["type"] == "partial"]
+    finals = [(t - started) - e["end"] for t, e in events if e["type"] == "final"]
+    return {
+        "first_partial": partials[0] if partials else None,
+        "first_final": min((t - started for t, e in events if e["type"] == "final"), default=None),
+        "partials": len(partials),
+        "finals": finals,
+        "stop_to_done": events[-1][0] - stopped if events else None,
+        "texts": [e["text"] for _, e in events if e["type"] == "final"],
+    }
+
+
+async def run_legacy(url: str, pcm: bytes) -> float:
+    """Старый режим: клиент пишет всю запись, потом один чанк - время до текста от начала записи"""
+    started = time.perf_counter()
+    await asyncio.sleep(len(pcm) / 2 / SAMPLE_RATE)
+    async with aiohttp.ClientSession() as http, http.ws_connect(url, max_msg_size=0) as ws:
+        await ws.send_str(json.dumps({"type": "audio", "audio": base64.b64encode(pcm_to_wav(pcm)).decode("ascii")}))
+        async for msg in ws:
+            if json.loads(msg.data)["type"] in ("transcription", "error"):
+                break
+    return time.perf_counter() - started
+
+
+def fmt(value) -> str:
+    return f"{value:6.2f} с" if value is not None else "     -"
+
+
+async def main():
+    pcm = load_pcm(FILE) if FILE else synth_speech()
+    runner = None
+    url = URL
+    if url is None:
+        runner = await local_server()
+        url = f"http://127.0.0.1:{PORT}/api/ws/transcribe"
+    duration = len(pcm) / 2 / SAMPLE_RATE
+    print("=" * 90)
+    print(f"🎙️ {FILE or 'синтетическая речь'}: {duration:.1f} с, кадры по {FRAME_MS} мс в реальном времени -> {url}")
+    if runner:
+        print(f"   Whisper - имитация, {WHISPER_MS} мс на запрос")
+    print("=" * 90)
+    try:
+        streaming = await run_streaming(url, pcm)
+        legacy = await run_legacy(url, pcm)
+    finally:
+        if runner:
+            await runner.cleanup()
+
+    finals = np.array(streaming["finals"])
+    print(f"Потоковый режим: partial {streaming['partials']}, final {len(finals)}")
+    print(f"   до первого partial:  {fmt(streaming['first_partial'])}")
+    print(f"   до первого final:    {fmt(streaming['first_final'])}")
+    if len(finals):
+        print(f"   конец речи -> final:  ср. {finals.mean():5.2f} с, p95 {np.percentile(finals, 95):5.2f} с")
+    print(f"   stop -> done:        {fmt(streaming['stop_to_done'])}")
+    print(f"Старый режим (вся запись одним чанком): до текста {fmt(legacy)}")
+    for text in streaming["texts"]:
+        print(f"   · {text}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,168 @@
+"""
+Тест brain_answer_cache перед brain_router.try_fast_answer
+- перефразированный вопрос с тем же намерением и сущностями отвечается из кеша, без резолвера, быстрее 5 мс
+- другой адрес - другой ключ; ответы резервной цепочки не кешируются
+- invalidate("bitrix") / invalidate("finance") сбрасывают только свои намерения
+- ответ, посчитанный во время сброса, не сохраняется; правка ответа вызывающим кеш не портит
+Хранилище заглушено: BrainStore без кеша считает вызовы и отвечает с задержкой Bitrix.
+
+Запуск: python test_brain_answer_cache.py
+"""
+import asyncio
+import logging
+import os
+import time
+
+os.environ.setdefault("BITRIX24_WEBHOOK_URL", "https://test.bitrix24.ru/rest/1/test/")
+
+from backend.app.services import brain_resolvers, brain_router  # noqa: E402
+from backend.app.services.brain import ElderContact, HouseDTO  # noqa: E402
+from backend.app.services.brain_answer_cache import brain_answer_cache  # noqa: E402
+from backend.app.services.brain_metrics import brain_metrics  # noqa: E402
+
+BITRIX_MS = 50
+
+
+class StubStore:
+    """BrainStore без кеша: считает походы в Bitrix и в БД"""
+
+    def __init__(self):
+        self.calls = 0
+        self.income = 1000.0
+        self.before_return = None  # корутина, вызываемая перед ответом (сброс во время запроса)
+
+    async def get_houses_by_address(self, address, limit=3, return_debug=False):
+        self.calls += 1
+        await asyncio.sleep(BITRIX_MS / 1000)
+        if self.before_return:
+            await self.before_return()
+        houses = []
+        if "кибальчича" in address.lower():
+            houses = [HouseDTO(
+                id="1", title="Кибальчича 3", address="Кибальчича 3",
+                elder_contact=ElderContact(name="Иванова Анна", phones=["+7 900 000-00-00"]),
+            )]
+        return (houses, {"cache": "miss"}) if return_debug else houses
+
+    async def get_elder_contact_by_address(self, address, return_debug=False):
+        houses, meta = await self.get_houses_by_address(address, limit=1, return_debug=True)
+        elder = houses[0].elder_contact if houses else None
+        return (elder, {"houses": meta}) if return_debug else elder
+
+    async def get_finance_aggregate(self, db, date_from=None, date_to=None, return_debug=False):
+        self.calls += 1
+        data = {"transactions": 1, "income": self.income, "expense": 0.0}
+        return (data, {"cache": "miss"}) if return_debug else data
+
+
+async def ask(message, db=None):
+    started = time.perf_counter()
+    res = await brain_router.try_fast_answer(message, db=db, return_debug=True)
+    return res, (time.perf_counter() - started) * 1000
+
+
+async def test_paraphrase_hit(store):
+    print("\n🧪 Тот же вопрос другими словами - из кеша")
+    first, _ = await ask("контакты старшего на Кибальчича 3")
+    calls = store.calls
+    second, ms = await ask("Контакты старшего: на кибальчича 3!")
+    assert first["answer"] == second["answer"]
+    assert store.calls == calls, "резолвер вызван повторно"
+    assert second["debug"]["answer_cache"] == "hit" and second["debug"]["matched_rule"] == "elder_contact"
+    assert ms < 5, f"ответ из кеша за {ms:.2f} мс"
+    print(f"   ✅ ответ из кеша за {ms:.3f} мс, Bitrix не вызывался")
+
+    await ask("контакты старшего на Билибина 6")
+    assert store.calls > calls, "другой адрес должен идти мимо кеша"
+    print("   ✅ другой адрес - промах")
+
+
+async def test_fallback_not_cached(store):
+    print("\n🧪 Ответы резервной цепочки не кешируются")
+    # Намерение - график уборок, но отвечает резервный elder_contact
+    msg = "телефон старшего и график уборок на Кибальчича 3 в октябре"
+    await ask(msg)
+    calls = store.calls
+    res, _ = await ask(msg)
+    assert store.calls > calls and "answer_cache" not in res["debug"]
+    print(f"   ✅ {res['debug']['matched_rule']} из цепочки посчитан заново")
+
+
+async def test_invalidation(store):
+    print("\n🧪 Сброс по источнику")
+    db = object()
+    await ask("покажи финансы", db=db)
+    await ask("контакты старшего на Кибальчича 3")
+    brain_answer_cache.invalidate("finance")
+    store.income = 2000.0
+    calls = store.calls
+    elder, _ = await ask("контакты старшего на Кибальчича 3")
+    assert store.calls == calls and elder["debug"].get("answer_cache") == "hit"
+    fin, _ = await ask("покажи финансы", db=db)
+    assert store.calls == calls + 1 and "2,000.00" in fin["answer"]
+    print("   ✅ finance: финансы пересчитаны, контакты остались в кеше")
+
+    brain_answer_cache.invalidate("bitrix")
+    elder, _ = await ask("контакты старшего на Кибальчича 3")
+    assert "answer_cache" not in elder["debug"]
+    fin, _ = await ask("покажи финансы", db=db)
+    assert fin["debug"].get("answer_cache") == "hit"
+    print("   ✅ bitrix: контакты пересчитаны, финансы остались в кеше")
+
+    res = await brain_router.try_fast_answer("покажи финансы", db=None, return_debug=True)
+    assert "answer_cache" not in res["debug"]
+    print("   ✅ без сессии БД финансовое намерение из кеша не отдаётся")
+
+
+async def test_invalidated_during_request(store):
+    print("\n🧪 Сброс во время запроса")
+    brain_answer_cache.invalidate("bitrix")
+
+    async def invalidate():
+        brain_answer_cache.invalidate("bitrix")
+
+    store.before_return = invalidate
+    await ask("контакты старшего на Кибальчича 3")
+    store.before_return = None
+    calls = store.calls
+    await ask("контакты старшего на Кибальчича 3")
+    assert store.calls > calls, "ответ, посчитанный до сброса, попал в кеш"
+    print("   ✅ ответ, посчитанный во время сброса, не сохранён")
+
+
+async def test_caller_mutation(store):
+    print("\n🧪 Правка ответа вызывающим")
+    first, _ = await ask("контакты старшего на Кибальчича 3")
+    first["answer"] = "испорчено"
+    second, _ = await ask("контакты старшего на Кибальчича 3")
+    assert second["answer"] != "испорчено" and second["debug"]["answer_cache"] == "hit"
+    print("   ✅ кеш отдаёт копию")
+
+
+def test_metrics():
+    print("\n🧪 Счётчики в BrainMetrics.snapshot()")
+    snap = brain_metrics.snapshot()
+    assert snap["answer_cache_hits"].get("elder_contact", 0) > 0
+    assert snap["answer_cache_misses"].get("elder_contact", 0) > 0
+    assert snap["answer_cache_invalidations"].get("bitrix", 0) > 0
+    print(f"   ✅ hits {snap['answer_cache_hits']}, misses {snap['answer_cache_misses']}")
+
+
+async def main():
+    logging.basicConfig(level=logging.ERROR)
+    store = StubStore()
+    brain_resolvers._brain_store = store
+    print("=" * 90)
+    print("🧪 brain_answer_cache")
+    print("=" * 90)
+    await test_paraphrase_hit(store)
+    await test_fallback_not_cached(store)
+    await test_invalidation(store)
+    await test_invalidated_during_request(store)
+    await test_caller_mutation(store)
+    test_metrics()
+    print("\n✅ Все тесты пройдены")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,202 @@
+"""
+Тест паритета brain_intents.detect_intent (INTENT_RULES + IntentMatcher) с прежней реализацией
+- эталон ниже - прежний detect_intent без изменений: `kw in tl` по спискам и extract_month по паттернам
+- корпус: типовые запросы диспетчеров, пограничные случаи и 20 000 сгенерированных сочетаний
+  ключевых слов, адресов, месяцев и дат
+
+Запуск: python test_brain_intent_parity.py
+"""
+import logging
+import os
+import random
+import re
+
+os.environ.setdefault("BITRIX24_WEBHOOK_URL", "https://test.bitrix24.ru/rest/1/test/")
+
+from backend.app.services.brain_intents import (  # noqa: E402
+    INTENT_RULES,
+    MONTH_PATTERNS,
+    detect_intent,
+    extract_address,
+    extract_date_range,
+    extract_specific_date,
+)
+
+
+def reference_month(text):
+    text_lower = text.lower()
+    for month_key, patterns in MONTH_PATTERNS.items():
+        for pattern in patterns:
+            if re.search(pattern, text_lower):
+                return month_key
+    return None
+
+
+def reference_detect_intent(message):
+    """Прежний detect_intent"""
+    if not message:
+        return None
+    tl = message.lower()
+    result = {}
+    address = extract_address(message)
+    month = reference_month(message)
+    date_range = extract_date_range(message)
+    specific_date = extract_specific_date(message)
+    intent_scores = {}
+
+    elder_score = 0
+    for kw in ["контакт", "телефон", "номер", "почта", "email", "связ"]:
+        if kw in tl:
+            elder_score += 2
+    for tg in ["старш"]:
+        if tg in tl:
+            elder_score += 3
+    if address:
+        elder_score += 1
+    if elder_score >= 3:
+        intent_scores['elder_contact'] = elder_score
+
+    cleaning_score = 0
+    for kw in ["уборк", "график", "расписан", "когда", "дат"]:
+        if kw in tl:
+            cleaning_score += 2
+    if month:
+        cleaning_score += 3
+    if address:
+        cleaning_score += 2
+    if cleaning_score >= 2:
+        intent_scores['cleaning_month'] = cleaning_score
+
+    brigade_score = 0
+    for kw in ["бригад", "кто убирает", "какая команда"]:
+        if kw in tl:
+            brigade_score += 3
+    if address:
+        brigade_score += 2
+    if brigade_score >= 3:
+        intent_scores['brigade'] = brigade_score
+
+    structural_score = 0
+    for kw in ["квартир", "этаж", "подъезд", "сколько домов", "всего", "статистика"]:
+        if kw in tl:
+            structural_score += 2
+    if structural_score >= 2:
+        intent_scores['structural_totals'] = structural_score
+
+    if any(k in tl for k in ["yoy", "г/г", "год к году", "годовая динамика"]):
+        intent_scores['finance_yoy'] = 10
+    if any(k in tl for k in ["м/м", "месяц к месяц", "месячная динамика"]) and not any(k in tl for k in ["г/г", "год"]):
+        intent_scores['finance_mom'] = 9
+    if any(k in tl for k in ["топ", "рост", "падени", "лидеры", "просели", "тренд"]):
+        intent_scores['finance_cat_trends'] = 8
+    if any(k in tl for k in ["категори", "разбивк", "по категор", "структура расходов"]):
+        intent_scores['finance_breakdown'] = 7
+
+    finance_basic_score = 0
+    for kw in ["финанс", "деньги", "баланс", "прибыль", "доход", "расход"]:
+        if kw in tl:
+            finance_basic_score += 1
+    if finance_basic_score >= 1 and not any(k in ['finance_yoy', 'finance_mom', 'finance_cat_trends', 'finance_breakdown'] for k in intent_scores.keys()):
+        intent_scores['finance_basic'] = 5
+
+    contractor_score = 0
+    for kw in ["подрядчик", "управляющ", "компани", "ук", "контакты ук"]:
+        if kw in tl:
+            contractor_score += 2
+    if contractor_score >= 2:
+        intent_scores['contractor_contacts'] = 6
+
+    if any(k in tl for k in ["задач", "жалоб", "заявк", "проблем"]):
+        tasks_score = 4
+        if address:
+            tasks_score += 2
+        if any(k in tl for k in ["по адресу", "на доме", "объект"]):
+            tasks_score += 1
+        if tasks_score >= 4:
+            intent_scores['tasks_by_address'] = tasks_score
+
+    if any(k in tl for k in ["задач", "жалоб", "заявк"]) and any(k in tl for k in ["бригад", "у бригады"]):
+        intent_scores['tasks_by_brigade'] = 7
+
+    if not intent_scores:
+        return None
+    best_intent = max(intent_scores.items(), key=lambda x: x[1])
+    result['type'] = best_intent[0]
+    result['confidence'] = best_intent[1]
+    if address:
+        result['address'] = address
+    if month:
+        result['month'] = month
+    if date_range:
+        result['date_range'] = date_range
+    if specific_date:
+        result['specific_date'] = specific_date
+    return result
+
+
+CORPUS = [
+    "", " ", "привет", "кто ты", "Контакты старшего на Кибальчича 3",
+    "телефон старшего по адресу Билибина 6 к1 лит А", "график уборок на Кибальчича 3 стр2 в октябре",
+    "когда уборка на Билибина 6 в 11.2025", "КАКАЯ БРИГАДА НА ЛЕНИНА 5", "кто убирает дом на Пушкина 10",
+    "сколько домов всего", "статистика по подъездам", "покажи финансы", "доход год к году", "г/г и м/м",
+    "динамика м/м за год", "месячная динамика расходов", "топ категорий", "разбивка по категориям",
+    "структура расходов за квартал", "контакты УК на Кибальчича 3", "управляющая компания Ленина 5",
+    "задачи по адресу Билибина 6", "жалобы на доме Ленина 5", "заявки у бригады 2", "проблемы объект Чехова 1",
+    "уборка 15 октября", "что было вчера", "расходы с 1 по 15 ноября", "01.10-15.10 доходы",
+    "декабрь 2025-12-01", "звук", "мука", "рукав", "поставь задачу", "yoy", "контакты укладчиков",
+    "номер подъезда на Тверской 12", "12", "10", "связь со старшим на невском 8", "email",
+]
+
+FRAGMENTS = sorted({w for r in INTENT_RULES for w, _ in r.keywords} | {
+    w for r in INTENT_RULES for group, _ in r.bonus for w in group
+} | {w for r in INTENT_RULES for w in r.also_any + r.unless_any}) + [
+    "на Кибальчича 3", "по адресу Билибина 6 к1", "Ленина 5", "дом на Пушкина 10 стр 2", "в октябре",
+    "ноябрь", "дек", "11/2025", "2025-10-15", "15.10", "с 1 по 15 октября", "за квартал", "сегодня",
+    "вчера", "за год", "покажи", "пожалуйста", "и", "а также", "ООО", "Кибальчича", "12", "10.",
+]
+
+
+def generated(n, seed=7):
+    rng = random.Random(seed)
+    for _ in range(n):
+        parts = rng.sample(FRAGMENTS, rng.randint(1, 5))
+        text = " ".join(parts)
+        if rng.random() < 0.3:
+            text = text.upper() if rng.random() < 0.5 else text.capitalize()
+        if rng.random() < 0.2:
+            # Ключевые слова внутри других слов: подстроки тоже должны находиться
+            text = text.replace(" ", rng.choice(["", "-", ", "]))
+        yield text
+
+
+def test_parity():
+    print("\n🧭 Тест: detect_intent совпадает с прежней реализацией")
+    messages = CORPUS + list(generated(20_000))
+    mismatches = []
+    for msg in messages:
+        expected, actual = reference_detect_intent(msg), detect_intent(msg)
+        if expected != actual:
+            mismatches.append((msg, expected, actual))
+    intents = {}
+    for msg in messages:
+        res = detect_intent(msg)
+        key = res["type"] if res else None
+        intents[key] = intents.get(key, 0) + 1
+    print(f"   сообщений: {len(messages)}, намерения: {intents}")
+    for msg, expected, actual in mismatches[:10]:
+        print(f"   ❌ {msg!r}\n      было: {expected}\n      стало: {actual}")
+    assert not mismatches, f"{len(mismatches)} расхождений"
+    print("   ✅ Результаты идентичны")
+
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+    print("=" * 90)
+    print("🧪 brain_intents.detect_intent: паритет")
+    print("=" * 90)
+    test_parity()
+    print("\n✅ Все тесты пройдены")
+
+
+if __name__ == "__main__":
+    main()
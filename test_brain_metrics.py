@@ -0,0 +1,135 @@
+"""
+Тест BrainMetrics: гистограммы задержек, текстовый формат /metrics, интервалы для brain_metrics_snapshots
+- границы корзин (le включительно), оценка p50/p95/p99 по корзинам
+- render_text: накопительные корзины, _sum/_count, экранирование меток
+- BrainStore: задержка по области, открытия circuit breaker, отдачи устаревшего значения
+- interval(): только приросты с прошлого сброса
+- цена записи наблюдения - меньше микросекунды
+
+Запуск: python test_brain_metrics.py
+"""
+import asyncio
+import logging
+import os
+import time
+import timeit
+
+os.environ.setdefault("BITRIX24_WEBHOOK_URL", "https://test.bitrix24.ru/rest/1/test/")
+
+from backend.app.services.brain_metrics import LATENCY_BUCKETS_MS, BrainMetrics, LatencyHistogram, quantile  # noqa: E402
+from backend.app.services import brain_store  # noqa: E402
+
+
+def test_buckets():
+    print("\n🧪 Корзины и квантили")
+    h = LatencyHistogram()
+    for ms in (0.2, 1, 1.01, 50, 20000):
+        h.observe(ms)
+    assert h.counts[0] == 2, "1 мс попадает в le=1"
+    assert h.counts[1] == 1
+    assert h.counts[LATENCY_BUCKETS_MS.index(50)] == 1
+    assert h.counts[-1] == 1, "больше последней границы - +Inf"
+
+    h = LatencyHistogram()
+    for i in range(100):
+        h.observe(50.5 + i * 0.49)  # все в (50, 100]
+    assert quantile(h.counts, 0.5) == 75.0
+    assert quantile(h.counts, 0.99) == 99.5
+    assert quantile([0] * len(h.counts), 0.5) is None
+    print(f"   ✅ p50 {quantile(h.counts, 0.5)} мс, p99 {quantile(h.counts, 0.99)} мс")
+
+
+def test_render_text():
+    print("\n🧪 Текстовый формат")
+    m = BrainMetrics()
+    m.observe_resolver("elder_contact", 3)
+    m.observe_resolver("elder_contact", 300)
+    m.record_resolver("elder_contact", 300)
+    m.record_cache('do"m', True)
+    text = m.render_text()
+    lines = text.splitlines()
+    buckets = [ln for ln in lines if ln.startswith('brain_resolver_latency_ms_bucket{rule="elder_contact"')]
+    values = [int(ln.rsplit(" ", 1)[1]) for ln in buckets]
+    assert len(buckets) == len(LATENCY_BUCKETS_MS) + 1 and buckets[-1].endswith('le="+Inf"} 2')
+    assert values == sorted(values), "корзины накопительные"
+    assert 'brain_resolver_latency_ms_count{rule="elder_contact"} 2' in lines
+    assert 'brain_resolver_latency_ms_sum{rule="elder_contact"} 303.000' in lines
+    assert 'brain_resolver_answers_total{rule="elder_contact"} 1' in lines
+    assert 'brain_store_cache_hits_total{area="do\\"m"} 1' in lines
+    assert "# TYPE brain_resolver_latency_ms histogram" in lines
+    snap = m.snapshot()["resolver_latency_ms"]["elder_contact"]
+    assert snap["count"] == 2 and snap["p99"] is not None
+    print(f"   ✅ {len(lines)} строк, гистограмма elder_contact: p50 {snap['p50']} мс, p99 {snap['p99']} мс")
+
+
+async def test_store_metrics():
+    print("\n🧪 BrainStore: задержка, circuit breaker, устаревшие значения")
+    m = BrainMetrics()
+    brain_store.brain_metrics = m
+    store = brain_store.BrainStore()
+    cache = store.addr_cache
+
+    async def failing(meta):
+        raise RuntimeError("bitrix down")
+
+    for i in range(store._cb_threshold):
+        await store._cached(cache, "houses", f"k{i}", failing, [])
+    assert m.breaker_opens["houses"] == 1
+    assert sum(m.store_latency["houses"].counts) == store._cb_threshold
+
+    # breaker открыт, в кеше просроченное значение - отдаётся оно
+    cache.set("old", ["house"])
+    cache._store["old"].stored_at -= cache.ttl + 1
+    val, meta = await store._cached(cache, "houses", "old", failing, [])
+    assert val == ["house"] and meta["stale"] and m.stale_serves["houses"] == 1
+    print(f"   ✅ breaker opens {dict(m.breaker_opens)}, stale {dict(m.stale_serves)}")
+
+
+def test_interval():
+    print("\n🧪 Интервал с прошлого сброса")
+    m = BrainMetrics()
+    m.observe_resolver("finance_basic", 20)
+    m.record_answer_cache("finance_basic", True)
+    m._flushed = m._cumulative()
+    m.observe_resolver("finance_basic", 400)
+    m.observe_resolver("brigade", 5)
+    m.record_answer_cache("finance_basic", False)
+    data = m.interval(m._cumulative())
+    assert data["resolver_latency_ms"]["finance_basic"]["count"] == 1
+    assert data["resolver_latency_ms"]["finance_basic"]["sum_ms"] == 400
+    assert data["resolver_latency_ms"]["brigade"]["count"] == 1
+    assert data["answer_cache_hits"] == {} and data["answer_cache_misses"] == {"finance_basic": 1}
+    print("   ✅ в интервале только приросты")
+
+
+def test_overhead():
+    print("\n🧪 Цена записи")
+    m = BrainMetrics()
+    m.observe_resolver("elder_contact", 1.0)
+    n = 200_000
+    empty = min(timeit.repeat(lambda: None, number=n, repeat=5)) / n
+    for name, fn in (
+        ("observe_resolver", lambda: m.observe_resolver("elder_contact", 137.5)),
+        ("record_cache", lambda: m.record_cache("houses", True)),
+    ):
+        ns = (min(timeit.repeat(fn, number=n, repeat=5)) / n - empty) * 1e9
+        assert ns < 1000, f"{name}: {ns:.0f} нс"
+        print(f"   ✅ {name}: {ns:.0f} нс")
+
+
+async def main():
+    logging.basicConfig(level=logging.CRITICAL)
+    print("=" * 90)
+    print("🧪 BrainMetrics")
+    print("=" * 90)
+    started = time.perf_counter()
+    test_buckets()
+    test_render_text()
+    await test_store_metrics()
+    test_interval()
+    test_overhead()
+    print(f"\n✅ Все тесты пройдены ({time.perf_counter() - started:.1f} с)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,175 @@
+"""
+Тест фильтров list_houses на стороне Bitrix: сколько запросов к порталу стоит первая страница
+домов бригады (как открывает /cleaning/houses?brigade=3)
+- Портал (httpx.MockTransport): 1500 сделок категории 34, 7 бригад; crm.deal.list понимает
+  filter[ASSIGNED_BY_ID][] и filter[>=UF_...]/filter[<UF_...], страницы по 50
+- "полный обход": как было - все страницы crm.deal.list, фильтр в Python
+- "pushdown": ASSIGNED_BY_ID в filter[...] + остановка после page*limit домов
+
+Запуск: python test_list_houses_pushdown.py
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+from urllib.parse import parse_qsl
+
+import httpx
+
+os.environ.setdefault("BITRIX24_WEBHOOK_URL", "https://test.bitrix24.ru/rest/1/test/")
+# БД тесту не нужна, но модули сервиса создают engine при импорте
+os.environ.setdefault("DATABASE_URL", "postgresql://test@127.0.0.1:1/test")
+
+from backend.app.config.http_clients import http_clients  # noqa: E402
+from backend.app.config.settings import settings  # noqa: E402
+from backend.app.services.bitrix24_service import Bitrix24Service  # noqa: E402
+from backend.app.services.bitrix_rate_limiter import AdaptiveTokenBucket  # noqa: E402
+
+DEALS = 1500
+PAGE_SIZE = 50
+DATE_FIELD = 'UF_CRM_1741593004888'
+
+
+class Portal:
+    def __init__(self):
+        rng = random.Random(7)
+        self.deals = []
+        for i in range(DEALS, 0, -1):
+            day = rng.randint(1, 28)
+            self.deals.append({
+                'ID': str(i),
+                'TITLE': f'ул. Тестовая, д. {i}',
+                'UF_CRM_1669561599956': f'Калуга, ул. Тестовая, д. {i}',
+                'COMPANY_ID': str(1000 + rng.randint(1, 30)),
+                'ASSIGNED_BY_ID': str(rng.randint(1, 7)),
+                'STAGE_ID': 'C34:WON',
+                DATE_FIELD: [f'2025-10-{day:02d}T03:00:00+03:00'],
+                'UF_CRM_1741593047994': '1',
+            })
+        self.requests = []
+
+    def deal_list(self, query: list) -> dict:
+        params = dict(query)
+        ids = [v for k, v in query if k == 'filter[ASSIGNED_BY_ID][]']
+        deals = self.deals
+        if ids:
+            deals = [d for d in deals if d['ASSIGNED_BY_ID'] in ids]
+        for k, v in params.items():
+            if k.startswith('filter[>='):
+                code = k[len('filter[>='):-1]
+                deals = [d for d in deals if any(x[:10] >= v for x in d.get(code) or [])]
+            elif k.startswith('filter[<') and not k.startswith('filter[<='):
+                code = k[len('filter[<'):-1]
+                deals = [d for d in deals if any(x[:10] < v for x in d.get(code) or [])]
+        start = int(params.get('start', 0))
+        res = {'result': deals[start:start + PAGE_SIZE], 'total': len(deals)}
+        if start + PAGE_SIZE < len(deals):
+            res['next'] = start + PAGE_SIZE
+        return res
+
+    def call(self, method: str, params: dict):
+        pid = params.get('id') or params.get('ID') or params.get('filter[ID]')
+        if method == 'user.get':
+            if pid:
+                return [{'ID': pid, 'NAME': f'{pid} бригада', 'LAST_NAME': ''}]
+            return [{'ID': str(i), 'NAME': f'{i} бригада', 'LAST_NAME': ''} for i in range(1, 8)]
+        if method == 'crm.company.get':
+            return {'ID': pid, 'TITLE': f'УК {pid}'}
+        if method == 'crm.deal.userfield.list':
+            return [{'FIELD_NAME': params.get('filter[FIELD_NAME]'), 'LIST': [{'ID': '1', 'VALUE': 'Влажная уборка'}]}]
+        return None
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        method = request.url.path.rstrip('/').rsplit('/', 1)[-1]
+        self.requests.append(method)
+        if method == 'batch':
+            cmd = json.loads(request.content)['cmd']
+            result = {k: self.call(c.partition('?')[0], dict(parse_qsl(c.partition('?')[2]))) for k, c in cmd.items()}
+            return httpx.Response(200, json={'result': {'result': result, 'result_error': []}})
+        if method == 'crm.deal.list':
+            return httpx.Response(200, json=self.deal_list(list(request.url.params.multi_items())))
+        res = self.call(method, dict(request.url.params))
+        if res is None:
+            return httpx.Response(400, json={'error': 'NOT_FOUND'})
+        return httpx.Response(200, json={'result': res})
+
+
+def fresh_service(portal: Portal) -> Bitrix24Service:
+    http_clients._clients['bitrix'] = httpx.AsyncClient(transport=httpx.MockTransport(portal.handle))
+    service = Bitrix24Service()
+    service.rate_limiter = AdaptiveTokenBucket(rate=1000, burst=1000)
+
+    async def no_mirror():
+        return None
+    service.mirror.get_deals = no_mirror
+    return service
+
+
+async def run(pushdown: bool, **kwargs):
+    portal = Portal()
+    service = fresh_service(portal)
+    settings.BITRIX_FILTER_PUSHDOWN = pushdown
+    data = await service.list_houses(**kwargs)
+    return portal, data
+
+
+async def test_brigade_first_page():
+    """Первая страница бригады 3: pushdown + ранняя остановка против полного обхода"""
+    print("\n🏠 Тест: brigade=3, page=1, limit=20")
+    old_portal, old = await run(False, brigade='3', page=1, limit=20, with_total=True)
+    new_portal, new = await run(True, brigade='3', page=1, limit=20)
+
+    old_lists = old_portal.requests.count('crm.deal.list')
+    new_lists = new_portal.requests.count('crm.deal.list')
+    print(f"   полный обход: {len(old_portal.requests)} запросов (crm.deal.list: {old_lists}), total={old['total']}")
+    print(f"   pushdown:     {len(new_portal.requests)} запросов (crm.deal.list: {new_lists}), "
+          f"total>={new['total']}, exact={new['total_exact']}, pages={new['pages']}")
+
+    assert [h['id'] for h in new['houses']] == [h['id'] for h in old['houses']], "страница отличается от полного обхода"
+    assert all(h['brigade_number'] == '3' for h in new['houses'])
+    assert old_lists == DEALS // PAGE_SIZE
+    assert new_lists == 1, f"ожидалась одна страница crm.deal.list, было {new_lists}"
+    assert len(new_portal.requests) <= 5, new_portal.requests
+    assert not new['total_exact'] and new['pages'] == 2
+    print("   ✅ Одна страница crm.deal.list вместо", old_lists)
+
+
+async def test_brigade_with_total():
+    """with_total=True: точный total, совпадающий с полным обходом"""
+    print("\n🏠 Тест: brigade=3, with_total=True")
+    _, old = await run(False, brigade='3', page=2, limit=20, with_total=True)
+    portal, new = await run(True, brigade='3', page=2, limit=20, with_total=True)
+    print(f"   total: {new['total']} (полный обход: {old['total']}), crm.deal.list: {portal.requests.count('crm.deal.list')}")
+    assert new['total_exact'] and new['total'] == old['total'] and new['pages'] == old['pages']
+    assert [h['id'] for h in new['houses']] == [h['id'] for h in old['houses']]
+    print("   ✅ total совпадает")
+
+
+async def test_date_range():
+    """Диапазон дат уборок: filter[>=UF]/filter[<UF] по каждому полю дат, результат как у полного обхода"""
+    print("\n📅 Тест: date_from=2025-10-10, date_to=2025-10-12")
+    kwargs = dict(date_from='2025-10-10', date_to='2025-10-12', page=1, limit=1000, with_total=True)
+    _, old = await run(False, **kwargs)
+    portal, new = await run(True, **kwargs)
+    print(f"   домов: {new['total']} (полный обход: {old['total']}), crm.deal.list: {portal.requests.count('crm.deal.list')}")
+    assert [h['id'] for h in new['houses']] == [h['id'] for h in old['houses']]
+    print("   ✅ Выборка совпадает")
+
+
+async def main():
+    logging.basicConfig(level=logging.ERROR)
+    print("=" * 90)
+    print(f"🧪 list_houses: фильтры на стороне Bitrix ({DEALS} сделок, страница портала {PAGE_SIZE})")
+    print("=" * 90)
+    try:
+        await test_brigade_first_page()
+        await test_brigade_with_total()
+        await test_date_range()
+        print("\n✅ Все тесты пройдены")
+    finally:
+        await http_clients.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+"""
+Тест общего кеша SWRCache (backend/app/services/swr_cache.py) и его использования в list_houses
+- single-flight: 50 конкурентных промахов - одна загрузка
+- stale-while-revalidate и отдача старого значения при ошибке загрузки
+- LRU-вытеснение по числу записей и по байтам
+- list_houses(with_total=True) x20 одновременно после истечения deals_cache - один обход портала
+
+Запуск: python test_swr_cache.py
+"""
+import asyncio
+import logging
+import os
+
+os.environ.setdefault("BITRIX24_WEBHOOK_URL", "https://test.bitrix24.ru/rest/1/test/")
+# БД тесту не нужна, но модули сервиса создают engine при импорте
+os.environ.setdefault("DATABASE_URL", "postgresql://test@127.0.0.1:1/test")
+
+from backend.app.config.http_clients import http_clients  # noqa: E402
+from backend.app.services.swr_cache import SWRCache, cache_stats  # noqa: E402
+from test_list_houses_pushdown import Portal, fresh_service  # noqa: E402
+
+
+async def test_single_flight():
+    print("\n🔀 Тест: 50 конкурентных промахов")
+    cache = SWRCache("test.single", 60)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"value": 42}
+
+    results = await asyncio.gather(*[cache.get_or_load("k", loader) for _ in range(50)])
+    print(f"   загрузок: {calls}, {cache.stats()['coalesced']} ждали общую")
+    assert calls == 1 and all(r == {"value": 42} for r in results)
+    print("   ✅ Одна загрузка на всех")
+
+
+async def test_stale_while_revalidate():
+    print("\n♻️  Тест: просроченное значение и ошибка загрузки")
+    cache = SWRCache("test.stale", 0.05, stale_seconds=60)
+    version = 0
+
+    async def loader():
+        nonlocal version
+        version += 1
+        return version
+
+    assert await cache.get_or_load("k", loader) == 1
+    await asyncio.sleep(0.1)
+    # Просрочено: сразу старое значение, новое - в фоне
+    assert await cache.get_or_load("k", loader) == 1
+    await asyncio.sleep(0.01)
+    assert cache.get("k") == 2, cache.stats()
+    print(f"   stale_hits={cache.stats()['stale_hits']}, refreshes={cache.stats()['refreshes']}")
+
+    await asyncio.sleep(0.1)
+
+    async def failing():
+        raise RuntimeError("портал недоступен")
+
+    strict = SWRCache("test.strict", 0.05, stale_seconds=60, revalidate=False)
+    strict.set("k", "старое")
+    await asyncio.sleep(0.1)
+    assert await strict.get_or_load("k", failing) == "старое"
+    print(f"   при ошибке: stale_on_error={strict.stats()['stale_on_error']}")
+    try:
+        await strict.get_or_load("нет", failing)
+        raise AssertionError("ожидалось исключение без старого значения")
+    except RuntimeError:
+        pass
+    print("   ✅ Старое значение отдаётся, ошибка без него - пробрасывается")
+
+
+async def test_eviction():
+    print("\n🧹 Тест: LRU по записям и байтам")
+    cache = SWRCache("test.lru", 60, max_entries=3)
+    for k in "abc":
+        cache.set(k, k)
+    cache.get("a")
+    cache.set("d", "d")
+    assert cache.peek("b") is None and cache.peek("a") == "a"
+
+    sized = SWRCache("test.bytes", 60, max_bytes=20_000)
+    for i in range(10):
+        sized.set(str(i), ["x" * 100] * 20)
+    st = sized.stats()
+    print(f"   по записям: evictions={cache.stats()['evictions']}; по байтам: entries={st['entries']}, bytes={st['bytes']}")
+    assert st["bytes"] <= 20_000 and st["evictions"] > 0
+    print("   ✅ Вытесняются самые старые")
+
+
+async def test_list_houses_coalescing():
+    print("\n🏠 Тест: 20 одновременных /cleaning/houses?with_total=true на пустом deals_cache")
+    portal = Portal()
+    service = fresh_service(portal)
+    results = await asyncio.gather(*[service.list_houses(page=1, limit=20, with_total=True) for _ in range(20)])
+    scans = portal.requests.count("crm.deal.list")
+    print(f"   crm.deal.list: {scans} (один полный обход = {len(portal.deals) // 50}), deals_cache: {service.deals_cache.stats()['coalesced']} ждали общий")
+    assert scans == len(portal.deals) // 50
+    assert len({r["total"] for r in results}) == 1
+    print("   ✅ Один обход портала на все запросы")
+
+
+async def main():
+    logging.basicConfig(level=logging.ERROR)
+    print("=" * 90)
+    print("🧪 SWRCache")
+    print("=" * 90)
+    try:
+        await test_single_flight()
+        await test_stale_while_revalidate()
+        await test_eviction()
+        await test_list_houses_coalescing()
+        print(f"\n📊 {sorted(cache_stats())}")
+        print("\n✅ Все тесты пройдены")
+    finally:
+        await http_clients.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())